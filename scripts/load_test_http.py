@@ -0,0 +1,61 @@
+"""Measure the throughput of a running ``sourcery-analytics serve-http`` service.
+
+Each request analyzes the Python files given, sent as sources, so the service need not
+share a file system with this script. Sending the same files repeatedly measures warm
+requests; pass ``--distinct`` to vary each request's sources, measuring cold requests.
+
+Examples:
+    sourcery-analytics serve-http --jobs 4 &
+    python scripts/load_test_http.py sourcery_analytics/*.py --requests 500
+"""
+import pathlib
+import typing
+
+import typer
+
+from sourcery_analytics.load_testing import load_test
+
+
+def main(
+    files: typing.List[pathlib.Path] = typer.Argument(
+        ..., exists=True, file_okay=True, dir_okay=False
+    ),
+    url: str = typer.Option("http://127.0.0.1:8765/analyze"),
+    requests: int = typer.Option(200, min=1),
+    concurrency: int = typer.Option(8, min=1, help="Requests in flight at once."),
+    files_per_request: int = typer.Option(1, min=1),
+    distinct: bool = typer.Option(
+        False, help="Make every request's sources distinct, so none are cached."
+    ),
+):
+    """Sends requests to the service, then prints its throughput and latencies."""
+    sources = {str(file): file.read_text() for file in files}
+    names = list(sources)
+    bodies = []
+    for index in range(requests if distinct else len(names)):
+        chosen = [
+            names[(index + offset) % len(names)] for offset in range(files_per_request)
+        ]
+        bodies.append(
+            {
+                "sources": {
+                    name: sources[name] + (f"\n# {index}\n" if distinct else "")
+                    for name in chosen
+                }
+            }
+        )
+
+    result = load_test(url, bodies, requests=requests, concurrency=concurrency)
+    typer.echo(
+        f"{result.requests} requests, {result.failures} failed, "
+        f"in {result.seconds:.2f}s: {result.throughput:.1f} requests/s"
+    )
+    typer.echo(
+        "latency p50 {:.1f}ms, p90 {:.1f}ms, p99 {:.1f}ms".format(
+            *(result.percentile(percent) * 1000 for percent in (50, 90, 99))
+        )
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
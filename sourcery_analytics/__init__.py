@@ -1,4 +1,10 @@
 """Calculate static code quality metrics."""
 
-from sourcery_analytics.analysis import analyze_methods, analyze
+from sourcery_analytics.analysis import (
+    analyze_methods,
+    analyze,
+    iter_method_metrics,
+    MethodRecord,
+)
 from sourcery_analytics.extractors import extract_methods, extract
+from sourcery_analytics.aio import aanalyze_methods, aiter_method_metrics
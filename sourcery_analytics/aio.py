@@ -0,0 +1,274 @@
+"""Asynchronous counterparts of the analysis functions, for use in asyncio services.
+
+Parsing and computing metrics is CPU-bound, so these functions never do it on the event
+loop. Instead, each file is analyzed in an executor: by default the loop's default
+thread pool, or any :py:class:`concurrent.futures.Executor`, such as a process pool.
+Results are awaited in order, while up to ``concurrency`` files are analyzed ahead.
+An :py:class:`asyncio.Semaphore` may be shared between calls, to cap the number of
+files being analyzed at once across all of them.
+
+Cancelling a call, or closing an iterator early, cancels the files not yet started.
+Files already being analyzed finish in the background, but their results are dropped.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import itertools
+import pathlib
+import typing
+
+import astroid
+import more_itertools
+
+from sourcery_analytics.analysis import (
+    RECORD_CACHE,
+    MethodRecord,
+    MethodRecorder,
+    analyze,
+    work_units,
+)
+from sourcery_analytics.extractors import Extractable, extract_methods
+from sourcery_analytics.metrics import standard_method_metrics
+from sourcery_analytics.metrics.aggregations import Aggregation
+from sourcery_analytics.metrics.compounders import Compounder, name_metrics
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.settings import LimitSettings
+from sourcery_analytics.sharding import Shard
+
+R = typing.TypeVar("R")
+T = typing.TypeVar("T")
+
+Metrics = typing.Union[None, MethodMetric, typing.Iterable[MethodMetric]]
+
+
+async def aiter_method_metrics(
+    items: typing.Union[Extractable, typing.Iterable[Extractable]],
+    /,
+    *,
+    metrics: Metrics = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    concurrency: int = 4,
+    semaphore: typing.Optional[asyncio.Semaphore] = None,
+    cache: bool = False,
+    limits: typing.Optional[LimitSettings] = None,
+    shard: typing.Optional[Shard] = None,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None,
+) -> typing.AsyncIterator[MethodRecord]:
+    """Asynchronously yields a :py:class:`.MethodRecord` for each method in ``items``.
+
+    The asynchronous counterpart of :py:func:`.iter_method_metrics`.
+
+    Args:
+        items: source code, a node, a file or directory path, or an iterable of these
+        metrics: the method metrics to compute, by default the standard metrics
+        executor: the executor to analyze files in, by default the loop's default
+            executor. With a process pool, metrics must be picklable.
+        concurrency: the number of files analyzed ahead of the consumer
+        semaphore: caps the number of files analyzed at once, and may be shared
+            between calls. By default, only ``concurrency`` caps this call.
+        cache: reuse the records of files analyzed before, if unchanged
+        limits: per-file limits, beyond which files are skipped with a warning
+        shard: only analyze the files in this shard
+        on_file: called on the event loop with each file once it has been analyzed
+
+    Examples:
+        >>> from sourcery_analytics.metrics import method_length
+        >>> async def lengths(source):
+        ...     records = aiter_method_metrics(source, metrics=method_length)
+        ...     return [record["method_length"] async for record in records]
+        >>> asyncio.run(lengths("def one(): return 1"))
+        [1]
+    """
+    recorder = MethodRecorder(_method_metrics(metrics), limits or LimitSettings())
+    unit_records = functools.partial(
+        _unit_records,
+        _Runner(executor, semaphore or asyncio.Semaphore(concurrency)),
+        recorder,
+        cache=cache,
+    )
+    units = _work_units(items, recorder.limits, shard)
+    async for unit, records in _map_units(units, unit_records, concurrency):
+        if on_file and isinstance(unit, pathlib.Path):
+            on_file(unit)
+        for record in records:
+            yield record
+
+
+async def aanalyze_methods(
+    item: typing.Union[Extractable, typing.Iterable[Extractable]],
+    /,
+    *,
+    metrics: Metrics = None,
+    compounder: Compounder = name_metrics,
+    aggregation: Aggregation[T] = list,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    concurrency: int = 4,
+    semaphore: typing.Optional[asyncio.Semaphore] = None,
+    limits: typing.Optional[LimitSettings] = None,
+    shard: typing.Optional[Shard] = None,
+) -> T:
+    """Extracts methods from ``item`` then computes and aggregates metrics.
+
+    The asynchronous counterpart of :py:func:`.analyze_methods`. Each file is analyzed
+    in the executor, and the results are aggregated on the event loop.
+
+    Args:
+        item: source code, a node, a file or directory path, or an iterable of these
+        metrics: the method metrics to compute, by default the standard metrics
+        compounder: method to combine individual metrics into compound metric
+        aggregation: method to combine the results
+        executor: the executor to analyze files in, by default the loop's default
+            executor. With a process pool, metrics and compounder must be picklable.
+        concurrency: the number of files analyzed at once by this call
+        semaphore: caps the number of files analyzed at once, and may be shared
+            between calls
+        limits: per-file limits, beyond which files are skipped with a warning
+        shard: only analyze the files in this shard
+
+    Examples:
+        >>> from sourcery_analytics.metrics import method_length
+        >>> from sourcery_analytics.metrics.aggregations import total
+        >>> source = '''
+        ...     def one():
+        ...         return 1
+        ...     def two():
+        ...         x = 2
+        ...         return x
+        ... '''
+        >>> asyncio.run(
+        ...     aanalyze_methods(source, metrics=method_length, aggregation=total)
+        ... )
+        {'method_length': 3}
+    """
+    metrics = _method_metrics(metrics)
+    limits = limits or LimitSettings()
+    run = _Runner(executor, semaphore or asyncio.Semaphore(concurrency))
+
+    async def unit_results(
+        unit: Extractable, unit_shard: typing.Optional[Shard]
+    ) -> list:
+        return await run(
+            functools.partial(
+                _unit_analysis, unit, metrics, compounder, limits, unit_shard
+            )
+        )
+
+    results = [
+        unit_result
+        async for _unit, unit_result in _map_units(
+            _work_units(item, limits, shard), unit_results, concurrency
+        )
+    ]
+    return aggregation(itertools.chain.from_iterable(results))
+
+
+@dataclasses.dataclass
+class _Runner:
+    """Runs callables in an executor, as many at once as the semaphore allows."""
+
+    executor: typing.Optional[concurrent.futures.Executor]
+    semaphore: asyncio.Semaphore
+
+    async def __call__(self, callable_: typing.Callable[[], R]) -> R:
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, callable_)
+
+
+async def _unit_records(
+    run: _Runner,
+    recorder: MethodRecorder,
+    unit: Extractable,
+    shard: typing.Optional[Shard],
+    cache: bool,
+) -> typing.List[MethodRecord]:
+    """The records of a unit of work, from the cache or computed in the executor."""
+    key = recorder.cache_key(unit, shard) if cache else None
+    if key is not None and (cached := RECORD_CACHE.peek(key)) is not None:
+        return cached
+    records = await run(functools.partial(recorder.records, unit, shard))
+    if key is not None:
+        RECORD_CACHE.get(key, lambda: records)
+    return records
+
+
+def _unit_analysis(
+    unit: Extractable,
+    metrics: typing.List[MethodMetric],
+    compounder: Compounder,
+    limits: LimitSettings,
+    shard: typing.Optional[Shard],
+) -> list:
+    """Analyzes a single unit of work, possibly in another process."""
+    methods = extract_methods(unit, limits=limits, shard=shard)
+    return analyze(methods, metrics=metrics, compounder=compounder)
+
+
+Unit = typing.Tuple[Extractable, typing.Optional[Shard]]
+
+# the units of work listed off the loop at a time
+UNIT_CHUNK = 64
+
+
+async def _work_units(
+    items: typing.Union[Extractable, typing.Iterable[Extractable]],
+    limits: LimitSettings,
+    shard: typing.Optional[Shard],
+) -> typing.AsyncIterator[Unit]:
+    """Yields the units of work, listing them off the loop a chunk at a time.
+
+    Listing files touches the file system, so it is done in the default executor,
+    without waiting for a whole directory tree to be listed.
+    """
+    if isinstance(items, (str, pathlib.Path, astroid.nodes.NodeNG)):
+        items = [items]
+    loop = asyncio.get_running_loop()
+    chunks = more_itertools.chunked(work_units(items, limits, shard), UNIT_CHUNK)
+    while chunk := await loop.run_in_executor(None, _next_chunk, chunks):
+        for unit in chunk:
+            yield unit
+
+
+def _next_chunk(chunks: typing.Iterator[typing.List[Unit]]) -> typing.List[Unit]:
+    return next(chunks, [])
+
+
+async def _map_units(
+    units: typing.AsyncIterator[Unit],
+    function: typing.Callable[
+        [Extractable, typing.Optional[Shard]],
+        typing.Coroutine[typing.Any, typing.Any, R],
+    ],
+    concurrency: int,
+) -> typing.AsyncIterator[typing.Tuple[Extractable, R]]:
+    """Yields each unit of work and ``function`` of it in order, running some ahead.
+
+    The function is called with the unit, and the shard to extract the unit with.
+    """
+    pending: typing.Deque[typing.Tuple[Extractable, "asyncio.Task[R]"]]
+    pending = collections.deque()
+    try:
+        async for unit, shard in units:
+            pending.append((unit, asyncio.ensure_future(function(unit, shard))))
+            if len(pending) >= max(concurrency, 1):
+                yield await _first_done(pending)
+        while pending:
+            yield await _first_done(pending)
+    finally:
+        for _unit, task in pending:
+            task.cancel()
+
+
+async def _first_done(
+    pending: typing.Deque[typing.Tuple[Extractable, "asyncio.Task[R]"]]
+) -> typing.Tuple[Extractable, R]:
+    unit, task = pending.popleft()
+    return unit, await task
+
+
+def _method_metrics(metrics: Metrics) -> typing.List[MethodMetric]:
+    return list(more_itertools.always_iterable(metrics)) or list(
+        standard_method_metrics()
+    )
@@ -1,4 +1,9 @@
 """Compute and aggregate metrics over nodes, source code, files, and directories."""
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import pathlib
 import sys
 import typing
 
@@ -7,7 +12,13 @@ import more_itertools
 
 from sourcery_analytics.cli.data import ThresholdBreachDict
 from sourcery_analytics.conditions import is_method
-from sourcery_analytics.extractors import Extractable, extract
+from sourcery_analytics.extractors import (
+    Extractable,
+    Extractor,
+    extract,
+    extract_methods,
+    is_archive,
+)
 from sourcery_analytics.metrics import (
     standard_method_metrics,
 )
@@ -18,15 +29,31 @@ from sourcery_analytics.metrics.compounders import (
     NamedMetricResult,
     NamedMetric,
 )
+from sourcery_analytics.metrics.registry import fuse_metrics
 from sourcery_analytics.metrics.types import Metric, MethodMetric, MetricResult
-from sourcery_analytics.metrics.utils import method_file, method_lineno, method_name
-from sourcery_analytics.settings import ThresholdSettings
+from sourcery_analytics.metrics.utils import (
+    method_file,
+    method_lineno,
+    method_name,
+    method_qualname,
+)
+from sourcery_analytics.overrides import ThresholdOverrides
+from sourcery_analytics.settings import (
+    LimitSettings,
+    ThresholdOverride,
+    ThresholdSettings,
+)
+from sourcery_analytics.sharding import Shard
+from sourcery_analytics.utils import LRUCache
 
 
 R = typing.TypeVar("R", bound=MetricResult)
 S = typing.TypeVar("S", bound=MetricResult)
 T = typing.TypeVar("T")
 
+RECORD_CACHE: LRUCache[typing.Tuple, typing.List["MethodRecord"]] = LRUCache(1024)
+"""Cache of the records of each file, used by :py:func:`.iter_method_metrics`."""
+
 
 def analyze_methods(
     item: Extractable,
@@ -88,6 +115,9 @@ def analyze(
 ) -> T:
     """Computes and aggregates metrics over ``nodes``.
 
+    Any :py:class:`.VisitorMetric` metrics are computed together, in a single walk of
+    each node.
+
     Examples:
         >>> from pprint import pprint
         >>> from sourcery_analytics.metrics import (
@@ -121,17 +151,348 @@ def analyze(
           'method_name': 'div'}]
     """
     nodes = more_itertools.always_iterable(nodes, base_type=astroid.nodes.NodeNG)
-    metrics = more_itertools.always_iterable(metrics)
+    metrics = fuse_metrics(more_itertools.always_iterable(metrics))
     metric = compounder(*metrics)
     results = (metric(node) for node in nodes)
     return aggregation(results)
 
 
+class MethodRecord:
+    """The metric values of a single method, with where to find the method.
+
+    Records are slotted, and records produced together share a single tuple of metric
+    names, so that holding many of them is cheap. Metric values can be looked up by
+    name, as with the results of :py:func:`.analyze`.
+
+    Examples:
+        >>> record = MethodRecord(
+        ...     "module.py",
+        ...     "module.one",
+        ...     1,
+        ...     values=(2, 0),
+        ...     names=("method_length", "method_depth"),
+        ... )
+        >>> record["method_length"]
+        2
+        >>> record.metrics()
+        {'method_length': 2, 'method_depth': 0}
+        >>> MethodRecord.from_dict(record.as_dict()) == record
+        True
+    """
+
+    __slots__ = ("file", "qualname", "lineno", "values", "names")
+
+    def __init__(
+        self,
+        file: str,
+        qualname: str,
+        lineno: int,
+        *,
+        values: typing.Tuple[MetricResult, ...],
+        names: typing.Tuple[str, ...],
+    ):
+        self.file = file
+        self.qualname = qualname
+        self.lineno = lineno
+        self.values = values
+        self.names = names
+
+    @classmethod
+    def from_dict(cls, data: typing.Mapping[str, typing.Any]) -> "MethodRecord":
+        """Constructs a record from the output of :py:meth:`.as_dict`."""
+        metrics = {
+            name: value
+            for name, value in data.items()
+            if name not in ("method_file", "method_qualname", "method_lineno")
+        }
+        return cls(
+            data["method_file"],
+            data["method_qualname"],
+            data["method_lineno"],
+            values=tuple(metrics.values()),
+            names=tuple(metrics),
+        )
+
+    def __getitem__(self, name: str) -> MetricResult:
+        try:
+            return self.values[self.names.index(name)]
+        except ValueError:
+            raise KeyError(name) from None
+
+    def metrics(self) -> typing.Dict[str, MetricResult]:
+        """Returns the metric values keyed by metric name."""
+        return dict(zip(self.names, self.values))
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """Returns the location and metric values of the method as a dictionary."""
+        return {
+            "method_file": self.file,
+            "method_qualname": self.qualname,
+            "method_lineno": self.lineno,
+            **self.metrics(),
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, MethodRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self.names, self.values)
+        )
+        return (
+            f"MethodRecord(file={self.file!r}, qualname={self.qualname!r}, "
+            f"lineno={self.lineno!r}, {values})"
+        )
+
+
+def iter_method_metrics(
+    items: typing.Union[Extractable, typing.Iterable[Extractable]],
+    /,
+    *,
+    metrics: typing.Union[None, MethodMetric, typing.Iterable[MethodMetric]] = None,
+    jobs: int = 1,
+    cache: bool = False,
+    limits: typing.Optional[LimitSettings] = None,
+    read_ahead: int = 0,
+    shard: typing.Optional[Shard] = None,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None,
+) -> typing.Iterator[MethodRecord]:
+    """Lazily yields a :py:class:`.MethodRecord` for each method in ``items``.
+
+    Unlike :py:func:`.analyze_methods`, nothing is collected: each record is yielded as
+    soon as its file has been analyzed, and at most a few files' records are held at
+    once, so results can be consumed early and memory stays bounded.
+
+    Args:
+        items: source code, a node, a file or directory path, or an iterable of these
+        metrics: the method metrics to compute, by default the standard metrics
+        jobs: the number of processes analyzing files in parallel. Records are still
+            yielded in order. Metrics must be picklable, such as module-level functions.
+        cache: reuse the records of files analyzed before with the same metrics and
+            limits, if their size and modification time are unchanged. Records are
+            held in :py:data:`.RECORD_CACHE`.
+        limits: per-file limits, beyond which files are skipped with a warning
+        read_ahead: number of files to read in background threads ahead of parsing,
+            when analyzing in a single process without the cache
+        shard: only analyze the files in this shard
+        on_file: called with each file once it has been analyzed, or skipped
+
+    Examples:
+        >>> from sourcery_analytics.metrics import method_length
+        >>> source = '''
+        ...     def one():
+        ...         return 1
+        ...     def two():
+        ...         x = 2
+        ...         return x
+        ... '''
+        >>> records = iter_method_metrics(source, metrics=method_length)
+        >>> [(record.qualname, record["method_length"]) for record in records]
+        [('.one', 1), ('.two', 2)]
+    """
+    if isinstance(items, (str, pathlib.Path, astroid.nodes.NodeNG)):
+        items = [items]
+    recorder = MethodRecorder(
+        list(more_itertools.always_iterable(metrics))
+        or list(standard_method_metrics()),
+        limits or LimitSettings(),
+    )
+    if jobs <= 1 and not cache:
+        for item in items:
+            methods = extract_methods(
+                item,
+                limits=recorder.limits,
+                read_ahead=read_ahead,
+                shard=shard,
+                on_file=on_file,
+            )
+            yield from recorder.method_records(methods)
+        return
+
+    units = work_units(items, recorder.limits, shard)
+    for unit, records in _unit_records(units, recorder, jobs, cache):
+        if on_file and isinstance(unit, pathlib.Path):
+            on_file(unit)
+        yield from records
+
+
+def work_units(
+    items: typing.Iterable[Extractable],
+    limits: LimitSettings,
+    shard: typing.Optional[Shard] = None,
+) -> typing.Iterator[typing.Tuple[Extractable, typing.Optional[Shard]]]:
+    """Splits the items into units of work, each with the shard to extract it with.
+
+    Directories are split into the files in the shard, which need no shard of their
+    own. Archives are kept whole, with the shard, and other items are kept as they are.
+    Each unit can then be analyzed separately, for instance in another process.
+
+    Examples:
+        >>> list(work_units(["def f(): pass"], LimitSettings()))
+        [('def f(): pass', None)]
+    """
+    extractor: Extractor[astroid.nodes.NodeNG] = Extractor(limits=limits, shard=shard)
+    for item in items:
+        if not isinstance(item, pathlib.Path):
+            yield item, None
+            continue
+        for unit in extractor.files(item):
+            # files in directories are already selected, but archives are not
+            yield unit, shard if is_archive(unit) else None
+
+
+@dataclasses.dataclass
+class MethodRecorder:
+    """Computes the records of units of work, with the same metrics and limits.
+
+    Units of work are as split by :py:func:`.work_units`. A recorder can be pickled,
+    if its metrics can, so that records can be computed in another process.
+
+    Examples:
+        >>> from sourcery_analytics.metrics import method_length
+        >>> recorder = MethodRecorder([method_length])
+        >>> recorder.records("def one(): return 1")
+        [MethodRecord(file='<?>', qualname='.one', lineno=1, method_length=1)]
+        >>> recorder.cache_key("def one(): return 1") is None
+        True
+    """
+
+    metrics: typing.List[MethodMetric]
+    limits: LimitSettings = dataclasses.field(default_factory=LimitSettings)
+
+    @property
+    def names(self) -> typing.Tuple[str, ...]:
+        """The names of the metrics, in the order of the records' values."""
+        return tuple(metric.__name__ for metric in self.metrics)
+
+    def records(
+        self, unit: Extractable, shard: typing.Optional[Shard] = None
+    ) -> typing.List[MethodRecord]:
+        """Computes the records of the methods in a unit of work."""
+        methods = extract_methods(unit, limits=self.limits, shard=shard)
+        return list(self.method_records(methods))
+
+    def cached_records(
+        self, unit: Extractable, shard: typing.Optional[Shard] = None
+    ) -> typing.List[MethodRecord]:
+        """The records of a unit of work, reused from :py:data:`.RECORD_CACHE`."""
+        key = self.cache_key(unit, shard)
+        if key is None:
+            return self.records(unit, shard)
+        return RECORD_CACHE.get(key, functools.partial(self.records, unit, shard))
+
+    def method_records(
+        self, methods: typing.Iterable[astroid.nodes.FunctionDef]
+    ) -> typing.Iterator[MethodRecord]:
+        """Yields the record of each method."""
+        names = self.names
+        fused = fuse_metrics(self.metrics)
+        for method in methods:
+            yield MethodRecord(
+                method_file(method),
+                method_qualname(method),
+                method_lineno(method),
+                values=tuple(metric(method) for metric in fused),
+                names=names,
+            )
+
+    def cache_key(
+        self, unit: Extractable, shard: typing.Optional[Shard] = None
+    ) -> typing.Optional[typing.Tuple]:
+        """Keys a file's records on its identity and what they were computed with.
+
+        Returns None for anything but a file, whose records aren't cached.
+        """
+        if not isinstance(unit, pathlib.Path) or not unit.is_file():
+            return None
+        stat = unit.stat()
+        return (
+            str(unit.resolve()),
+            stat.st_mtime_ns,
+            stat.st_size,
+            self.names,
+            self.limits.json(),
+            shard,
+        )
+
+
+_UnitRecords = typing.Tuple[Extractable, typing.List[MethodRecord]]
+
+
+def _unit_records(
+    units: typing.Iterable[typing.Tuple[Extractable, typing.Optional[Shard]]],
+    recorder: MethodRecorder,
+    jobs: int,
+    cache: bool,
+) -> typing.Iterator[_UnitRecords]:
+    """Yields the records of each unit of work, in order, from the cache or a pool."""
+    if jobs > 1:
+        return _pooled_unit_records(units, recorder, jobs, cache)
+    if cache:
+        return ((unit, recorder.cached_records(unit, shard)) for unit, shard in units)
+    return ((unit, recorder.records(unit, shard)) for unit, shard in units)
+
+
+def _pooled_unit_records(
+    units: typing.Iterable[typing.Tuple[Extractable, typing.Optional[Shard]]],
+    recorder: MethodRecorder,
+    jobs: int,
+    cache: bool,
+) -> typing.Iterator[_UnitRecords]:
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    # each pending unit has either its cached records or a future for them
+    pending: typing.Deque[
+        typing.Tuple[Extractable, typing.Optional[typing.Tuple], typing.Any]
+    ]
+    pending = collections.deque()
+    try:
+        for unit, shard in units:
+            key = recorder.cache_key(unit, shard) if cache else None
+            pending.append(
+                (unit, key, _cached_or_submitted(executor, recorder, unit, shard, key))
+            )
+            if len(pending) > 2 * jobs:
+                yield _completed(*pending.popleft())
+        while pending:
+            yield _completed(*pending.popleft())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _cached_or_submitted(
+    executor: concurrent.futures.Executor,
+    recorder: MethodRecorder,
+    unit: Extractable,
+    shard: typing.Optional[Shard],
+    key: typing.Optional[typing.Tuple],
+) -> typing.Any:
+    """The cached records of a unit if there are any, or else a future for them."""
+    if key and (records := RECORD_CACHE.peek(key)) is not None:
+        return records
+    return executor.submit(recorder.records, unit, shard)
+
+
+def _completed(
+    unit: Extractable, key: typing.Optional[typing.Tuple], result: typing.Any
+) -> _UnitRecords:
+    """The records of a pending unit, once its future, if it has one, is done."""
+    if not isinstance(result, concurrent.futures.Future):
+        return unit, result
+    records = result.result()
+    if key:
+        # stores the records, unless they were cached in the meantime
+        records = RECORD_CACHE.get(key, lambda: records)
+    return unit, records
+
+
 def assess(
     nodes: typing.Union[astroid.nodes.NodeNG, typing.Iterable[astroid.nodes.NodeNG]],
     /,
     metrics: typing.Union[None, Metric, typing.Iterable[Metric]] = None,
     threshold_settings: ThresholdSettings = ThresholdSettings(),
+    overrides: typing.Sequence[ThresholdOverride] = (),
 ) -> typing.Iterator[ThresholdBreachDict]:
     """Yields the nodes which breach the thresholds according to the metrics.
 
@@ -139,6 +500,8 @@ def assess(
         nodes: an iterable of nodes, compatible with the metrics
         metrics: a collection of metrics, which may have thresholds in the settings
         threshold_settings: describes the maximum allowed value for the metrics
+        overrides: thresholds overriding ``threshold_settings`` for the methods in
+            files matching their paths, or excluding those methods
 
     Examples:
         >>> from pprint import pprint
@@ -181,14 +544,24 @@ def assess(
     """
     nodes = more_itertools.always_iterable(nodes, base_type=astroid.nodes.NodeNG)
     metrics = list(more_itertools.always_iterable(metrics))
-    threshold_values = threshold_settings.dict()
+    threshold_overrides = ThresholdOverrides(threshold_settings, overrides)
     metric: NamedMetric = name_metrics(
-        method_file, method_lineno, method_name, *metrics
+        method_file, method_lineno, method_name, *fuse_metrics(metrics)
     )
     results = melt((metric(node) for node in nodes), metrics)
+
+    @functools.lru_cache(maxsize=1)
+    def threshold_values(file: str) -> typing.Optional[typing.Dict[str, int]]:
+        # the results of each method, and file, are consecutive
+        thresholds = threshold_overrides.thresholds_for(file)
+        return thresholds.dict() if thresholds else None
+
     for result in results:
+        values = threshold_values(str(result["method_file"]))
+        if values is None:
+            continue
         metric_value = result["metric_value"]
-        threshold_value = threshold_values.get(result["metric_name"], sys.maxsize)
+        threshold_value = values.get(result["metric_name"], sys.maxsize)
         if metric_value > threshold_value:
             yield result
 
@@ -256,10 +629,12 @@ def melt(
 
     """
     metric_vars = [m.__name__ for m in metrics]
-    first_result, *remaining_results = results
+    results = iter(results)
+    if (first_result := next(results, None)) is None:
+        return
     id_vars = [k for k in first_result.keys() if k not in metric_vars]
     yield from _melt_one(first_result, metric_vars, id_vars)
-    for result in remaining_results:
+    for result in results:
         yield from _melt_one(result, metric_vars, id_vars)
 
 
@@ -0,0 +1,140 @@
+"""Aggregate metrics over many roots, such as repositories, in a single process.
+
+Analyzing every root in one process avoids paying the interpreter start-up and import
+costs once per root, and lets the roots share astroid's cache of built-in modules. The
+modules parsed from each root are evicted from the cache once that root is done, so
+memory use does not grow with the number of roots.
+"""
+import contextlib
+import pathlib
+import typing
+import warnings
+
+import astroid
+import astroid.manager
+import pydantic
+import tomli
+
+from sourcery_analytics.analysis import analyze
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.settings import Settings
+
+
+class BatchRoot(pydantic.BaseModel):
+    """Model describing a single root in a batch, with its optional settings file."""
+
+    path: pathlib.Path
+    settings_file: typing.Optional[pathlib.Path] = None
+    name: typing.Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """The root's name if it has one, otherwise its path."""
+        return self.name or str(self.path)
+
+
+class BatchManifest(pydantic.BaseModel):
+    """Model describing a batch manifest, listing the roots to analyze."""
+
+    roots: typing.List[BatchRoot]
+
+    @classmethod
+    def from_toml_file(cls, toml_file_path: pathlib.Path) -> "BatchManifest":
+        """Construct a manifest from a toml file with a ``[[roots]]`` table per root.
+
+        Relative paths in the manifest are relative to the manifest's directory.
+
+        Examples:
+            >>> import tempfile
+            >>> with tempfile.TemporaryDirectory() as directory:
+            ...     manifest_path = pathlib.Path(directory) / "manifest.toml"
+            ...     _ = manifest_path.write_text('''
+            ...         [[roots]]
+            ...         path = "alpha"
+            ...         settings_file = "alpha/pyproject.toml"
+            ...         [[roots]]
+            ...         path = "/srv/beta"
+            ...         name = "beta"
+            ...     ''')
+            ...     manifest = BatchManifest.from_toml_file(manifest_path)
+            ...     [
+            ...         root.path.relative_to(directory).as_posix()
+            ...         for root in manifest.roots[:1]
+            ...     ]
+            ['alpha']
+            >>> [root.label for root in manifest.roots[1:]]
+            ['beta']
+        """
+        with toml_file_path.open("rb") as file:
+            config = tomli.load(file)
+        manifest = cls(**config)
+        base = toml_file_path.parent
+        return cls(
+            roots=[
+                root.copy(
+                    update={
+                        "path": base / root.path,
+                        "settings_file": root.settings_file
+                        and base / root.settings_file,
+                    }
+                )
+                for root in manifest.roots
+            ]
+        )
+
+
+def aggregate_roots(
+    roots: typing.Iterable[BatchRoot],
+    /,
+    metrics: typing.Iterable[MethodMetric],
+    load_settings: typing.Callable[[pathlib.Path], Settings] = Settings.from_toml_file,
+) -> typing.Iterator[typing.Tuple[BatchRoot, AggregationState]]:
+    """Yields the aggregation state of the metrics over each root's methods, in turn.
+
+    Roots which do not exist are skipped with a warning.
+
+    Args:
+        roots: the roots to analyze, typically from a :py:class:`.BatchManifest`
+        metrics: the method metrics to compute for each method
+        load_settings: loads a root's settings file, for its per-file limits
+
+    Examples:
+        >>> from sourcery_analytics.metrics import method_length
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     root = BatchRoot(path=directory, name="example")
+        ...     _ = (root.path / "example.py").write_text("def f(): pass")
+        ...     [
+        ...         (root.label, state.count, state.total)
+        ...         for root, state in aggregate_roots([root], metrics=[method_length])
+        ...     ]
+        [('example', 1, {'method_length': 1})]
+    """
+    metrics = list(metrics)
+    for root in roots:
+        if not root.path.exists():
+            warnings.warn(f"skipping root {root.label}: {root.path} does not exist")
+            continue
+        settings = (
+            load_settings(root.settings_file) if root.settings_file else Settings()
+        )
+        with _evicting_new_modules(astroid.MANAGER):
+            state = analyze(
+                extract_methods(root.path, limits=settings.limits),
+                metrics=metrics,
+                aggregation=AggregationState.from_results,
+            )
+        yield root, state
+
+
+@contextlib.contextmanager
+def _evicting_new_modules(manager: astroid.manager.AstroidManager):
+    """Removes modules added to the manager's cache within the context."""
+    cached = set(manager.astroid_cache)
+    try:
+        yield
+    finally:
+        for modname in set(manager.astroid_cache) - cached:
+            del manager.astroid_cache[modname]
@@ -2,37 +2,48 @@
 
 import enum
 
-from sourcery_analytics.metrics import (
-    method_cognitive_complexity,
-    method_cyclomatic_complexity,
-    method_length,
-    method_working_memory,
-)
+import click
+
 from sourcery_analytics.metrics.aggregations import Aggregation, total, average, peak
+from sourcery_analytics.metrics.registry import method_metric_registry
 from sourcery_analytics.metrics.types import MethodMetric
 
 
-class MethodMetricChoice(enum.Enum):
-    """Method metrics available to the CLI."""
+class MethodMetricChoice(str):
+    """A method metric available to the CLI, named by its key in the registry.
+
+    Unlike the other choices this is not an Enum, since plugin metrics are only known
+    once the registry is loaded. Use :py:data:`.METHOD_METRIC_TYPE` to parse it.
+
+    Examples:
+        >>> MethodMetricChoice("length").method_method_name
+        'method_length'
+    """
 
-    COGNITIVE_COMPLEXITY = "cognitive_complexity"
-    CYCLOMATIC_COMPLEXITY = "cyclomatic_complexity"
-    LENGTH = "length"
-    WORKING_MEMORY = "working_memory"
+    @property
+    def value(self) -> str:
+        """The name of the metric in the registry."""
+        return str(self)
 
     @property
-    def method_method_name(self):
+    def method_method_name(self) -> str:
         """Returns the method metric's actual function name, used for sorting."""
-        return f"method_{self.value}"
+        return self.as_method_metric().__name__
 
     def as_method_metric(self) -> MethodMetric:
         """Returns the string choice as a callable method."""
-        return {
-            MethodMetricChoice.COGNITIVE_COMPLEXITY: method_cognitive_complexity,
-            MethodMetricChoice.CYCLOMATIC_COMPLEXITY: method_cyclomatic_complexity,
-            MethodMetricChoice.LENGTH: method_length,
-            MethodMetricChoice.WORKING_MEMORY: method_working_memory,
-        }[self]
+        return method_metric_registry()[self]
+
+
+class _MethodMetricType(click.Choice):
+    """Parses a method metric choice, offering every metric in the registry."""
+
+    def convert(self, value, param, ctx) -> MethodMetricChoice:
+        return MethodMetricChoice(super().convert(value, param, ctx))
+
+
+# built from the registry so that plugin metrics are also available as choices
+METHOD_METRIC_TYPE = _MethodMetricType(list(method_metric_registry()))
 
 
 class AggregationChoice(enum.Enum):
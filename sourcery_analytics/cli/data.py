@@ -3,7 +3,11 @@ import dataclasses
 import pathlib
 import typing
 
+import pydantic
+
+from sourcery_analytics.metrics.aggregations import AggregationState
 from sourcery_analytics.settings import ThresholdSettings
+from sourcery_analytics.sharding import Shard
 
 
 class ThresholdBreachDict(typing.TypedDict):
@@ -49,3 +53,103 @@ class ThresholdBreach:
             threshold_breach_dict["metric_value"],
             threshold_settings.dict()[metric_name],
         )
+
+
+class PartialResult(pydantic.BaseModel):
+    """Model describing the result of a command over one shard of the files.
+
+    Attributes:
+        command: the name of the command which produced the result
+        shard: the shard which was analyzed
+        options: the command's options needed to display the merged result
+        rows: the command's raw rows, for commands reporting individual methods
+        state: the aggregation state, for commands aggregating over methods
+    """
+
+    command: str
+    shard: Shard
+    options: typing.Dict[str, typing.Any] = {}
+    rows: typing.List[typing.Dict[str, typing.Any]] = []
+    state: typing.Optional[typing.Dict[str, typing.Any]] = None
+
+    @classmethod
+    def from_aggregation_state(
+        cls, state: AggregationState, **fields: typing.Any
+    ) -> "PartialResult":
+        """Constructs a partial result holding an aggregation state."""
+        return cls(state=dataclasses.asdict(state), **fields)
+
+    @classmethod
+    def merge(cls, partials: typing.Iterable["PartialResult"]) -> "PartialResult":
+        """Merges the partial results of every shard of a command into a full result.
+
+        Rows are concatenated in shard order, and aggregation states are merged.
+
+        Raises:
+            ValueError: if there are no partial results, they come from different
+                commands or options, or any shard is missing or repeated
+
+        Examples:
+            >>> partials = [
+            ...     PartialResult(command="analyze", shard=(n, 2), rows=[{"x": n}])
+            ...     for n in (2, 1)
+            ... ]
+            >>> PartialResult.merge(partials).rows
+            [{'x': 1}, {'x': 2}]
+        """
+        partials = sorted(partials, key=lambda partial: partial.shard.shard_index)
+        if not partials:
+            raise ValueError("no partial results to merge")
+        first = partials[0]
+        _check_same_command(partials)
+        _check_every_shard(partials)
+        state = AggregationState()
+        for partial in partials:
+            state = state.merge(partial.aggregation_state())
+        return cls(
+            command=first.command,
+            shard=Shard(1, 1),
+            options=first.options,
+            rows=[row for partial in partials for row in partial.rows],
+            state=dataclasses.asdict(state) if first.state is not None else None,
+        )
+
+    def aggregation_state(self) -> AggregationState:
+        """Returns the aggregation state held by this partial result.
+
+        Examples:
+            >>> from sourcery_analytics.metrics.compounders import NamedMetricResult
+            >>> state = AggregationState.from_results(
+            ...     [NamedMetricResult({"method_length": 3})]
+            ... )
+            >>> partial = PartialResult.from_aggregation_state(
+            ...     state, command="aggregate", shard=Shard(1, 1)
+            ... )
+            >>> PartialResult.parse_raw(partial.json()).aggregation_state() == state
+            True
+        """
+        return AggregationState.from_dict(self.state or {})
+
+    def write(self, path: pathlib.Path) -> None:
+        """Writes the partial result to a JSON file."""
+        path.write_text(self.json())
+
+
+def _check_same_command(partials: typing.List[PartialResult]) -> None:
+    first = partials[0]
+    for partial in partials:
+        if (partial.command, partial.options) != (first.command, first.options):
+            raise ValueError(
+                f"cannot merge results of shard {partial.shard} with shard "
+                f"{first.shard}: different commands or options"
+            )
+
+
+def _check_every_shard(partials: typing.List[PartialResult]) -> None:
+    shard_count = partials[0].shard.shard_count
+    shards = [partial.shard for partial in partials]
+    if shards != [Shard(index, shard_count) for index in range(1, shard_count + 1)]:
+        listed = ", ".join(str(shard) for shard in shards)
+        raise ValueError(
+            f"expected each of {shard_count} shards exactly once, got {listed}"
+        )
@@ -1,82 +1,133 @@
 """Parts of larger commands."""
+import functools
+import itertools
 import operator
 import pathlib
+import sys
 import typing
 
+import more_itertools
 import pydantic
+import tomli
 import typer
+import rich.markup
 import rich.progress
 import rich.table
 import rich.console
 
-from sourcery_analytics import analyze
+from sourcery_analytics.analysis import MethodRecord
+from sourcery_analytics.batch import BatchManifest, BatchRoot
+from sourcery_analytics.cli.data import (
+    PartialResult,
+    ThresholdBreach,
+    ThresholdBreachDict,
+)
+from sourcery_analytics.duplicates import DuplicateGroup
+from sourcery_analytics.explain import Explanation
+from sourcery_analytics.external_sort import sort_records
+from sourcery_analytics.file_lists import listed_files, read_file_list
+from sourcery_analytics.history import HistoryPoint
+from sourcery_analytics.hotspots import Hotspot
+from sourcery_analytics.metrics.aggregations import AggregationState
 from sourcery_analytics.metrics.compounders import NamedMetricResult
-from sourcery_analytics.settings import Settings
+from sourcery_analytics.overrides import ThresholdOverrides, relative_path
+from sourcery_analytics.pipeline import write_in_background
+from sourcery_analytics.sampling import Estimate, SampledAggregate
+from sourcery_analytics.settings import Settings, ThresholdOverride, ThresholdSettings
 
+# rows of CSV output written at once, when written as they are produced
+CSV_CHUNK_ROWS = 4096
 
-def analyze_rich_output(method_metric, methods, metrics, sort) -> None:
-    """Performs analysis and displays results in a rich-formatted table."""
 
-    console = rich.console.Console()
-    methods_progress = rich.progress.track(methods, description="Analyzing methods...")
-    analysis: typing.List[NamedMetricResult] = sorted(
-        analyze(methods_progress, metrics=metrics),
-        key=operator.itemgetter(sort.method_method_name),
-        reverse=True,
+def _sorted_analysis(
+    analysis: typing.Iterable[MethodRecord], sort
+) -> typing.List[MethodRecord]:
+    """Sorts from the largest value of the metric, then by file and line.
+
+    The order of equal values doesn't depend on the order the files were analyzed in,
+    so the output of merged shards is the same as the output over all the files.
+    """
+    by_location = sorted(analysis, key=operator.attrgetter("file", "lineno"))
+    return sorted(
+        by_location, key=operator.itemgetter(sort.method_method_name), reverse=True
     )
+
+
+def analyze_rich_output(
+    method_metric, analysis: typing.Iterable[MethodRecord], sort
+) -> None:
+    """Displays the analysis of each method in a rich-formatted table."""
+
+    console = rich.console.Console()
+    analysis = _sorted_analysis(analysis, sort)
     console.print("[bold green]Analysis Complete")
     table = rich.table.Table()
     table.add_column("Method")
     for metric_choice in method_metric:
         table.add_column(metric_choice.value, justify="right")
-    for metric in analysis:
-        table.add_row(
-            *(
-                f"{value}" if isinstance(value, (float, int)) else str(value)
-                for _sub_metric_name, value in metric
-            )
-        )
+    for record in analysis:
+        table.add_row(record.qualname, *(str(value) for value in record.values))
     console.print(table)
     raise typer.Exit()
 
 
-def analyze_plain_output(methods, metrics, sort) -> None:
-    """Performs analysis and displays the python object's representation."""
-    analysis = sorted(
-        analyze(methods, metrics=metrics),
-        key=operator.itemgetter(sort.method_method_name),
-        reverse=True,
+def analyze_plain_output(analysis: typing.Iterable[MethodRecord], sort) -> None:
+    """Displays the python representation of the analysis of each method."""
+    analysis = _sorted_analysis(analysis, sort)
+    typer.echo(
+        [
+            {"method_qualname": record.qualname, **record.metrics()}
+            for record in analysis
+        ]
     )
-    typer.echo(analysis)
 
 
-def analyze_csv_output(method_metric, methods, metrics, sort) -> None:
-    """Performs analysis and displays the results in CSV format."""
-    analysis = sorted(
-        analyze(methods, metrics=metrics),
-        key=operator.itemgetter(sort.method_method_name),
-        reverse=True,
-    )
-    result = ""
-    result += (
+def analyze_csv_output(
+    method_metric,
+    analysis: typing.Iterable[MethodRecord],
+    sort,
+    background_writer: bool = False,
+    sort_memory: typing.Optional[int] = None,
+) -> None:
+    """Displays the analysis of each method in CSV format.
+
+    With ``background_writer``, rows are formatted and written from a separate thread.
+    With ``sort_memory``, at most about that many bytes of the analysis are held while
+    sorting it, the rest being spilled to disk, and rows are written as they are merged.
+    """
+    if sort_memory is None:
+        analysis = _sorted_analysis(analysis, sort)
+    else:
+        analysis = sort_records(
+            analysis,
+            key=sort.method_method_name,
+            reverse=True,
+            memory_limit=sort_memory,
+        )
+    header = (
         "qualname,"
         + ",".join([str(metric_choice.value) for metric_choice in method_metric])
         + "\n"
     )
-    for metric in analysis:
-        result += ",".join([str(value) for _sub_metric_name, value in metric]) + "\n"
-    typer.echo(result)
-
+    rows = (
+        ",".join([record.qualname, *(str(value) for value in record.values)]) + "\n"
+        for record in analysis
+    )
+    lines = itertools.chain([header], rows, ["\n"])
+    if background_writer:
+        write_in_background(lines, write=functools.partial(typer.echo, nl=False))
+    elif sort_memory is not None:
+        # the rows don't fit in memory, so are written in chunks as they are merged
+        for chunk in more_itertools.chunked(lines, CSV_CHUNK_ROWS):
+            typer.echo("".join(chunk), nl=False)
+    else:
+        typer.echo("".join(lines), nl=False)
 
-def aggregate_rich_output(aggregation, aggregation_method, methods, metrics) -> None:
-    """Analyse methods, and aggregates results.
 
-    Displays the results in a rich-formatted table.
-    """
+def aggregate_rich_output(aggregation, result: NamedMetricResult) -> None:
+    """Displays aggregated results in a rich-formatted table."""
 
     console = rich.console.Console()
-    methods_progress = rich.progress.track(methods, description="Analyzing methods...")
-    result = analyze(methods_progress, metrics=metrics, aggregation=aggregation_method)
     table = rich.table.Table()
     table.add_column("Metric")
     table.add_column(f"{aggregation.value.title()} Value", justify="right")
@@ -85,24 +136,387 @@ def aggregate_rich_output(aggregation, aggregation_method, methods, metrics) ->
     console.print(table)
 
 
-def aggregate_plain_output(aggregation_method, methods, metrics) -> None:
-    """Analyse methods, and aggregates results.
+def aggregate_plain_output(result: NamedMetricResult) -> None:
+    """Displays the python representation of aggregated results."""
+    typer.echo(result)
+
+
+def aggregate_csv_output(method_metric, result: NamedMetricResult) -> None:
+    """Displays aggregated results in CSV format."""
+    output = ",".join([m.value for m in method_metric]) + "\n"
+    output += ",".join(str(value) for _metric_name, value in result)
+    typer.echo(output)
+
+
+def sampled_aggregate_rich_output(aggregation, result: SampledAggregate) -> None:
+    """Displays estimated aggregates, with their confidence intervals, in a table."""
+    console = rich.console.Console()
+    table = rich.table.Table(
+        caption=f"Estimated from {result.sampled_files} of {result.total_files} "
+        f"files, in {result.strata} strata."
+    )
+    table.add_column("Metric")
+    table.add_column(f"Estimated {aggregation.value.title()} Value", justify="right")
+    table.add_column(f"{result.confidence:.0%} Interval", justify="right")
+    for metric_name, estimate in result.estimates.items():
+        table.add_row(
+            metric_name, _format_estimate(estimate.value), _interval(estimate)
+        )
+    console.print(table)
+
+
+def sampled_aggregate_plain_output(result: SampledAggregate) -> None:
+    """Displays the python representation of estimated aggregates and intervals."""
+    typer.echo(
+        {
+            metric_name: estimate._asdict()
+            for metric_name, estimate in result.estimates.items()
+        }
+    )
+
+
+def sampled_aggregate_csv_output(result: SampledAggregate) -> None:
+    """Displays estimated aggregates, with their intervals, in CSV format."""
+    output = "metric,estimate,lower,upper\n"
+    for metric_name, estimate in result.estimates.items():
+        output += ",".join(
+            [metric_name, *("" if v is None else str(v) for v in estimate)]
+        )
+        output += "\n"
+    typer.echo(output)
+
+
+def _format_estimate(value: typing.Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
 
-    Displays the python representation of the results.
+
+def _interval(estimate: Estimate) -> str:
+    if estimate.lower is None:
+        return "-"
+    if estimate.upper is None:
+        return f"at least {_format_estimate(estimate.lower)}"
+    return f"{_format_estimate(estimate.lower)} to {_format_estimate(estimate.upper)}"
+
+
+def assess_rich_output(
+    threshold_breach_results: typing.Iterable[ThresholdBreachDict],
+    threshold_settings: ThresholdSettings,
+    overrides: typing.Sequence[ThresholdOverride] = (),
+    explain: typing.Optional[
+        typing.Callable[[ThresholdBreachDict], typing.Optional[Explanation]]
+    ] = None,
+) -> None:
+    """Displays each threshold breach, against its file's thresholds, and a summary.
+
+    With ``explain``, each breach it can explain is followed by the breaching method's
+    source, annotated with the contribution of each line to the metric.
+
+    Raises:
+        typer.Exit: with code 1, if there are any breaches
     """
-    result = analyze(methods, metrics=metrics, aggregation=aggregation_method)
+    console = rich.console.Console()
+    threshold_overrides = ThresholdOverrides(threshold_settings, overrides)
+    count = 0
+    for count, threshold_breach_result in enumerate(threshold_breach_results, 1):
+        file_thresholds = threshold_overrides.thresholds_for(
+            threshold_breach_result["method_file"]
+        )
+        threshold_breach = ThresholdBreach.from_dict(
+            threshold_breach_result,
+            threshold_settings=file_thresholds or threshold_settings,
+        )
+        console.print(
+            f"{threshold_breach.relative_path}:{threshold_breach.lineno}: "
+            f"[bold red]error:[/] "
+            f"{threshold_breach.metric_name} of "
+            f"[bold]{threshold_breach.method_name}[/] "
+            f"is {threshold_breach.metric_value} "
+            f"exceeding threshold of {threshold_breach.threshold_value}"
+        )
+        if explain and (explanation := explain(threshold_breach_result)):
+            explanation_rich_output(console, explanation)
+
+    if count:
+        console.print(f"[bold red]Found {count} errors.")
+        raise typer.Exit(1)
+
+    console.print("[bold green]Assessment Complete", "[green]No issues found.")
+
+
+def explanation_rich_output(
+    console: rich.console.Console, explanation: Explanation
+) -> None:
+    """Displays a method's source, with each line's contribution to a metric."""
+    width = len(str(explanation.lines[-1].lineno)) if explanation.lines else 1
+    for line in explanation.lines:
+        value = f"[bold red]{line.value:>3}[/]" if line.value else "   "
+        console.print(
+            f"  [dim]{line.lineno:>{width}}[/] {value} | "
+            f"{rich.markup.escape(line.source)}",
+            highlight=False,
+            soft_wrap=True,
+        )
+
+
+def duplicates_rich_output(groups: typing.Iterable[DuplicateGroup]) -> None:
+    """Displays groups of duplicate methods in a rich-formatted table."""
+    console = rich.console.Console()
+    table = rich.table.Table()
+    table.add_column("Group", justify="right")
+    table.add_column("Similarity", justify="right")
+    table.add_column("Location")
+    table.add_column("Method")
+    count = 0
+    for count, group in enumerate(groups, 1):
+        for method in group.methods:
+            path = relative_path(method.method_file, pathlib.Path.cwd().absolute())
+            table.add_row(
+                str(count),
+                f"{group.similarity:.2f}",
+                f"{path}:{method.method_lineno}",
+                method.method_qualname,
+            )
+        table.add_section()
+    console.print(table)
+    console.print(f"[bold]Found {count} groups of duplicate methods.")
+
+
+def duplicates_plain_output(groups: typing.Iterable[DuplicateGroup]) -> None:
+    """Displays the python representation of groups of duplicate methods."""
+    typer.echo(
+        [
+            {
+                "similarity": group.similarity,
+                "methods": [method._asdict() for method in group.methods],
+            }
+            for group in groups
+        ]
+    )
+
+
+def duplicates_csv_output(groups: typing.Iterable[DuplicateGroup]) -> None:
+    """Displays groups of duplicate methods in CSV format, one method per row."""
+    result = "group,similarity,file,lineno,qualname\n"
+    for count, group in enumerate(groups, 1):
+        for method in group.methods:
+            result += (
+                f"{count},{group.similarity},{method.method_file},"
+                f"{method.method_lineno},{method.method_qualname}\n"
+            )
     typer.echo(result)
 
 
-def aggregate_csv_output(aggregation_method, method_metric, methods, metrics) -> None:
-    """Analyse methods, and aggregates results.
+BatchResults = typing.Iterable[typing.Tuple[BatchRoot, AggregationState]]
+
+# label of the summary row following the per-root rows of a batch
+BATCH_OVERALL = "(overall)"
+
 
-    Displays the results in CSV format.
+def batch_rich_output(aggregation, method_metric, results: BatchResults) -> None:
+    """Displays each root's aggregate, then the overall aggregate, in a rich table."""
+    console = rich.console.Console()
+    table = rich.table.Table()
+    table.add_column("Root")
+    table.add_column("Methods", justify="right")
+    for metric_choice in method_metric:
+        table.add_column(
+            f"{aggregation.value.title()} {metric_choice.value}", justify="right"
+        )
+    for label, row in _batch_rows(aggregation, method_metric, results):
+        if label == BATCH_OVERALL:
+            table.add_section()
+        table.add_row(label, *(str(value) for value in row))
+    console.print(table)
+
+
+def batch_plain_output(aggregation, method_metric, results: BatchResults) -> None:
+    """Displays the python representation of each root's aggregate, then overall."""
+    names = ["method_count", *(m.method_method_name for m in method_metric)]
+    typer.echo(
+        [
+            {"root": label, **dict(zip(names, row))}
+            for label, row in _batch_rows(aggregation, method_metric, results)
+        ]
+    )
+
+
+def batch_csv_output(aggregation, method_metric, results: BatchResults) -> None:
+    """Displays each root's aggregate, then overall, in CSV format.
+
+    Each root's row is written as soon as that root has been analyzed.
     """
-    analysis = analyze(methods, metrics=metrics, aggregation=aggregation_method)
-    result = ",".join([m.value for m in method_metric]) + "\n"
-    result += ",".join(str(value) for _metric_name, value in analysis)
-    typer.echo(result)
+    typer.echo("root,method_count," + ",".join(m.value for m in method_metric))
+    for label, row in _batch_rows(aggregation, method_metric, results):
+        typer.echo(",".join([label, *(str(value) for value in row)]))
+
+
+def _batch_rows(
+    aggregation, method_metric, results: BatchResults
+) -> typing.Iterator[typing.Tuple[str, typing.List]]:
+    """Yields a label and row of values per root, then for all roots together."""
+    overall = AggregationState()
+    for root, state in results:
+        overall = overall.merge(state)
+        yield root.label, _state_row(aggregation, method_metric, state)
+    yield BATCH_OVERALL, _state_row(aggregation, method_metric, overall)
+
+
+def _state_row(aggregation, method_metric, state: AggregationState) -> typing.List:
+    aggregate = getattr(state, aggregation.value) or {}
+    return [
+        state.count,
+        *(aggregate.get(m.method_method_name) for m in method_metric),
+    ]
+
+
+def history_rich_output(
+    aggregation, method_metric, history: typing.Iterable[HistoryPoint]
+) -> None:
+    """Displays the aggregate for each commit in a rich-formatted table."""
+    console = rich.console.Console()
+    table = rich.table.Table()
+    table.add_column("Commit")
+    table.add_column("Date")
+    table.add_column("Methods", justify="right")
+    for metric_choice in method_metric:
+        table.add_column(
+            f"{aggregation.value.title()} {metric_choice.value}", justify="right"
+        )
+    for point in history:
+        row = _state_row(aggregation, method_metric, point.state)
+        table.add_row(point.commit[:12], point.date, *(str(value) for value in row))
+    console.print(table)
+
+
+def history_plain_output(
+    aggregation, method_metric, history: typing.Iterable[HistoryPoint]
+) -> None:
+    """Displays the python representation of the aggregate for each commit."""
+    names = ["method_count", *(m.method_method_name for m in method_metric)]
+    typer.echo(
+        [
+            {
+                "commit": point.commit,
+                "date": point.date,
+                **dict(zip(names, _state_row(aggregation, method_metric, point.state))),
+            }
+            for point in history
+        ]
+    )
+
+
+def history_csv_output(
+    aggregation, method_metric, history: typing.Iterable[HistoryPoint]
+) -> None:
+    """Displays the aggregate for each commit in CSV format, as soon as it is ready."""
+    typer.echo("commit,date,method_count," + ",".join(m.value for m in method_metric))
+    for point in history:
+        row = _state_row(aggregation, method_metric, point.state)
+        typer.echo(",".join([point.commit, point.date, *(str(v) for v in row)]))
+
+
+def hotspots_rich_output(method_metric, hotspots: typing.Iterable[Hotspot]) -> None:
+    """Displays the hotspots in a rich-formatted table."""
+    console = rich.console.Console()
+    table = rich.table.Table()
+    table.add_column("Method")
+    table.add_column("File")
+    table.add_column("Churn", justify="right")
+    table.add_column(method_metric.value, justify="right")
+    table.add_column("Score", justify="right")
+    for hotspot in hotspots:
+        table.add_row(
+            hotspot.method_qualname,
+            f"{hotspot.method_file}:{hotspot.method_lineno}",
+            str(hotspot.churn),
+            str(hotspot.metric_value),
+            str(hotspot.score),
+        )
+    console.print(table)
+
+
+def hotspots_plain_output(method_metric, hotspots: typing.Iterable[Hotspot]) -> None:
+    """Displays the python representation of the hotspots."""
+    typer.echo(
+        [
+            {
+                "method_qualname": hotspot.method_qualname,
+                "method_file": hotspot.method_file,
+                "method_lineno": hotspot.method_lineno,
+                "churn": hotspot.churn,
+                method_metric.method_method_name: hotspot.metric_value,
+                "score": hotspot.score,
+            }
+            for hotspot in hotspots
+        ]
+    )
+
+
+def hotspots_csv_output(method_metric, hotspots: typing.Iterable[Hotspot]) -> None:
+    """Displays the hotspots in CSV format."""
+    typer.echo(
+        f"method_qualname,method_file,method_lineno,churn,{method_metric.value},score"
+    )
+    for hotspot in hotspots:
+        typer.echo(
+            ",".join(
+                [
+                    hotspot.method_qualname,
+                    hotspot.method_file,
+                    str(hotspot.method_lineno),
+                    str(hotspot.churn),
+                    str(hotspot.metric_value),
+                    str(hotspot.score),
+                ]
+            )
+        )
+
+
+def read_manifest(
+    manifest_file: pathlib.Path, console: rich.console.Console
+) -> BatchManifest:
+    """Loads a batch manifest in the CLI, exiting with code 2 if it is invalid."""
+    try:
+        return BatchManifest.from_toml_file(manifest_file)
+    except (pydantic.ValidationError, tomli.TOMLDecodeError) as exc:
+        console.print(
+            "[bold red]Error:[/] unable to parse manifest file "
+            f"[bold]{manifest_file}[/]."
+        )
+        raise typer.Exit(2) from exc
+
+
+def read_partials(
+    partial_files: typing.Iterable[pathlib.Path], console: rich.console.Console
+) -> PartialResult:
+    """Loads and merges partial results in the CLI, exiting with code 2 on failure."""
+    try:
+        return PartialResult.merge(PartialResult.parse_file(f) for f in partial_files)
+    except (pydantic.ValidationError, ValueError) as exc:
+        console.print(f"[bold red]Error:[/] unable to merge partial results: {exc}")
+        raise typer.Exit(2) from exc
+
+
+def read_input_paths(
+    path: typing.Optional[pathlib.Path], files_from: typing.Optional[str]
+) -> typing.Iterable[pathlib.Path]:
+    """The path to analyze, or the files listed in ``files_from``, read lazily."""
+    if path is not None and files_from is None:
+        return [path]
+    if path is not None or files_from is None:
+        raise typer.BadParameter("Give exactly one of `PATH` or `--files-from`.")
+    if files_from != "-" and not pathlib.Path(files_from).is_file():
+        raise typer.BadParameter(f"File '{files_from}' does not exist.")
+    return listed_files(read_files_from(files_from))
+
+
+def read_files_from(files_from: str) -> typing.Iterator[pathlib.Path]:
+    """Lazily reads the paths listed in a file, or on standard input if ``-``."""
+    if files_from == "-":
+        yield from read_file_list(sys.stdin.buffer)
+        return
+    with open(files_from, "rb") as stream:
+        yield from read_file_list(stream)
 
 
 def read_settings(
@@ -17,6 +17,9 @@ def always(_node: astroid.nodes.NodeNG) -> bool:
 def is_type(*t: typing.Type[astroid.nodes.NodeNG]) -> Condition:
     """Construct a Condition based on the type of the node.
 
+    The types are recorded on the condition as ``types``, so that extraction can
+    skip the parts of the tree in which they cannot occur.
+
     Examples:
         >>> is_method = is_type(astroid.nodes.FunctionDef)
         >>> module = astroid.parse("def foo(): pass")
@@ -29,6 +32,7 @@ def is_type(*t: typing.Type[astroid.nodes.NodeNG]) -> Condition:
     def _is_type(node: astroid.nodes.NodeNG):
         return isinstance(node, t)
 
+    _is_type.types = t  # type: ignore[attr-defined]
     return _is_type
 
 
@@ -56,6 +60,36 @@ def is_elif(node: astroid.nodes.NodeNG) -> bool:
     )
 
 
+def matches_statements_only(condition: Condition) -> bool:
+    """True if the condition is a type condition which can only match statements.
+
+    Examples:
+        >>> matches_statements_only(is_type(astroid.nodes.FunctionDef))
+        True
+        >>> matches_statements_only(is_type(astroid.nodes.Name))
+        False
+        >>> matches_statements_only(always)
+        False
+    """
+    types = getattr(condition, "types", None) or ()
+    return bool(types) and all(t.is_statement for t in types)
+
+
+def matches_methods_only(condition: Condition) -> bool:
+    """True if the condition is a type condition which can only match methods.
+
+    Examples:
+        >>> matches_methods_only(is_type(astroid.nodes.FunctionDef))
+        True
+        >>> matches_methods_only(is_type(astroid.nodes.AsyncFunctionDef))
+        True
+        >>> matches_methods_only(is_type(astroid.nodes.Lambda))
+        False
+    """
+    types = getattr(condition, "types", None) or ()
+    return bool(types) and all(issubclass(t, astroid.nodes.FunctionDef) for t in types)
+
+
 is_method = is_type(astroid.nodes.FunctionDef)
 is_const = is_type(astroid.nodes.Const)
 is_name = is_type(astroid.nodes.Name)
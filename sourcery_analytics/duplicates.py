@@ -0,0 +1,311 @@
+"""Find structurally identical and near-identical methods.
+
+Each method is reduced to a structural fingerprint: the sequence of its node types and
+depths, with identifiers and constant values abstracted away. Methods with equal
+fingerprints are exact duplicates. Near-duplicates are found by estimating the Jaccard
+similarity of the fingerprints' shingles using MinHash signatures, with locality
+sensitive hashing (LSH) to only compare methods sharing at least one band of their
+signature. This keeps the cost close to linear in the number of methods, rather than
+comparing every pair.
+
+Each value of a MinHash signature is the minimum over the shingles of a hash from the
+universal family ``(a * x + b) mod p``, with random ``a`` and ``b`` and a large prime
+``p``, which is close enough to min-wise independent for the fraction of equal values
+to estimate the Jaccard similarity without bias. Every method in a band's bucket is
+compared with at most ``max_candidates`` of the methods added to the bucket before it,
+so that very common structures don't make grouping quadratic.
+"""
+import array
+import collections
+import contextlib
+import dataclasses
+import hashlib
+import random
+import typing
+import zlib
+
+import astroid
+
+from sourcery_analytics.metrics.method_length import statement_count
+from sourcery_analytics.metrics.utils import method_file, method_lineno, method_qualname
+from sourcery_analytics.visitors import (
+    CompoundVisitor,
+    FunctionVisitor,
+    TreeVisitor,
+    Visitor,
+)
+
+# the Mersenne prime 2**61 - 1, the modulus of the signatures' universal hashes
+_PRIME = (1 << 61) - 1
+
+
+class FingerprintVisitor(Visitor[str]):
+    """Returns a normalized label for a node, abstracting away names and values.
+
+    The label is the node's depth and type, plus its operator for operations, since
+    these change the structure of a computation but names and values do not.
+
+    Examples:
+        >>> visitor = TreeVisitor(FingerprintVisitor(), list)
+        >>> visitor.visit(astroid.extract_node("x + 1"))
+        ['1:BinOp+', '2:Name', '2:Const']
+    """
+
+    def __init__(self, _depth: int = 0):
+        self.depth = _depth
+
+    @contextlib.contextmanager
+    def enter(self, _node: astroid.nodes.NodeNG):
+        self.depth += 1
+        yield
+        self.depth -= 1
+
+    def touch(self, node: astroid.nodes.NodeNG) -> str:
+        return (
+            f"{self.depth}:{node.__class__.__name__}{getattr(node, 'op', None) or ''}"
+        )
+
+
+class MethodLocation(typing.NamedTuple):
+    """Where to find a method."""
+
+    method_file: str
+    method_lineno: int
+    method_qualname: str
+
+
+@dataclasses.dataclass
+class DuplicateGroup:
+    """A group of methods with structurally similar implementations.
+
+    ``similarity`` is the lowest estimated similarity linking the group together,
+    and is exactly 1.0 when all methods in the group are structurally identical.
+    """
+
+    similarity: float
+    methods: typing.List[MethodLocation]
+
+
+@dataclasses.dataclass
+class DuplicateIndex:  # pylint: disable=too-many-instance-attributes
+    """Collects method fingerprints and groups duplicate methods.
+
+    Attributes:
+        threshold: minimum estimated similarity for methods to be grouped; when 1.0
+            only exact duplicates are found and no signatures are computed
+        min_length: methods with fewer statements than this are ignored
+        shingle_size: number of consecutive fingerprint labels in each shingle
+        bands: number of LSH bands
+        rows: number of signature values in each LSH band
+        max_candidates: the most methods earlier in a bucket that each method is
+            compared with
+
+    Examples:
+        >>> from sourcery_analytics.extractors import extract_methods
+        >>> source = '''
+        ...     def add(x, y):
+        ...         z = x + y
+        ...         return z
+        ...     def plus(a, b):
+        ...         c = a + b
+        ...         return c
+        ...     def sub(x, y):
+        ...         return x - y
+        ... '''
+        >>> index = DuplicateIndex(min_length=1)
+        >>> index.update(extract_methods(source))
+        >>> [
+        ...     [method.method_qualname for method in group.methods]
+        ...     for group in index.groups()
+        ... ]
+        [['.add', '.plus']]
+    """
+
+    threshold: float = 0.8
+    min_length: int = 3
+    shingle_size: int = 4
+    bands: int = 8
+    rows: int = 4
+    max_candidates: int = 32
+    _methods: typing.Dict[bytes, typing.List[MethodLocation]] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(list), repr=False
+    )
+    _signatures: typing.Dict[bytes, array.array] = dataclasses.field(
+        default_factory=dict, repr=False
+    )
+    _buckets: typing.Dict[
+        typing.Tuple[int, bytes], typing.List[bytes]
+    ] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(list), repr=False
+    )
+
+    def __post_init__(self):
+        # fixed seed, so that signatures are stable between runs
+        seeds = random.Random(0)
+        self._hashes = [
+            (seeds.randrange(1, _PRIME), seeds.randrange(_PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+
+    def update(self, methods: typing.Iterable[astroid.nodes.FunctionDef]) -> None:
+        """Adds each of the methods to the index."""
+        for method in methods:
+            self.add(method)
+
+    def add(self, method: astroid.nodes.FunctionDef) -> None:
+        """Fingerprints the method and adds it to the index."""
+        labels, length = method_fingerprint(method)
+        if length < self.min_length:
+            return
+        digest = hashlib.blake2b("\n".join(labels).encode(), digest_size=16).digest()
+        if digest not in self._methods and self.threshold < 1:
+            signature = self._signature(labels)
+            self._signatures[digest] = signature
+            for band in range(self.bands):
+                values = signature[band * self.rows : (band + 1) * self.rows]
+                self._buckets[(band, values.tobytes())].append(digest)
+        self._methods[digest].append(
+            MethodLocation(
+                method_file(method), method_lineno(method), method_qualname(method)
+            )
+        )
+
+    def groups(self) -> typing.Iterator[DuplicateGroup]:
+        """Yields groups of duplicate methods, most similar first."""
+        links = _Links(self._methods)
+        for candidates in self._buckets.values():
+            for index, right in enumerate(candidates):
+                start = max(0, index - self.max_candidates)
+                for left in candidates[start:index]:
+                    self._link(links, left, right)
+        groups = (
+            DuplicateGroup(
+                similarity=round(links.similarity(root), 2),
+                methods=[m for d in digests for m in self._methods[d]],
+            )
+            for root, digests in links.members().items()
+        )
+        yield from sorted(
+            (group for group in groups if len(group.methods) > 1),
+            key=lambda group: (-group.similarity, -len(group.methods)),
+        )
+
+    def _link(self, links: "_Links", left: bytes, right: bytes) -> None:
+        """Links the methods' groups, if they are separate and similar enough."""
+        if links.find(left) == links.find(right):
+            return
+        similarity = self._similarity(left, right)
+        if similarity >= self.threshold:
+            links.union(left, right, similarity)
+
+    def _signature(self, labels: typing.Sequence[str]) -> array.array:
+        shingles = {
+            zlib.crc32("\n".join(labels[i : i + self.shingle_size]).encode())
+            for i in range(max(1, len(labels) - self.shingle_size + 1))
+        }
+        return array.array(
+            "Q", (min((a * s + b) % _PRIME for s in shingles) for a, b in self._hashes)
+        )
+
+    def _similarity(self, left: bytes, right: bytes) -> float:
+        left_signature = self._signatures[left]
+        right_signature = self._signatures[right]
+        matches = sum(u == v for u, v in zip(left_signature, right_signature))
+        return matches / len(left_signature)
+
+
+class _Links:
+    """Disjoint sets of linked methods, with the lowest similarity linking each set."""
+
+    def __init__(self, digests: typing.Iterable[bytes]):
+        self.parents = {digest: digest for digest in digests}
+        self.similarities: typing.Dict[bytes, float] = {}
+
+    def find(self, digest: bytes) -> bytes:
+        """The root of the digest's set."""
+        while self.parents[digest] != digest:
+            self.parents[digest] = self.parents[self.parents[digest]]
+            digest = self.parents[digest]
+        return digest
+
+    def union(self, left: bytes, right: bytes, similarity: float) -> None:
+        """Joins the sets of the digests, linked with the given similarity."""
+        left_root, right_root = self.find(left), self.find(right)
+        self.parents[right_root] = left_root
+        self.similarities[left_root] = min(
+            similarity, self.similarity(left_root), self.similarity(right_root)
+        )
+
+    def similarity(self, root: bytes) -> float:
+        """The lowest similarity linking the set, or 1.0 if it is a single digest."""
+        return self.similarities.get(root, 1.0)
+
+    def members(self) -> typing.Dict[bytes, typing.List[bytes]]:
+        """The digests in each set, by their root."""
+        members = collections.defaultdict(list)
+        for digest in self.parents:
+            members[self.find(digest)].append(digest)
+        return members
+
+
+def method_fingerprint(
+    method: astroid.nodes.FunctionDef,
+) -> typing.Tuple[typing.List[str], int]:
+    """Returns the method's normalized labels and its length, in a single tree walk.
+
+    Examples:
+        >>> labels, length = method_fingerprint(
+        ...     astroid.extract_node("def add(x, y): return x + y")
+        ... )
+        >>> labels
+        ['1:FunctionDef', '2:Arguments', '3:AssignName', '3:AssignName', '2:Return', ...
+        >>> length
+        1
+    """
+    visitor = TreeVisitor[typing.Tuple[str, int], typing.List[typing.Tuple[str, int]]](
+        CompoundVisitor[typing.Any, typing.Tuple[str, int]](
+            FingerprintVisitor(), FunctionVisitor(statement_count)
+        ),
+        list,
+    )
+    labels, counts = zip(*visitor.visit(method))
+    return list(labels), sum(counts)
+
+
+def find_duplicates(
+    methods: typing.Iterable[astroid.nodes.FunctionDef],
+    /,
+    threshold: float = 0.8,
+    min_length: int = 3,
+) -> typing.Iterator[DuplicateGroup]:
+    """Finds groups of structurally identical or similar methods.
+
+    Args:
+        methods: the methods to compare, typically from :py:func:`.extract_methods`
+        threshold: minimum estimated similarity between 0 and 1 for methods to be
+            grouped; use 1.0 to find only exact structural duplicates
+        min_length: methods with fewer statements than this are ignored
+
+    Examples:
+        >>> from sourcery_analytics.extractors import extract_methods
+        >>> source = '''
+        ...     def load(path):
+        ...         with open(path) as file:
+        ...             data = file.read()
+        ...         rows = [line.split(",") for line in data.splitlines()]
+        ...         header, *body = rows
+        ...         return [dict(zip(header, row)) for row in body]
+        ...     def load_logged(filename):
+        ...         print(filename)
+        ...         with open(filename) as f:
+        ...             text = f.read()
+        ...         rows = [line.split(",") for line in text.splitlines()]
+        ...         header, *body = rows
+        ...         return [dict(zip(header, row)) for row in body]
+        ... '''
+        >>> [group.similarity for group in find_duplicates(extract_methods(source))]
+        [0.81]
+    """
+    index = DuplicateIndex(threshold=threshold, min_length=min_length)
+    index.update(methods)
+    return index.groups()
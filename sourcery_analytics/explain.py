@@ -0,0 +1,189 @@
+"""Explain threshold breaches by the contribution of each line of the breaching method.
+
+Recording where every increment of a metric comes from is much slower than computing
+the metric, so explanations are only computed for the methods breaching a threshold.
+Assessment first finds the breaches with the usual metrics, and each breaching method
+is then visited a second time, recording the value of the metric's visitor at every
+node. The cost of explaining is therefore proportional to the number of breaches.
+"""
+import collections
+import typing
+
+import astroid
+
+from sourcery_analytics.cli.data import ThresholdBreachDict
+from sourcery_analytics.metrics.cognitive_complexity import CognitiveComplexityVisitor
+from sourcery_analytics.metrics.working_memory import WorkingMemoryVisitor
+from sourcery_analytics.visitors import (
+    CompoundVisitor,
+    FunctionVisitor,
+    TreeVisitor,
+    Visitor,
+)
+
+# the visitor computing each explainable metric at every node, and how the values of
+# the nodes on a line are combined, matching how the metric combines all its nodes
+EXPLAINERS: typing.Dict[
+    str,
+    typing.Tuple[
+        typing.Callable[[], Visitor[int]], typing.Callable[[typing.List[int]], int]
+    ],
+] = {
+    "method_cognitive_complexity": (CognitiveComplexityVisitor, sum),
+    "method_working_memory": (WorkingMemoryVisitor, max),
+}
+
+
+class LineContribution(typing.NamedTuple):
+    """A line of a method's source, and its contribution to a metric."""
+
+    lineno: int
+    source: str
+    value: int
+
+
+class Explanation(typing.NamedTuple):
+    """The contribution of each line of a method to a metric."""
+
+    metric_name: str
+    lines: typing.List[LineContribution]
+
+
+def line_contributions(
+    method: astroid.nodes.FunctionDef, metric_name: str
+) -> typing.Dict[int, int]:
+    """The contribution to the metric of each line of the method contributing to it.
+
+    For cognitive complexity, the contributions of the lines sum to the metric, while
+    for working memory, which is a peak, the metric is the largest contribution.
+
+    Args:
+        method: a node for a function definition
+        metric_name: the name of an explainable metric, such as
+            ``"method_cognitive_complexity"``
+
+    Examples:
+        >>> from sourcery_analytics.extractors import extract_methods
+        >>> source = '''
+        ...     def check_add(x, y):
+        ...         if x:
+        ...             if y:
+        ...                 return x + y
+        ... '''
+        >>> [method] = extract_methods(source)
+        >>> line_contributions(method, "method_cognitive_complexity")
+        {2: 1, 3: 2}
+    """
+    visitor_type, combine = EXPLAINERS[metric_name]
+    visitor: TreeVisitor[
+        typing.Tuple[typing.Optional[int], int],
+        typing.List[typing.Tuple[typing.Optional[int], int]],
+    ] = TreeVisitor(
+        CompoundVisitor(FunctionVisitor(lambda node: node.lineno), visitor_type()),
+        list,
+    )
+    values: typing.DefaultDict[int, typing.List[int]] = collections.defaultdict(list)
+    for lineno, value in visitor.visit(method):
+        if value and lineno is not None:
+            values[lineno].append(value)
+    return {lineno: combine(values[lineno]) for lineno in sorted(values)}
+
+
+def explain_method(method: astroid.nodes.FunctionDef, metric_name: str) -> Explanation:
+    """Annotates each line of the method's source with its contribution to the metric.
+
+    Examples:
+        >>> from sourcery_analytics.extractors import extract_methods
+        >>> source = '''
+        ...     def check(x):
+        ...         if x:
+        ...             return 1
+        ... '''
+        >>> [method] = extract_methods(source)
+        >>> for line in explain_method(method, "method_cognitive_complexity").lines:
+        ...     print(line.value, line.source)
+        0 def check(x):
+        1     if x:
+        0         return 1
+    """
+    contributions = line_contributions(method, metric_name)
+    source_lines = _source_lines(method)
+    first = method.fromlineno
+    last = max(method.tolineno, *contributions) if contributions else method.tolineno
+    return Explanation(
+        metric_name,
+        [
+            LineContribution(
+                lineno,
+                source_lines[lineno - 1] if lineno <= len(source_lines) else "",
+                contributions.get(lineno, 0),
+            )
+            for lineno in range(first, last + 1)
+        ],
+    )
+
+
+class BreachExplainer:
+    """Explains the breaches of the methods passing through it on their way to assess.
+
+    Since :py:func:`.assess` is lazy, each breach is yielded straight after its method
+    has been taken from the methods, so the method last passing through the explainer
+    is the one breaching. Only that method is visited again, once for each of its
+    metrics which is explained.
+
+    Examples:
+        >>> from sourcery_analytics.analysis import assess
+        >>> from sourcery_analytics.extractors import extract_methods
+        >>> from sourcery_analytics.metrics import method_cognitive_complexity
+        >>> from sourcery_analytics.settings import ThresholdSettings
+        >>> source = '''
+        ...     def check(x):
+        ...         for y in x:
+        ...             if y:
+        ...                 return 1
+        ... '''
+        >>> explainer = BreachExplainer()
+        >>> for breach in assess(
+        ...     explainer.track(extract_methods(source)),
+        ...     metrics=method_cognitive_complexity,
+        ...     threshold_settings=ThresholdSettings(method_cognitive_complexity=2),
+        ... ):
+        ...     [line.value for line in explainer.explain(breach).lines]
+        [0, 1, 2, 0]
+    """
+
+    def __init__(self) -> None:
+        self._method: typing.Optional[astroid.nodes.FunctionDef] = None
+        self._explanations: typing.Dict[str, Explanation] = {}
+
+    def track(
+        self, methods: typing.Iterable[astroid.nodes.FunctionDef]
+    ) -> typing.Iterator[astroid.nodes.FunctionDef]:
+        """Passes the methods through, remembering the last method taken."""
+        for method in methods:
+            self._method = method
+            self._explanations.clear()
+            yield method
+
+    def explain(self, breach: ThresholdBreachDict) -> typing.Optional[Explanation]:
+        """Explains the breach, or returns None if its metric cannot be explained."""
+        metric_name = breach["metric_name"]
+        if (
+            metric_name not in EXPLAINERS
+            or self._method is None
+            or self._method.lineno != breach["method_lineno"]
+        ):
+            return None
+        if metric_name not in self._explanations:
+            self._explanations[metric_name] = explain_method(self._method, metric_name)
+        return self._explanations[metric_name]
+
+
+def _source_lines(method: astroid.nodes.FunctionDef) -> typing.List[str]:
+    module = method.root()
+    source = getattr(module, "file_bytes", None)
+    if source is None:
+        return []
+    if isinstance(source, bytes):
+        source = source.decode(module.file_encoding or "utf-8", errors="replace")
+    return source.splitlines()
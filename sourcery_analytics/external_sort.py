@@ -0,0 +1,219 @@
+"""Sort more method records than fit in memory, by spilling sorted runs to disk.
+
+Records are buffered in a compact binary form until the buffer reaches a memory limit,
+when it is sorted and written to a temporary file as a run. Once every record has been
+read, the runs are merged with :py:func:`heapq.merge`, reading each run a block at a
+time, so that sorted records are yielded while only a block of each run is in memory.
+If the records fit in the limit, they are sorted in memory and nothing is written.
+
+Each record is written as its length, then its location and metric values serialized
+with :py:mod:`marshal`, which is fast and compact for the strings and numbers records
+hold. The metric names are shared by all the records being sorted, so are kept in
+memory rather than written with every record.
+"""
+import dataclasses
+import functools
+import heapq
+import itertools
+import marshal
+import pathlib
+import struct
+import tempfile
+import typing
+
+from sourcery_analytics.analysis import MethodRecord
+
+# the default memory limit of the buffered records, in bytes
+MEMORY_LIMIT = 256 * 1024 * 1024
+
+# the most runs merged at once; beyond this runs are first merged into longer runs
+MERGE_FAN_IN = 64
+
+# the bytes read from each run at a time while merging
+READ_BUFFER = 64 * 1024
+
+# estimated bytes held per buffered record beyond its encoding: its key, the tuple
+# holding it, and the list slot
+_RECORD_OVERHEAD = 128
+
+_LENGTH = struct.Struct("<I")
+
+# a buffered or spilled record: its metric value, file and line, and its encoding
+_Entry = typing.Tuple[typing.Tuple[typing.Any, str, int], bytes]
+
+
+def sort_records(
+    records: typing.Iterable[MethodRecord],
+    /,
+    key: str,
+    reverse: bool = False,
+    memory_limit: int = MEMORY_LIMIT,
+    directory: typing.Optional[pathlib.Path] = None,
+) -> typing.Iterator[MethodRecord]:
+    """Lazily yields the records sorted by a metric, holding at most ``memory_limit``.
+
+    Records with the same value are ordered by file then line, whichever the direction
+    of the sort, so the order doesn't depend on the order of ``records``. All the
+    records must have the same metric names.
+
+    Args:
+        records: the records to sort
+        key: the name of the metric to sort by
+        reverse: sort from the largest value to the smallest, breaking ties as before
+        memory_limit: the approximate bytes of records to buffer before spilling a run
+        directory: where to write runs, by default the system's temporary directory
+
+    Raises:
+        ValueError: if the records have different metric names
+
+    Examples:
+        >>> names = ("method_length",)
+        >>> records = [
+        ...     MethodRecord("a.py", f".f{n}", n, values=(n % 3,), names=names)
+        ...     for n in range(6)
+        ... ]
+        >>> sorted_records = sort_records(
+        ...     records, key="method_length", reverse=True, memory_limit=256
+        ... )
+        >>> [record.qualname for record in sorted_records]
+        ['.f2', '.f5', '.f1', '.f4', '.f0', '.f3']
+        >>> records.append(MethodRecord("_.py", ".g", 9, values=(1,), names=names))
+        >>> sorted_records = sort_records(records, key="method_length", reverse=True)
+        >>> [record.qualname for record in sorted_records][2:5]
+        ['.g', '.f1', '.f4']
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    names = first.names
+    with tempfile.TemporaryDirectory(dir=directory) as temporary_directory:
+        runs = _Runs(names.index(key), reverse, memory_limit, temporary_directory)
+        for record in itertools.chain([first], records):
+            if record.names != names:
+                raise ValueError(
+                    f"cannot sort records with metrics {record.names} "
+                    f"together with records with metrics {names}"
+                )
+            runs.add(record)
+        yield from _decode(runs.merged(), names)
+
+
+@dataclasses.dataclass
+class _Runs:
+    """Buffers records' entries, spilling the buffer as a sorted run when it is full.
+
+    Attributes:
+        index: the index of the metric to sort by in each record's values
+        reverse: sort from the largest value to the smallest
+        memory_limit: the approximate bytes of entries to buffer before spilling
+        directory: where to write runs
+    """
+
+    index: int
+    reverse: bool
+    memory_limit: int
+    directory: str
+    runs: typing.List[pathlib.Path] = dataclasses.field(default_factory=list)
+    buffer: typing.List[_Entry] = dataclasses.field(default_factory=list)
+    buffered: int = 0
+
+    def add(self, record: MethodRecord) -> None:
+        """Buffers the record, spilling the buffer if it reaches the memory limit."""
+        encoded = marshal.dumps(
+            (record.file, record.qualname, record.lineno, record.values)
+        )
+        sort_key = (record.values[self.index], record.file, record.lineno)
+        self.buffer.append((sort_key, encoded))
+        self.buffered += len(encoded) + _RECORD_OVERHEAD
+        if self.buffered >= self.memory_limit:
+            self.spill()
+
+    def spill(self) -> None:
+        """Writes the buffer to a sorted run, and empties it."""
+        self.runs.append(_write_run(_sorted(self.buffer, self.reverse), self.directory))
+        self.buffer, self.buffered = [], 0
+
+    def merged(self) -> typing.Iterator[_Entry]:
+        """Every entry in order, sorted in memory if nothing was spilled."""
+        if not self.runs:
+            return iter(_sorted(self.buffer, self.reverse))
+        if self.buffer:
+            self.spill()
+        while len(self.runs) > MERGE_FAN_IN:
+            self.runs = [
+                _write_run(_merge(group, self.reverse), self.directory)
+                for group in _groups(self.runs, MERGE_FAN_IN)
+            ]
+        return _merge(self.runs, self.reverse)
+
+
+def _sorted(buffer: typing.List[_Entry], reverse: bool) -> typing.List[_Entry]:
+    buffer.sort(key=functools.partial(_entry_key, reverse=reverse))
+    return buffer
+
+
+def _entry_key(entry: _Entry, reverse: bool) -> typing.Any:
+    value, file, lineno = entry[0]
+    return (_Descending(value) if reverse else value, file, lineno)
+
+
+@functools.total_ordering
+class _Descending:
+    """Wraps a value so that larger values sort first."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: typing.Any):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _write_run(entries: typing.Iterable[_Entry], directory: str) -> pathlib.Path:
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".run", delete=False) as run:
+        for sort_key, encoded in entries:
+            # the key is written alongside the record, so merging needn't decode it
+            entry = marshal.dumps((sort_key, encoded))
+            run.write(_LENGTH.pack(len(entry)))
+            run.write(entry)
+    return pathlib.Path(run.name)
+
+
+def _read_run(run: pathlib.Path) -> typing.Iterator[_Entry]:
+    """Yields the entries of a run, then deletes it."""
+    with run.open("rb", buffering=READ_BUFFER) as file:
+        while header := file.read(_LENGTH.size):
+            (length,) = _LENGTH.unpack(header)
+            yield marshal.loads(file.read(length))
+    run.unlink()
+
+
+def _merge(
+    runs: typing.Iterable[pathlib.Path], reverse: bool
+) -> typing.Iterator[_Entry]:
+    return iter(
+        heapq.merge(
+            *(_read_run(run) for run in runs),
+            key=functools.partial(_entry_key, reverse=reverse),
+        )
+    )
+
+
+def _groups(
+    runs: typing.List[pathlib.Path], size: int
+) -> typing.Iterator[typing.List[pathlib.Path]]:
+    for start in range(0, len(runs), size):
+        yield runs[start : start + size]
+
+
+def _decode(
+    entries: typing.Iterable[_Entry], names: typing.Tuple[str, ...]
+) -> typing.Iterator[MethodRecord]:
+    for _sort_key, encoded in entries:
+        file, qualname, lineno, values = marshal.loads(encoded)
+        yield MethodRecord(file, qualname, lineno, values=values, names=names)
@@ -1,34 +1,83 @@
 """Extract nodes from various sources according to conditions."""
 import dataclasses
 import functools
+import io
 import itertools
 import pathlib
+import tarfile
+import tokenize
 import typing
 import warnings
+import zipfile
 
 import astroid
 import astroid.manager
+import astroid.modutils
 
-from sourcery_analytics.conditions import Condition, is_method
-from sourcery_analytics.utils import clean_source
+from sourcery_analytics.conditions import (
+    Condition,
+    is_method,
+    matches_methods_only,
+    matches_statements_only,
+)
+from sourcery_analytics.notebooks import (
+    NOTEBOOK_SUFFIX,
+    Notebook,
+    NotebookError,
+    cell_path,
+    clean_cell_source,
+    is_notebook,
+    read_notebook,
+)
+from sourcery_analytics.overrides import relative_path
+from sourcery_analytics.pipeline import prefetch
+from sourcery_analytics.settings import LimitSettings
+from sourcery_analytics.sharding import Shard
+from sourcery_analytics.triage import Triage
+from sourcery_analytics.utils import clean_source, time_limit
 from sourcery_analytics.visitors import (
     Visitor,
     FunctionVisitor,
     IdentityVisitor,
     TreeVisitor,
     ConditionalVisitor,
+    StatementTreeVisitor,
 )
 
 Extractable = typing.Union[str, astroid.nodes.NodeNG, pathlib.Path]
 N = typing.TypeVar("N", bound=astroid.nodes.NodeNG)
 E = typing.TypeVar("E")
+# a member's path, its size and its contents, or None if too big to be analyzed
+ArchiveMember = typing.Tuple[pathlib.Path, int, typing.Optional[bytes]]
+# the contents of a file read ahead: its bytes, a notebook's cells or the error reading
+# them, or None if too big
+FileContents = typing.Union[bytes, Notebook, NotebookError, None]
+
+READ_WORKERS = 4
 
+ZIP_SUFFIXES = (".zip", ".whl", ".egg")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
 
-def extract_methods(item: Extractable, /) -> typing.Iterator[astroid.nodes.FunctionDef]:
+
+def extract_methods(
+    item: Extractable,
+    /,
+    *,
+    limits: typing.Optional[LimitSettings] = None,
+    read_ahead: int = 0,
+    shard: typing.Optional[Shard] = None,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None,
+    exclude: typing.Optional[typing.Callable[[pathlib.Path], bool]] = None,
+) -> typing.Iterator[astroid.nodes.FunctionDef]:
     """Extracts methods from the input.
 
     Args:
         item: source code, node, or path to file or directory
+        limits: per-file limits, beyond which files are skipped with a warning
+        read_ahead: number of files to read in background threads ahead of parsing
+        shard: only extract from the files in this shard
+        on_file: called with each file once it has been extracted from, or skipped
+        exclude: files for which this returns True are not read at all
 
     Returns:
         An iterable of all the function definition nodes in the item
@@ -37,7 +86,15 @@ def extract_methods(item: Extractable, /) -> typing.Iterator[astroid.nodes.Funct
     ['foo']
 
     """
-    return extract(item, condition=is_method)
+    return extract(
+        item,
+        condition=is_method,
+        limits=limits,
+        read_ahead=read_ahead,
+        shard=shard,
+        on_file=on_file,
+        exclude=exclude,
+    )
 
 
 def extract(
@@ -47,6 +104,12 @@ def extract(
     function: typing.Optional[
         typing.Callable[[astroid.nodes.NodeNG], typing.Optional[E]]
     ] = None,
+    *,
+    limits: typing.Optional[LimitSettings] = None,
+    read_ahead: int = 0,
+    shard: typing.Optional[Shard] = None,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None,
+    exclude: typing.Optional[typing.Callable[[pathlib.Path], bool]] = None,
 ) -> typing.Iterator[E]:
     """Extracts from ``item`` according to ``condition`` OR ``function``.
 
@@ -54,6 +117,11 @@ def extract(
         item: source code, node, or path to file or directory
         condition: a condition on a node
         function: a function over a node, returning None for unextracted nodes
+        limits: per-file limits, beyond which files are skipped with a warning
+        read_ahead: number of files to read in background threads ahead of parsing
+        shard: only extract from the files in this shard
+        on_file: called with each file once it has been extracted from, or skipped
+        exclude: files for which this returns True are not read at all
 
     Returns:
         If ``condition`` is specified, an iterable of nodes satisfying the condition.
@@ -87,7 +155,16 @@ def extract(
     else:
         # Fall back to just extracting all the nodes.
         extractor = Extractor[N]()
-    return extractor.extract(item)
+    options = {
+        "limits": limits,
+        "read_ahead": read_ahead,
+        "shard": shard,
+        "on_file": on_file,
+        "exclude": exclude,
+    }
+    # options left unset keep the extractor's defaults
+    given = {name: value for name, value in options.items() if value}
+    return dataclasses.replace(extractor, **given).extract(item)
 
 
 @dataclasses.dataclass
@@ -99,6 +176,46 @@ class Extractor(typing.Generic[E]):
 
     By default, the extractor will return every node in the tree.
 
+    Files exceeding the ``limits``, or which are nested too deeply to parse, are skipped
+    with a :py:class:`.SkippedFileWarning`.
+
+    When extracting from a directory with ``read_ahead`` set, up to that many files are
+    read by a pool of threads ahead of the parser, so that waiting on the file system
+    overlaps with parsing and analysis.
+
+    Zip archives (including wheels) and tar archives (including sdists) are read in a
+    single pass, without extracting them to disk. Each Python member is reported as
+    the archive's path joined with the member's path, for instance
+    ``dist/package.whl/package/module.py``.
+
+    Jupyter notebooks (``.ipynb`` files) are extracted from too. Only the source of each
+    code cell is read, so outputs such as embedded images are never loaded, and each
+    cell is parsed separately, with IPython magics replaced by ``pass``. Each cell is
+    reported like an archive member, as the notebook's path joined with ``cell_N``,
+    where ``N`` counts every cell from 1, and line numbers are within the cell. The
+    limits apply to each cell, and notebooks in languages other than Python are skipped
+    with a warning.
+
+    With a ``shard``, files are only extracted from if their path relative to the
+    extracted path, or for a single file its path relative to the current directory, is
+    in the shard.
+
+    When the visitor is a :py:class:`.ConditionalVisitor` on the type of a statement,
+    such as :py:func:`.is_method`, and its sub-visitor needs no context, only the
+    statements of the tree are walked, skipping expressions. This doesn't apply when
+    counting nodes against ``limits.max_node_count``, which needs every node.
+
+    The ``on_file`` callback is called with each file, including archive members, once
+    it has been extracted from or skipped, for instance to report progress. The number
+    of such files can be counted ahead of time using :py:meth:`.count_files`.
+
+    Files, including archive members, for which ``exclude`` returns True are passed
+    over without being read, and without calling ``on_file``.
+
+    Before parsing a file, it is triaged according to ``limits.triage``: generated files
+    are skipped with a :py:class:`.SkippedFileWarning`, and when extracting methods,
+    files which contain none are passed over without a warning. See :py:mod:`.triage`.
+
     Examples:
         >>> source = '''
         ...     def one():
@@ -120,6 +237,11 @@ class Extractor(typing.Generic[E]):
 
     visitor: Visitor[typing.Optional[E]] = IdentityVisitor()
     manager: astroid.manager.AstroidManager = astroid.manager.AstroidManager()
+    limits: LimitSettings = dataclasses.field(default_factory=LimitSettings)
+    read_ahead: int = 0
+    shard: typing.Optional[Shard] = None
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None
+    exclude: typing.Optional[typing.Callable[[pathlib.Path], bool]] = None
 
     @classmethod
     def from_condition(
@@ -140,6 +262,52 @@ class Extractor(typing.Generic[E]):
         # `singledispatchmethod` confuses mypy, so wrap with a mypy-friendly interface
         return self._extract(item)
 
+    def extract_from_bytes(self, data: bytes, file: pathlib.Path) -> typing.Iterator[E]:
+        """Extract from the contents of a Python file, which have already been read.
+
+        The file is used to name the module and in warnings, and need not exist. The
+        limits apply as for files on disk.
+        """
+        return self._extract_from_file(file, data)
+
+    def count_files(self, path: pathlib.Path) -> typing.Optional[int]:
+        """Counts the files extracting from ``path`` would read, without reading them.
+
+        Returns None for tar archives, which can only be listed by decompressing them.
+        """
+        if not path.is_file():
+            return sum(1 for _file in self._directory_files(path))
+        if path.name.endswith(ZIP_SUFFIXES):
+            return self._count_zip_files(path)
+        if path.name.endswith(TAR_SUFFIXES):
+            return None
+        return int(self._file_in_shard(path) and not self._excluded(path))
+
+    def _count_zip_files(self, archive: pathlib.Path) -> int:
+        with zipfile.ZipFile(archive) as zip_file:
+            return sum(
+                1
+                for info in zip_file.infolist()
+                if not info.is_dir()
+                and info.filename.endswith(".py")
+                and self._in_shard(info.filename)
+                and not self._excluded(archive / info.filename)
+            )
+
+    def files(self, path: pathlib.Path) -> typing.Iterator[pathlib.Path]:
+        """Yields the files extracting from ``path`` reads, as separate units of work.
+
+        For a directory these are the Python files in the shard, which can each be
+        extracted from without a shard. Archives are yielded whole, and must still be
+        extracted from with the shard.
+        """
+        if path.is_dir():
+            yield from self._directory_files(path)
+        elif is_archive(path) or (
+            self._file_in_shard(path) and not self._excluded(path)
+        ):
+            yield path
+
     @functools.singledispatchmethod
     def _extract(self, item: Extractable) -> typing.Iterator[E]:
         # Note we use regular dispatch rather than nodedispatch for this function
@@ -148,9 +316,11 @@ class Extractor(typing.Generic[E]):
 
     @_extract.register
     def _extract_from_node(self, node: astroid.nodes.NodeNG) -> typing.Iterator[E]:
-        visitor = TreeVisitor[typing.Optional[E], typing.Iterator[typing.Optional[E]]](
-            self.visitor
-        )
+        visitor: TreeVisitor[typing.Optional[E], typing.Iterator[typing.Optional[E]]]
+        if self._visits_statements_only():
+            visitor = StatementTreeVisitor(self.visitor)
+        else:
+            visitor = TreeVisitor(self.visitor)
         yield from filter(None, visitor.visit(node))
 
     @_extract.register
@@ -160,6 +330,14 @@ class Extractor(typing.Generic[E]):
 
     @_extract.register
     def _extract_from_path(self, path: pathlib.Path) -> typing.Iterator[E]:
+        if path.is_file() and is_archive(path):
+            return self._extract_from_archive(path)
+        if path.is_file() and not (
+            self._file_in_shard(path) and not self._excluded(path)
+        ):
+            return iter(())
+        if path.is_file() and is_notebook(path):
+            return self._extract_from_notebook(path)
         if path.is_file():
             return self._extract_from_file(path)
         if path.is_dir():
@@ -168,25 +346,332 @@ class Extractor(typing.Generic[E]):
             f"Unable to extract from {path}: not a file or directory."
         )
 
+    def _directory_files(
+        self, directory: pathlib.Path
+    ) -> typing.Iterator[pathlib.Path]:
+        return (
+            file
+            for file in itertools.chain(
+                directory.glob("**/*.py"), directory.glob(f"**/*{NOTEBOOK_SUFFIX}")
+            )
+            if self._in_shard(file.relative_to(directory).as_posix())
+            and not self._excluded(file)
+        )
+
     def _extract_from_directory(self, directory: pathlib.Path) -> typing.Iterator[E]:
-        files = directory.glob("**/*.py")
-        yield from itertools.chain.from_iterable(
-            self._extract_from_file(file) for file in files
+        files = self._directory_files(directory)
+        if not self.read_ahead:
+            yield from itertools.chain.from_iterable(
+                self._extract_from_notebook(file)
+                if is_notebook(file)
+                else self._extract_from_file(file)
+                for file in files
+            )
+            return
+        sources = prefetch(
+            self._read_file, files, buffer=self.read_ahead, workers=READ_WORKERS
+        )
+        for file, contents in sources:
+            if isinstance(contents, (Notebook, NotebookError)):
+                yield from self._extract_from_notebook(file, contents)
+            else:
+                yield from self._extract_from_file(file, contents)
+
+    def _extract_from_archive(self, archive: pathlib.Path) -> typing.Iterator[E]:
+        if archive.name.endswith(ZIP_SUFFIXES):
+            members = self._read_zip_members(archive)
+        else:
+            members = self._read_tar_members(archive)
+        for file, file_size, data in members:
+            if data is None:
+                message = self._size_limit_message(file_size)
+                warnings.warn(SkippedFileWarning(file, message))
+                if self.on_file:
+                    self.on_file(file)
+                continue
+            yield from self._extract_from_file(file, data)
+
+    def _read_zip_members(
+        self, archive: pathlib.Path
+    ) -> typing.Iterator[ArchiveMember]:
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir() or not info.filename.endswith(".py"):
+                    continue
+                file = archive / info.filename
+                if not self._in_shard(info.filename) or self._excluded(file):
+                    continue
+                if self._exceeds_size_limit(info.file_size):
+                    yield file, info.file_size, None
+                else:
+                    yield file, info.file_size, zip_file.read(info)
+
+    def _read_tar_members(
+        self, archive: pathlib.Path
+    ) -> typing.Iterator[ArchiveMember]:
+        # stream mode reads the (possibly compressed) archive front to back, once
+        with tarfile.open(archive, mode="r|*") as tar_file:
+            for info in tar_file:
+                if not info.isfile() or not info.name.endswith(".py"):
+                    continue
+                file = archive / info.name
+                if not self._in_shard(info.name) or self._excluded(file):
+                    continue
+                if self._exceeds_size_limit(info.size):
+                    yield file, info.size, None
+                elif member := tar_file.extractfile(info):
+                    yield file, info.size, member.read()
+
+    def _visits_statements_only(self) -> bool:
+        """Whether the visitor can only produce results for statements.
+
+        Requires the sub-visitor not to override ``enter``, since skipping expressions
+        would otherwise change its context.
+        """
+        return isinstance(
+            self.visitor, ConditionalVisitor
+        ) and _conditional_visits_statements_only(self.visitor)
+
+    def _extracts_methods_only(self) -> bool:
+        """Whether the visitor can only produce results for methods."""
+        return isinstance(
+            self.visitor, ConditionalVisitor
+        ) and _conditional_extracts_methods_only(self.visitor)
+
+    @functools.cached_property
+    def _triage(self) -> Triage:
+        return Triage(self.limits.triage)
+
+    def _in_shard(self, path: str) -> bool:
+        return self.shard is None or self.shard.contains(path)
+
+    def _file_in_shard(self, file: pathlib.Path) -> bool:
+        """Whether a file given on its own, rather than in a directory, is in the shard.
+
+        Such files, like those listed with ``--files-from``, are sharded by their path
+        relative to the current directory, so files with the same name in different
+        directories are spread across shards.
+        """
+        return self.shard is None or self.shard.contains(
+            relative_path(file, pathlib.Path.cwd().absolute()).as_posix()
         )
 
-    def _extract_from_file(self, file: pathlib.Path) -> typing.Iterator[E]:
+    def _excluded(self, file: pathlib.Path) -> bool:
+        return self.exclude is not None and self.exclude(file)
+
+    def _exceeds_size_limit(self, file_size: int) -> bool:
+        max_file_size = self.limits.max_file_size
+        return max_file_size is not None and file_size > max_file_size
+
+    def _size_limit_message(self, file_size: int) -> str:
+        return (
+            f"file size of {file_size} bytes exceeds limit of "
+            f"{self.limits.max_file_size}"
+        )
+
+    def _read_file(
+        self, file: pathlib.Path
+    ) -> typing.Tuple[pathlib.Path, FileContents]:
+        """Reads a file's bytes, unless it is too big or triaged out to be parsed.
+
+        Notebooks are read as their code cells, which are each limited separately, or
+        as the error making them invalid, which is reported when extracted from.
+        """
+        if is_notebook(file):
+            return file, _read_notebook(file)
+        if self._triage.path_reason(file) or self._exceeds_size_limit(
+            file.stat().st_size
+        ):
+            return file, None
+        return file, file.read_bytes()
+
+    def _extract_from_notebook(
+        self,
+        notebook: pathlib.Path,
+        contents: typing.Union[Notebook, NotebookError, None] = None,
+    ) -> typing.Iterator[E]:
+        if contents is None:
+            contents = _read_notebook(notebook)
+        results = self._extract_from_cells(notebook, contents)
+        if self.on_file:
+            self.on_file(notebook)
+        yield from results
+
+    def _extract_from_cells(
+        self, notebook: pathlib.Path, contents: typing.Union[Notebook, NotebookError]
+    ) -> typing.List[E]:
+        """Extracts from each code cell, or warns if the notebook can't be analyzed."""
+        if isinstance(contents, NotebookError):
+            warnings.warn(SkippedFileWarning(notebook, str(contents)))
+            return []
+        if not contents.is_python:
+            reason = f"notebook language {contents.language!r} is not Python"
+            warnings.warn(SkippedFileWarning(notebook, reason))
+            return []
+        return [
+            result
+            for cell in contents.cells
+            for result in self._extract_or_warn(
+                cell_path(notebook, cell.number),
+                clean_cell_source(cell.source).encode(),
+            )
+        ]
+
+    def _extract_from_file(
+        self, file: pathlib.Path, data: typing.Optional[bytes] = None
+    ) -> typing.Iterator[E]:
+        results = self._extract_or_warn(file, data)
+        if self.on_file:
+            self.on_file(file)
+        yield from results
+
+    def _extract_or_warn(
+        self, file: pathlib.Path, data: typing.Optional[bytes] = None
+    ) -> typing.List[E]:
+        """Extracts from a file, or warns and returns nothing if it can't be parsed."""
         try:
-            module = self.manager.ast_from_file(file)
-            yield from self._extract_from_node(module)
+            # extract eagerly, so that the time limit doesn't apply to the consumer
+            with time_limit(self.limits.timeout):
+                return list(self._extract_from_limited_file(file, data))
         except astroid.AstroidSyntaxError as error:
-            if sub_error := getattr(error, "error"):
-                error_message = _format_syntax_error_message(
-                    "skipping file", file, sub_error
-                )
-            else:
-                error_message = str(error)
-            warnings.warn(SyntaxWarning(error_message))
-            yield from ()
+            warnings.warn(SyntaxWarning(_skipped_syntax_error_message(file, error)))
+        except _SKIPPED_FILE_ERRORS as error:
+            warnings.warn(SkippedFileWarning(file, _skipped_file_reason(error)))
+        return []
+
+    def _extract_from_limited_file(
+        self, file: pathlib.Path, data: typing.Optional[bytes] = None
+    ) -> typing.Iterator[E]:
+        data = self._limited_contents(file, data)
+        if data is None:
+            return
+        # always parse, since the manager's lookup by module name would return a
+        # stale module for a file edited since it was last parsed
+        module = self._parse_bytes(data, file)
+        if self.limits.max_node_count:
+            yield from self._extract_counting_nodes(module, self.limits.max_node_count)
+        else:
+            yield from self._extract_from_node(module)
+
+    def _limited_contents(
+        self, file: pathlib.Path, data: typing.Optional[bytes]
+    ) -> typing.Optional[bytes]:
+        """Reads a file's bytes, or returns None if it certainly has nothing to extract.
+
+        Raises:
+            FileLimitError: if the file exceeds the size limit or is triaged out
+        """
+        if reason := self._triage.path_reason(file):
+            raise FileLimitError(reason)
+        file_size = file.stat().st_size if data is None else len(data)
+        if self._exceeds_size_limit(file_size):
+            raise FileLimitError(self._size_limit_message(file_size))
+        if data is None:
+            data = file.read_bytes()
+        if reason := self._triage.header_reason(data):
+            raise FileLimitError(reason)
+        if self._extracts_methods_only() and not self._triage.may_contain_methods(data):
+            return None
+        return data
+
+    def _extract_counting_nodes(
+        self, module: astroid.nodes.Module, max_node_count: int
+    ) -> typing.Iterator[E]:
+        # the tree visitor produces one result per node, so count nodes as we go
+        visitor = TreeVisitor[typing.Optional[E], typing.Iterator[typing.Optional[E]]](
+            self.visitor
+        )
+        for node_count, result in enumerate(visitor.visit(module), 1):
+            if node_count > max_node_count:
+                raise FileLimitError(f"node count exceeds limit of {max_node_count}")
+            if result:
+                yield result
+
+    def _parse_bytes(self, data: bytes, file: pathlib.Path) -> astroid.nodes.Module:
+        """Parses a file's contents, which have already been read."""
+        try:
+            encoding, _lines = tokenize.detect_encoding(io.BytesIO(data).readline)
+            source = data.decode(encoding)
+        except (SyntaxError, LookupError, UnicodeDecodeError) as exc:
+            raise astroid.AstroidSyntaxError(
+                "Python 3 encoding specification error or unknown encoding:\n{error}",
+                modname=None,
+                error=exc,
+                path=str(file),
+            ) from exc
+        return self.manager.ast_from_string(source, _module_name(file), str(file))
+
+
+class FileLimitError(Exception):
+    """Raised when a file exceeds one of the configured limits, or is triaged out."""
+
+
+# the errors for which a file is skipped with a warning, rather than stopping analysis
+_SKIPPED_FILE_ERRORS = (RecursionError, MemoryError, FileLimitError, TimeoutError)
+
+
+def _skipped_file_reason(error: Exception) -> str:
+    if isinstance(error, (RecursionError, MemoryError)):
+        # the parser raises either of these for very deeply nested expressions
+        return "too deeply nested to parse"
+    return str(error)
+
+
+class SkippedFileWarning(UserWarning):
+    """Warning issued when a file is skipped, with the path and reason as attributes.
+
+    Examples:
+        >>> warning = SkippedFileWarning(pathlib.Path("big.py"), "too big")
+        >>> print(warning)
+        skipping file:
+        big.py:
+        too big
+    """
+
+    def __init__(self, path: pathlib.Path, reason: str):
+        super().__init__(path, reason)
+        self.path = path
+        self.reason = reason
+
+    def __str__(self):
+        return f"skipping file:\n{self.path!s}:\n{self.reason}"
+
+
+def is_archive(path: pathlib.Path) -> bool:
+    """True if the path names a zip or tar archive which can be extracted from.
+
+    Examples:
+        >>> is_archive(pathlib.Path("dist/package-1.0.tar.gz"))
+        True
+        >>> is_archive(pathlib.Path("package/module.py"))
+        False
+    """
+    return path.name.endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def _read_notebook(notebook: pathlib.Path) -> typing.Union[Notebook, NotebookError]:
+    """Reads a notebook's code cells, or returns the error making it invalid."""
+    try:
+        with notebook.open("rb") as file:
+            return read_notebook(file)
+    except NotebookError as error:
+        return error
+
+
+def _module_name(file: pathlib.Path) -> str:
+    """The module name astroid would give to the file, or the path as a fallback."""
+    try:
+        return ".".join(astroid.modutils.modpath_from_file(str(file)))
+    except ImportError:
+        return str(file)
+
+
+def _skipped_syntax_error_message(
+    file: pathlib.Path, error: astroid.AstroidSyntaxError
+) -> str:
+    if sub_error := getattr(error, "error"):
+        return _format_syntax_error_message("skipping file", file, sub_error)
+    return str(error)
 
 
 def _format_syntax_error_message(
@@ -199,7 +684,17 @@ def _format_syntax_error_message(
             f"{file_path!s}:{error.lineno}\n"
             f"{error.msg!s}:\n"
             f"{(error.text or '').strip()}\n"
-            f"{'^':>{error.offset}}\n"
+            f"{'^':>{error.offset or 1}}\n"
         )
     error_text = str(error).replace("\n", " ")
     return f"{main_message}:\n{file_path!s}:\n{error_text}"
+
+
+def _conditional_visits_statements_only(visitor: ConditionalVisitor) -> bool:
+    return type(visitor.sub_visitor).enter is Visitor.enter and matches_statements_only(
+        visitor.condition
+    )
+
+
+def _conditional_extracts_methods_only(visitor: ConditionalVisitor) -> bool:
+    return matches_methods_only(visitor.condition)
@@ -0,0 +1,94 @@
+"""Read lists of files to analyze, such as the output of ``git ls-files -z``.
+
+Lists are read lazily, so analysis starts while the program producing the list is still
+listing, and may be separated by NUL characters or by newlines. A list is taken to be
+NUL-separated if the first bytes read containing either separator contain a NUL, so
+NUL-separated lists may contain paths with newlines in them.
+"""
+import os
+import pathlib
+import typing
+import warnings
+
+from sourcery_analytics.extractors import SkippedFileWarning, is_archive
+from sourcery_analytics.notebooks import is_notebook
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_file_list(
+    stream: typing.BinaryIO, chunk_size: int = CHUNK_SIZE
+) -> typing.Iterator[pathlib.Path]:
+    """Yields each path in a NUL- or newline-separated list, as soon as it is read.
+
+    Empty entries, such as a trailing separator, are ignored.
+
+    Args:
+        stream: the list, opened in binary mode
+        chunk_size: the most bytes read at once
+
+    Examples:
+        >>> import io
+        >>> list(read_file_list(io.BytesIO(b"a.py\\0b c.py\\0")))
+        [PosixPath('a.py'), PosixPath('b c.py')]
+        >>> list(read_file_list(io.BytesIO(b"a.py\\r\\nb.py\\n\\n")))
+        [PosixPath('a.py'), PosixPath('b.py')]
+    """
+    # `read1` returns as soon as any bytes are available, rather than filling the chunk
+    read = getattr(stream, "read1", None) or stream.read
+    separator: typing.Optional[bytes] = None
+    pending = b""
+    while chunk := read(chunk_size):
+        pending += chunk
+        if separator is None:
+            if b"\0" in pending:
+                separator = b"\0"
+            elif b"\n" in pending:
+                separator = b"\n"
+            else:
+                continue
+        *entries, pending = pending.split(separator)
+        yield from _paths(entries, separator)
+    yield from _paths([pending], separator)
+
+
+def listed_files(paths: typing.Iterable[pathlib.Path]) -> typing.Iterator[pathlib.Path]:
+    """Yields the listed paths which can be analyzed, each only once.
+
+    Python files, notebooks, archives and directories are analyzed, while other
+    files, such as those listed by ``git ls-files``, are ignored. Missing paths are
+    skipped with a :py:class:`.SkippedFileWarning`.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     file = pathlib.Path(directory) / "a.py"
+        ...     readme = pathlib.Path(directory) / "README.md"
+        ...     _ = file.write_text(""), readme.write_text("")
+        ...     listed = [file, readme, file.parent / "." / "a.py"]
+        ...     [path.name for path in listed_files(listed)]
+        ['a.py']
+    """
+    seen: typing.Set[pathlib.Path] = set()
+    for path in paths:
+        if not path.exists():
+            warnings.warn(SkippedFileWarning(path, "no such file or directory"))
+            continue
+        if path.is_file() and not (
+            path.suffix == ".py" or is_archive(path) or is_notebook(path)
+        ):
+            continue
+        resolved = path.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            yield path
+
+
+def _paths(
+    entries: typing.List[bytes], separator: typing.Optional[bytes]
+) -> typing.Iterator[pathlib.Path]:
+    for entry in entries:
+        if separator != b"\0":
+            entry = entry.rstrip(b"\r")
+        if entry:
+            yield pathlib.Path(os.fsdecode(entry))
@@ -0,0 +1,511 @@
+"""A compact, flat encoding of syntax trees, on which the structural metrics can run.
+
+astroid nodes are large objects linked by pointers, which cannot be pickled, so trees
+cannot be cached cheaply or sent between processes. :py:func:`flatten` lowers a tree
+into a :py:class:`FlatTree`: a handful of arrays, with one entry per node, and a table
+of the strings they refer to. Nodes are stored in pre-order, the order in which a
+:py:class:`.TreeVisitor` visits them, so every subtree is a contiguous range of nodes,
+from the node itself to the end recorded for it. Walking a subtree is then a loop over
+a range of array indices, rather than a recursive walk of objects.
+
+The encoding records what the structural metrics need of each node, so that method
+length, cyclomatic complexity, cognitive complexity and working memory can be computed
+from it without the original tree, and agree with the metrics on astroid nodes. The
+Halstead metrics and maintainability index need the tokens of a method's source, which
+are not encoded.
+"""
+import array
+import dataclasses
+import marshal
+import typing
+
+import astroid
+
+from sourcery_analytics.analysis import MethodRecord
+from sourcery_analytics.conditions import is_elif
+
+# bumped whenever the encoding changes, so that stale encodings are not read
+FLAT_VERSION = 1
+
+# flags describing the kind of each node
+STATEMENT = 1 << 0
+DEFINITION = 1 << 1  # a function or class definition
+FUNCTION = 1 << 2  # a function definition, including async functions
+FRAME = 1 << 3  # a module, class, function or lambda, which names its contents
+IF = 1 << 4
+IF_EXP = 1 << 5
+FOR = 1 << 6  # including async for loops
+WHILE = 1 << 7
+EXCEPT_HANDLER = 1 << 8
+TRY_EXCEPT = 1 << 9
+BOOL_OP = 1 << 10
+COMPREHENSION = 1 << 11
+VARIABLE = 1 << 12  # a name, assigned name or attribute
+ASSIGN_NAME = 1 << 13
+ELIF = 1 << 14  # an `if` statement which is the `elif` of its parent
+ELSE = 1 << 15  # has an `else` block, which for `if` statements is not an `elif`
+
+_KINDS = [
+    (astroid.nodes.Statement, STATEMENT),
+    ((astroid.nodes.FunctionDef, astroid.nodes.ClassDef), DEFINITION),
+    (astroid.nodes.FunctionDef, FUNCTION),
+    (
+        (
+            astroid.nodes.Module,
+            astroid.nodes.ClassDef,
+            astroid.nodes.FunctionDef,
+            astroid.nodes.Lambda,
+        ),
+        FRAME,
+    ),
+    (astroid.nodes.If, IF),
+    (astroid.nodes.IfExp, IF_EXP),
+    (astroid.nodes.For, FOR),
+    (astroid.nodes.While, WHILE),
+    (astroid.nodes.ExceptHandler, EXCEPT_HANDLER),
+    (astroid.nodes.TryExcept, TRY_EXCEPT),
+    (astroid.nodes.BoolOp, BOOL_OP),
+    (astroid.nodes.Comprehension, COMPREHENSION),
+    ((astroid.nodes.Name, astroid.nodes.AssignName, astroid.nodes.Attribute), VARIABLE),
+    (astroid.nodes.AssignName, ASSIGN_NAME),
+]
+
+# the typecode of each column of a flat tree
+_COLUMNS = {
+    "types": "B",
+    "parents": "i",
+    "ends": "i",
+    "linenos": "i",
+    "end_linenos": "i",
+    "flags": "H",
+    "names": "i",
+    "arities": "I",
+}
+
+
+class FlatColumns(typing.NamedTuple):
+    """The arrays of a flat tree, with one entry per node in pre-order.
+
+    Attributes:
+        types: the type of each node, as an index into the tree's ``type_names``
+        parents: the index of each node's parent, or -1 for the root
+        ends: the index after the last node of each node's subtree
+        linenos: the first line of each node, or 0 if it has none
+        end_linenos: the last line of each node, or 0 if it has none
+        flags: the kinds of each node, such as :py:data:`STATEMENT`
+        names: the name of each variable, attribute or frame, as an index into the
+            tree's ``strings``, or -1 for other nodes
+        arities: the number of handlers of a ``try``, values of a boolean operation,
+            or conditions of a comprehension, or 0 for other nodes
+    """
+
+    types: array.array
+    parents: array.array
+    ends: array.array
+    linenos: array.array
+    end_linenos: array.array
+    flags: array.array
+    names: array.array
+    arities: array.array
+
+    @classmethod
+    def empty(cls) -> "FlatColumns":
+        """Columns of no nodes, to be appended to."""
+        return cls(**{column: array.array(code) for column, code in _COLUMNS.items()})
+
+
+@dataclasses.dataclass
+class FlatTree:
+    """A syntax tree encoded as columns of arrays, with one entry per node in pre-order.
+
+    Flat trees are small, and can be pickled, or written with :py:meth:`to_bytes`.
+
+    Attributes:
+        columns: the arrays describing the nodes
+        type_names: the name of each node type, such as ``"FunctionDef"``
+        strings: the names referred to by the nodes
+        file: the file the tree was parsed from
+    """
+
+    columns: FlatColumns
+    type_names: typing.Tuple[str, ...]
+    strings: typing.Tuple[str, ...]
+    file: str
+
+    def __len__(self) -> int:
+        return len(self.columns.types)
+
+    def type_name(self, index: int) -> str:
+        """The name of the type of the node, such as ``"FunctionDef"``."""
+        return self.type_names[self.columns.types[index]]
+
+    def name(self, index: int) -> typing.Optional[str]:
+        """The name of the variable, attribute or frame at the node, if it has one."""
+        name = self.columns.names[index]
+        return self.strings[name] if name >= 0 else None
+
+    def children(self, index: int) -> typing.Iterator[int]:
+        """Yields the indices of the node's children, in order."""
+        ends = self.columns.ends
+        child, end = index + 1, ends[index]
+        while child < end:
+            yield child
+            child = ends[child]
+
+    def methods(self) -> typing.Iterator[int]:
+        """Yields the indices of the function definitions, in order."""
+        flags = self.columns.flags
+        return (index for index in range(len(flags)) if flags[index] & FUNCTION)
+
+    def qualname(self, index: int) -> str:
+        """The qualified name of the frame at the node, as from astroid's ``qname``."""
+        flags, parents = self.columns.flags, self.columns.parents
+        names = []
+        while index >= 0:
+            if flags[index] & FRAME:
+                names.append(self.name(index) or "")
+            index = parents[index]
+        return ".".join(reversed(names))
+
+    def to_bytes(self) -> bytes:
+        """Encodes the tree, for instance to store it on disk.
+
+        The arrays are stored in the machine's byte order, so encodings should only be
+        read on machines like the one which wrote them.
+        """
+        return marshal.dumps(
+            (
+                FLAT_VERSION,
+                self.type_names,
+                self.strings,
+                self.file,
+                tuple(column.tobytes() for column in self.columns),
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FlatTree":
+        """Decodes a tree encoded by :py:meth:`to_bytes`.
+
+        Raises:
+            ValueError: if the data was encoded by a different version of the encoding
+        """
+        version, type_names, strings, file, columns = marshal.loads(data)
+        if version != FLAT_VERSION:
+            raise ValueError(f"unsupported flat tree version {version}")
+        arrays = FlatColumns.empty()
+        for column, column_bytes in zip(arrays, columns):
+            column.frombytes(column_bytes)
+        return cls(arrays, type_names=type_names, strings=strings, file=file)
+
+
+def flatten(node: astroid.nodes.NodeNG) -> FlatTree:
+    """Encodes the tree beneath the node, usually a module, as a :py:class:`FlatTree`.
+
+    Examples:
+        >>> tree = flatten(astroid.parse("def add(x, y):\\n    return x + y\\n"))
+        >>> len(tree), tree.type_name(1), tree.name(1)
+        (9, 'FunctionDef', 'add')
+        >>> [tree.type_name(index) for index in tree.children(1)]
+        ['Arguments', 'Return']
+        >>> tree.qualname(1)
+        '.add'
+    """
+    flattener = _Flattener()
+    # (node, parent index) pairs still to visit, last first; the end of a node's
+    # subtree is filled in once it is left, marked by a node of None
+    pending: typing.List[typing.Tuple[typing.Optional[astroid.nodes.NodeNG], int]] = [
+        (node, -1)
+    ]
+    while pending:
+        current, parent = pending.pop()
+        if current is None:
+            flattener.leave(parent)
+            continue
+        index = flattener.enter(current, parent)
+        pending.append((None, index))
+        pending.extend(
+            (child, index) for child in reversed(list(current.get_children()))
+        )
+    return flattener.tree(getattr(node.root(), "file", None) or "<?>")
+
+
+class _Flattener:
+    """Appends nodes to the columns of a flat tree, in pre-order."""
+
+    def __init__(self) -> None:
+        self.columns = FlatColumns.empty()
+        self.type_codes: typing.Dict[str, int] = {}
+        self.string_codes: typing.Dict[str, int] = {}
+
+    def enter(self, node: astroid.nodes.NodeNG, parent: int) -> int:
+        """Appends the node, returning its index; its end is filled in on leaving."""
+        columns = self.columns
+        index = len(columns.types)
+        columns.types.append(_code(self.type_codes, type(node).__name__))
+        columns.parents.append(parent)
+        columns.ends.append(0)
+        columns.linenos.append(node.lineno or 0)
+        columns.end_linenos.append(getattr(node, "end_lineno", None) or 0)
+        columns.flags.append(_flags(node))
+        name = _name(node)
+        columns.names.append(-1 if name is None else _code(self.string_codes, name))
+        columns.arities.append(_arity(node))
+        return index
+
+    def leave(self, index: int) -> None:
+        """Records that the subtree of the node ends at the last node appended."""
+        self.columns.ends[index] = len(self.columns.types)
+
+    def tree(self, file: str) -> FlatTree:
+        """The tree of the nodes appended."""
+        return FlatTree(
+            self.columns,
+            type_names=tuple(self.type_codes),
+            strings=tuple(self.string_codes),
+            file=file,
+        )
+
+
+def flat_method_length(tree: FlatTree, method: int) -> int:
+    """The number of statements in the method, as :py:func:`.method_length`.
+
+    Examples:
+        >>> tree = flatten(astroid.parse("def add(x, y): z = x + y; return z"))
+        >>> flat_method_length(tree, 1)
+        2
+    """
+    flags = tree.columns.flags
+    return sum(
+        1
+        for index in range(method, tree.columns.ends[method])
+        if flags[index] & (STATEMENT | DEFINITION) == STATEMENT
+    )
+
+
+def flat_method_cyclomatic_complexity(tree: FlatTree, method: int) -> int:
+    """The method's cyclomatic complexity, as :py:func:`.method_cyclomatic_complexity`.
+
+    Examples:
+        >>> source = "def div(x, y): return None if y == 0 else x / y"
+        >>> flat_method_cyclomatic_complexity(flatten(astroid.parse(source)), 1)
+        2
+    """
+    flags, arities = tree.columns.flags, tree.columns.arities
+    return sum(
+        _branches(flags[index], arities[index])
+        for index in range(method, tree.columns.ends[method])
+    )
+
+
+def flat_method_cognitive_complexity(tree: FlatTree, method: int) -> int:
+    """The method's cognitive complexity, as :py:func:`.method_cognitive_complexity`.
+
+    Examples:
+        >>> source = '''
+        ... def check_add(x, y):
+        ...     if x:
+        ...         if y:
+        ...             return x + y
+        ... '''
+        >>> flat_method_cognitive_complexity(flatten(astroid.parse(source)), 1)
+        3
+    """
+    flags, ends = tree.columns.flags, tree.columns.ends
+    # the ends of the subtrees of the nodes increasing the nesting
+    nesting: typing.List[int] = []
+    complexity = 0
+    for index in range(method + 1, ends[method]):
+        while nesting and nesting[-1] <= index:
+            nesting.pop()
+        flag = flags[index]
+        if flag & (IF | IF_EXP | FOR | WHILE | EXCEPT_HANDLER) and not flag & ELIF:
+            nesting.append(ends[index])
+        if flag & IF_EXP or flag & (IF | ELSE) == IF | ELSE:
+            complexity += len(nesting) + 1
+        elif flag & (IF | FOR | WHILE | EXCEPT_HANDLER):
+            complexity += len(nesting)
+    return complexity
+
+
+def flat_method_working_memory(tree: FlatTree, method: int) -> int:
+    """The peak working memory of the method, as :py:func:`.method_working_memory`.
+
+    Examples:
+        >>> tree = flatten(astroid.parse("def add(a, b): return a + b"))
+        >>> flat_method_working_memory(tree, 1)
+        2
+    """
+    columns = tree.columns
+    scoped: typing.Set[int] = set()
+    conditions = _Conditions()
+    peak = 0
+    for index in range(method + 1, columns.ends[method]):
+        conditions.leave(index)
+        flag = columns.flags[index]
+        if flag & IF:
+            conditions.enter(columns.ends[index], len(_variables(columns, index + 1)))
+        elif flag & ASSIGN_NAME:
+            scoped.add(columns.names[index])
+        value = _working_memory(columns, index, scoped)
+        if value is not None:
+            peak = max(peak, value + conditions.penalty)
+    return peak
+
+
+# the metrics which can be computed from a flat tree, by the name of their metric
+FLAT_METRICS: typing.Dict[str, typing.Callable[[FlatTree, int], int]] = {
+    "method_length": flat_method_length,
+    "method_cyclomatic_complexity": flat_method_cyclomatic_complexity,
+    "method_cognitive_complexity": flat_method_cognitive_complexity,
+    "method_working_memory": flat_method_working_memory,
+}
+
+
+def flat_method_records(
+    tree: FlatTree, metric_names: typing.Optional[typing.Sequence[str]] = None
+) -> typing.List[MethodRecord]:
+    """The records of every method in the tree, as from :py:func:`.iter_method_metrics`.
+
+    Args:
+        tree: the flat tree of a module
+        metric_names: the names of metrics in :py:data:`FLAT_METRICS`, by default all
+
+    Raises:
+        KeyError: if a metric cannot be computed from a flat tree
+
+    Examples:
+        >>> source = "def f(x):\\n    if x:\\n        return 1\\n"
+        >>> flat_method_records(flatten(astroid.parse(source)), ["method_length"])
+        [MethodRecord(file='<?>', qualname='.f', lineno=1, method_length=2)]
+    """
+    names = tuple(FLAT_METRICS if metric_names is None else metric_names)
+    metrics = [FLAT_METRICS[name] for name in names]
+    return [
+        MethodRecord(
+            tree.file,
+            tree.qualname(method),
+            tree.columns.linenos[method],
+            values=tuple(metric(tree, method) for metric in metrics),
+            names=names,
+        )
+        for method in tree.methods()
+    ]
+
+
+def _branches(flag: int, arity: int) -> int:
+    """The branches a node adds to the cyclomatic complexity of its method."""
+    has_else = bool(flag & ELSE)
+    if flag & TRY_EXCEPT:
+        return arity + has_else
+    if flag & BOOL_OP:
+        return arity - 1
+    if flag & (IF | FOR | WHILE):
+        return 1 + has_else
+    if flag & IF_EXP:
+        return 2
+    if flag & COMPREHENSION:
+        return arity + 1
+    return 0
+
+
+class _Conditions:
+    """The `if` statements enclosing a node, and their working memory penalty."""
+
+    def __init__(self) -> None:
+        # the ends of the subtrees of the `if` statements, and their penalties
+        self.ends: typing.List[typing.Tuple[int, int]] = []
+        self.penalty = 0
+
+    def enter(self, end: int, penalty: int) -> None:
+        """Adds an `if` statement, whose subtree ends at ``end``."""
+        self.ends.append((end, penalty))
+        self.penalty += penalty
+
+    def leave(self, index: int) -> None:
+        """Removes the `if` statements whose subtrees end before the node."""
+        while self.ends and self.ends[-1][0] <= index:
+            self.penalty -= self.ends.pop()[1]
+
+
+def _working_memory(
+    columns: FlatColumns, index: int, scoped: typing.Set[int]
+) -> typing.Optional[int]:
+    """The working memory of a node, without the penalty of its conditions.
+
+    None for nodes other than statements, and for definitions, whose working memory
+    is not counted towards their enclosing method's.
+    """
+    flag = columns.flags[index]
+    if flag & (IF | FOR):
+        value = len(scoped - _variables(columns, index))
+        if flag & FOR:
+            target = index + 1
+            iterable = columns.ends[target]
+            value += len(_variables(columns, iterable))
+            value += len(_variables(columns, target))
+        return value
+    if flag & DEFINITION or not flag & STATEMENT:
+        return None
+    statement_variables = _variables(columns, index)
+    return len(statement_variables) + len(scoped - statement_variables)
+
+
+def _variables(columns: FlatColumns, index: int) -> typing.Set[int]:
+    """The names of the variables in the subtree of the node."""
+    flags, names = columns.flags, columns.names
+    return {
+        names[node]
+        for node in range(index, columns.ends[index])
+        if flags[node] & VARIABLE and names[node] >= 0
+    }
+
+
+def _code(codes: typing.Dict[str, int], value: str) -> int:
+    return codes.setdefault(value, len(codes))
+
+
+def _flags(node: astroid.nodes.NodeNG) -> int:
+    flags = 0
+    for types, flag in _KINDS:
+        if isinstance(node, types):
+            flags |= flag
+    if is_elif(node):
+        flags |= ELIF
+    if isinstance(node, astroid.nodes.If):
+        if node.orelse and not is_elif(node.orelse[0]):
+            flags |= ELSE
+    elif isinstance(
+        node, (astroid.nodes.For, astroid.nodes.While, astroid.nodes.TryExcept)
+    ):
+        if node.orelse:
+            flags |= ELSE
+    return flags
+
+
+def _name(node: astroid.nodes.NodeNG) -> typing.Optional[str]:
+    if isinstance(node, astroid.nodes.Attribute):
+        return node.attrname
+    if isinstance(
+        node,
+        (
+            astroid.nodes.Name,
+            astroid.nodes.AssignName,
+            astroid.nodes.Module,
+            astroid.nodes.ClassDef,
+            astroid.nodes.FunctionDef,
+            astroid.nodes.Lambda,
+        ),
+    ):
+        return node.name
+    return None
+
+
+def _arity(node: astroid.nodes.NodeNG) -> int:
+    if isinstance(node, astroid.nodes.TryExcept):
+        return len(node.handlers)
+    if isinstance(node, astroid.nodes.BoolOp):
+        return len(node.values)
+    if isinstance(node, astroid.nodes.Comprehension):
+        return len(node.ifs)
+    return 0
@@ -0,0 +1,244 @@
+"""Aggregate metrics over the history of a git repository, without checking it out.
+
+Commits, trees and blobs are all read through a single ``git cat-file --batch``
+process. Aggregation states are memoized by the SHA of each blob and tree, so each
+distinct version of a file is parsed exactly once, wherever it appears, and directories
+which are unchanged between commits are reused wholesale. Analyzing many snapshots of a
+repository therefore costs about as much as analyzing the files which changed between
+them.
+"""
+import dataclasses
+import pathlib
+import subprocess
+import typing
+import warnings
+
+import astroid
+
+from sourcery_analytics.analysis import analyze
+from sourcery_analytics.conditions import is_method
+from sourcery_analytics.extractors import Extractor, SkippedFileWarning
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.settings import LimitSettings
+from sourcery_analytics.triage import Triage
+
+TREE_MODE = b"40000"
+BLOB_MODES = (b"100644", b"100755")
+
+
+class HistoryPoint(typing.NamedTuple):
+    """The aggregation state of the methods in a single commit."""
+
+    commit: str
+    date: str
+    state: AggregationState
+
+
+class GitObjectReader:
+    """Reads objects from a git repository through one ``git cat-file --batch``.
+
+    Should be used as a context manager, which stops the process on exit.
+    """
+
+    def __init__(self, repository: pathlib.Path):
+        self.repository = repository
+        self._process: typing.Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "GitObjectReader":
+        self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+            ["git", "cat-file", "--batch"],
+            cwd=self.repository,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._process is not None:
+            self._process.communicate()
+            self._process = None
+
+    def read(self, name: str) -> typing.Tuple[str, str, bytes]:
+        """Returns the SHA, type and contents of the object with the given name.
+
+        The name may be a SHA, or any name understood by git, such as
+        ``HEAD:src/module.py``.
+
+        Raises:
+            KeyError: if there is no such object
+        """
+        assert self._process is not None, "reader must be used as a context manager"
+        stdin, stdout = self._process.stdin, self._process.stdout
+        assert stdin is not None and stdout is not None
+        stdin.write(f"{name}\n".encode())
+        stdin.flush()
+        header = stdout.readline().decode().split()
+        if len(header) != 3:
+            raise KeyError(name)
+        sha, object_type, size = header
+        data = stdout.read(int(size))
+        stdout.read(1)  # trailing newline
+        return sha, object_type, data
+
+
+def aggregate_history(
+    path: pathlib.Path,
+    /,
+    metrics: typing.Iterable[MethodMetric],
+    count: int = 10,
+    every: int = 1,
+    revision: str = "HEAD",
+    limits: typing.Optional[LimitSettings] = None,
+) -> typing.Iterator[HistoryPoint]:
+    """Yields the aggregation state of the metrics for each of a series of commits.
+
+    The commits are every ``every``-th commit of the first-parent history of
+    ``revision``, up to ``count`` commits, yielded oldest first. Only Python files
+    beneath ``path`` are analyzed.
+
+    Args:
+        path: a directory in a git repository
+        metrics: the method metrics to aggregate
+        count: the maximum number of commits to analyze
+        every: the interval between analyzed commits
+        revision: the most recent commit to analyze
+        limits: per-file limits, beyond which files are skipped with a warning
+
+    Raises:
+        subprocess.CalledProcessError: if ``path`` is not in a git repository, or the
+            revision is unknown
+    """
+    path = path.absolute()
+    prefix = _git(path, "rev-parse", "--show-prefix").strip()
+    log = _git(
+        path,
+        "log",
+        "--first-parent",
+        "--format=%H %cs",
+        f"--max-count={count * every}",
+        revision,
+        "--",
+    )
+    commits = [line.split() for line in log.splitlines()][::every]
+    aggregator = _HistoryAggregator(list(metrics), limits or LimitSettings())
+    return _aggregate_commits(path, reversed(commits), prefix, aggregator)
+
+
+def _aggregate_commits(
+    path: pathlib.Path,
+    commits: typing.Iterable[typing.List[str]],
+    prefix: str,
+    aggregator: "_HistoryAggregator",
+) -> typing.Iterator[HistoryPoint]:
+    with GitObjectReader(path) as reader:
+        for commit, date in commits:
+            try:
+                sha, _type, data = reader.read(f"{commit}:{prefix}")
+            except KeyError:  # the directory didn't exist at this commit
+                state = AggregationState()
+            else:
+                state = aggregator.tree_state(reader, sha, data, prefix)
+            yield HistoryPoint(commit, date, state)
+
+
+class _HistoryAggregator:
+    """Computes aggregation states of git objects, memoized by SHA.
+
+    Files triaged out by their path are skipped before their blob is looked up, so a
+    blob's state doesn't depend on its path. A tree's state does when files are triaged
+    by their paths, so trees are then memoized by their path as well.
+    """
+
+    def __init__(self, metrics: typing.List[MethodMetric], limits: LimitSettings):
+        self.metrics = metrics
+        self.extractor: Extractor[astroid.nodes.FunctionDef] = dataclasses.replace(
+            Extractor.from_condition(is_method), limits=limits
+        )
+        self.triage = Triage(limits.triage)
+        self._blob_states: typing.Dict[str, AggregationState] = {}
+        self._tree_states: typing.Dict[typing.Tuple[str, str], AggregationState] = {}
+
+    def tree_state(
+        self, reader: GitObjectReader, sha: str, data: bytes, directory: str
+    ) -> AggregationState:
+        """The state of the Python files in a tree, read from the tree's contents.
+
+        Args:
+            reader: reads the tree's children
+            sha: the tree's object ID
+            data: the tree's raw contents
+            directory: the tree's path in the repository, ending in ``/`` unless empty
+        """
+        key = self._tree_key(sha, directory)
+        if key not in self._tree_states:
+            state = AggregationState()
+            # object IDs are 20 bytes for SHA-1 repositories, and 32 for SHA-256
+            for mode, name, child_sha in _tree_entries(data, len(sha) // 2):
+                state = state.merge(
+                    self._entry_state(reader, mode, child_sha, f"{directory}{name}")
+                )
+            self._tree_states[key] = state
+        return self._tree_states[key]
+
+    def _tree_key(self, sha: str, directory: str) -> typing.Tuple[str, str]:
+        if self.triage.settings.skip_generated:
+            return sha, directory
+        return sha, ""
+
+    def _entry_state(
+        self, reader: GitObjectReader, mode: bytes, sha: str, path: str
+    ) -> AggregationState:
+        if mode == TREE_MODE:
+            return self._subtree_state(reader, sha, f"{path}/")
+        if mode in BLOB_MODES and path.endswith(".py"):
+            return self._blob_state(reader, sha, path)
+        return AggregationState()
+
+    def _subtree_state(
+        self, reader: GitObjectReader, sha: str, directory: str
+    ) -> AggregationState:
+        key = self._tree_key(sha, directory)
+        if key not in self._tree_states:
+            _sha, _type, data = reader.read(sha)
+            self.tree_state(reader, sha, data, directory)
+        return self._tree_states[key]
+
+    def _blob_state(
+        self, reader: GitObjectReader, sha: str, path: str
+    ) -> AggregationState:
+        if reason := self.triage.path_reason(pathlib.Path(path)):
+            warnings.warn(SkippedFileWarning(pathlib.Path(path), reason))
+            return AggregationState()
+        if sha not in self._blob_states:
+            _sha, _type, data = reader.read(sha)
+            methods = self.extractor.extract_from_bytes(data, pathlib.Path(path))
+            self._blob_states[sha] = analyze(
+                methods, metrics=self.metrics, aggregation=AggregationState.from_results
+            )
+        return self._blob_states[sha]
+
+
+def _tree_entries(
+    data: bytes, id_size: int = 20
+) -> typing.Iterator[typing.Tuple[bytes, str, str]]:
+    """Yields the mode, name and object ID of each entry of a raw tree object.
+
+    Args:
+        data: the tree's raw contents
+        id_size: the size in bytes of the repository's object IDs
+    """
+    position = 0
+    while position < len(data):
+        mode_end = data.index(b" ", position)
+        name_end = data.index(b"\0", mode_end)
+        mode = data[position:mode_end]
+        name = data[mode_end + 1 : name_end].decode(errors="surrogateescape")
+        position = name_end + 1 + id_size
+        yield mode, name, data[name_end + 1 : position].hex()
+
+
+def _git(path: pathlib.Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=path, check=True, capture_output=True, text=True
+    ).stdout
@@ -0,0 +1,330 @@
+"""Rank methods by how often they change, multiplied by a metric such as complexity.
+
+Churn is read from a single streaming ``git log --patch --unified=0`` pass, without
+running ``git blame``. Each commit's changed line ranges are translated into line
+numbers of the current version of the file, by shifting them past the lines added and
+removed by every newer commit, and then matched against the current spans of the
+methods. Only files changed by enough commits are parsed at all.
+"""
+import bisect
+import dataclasses
+import itertools
+import pathlib
+import re
+import subprocess
+import typing
+
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.metrics.utils import method_lineno, method_qualname
+from sourcery_analytics.settings import LimitSettings
+
+HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# marks the start of each commit in the log, and cannot start a line of a patch
+COMMIT_MARKER = b"\0commit"
+
+# a hunk's old start and count, and new start and count
+Hunk = typing.Tuple[int, int, int, int]
+
+
+class Hotspot(typing.NamedTuple):
+    """A method with its churn, metric value, and their product as its score."""
+
+    method_file: str
+    method_lineno: int
+    method_qualname: str
+    churn: int
+    metric_value: typing.Any
+    score: typing.Any
+
+
+@dataclasses.dataclass
+class FileChurn:
+    """The commits changing a file, and the lines they changed in its current version.
+
+    Attributes:
+        commits: the indices of the commits changing the file, newest first
+        changes: the commit index and first and last current line of each change
+    """
+
+    commits: typing.Set[int] = dataclasses.field(default_factory=set)
+    changes: typing.List[typing.Tuple[int, int, int]] = dataclasses.field(
+        default_factory=list
+    )
+    # line maps of each commit processed so far, which are all newer than the next one
+    _newer: typing.List["LineMap"] = dataclasses.field(default_factory=list, repr=False)
+    _removed: bool = dataclasses.field(default=False, repr=False)
+
+    def add_commit(self, commit: int, hunks: typing.List[Hunk]) -> None:
+        """Records a commit older than all those recorded so far."""
+        if self._removed or not hunks:
+            return
+        self.commits.add(commit)
+        for _old_start, _old_count, new_start, new_count in hunks:
+            # a pure deletion is located at the line before it
+            first, last = new_start, new_start + max(new_count, 1) - 1
+            for newer in reversed(self._newer):
+                first, last = newer[first], newer[last]
+            self.changes.append((commit, max(first, 1), max(last, 1)))
+        self._newer.append(LineMap(hunks))
+
+    def remove(self) -> None:
+        """Marks the file as removed, so that changes by older commits are ignored."""
+        self._removed = True
+
+    def churn(self, first: int, last: int) -> int:
+        """The number of commits changing any of the lines from first to last."""
+        return len(
+            {
+                commit
+                for commit, change_first, change_last in self.changes
+                if change_first <= last and first <= change_last
+            }
+        )
+
+
+def read_churn(
+    path: pathlib.Path,
+    /,
+    since: typing.Optional[str] = None,
+    max_commits: typing.Optional[int] = None,
+) -> typing.Dict[pathlib.Path, FileChurn]:
+    """Reads the churn of each Python file beneath ``path`` from its git history.
+
+    Args:
+        path: a directory in a git repository
+        since: only count commits since this date, in any format understood by git
+        max_commits: only count this many of the most recent commits
+
+    Returns:
+        The churn of each file, keyed by its absolute path. Files which no longer
+        exist may be included.
+
+    Raises:
+        subprocess.CalledProcessError: if ``path`` is not in a git repository
+    """
+    path = path.absolute()
+    top_level = _top_level(path)
+    churn: typing.Dict[pathlib.Path, FileChurn] = {}
+    for diff in _read_log(path, _log_command(since, max_commits)):
+        file_churn = churn.setdefault(top_level / diff.file, FileChurn())
+        if diff.removed:
+            file_churn.remove()
+        else:
+            file_churn.add_commit(diff.commit, diff.hunks)
+    return churn
+
+
+def find_hotspots(
+    path: pathlib.Path,
+    /,
+    metric: MethodMetric,
+    since: typing.Optional[str] = None,
+    max_commits: typing.Optional[int] = None,
+    min_churn: int = 1,
+    limits: typing.Optional[LimitSettings] = None,
+) -> typing.List[Hotspot]:
+    """Returns the changed methods beneath ``path``, highest score first.
+
+    Each method's score is its churn, the number of commits changing any of its
+    lines, multiplied by the metric.
+
+    Args:
+        path: a directory in a git repository
+        metric: the method metric to multiply by churn
+        since: only count commits since this date, in any format understood by git
+        max_commits: only count this many of the most recent commits
+        min_churn: only parse files changed by at least this many commits
+        limits: per-file limits, beyond which files are skipped with a warning
+
+    Raises:
+        subprocess.CalledProcessError: if ``path`` is not in a git repository
+    """
+    hotspots: typing.List[Hotspot] = []
+    for file, file_churn in read_churn(
+        path, since=since, max_commits=max_commits
+    ).items():
+        if len(file_churn.commits) >= min_churn and file.is_file():
+            hotspots.extend(_file_hotspots(file, file_churn, metric, limits))
+    return sorted(hotspots, key=lambda hotspot: hotspot.score, reverse=True)
+
+
+def _file_hotspots(
+    file: pathlib.Path,
+    file_churn: FileChurn,
+    metric: MethodMetric,
+    limits: typing.Optional[LimitSettings],
+) -> typing.Iterator[Hotspot]:
+    for method in extract_methods(file, limits=limits):
+        if churn := file_churn.churn(method.fromlineno, method.tolineno):
+            # method metrics are numbers, which the metric result type doesn't say
+            value: typing.Any = metric(method)
+            yield Hotspot(
+                str(file),
+                method_lineno(method),
+                method_qualname(method),
+                churn,
+                value,
+                churn * value,
+            )
+
+
+def _top_level(path: pathlib.Path) -> pathlib.Path:
+    return pathlib.Path(
+        subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"],
+            cwd=path,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    )
+
+
+def _log_command(
+    since: typing.Optional[str], max_commits: typing.Optional[int]
+) -> typing.List[str]:
+    command = [
+        "git",
+        "log",
+        "--no-renames",
+        "--no-color",
+        "--no-ext-diff",
+        "--patch",
+        "--unified=0",
+        "--format=%x00commit",
+    ]
+    if since:
+        command.append(f"--since={since}")
+    if max_commits:
+        command.append(f"--max-count={max_commits}")
+    command.extend(["--", "*.py"])
+    return command
+
+
+def _read_log(
+    path: pathlib.Path, command: typing.List[str]
+) -> typing.Iterator["_FileDiff"]:
+    with subprocess.Popen(command, cwd=path, stdout=subprocess.PIPE) as process:
+        assert process.stdout is not None
+        yield from _parse_log(process.stdout)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+class _FileDiff(typing.NamedTuple):
+    """The hunks of a commit changing a file, and whether the commit removed it."""
+
+    commit: int
+    file: str
+    hunks: typing.List[Hunk]
+    removed: bool
+
+
+def _parse_log(lines: typing.Iterable[bytes]) -> typing.Iterator[_FileDiff]:
+    """Yields the diff of each file changed by each commit.
+
+    Commits are numbered from 0 in the order of the log, newest first.
+    """
+    parser = _LogParser()
+    for line in lines:
+        if diff := parser.feed(line):
+            yield diff
+    if diff := parser.flush():
+        yield diff
+
+
+@dataclasses.dataclass
+class _LogParser:
+    """Parses a patch log a line at a time, keeping only the current file's hunks."""
+
+    commit: int = -1
+    file: typing.Optional[str] = None
+    hunks: typing.List[Hunk] = dataclasses.field(default_factory=list)
+    removed: bool = False
+    in_header: bool = False
+
+    def feed(self, line: bytes) -> typing.Optional[_FileDiff]:
+        """Reads a line, returning the previous file's diff if the line ends it."""
+        if line.startswith((COMMIT_MARKER, b"diff --git ")):
+            diff = self.flush()
+            if line.startswith(COMMIT_MARKER):
+                self.commit += 1
+            else:
+                self.in_header = True
+            return diff
+        if self.in_header and line.startswith((b"--- a/", b"+++ ")):
+            self.header(line)
+        elif match := HUNK_HEADER.match(line):
+            self.in_header = False
+            self.hunks.append(_hunk(match))
+        return None
+
+    def header(self, line: bytes) -> None:
+        """Reads the old or new path from a file header line."""
+        if line.startswith(b"+++ ") and not line.startswith(b"+++ b/"):
+            # +++ /dev/null
+            self.removed = True
+        else:
+            self.file = _decode_path(line[6:])
+
+    def flush(self) -> typing.Optional[_FileDiff]:
+        """Returns the current file's diff, if any, and starts the next file."""
+        diff = None
+        if self.file is not None:
+            diff = _FileDiff(self.commit, self.file, self.hunks, self.removed)
+        self.file, self.hunks, self.removed = None, [], False
+        return diff
+
+
+def _hunk(match: typing.Match[bytes]) -> Hunk:
+    old_start, old_count, new_start, new_count = match.groups()
+    return (
+        int(old_start),
+        1 if old_count is None else int(old_count),
+        int(new_start),
+        1 if new_count is None else int(new_count),
+    )
+
+
+def _decode_path(path: bytes) -> str:
+    return path.rstrip(b"\n").decode(errors="surrogateescape")
+
+
+class LineMap:
+    """Maps lines from before to after the hunks of a commit.
+
+    Lines changed by the hunks are mapped to the start of the replacement lines. The
+    hunks are sorted, so each line is mapped by a binary search for the last hunk
+    starting before it, and the running total of the lines added and removed by the
+    hunks before that one.
+
+    Examples:
+        >>> # two lines inserted after line 3, and line 10 replaced by three lines
+        >>> line_map = LineMap([(3, 0, 4, 2), (10, 1, 12, 3)])
+        >>> [line_map[line] for line in (1, 3, 4, 9, 10, 11)]
+        [1, 3, 6, 11, 12, 15]
+    """
+
+    def __init__(self, hunks: typing.List[Hunk]):
+        self.hunks = hunks
+        # the first line each hunk moves: a pure insertion moves the lines after it
+        self.starts = [
+            old_start + 1 if old_count == 0 else old_start
+            for old_start, old_count, _new_start, _new_count in hunks
+        ]
+        # the shift of the lines after each number of hunks
+        self.shifts = list(
+            itertools.accumulate(
+                (new_count - old_count for _, old_count, _, new_count in hunks),
+                initial=0,
+            )
+        )
+
+    def __getitem__(self, line: int) -> int:
+        before = bisect.bisect_right(self.starts, line)
+        if before:
+            old_start, old_count, new_start, _new_count = self.hunks[before - 1]
+            if line < old_start + old_count:
+                return new_start
+        return line + self.shifts[before]
@@ -0,0 +1,83 @@
+"""A client measuring the throughput of the HTTP service in :py:mod:`.server`.
+
+Requests are sent from a pool of threads, and each request's latency is recorded, so
+both the throughput and the spread of latencies under load can be reported. This is
+used by ``scripts/load_test_http.py``, and is kept apart from the service, which never
+needs it.
+"""
+import concurrent.futures
+import functools
+import itertools
+import json
+import time
+import typing
+import urllib.error
+import urllib.request
+
+
+class LoadTestResult(typing.NamedTuple):
+    """The outcome of :py:func:`.load_test`, with latencies in seconds."""
+
+    requests: int
+    failures: int
+    seconds: float
+    latencies: typing.List[float]
+
+    @property
+    def throughput(self) -> float:
+        """Requests answered per second."""
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """The latency below which ``percent`` of the requests were answered."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def load_test(
+    url: str,
+    bodies: typing.Sequence[typing.Dict[str, typing.Any]],
+    requests: int = 100,
+    concurrency: int = 8,
+    timeout: float = 60.0,
+) -> LoadTestResult:
+    """POSTs ``requests`` requests to ``url``, ``concurrency`` at a time.
+
+    Bodies are sent in turn, so a few bodies sent repeatedly measure warm requests.
+
+    Args:
+        url: the ``/analyze`` URL of a running service
+        bodies: the JSON bodies to send
+        requests: the number of requests to send
+        concurrency: the number of requests in flight at once
+        timeout: seconds to wait for each response
+    """
+    encoded = [json.dumps(body).encode() for body in bodies]
+    send = functools.partial(_timed_post, url, timeout=timeout)
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        outcomes = list(
+            executor.map(send, itertools.islice(itertools.cycle(encoded), requests))
+        )
+    return LoadTestResult(
+        requests=requests,
+        failures=sum(not succeeded for succeeded, _latency in outcomes),
+        seconds=time.perf_counter() - start,
+        latencies=[latency for _succeeded, latency in outcomes],
+    )
+
+
+def _timed_post(url: str, data: bytes, timeout: float) -> typing.Tuple[bool, float]:
+    """POSTs JSON, returning whether it succeeded and how long it took."""
+    start = time.perf_counter()
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except (urllib.error.URLError, OSError):
+        return False, time.perf_counter() - start
+    return True, time.perf_counter() - start
@@ -1,17 +1,30 @@
 """CLI interface to ``sourcery-analytics``."""
+import contextlib
+import dataclasses
+import functools
+import itertools
 import pathlib
+import subprocess
 import typing
 
+import astroid
 import typer
 import rich
 
-from sourcery_analytics.analysis import assess
+from sourcery_analytics.analysis import (
+    MethodRecord,
+    analyze,
+    assess,
+    iter_method_metrics,
+)
+from sourcery_analytics.batch import aggregate_roots
 from sourcery_analytics.cli.choices import (
+    METHOD_METRIC_TYPE,
     MethodMetricChoice,
     AggregationChoice,
     OutputChoice,
 )
-from sourcery_analytics.cli.data import ThresholdBreach
+from sourcery_analytics.cli.data import PartialResult, ThresholdBreachDict
 from sourcery_analytics.cli.partials import (
     analyze_csv_output,
     analyze_plain_output,
@@ -19,23 +32,78 @@ from sourcery_analytics.cli.partials import (
     aggregate_csv_output,
     aggregate_plain_output,
     aggregate_rich_output,
+    assess_rich_output,
+    batch_csv_output,
+    batch_plain_output,
+    batch_rich_output,
+    duplicates_csv_output,
+    duplicates_plain_output,
+    duplicates_rich_output,
+    history_csv_output,
+    history_plain_output,
+    history_rich_output,
+    hotspots_csv_output,
+    hotspots_plain_output,
+    hotspots_rich_output,
+    read_files_from,
+    read_input_paths,
+    read_manifest,
+    read_partials,
     read_settings,
+    sampled_aggregate_csv_output,
+    sampled_aggregate_plain_output,
+    sampled_aggregate_rich_output,
 )
-from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.duplicates import find_duplicates
+from sourcery_analytics.explain import BreachExplainer
+from sourcery_analytics.extractors import Extractor, extract_methods
+from sourcery_analytics.history import aggregate_history
+from sourcery_analytics.hotspots import find_hotspots
 from sourcery_analytics.logging import set_up_logging
-from sourcery_analytics.metrics import method_qualname
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.progress import ExtractionProgress
+from sourcery_analytics.rollup import RollupIndex
+from sourcery_analytics.sampling import (
+    SampleOptions,
+    SampledAggregate,
+    aggregate_sample,
+)
+from sourcery_analytics.server import AnalysisServer, AnalysisService
+from sourcery_analytics.overrides import ThresholdOverrides
+from sourcery_analytics.settings import (
+    LimitSettings,
+    Settings,
+    ThresholdOverride,
+    ThresholdSettings,
+)
+from sourcery_analytics.sharding import Shard
 
 app = typer.Typer(rich_markup_mode="rich")
 
+# number of files read ahead of the parser with `--pipeline`
+PIPELINE_READ_AHEAD = 16
+
+PATH_ARGUMENT = typer.Argument(
+    None,
+    exists=True,
+    file_okay=True,
+    dir_okay=True,
+    show_default=False,
+    help="The file or directory to analyze, unless `--files-from` is given.",
+)
+FILES_FROM_OPTION = typer.Option(
+    None,
+    metavar="FILE",
+    help="Analyze the files listed in FILE, or on standard input if `-`, "
+    "separated by NULs or newlines.",
+)
+
 
 @app.command(name="analyze")
-def cli_analyze(
-    path: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=True,
-    ),
+def cli_analyze(  # pylint: disable=too-many-arguments
+    path: typing.Optional[pathlib.Path] = PATH_ARGUMENT,
+    files_from: typing.Optional[str] = FILES_FROM_OPTION,
     method_metric: typing.List[MethodMetricChoice] = typer.Option(
         [
             "length",
@@ -43,39 +111,406 @@ def cli_analyze(
             "cognitive_complexity",
             "working_memory",
         ],
+        click_type=METHOD_METRIC_TYPE,
+    ),
+    sort: typing.Optional[MethodMetricChoice] = typer.Option(
+        None, click_type=METHOD_METRIC_TYPE
     ),
-    sort: typing.Optional[MethodMetricChoice] = typer.Option(None),
     output: OutputChoice = typer.Option("rich"),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
+    ),
+    pipeline: bool = typer.Option(
+        False,
+        help="Read files ahead of parsing, and write output, in separate threads.",
+    ),
+    shard: typing.Optional[Shard] = typer.Option(
+        None,
+        parser=Shard.parse,
+        metavar="I/N",
+        help="Only analyze shard I of N, selecting files by a hash of their path.",
+    ),
+    write_partial: typing.Optional[pathlib.Path] = typer.Option(
+        None,
+        file_okay=True,
+        dir_okay=False,
+        help="Write a partial result to this file for `merge`, instead of displaying.",
+    ),
+    sort_memory: typing.Optional[int] = typer.Option(
+        None,
+        min=1,
+        metavar="MB",
+        help="Sort CSV output holding at most about MB megabytes of methods in "
+        "memory, spilling the rest to temporary files.",
+    ),
 ):
     """Produces a table of method metrics for all methods found in ``path``."""
     set_up_logging(output)
+    items = read_input_paths(path, files_from)
+    sort = _sort_metric(method_metric, sort, output, sort_memory)
+    records = _method_records(
+        items,
+        path,
+        method_metric,
+        limits=_settings(settings_file).limits,
+        pipeline=pipeline,
+        shard=shard,
+        show_progress=output is OutputChoice.RICH and not write_partial,
+    )
+    if write_partial:
+        PartialResult(
+            command="analyze",
+            shard=shard or Shard(1, 1),
+            options={
+                "method_metric": [m.value for m in method_metric],
+                "sort": sort.value,
+            },
+            rows=[record.as_dict() for record in records],
+        ).write(write_partial)
+    else:
+        _analyze_output(
+            method_metric,
+            records,
+            sort,
+            output,
+            pipeline=pipeline,
+            sort_memory=sort_memory * 1024 * 1024 if sort_memory else None,
+        )
+
+
+def _sort_metric(
+    method_metric: typing.List[MethodMetricChoice],
+    sort: typing.Optional[MethodMetricChoice],
+    output: OutputChoice,
+    sort_memory: typing.Optional[int],
+) -> MethodMetricChoice:
+    """The metric to sort by, the first by default, after checking the sort options."""
+    if sort_memory is not None and output is not OutputChoice.CSV:
+        raise typer.BadParameter("`--sort-memory` can only be used with CSV output")
     if sort is None:
-        sort = method_metric[0]
-    elif sort not in method_metric:
+        return method_metric[0]
+    if sort not in method_metric:
         raise typer.BadParameter("`--sort` must be one of the method metrics")
+    return sort
+
+
+def _method_records(
+    items: typing.Iterable[pathlib.Path],
+    path: typing.Optional[pathlib.Path],
+    method_metric: typing.List[MethodMetricChoice],
+    *,
+    limits: LimitSettings,
+    pipeline: bool,
+    shard: typing.Optional[Shard],
+    show_progress: bool,
+) -> typing.Iterator[MethodRecord]:
+    """The records of the methods, shown on a progress bar if ``show_progress``."""
+    progress = _extraction_progress(path, shard) if show_progress else None
+    records = iter_method_metrics(
+        items,
+        metrics=[metric.as_method_metric() for metric in method_metric],
+        limits=limits,
+        read_ahead=PIPELINE_READ_AHEAD if pipeline else 0,
+        shard=shard,
+        on_file=progress.file_done if progress else None,
+    )
+    return progress.track(records) if progress else records
+
+
+@app.command(name="aggregate")
+def cli_aggregate(  # pylint: disable=too-many-arguments,too-many-locals
+    path: typing.Optional[pathlib.Path] = PATH_ARGUMENT,
+    files_from: typing.Optional[str] = FILES_FROM_OPTION,
+    method_metric: typing.List[MethodMetricChoice] = typer.Option(
+        [
+            "length",
+            "cyclomatic_complexity",
+            "cognitive_complexity",
+            "working_memory",
+        ],
+        click_type=METHOD_METRIC_TYPE,
+    ),
+    aggregation: AggregationChoice = typer.Option("average"),
+    output: OutputChoice = typer.Option("rich"),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
+    ),
+    pipeline: bool = typer.Option(
+        False,
+        help="Read files ahead of parsing, and write output, in separate threads.",
+    ),
+    shard: typing.Optional[Shard] = typer.Option(
+        None,
+        parser=Shard.parse,
+        metavar="I/N",
+        help="Only analyze shard I of N, selecting files by a hash of their path.",
+    ),
+    write_partial: typing.Optional[pathlib.Path] = typer.Option(
+        None,
+        file_okay=True,
+        dir_okay=False,
+        help="Write a partial result to this file for `merge`, instead of displaying.",
+    ),
+    index: typing.Optional[pathlib.Path] = typer.Option(
+        None,
+        file_okay=True,
+        dir_okay=False,
+        help="Reuse and update the aggregates of unchanged files stored in this file.",
+    ),
+    changed: typing.Optional[str] = typer.Option(
+        None,
+        metavar="FILE",
+        help="With `--index`, only check the paths listed in FILE, or on standard "
+        "input if `-`, for changes, rather than every file.",
+    ),
+    sample: typing.Optional[float] = typer.Option(
+        None,
+        min=0.0,
+        max=1.0,
+        metavar="FRACTION",
+        help="Estimate the aggregates from this fraction of the files, sampled by "
+        "directory.",
+    ),
+    sample_files: typing.Optional[int] = typer.Option(
+        None,
+        min=1,
+        metavar="N",
+        help="Estimate the aggregates from about N files, sampled by directory.",
+    ),
+    seed: int = typer.Option(0, help="Seed of the random sample."),
+    confidence: float = typer.Option(
+        0.95, min=0.5, max=0.999, help="Confidence level of the estimates' intervals."
+    ),
+):
+    """Produces an aggregate of the metrics for all methods found in ``path``.
+
+    With ``--sample`` or ``--sample-files``, only a sample of the files is parsed, and
+    the aggregates are estimated, with confidence intervals.
+    """
+    set_up_logging(output)
+    command = _Aggregate(
+        read_input_paths(path, files_from),
+        path,
+        method_metric,
+        aggregation,
+        output,
+        _settings(settings_file).limits,
+        shard,
+    )
+    sample_options = _sample_options(
+        sample, sample_files, seed, confidence, bool(index or write_partial)
+    )
+    if sample_options:
+        command.sampled(sample_options)
+        return
+    _check_index_options(path, index, changed, bool(shard or write_partial))
+    if index:
+        command.indexed(index, changed)
+    else:
+        command.extracted(pipeline, write_partial)
+
+
+@dataclasses.dataclass
+class _Aggregate:
+    """The options shared by each way of running the ``aggregate`` command."""
+
+    items: typing.Iterable[pathlib.Path]
+    path: typing.Optional[pathlib.Path]
+    method_metric: typing.List[MethodMetricChoice]
+    aggregation: AggregationChoice
+    output: OutputChoice
+    limits: LimitSettings
+    shard: typing.Optional[Shard]
 
-    # use extract directly here rather than `analyze_methods` in case we want
-    # the progressbar
-    methods = extract_methods(path)
-    metrics = [
-        method_qualname,
-        *(metric.as_method_metric() for metric in method_metric),
-    ]
+    @property
+    def metrics(self) -> typing.List[MethodMetric]:
+        """The method metrics to aggregate."""
+        return [m.as_method_metric() for m in self.method_metric]
+
+    def sampled(self, options: SampleOptions) -> None:
+        """Estimates the aggregates from a sample of the files."""
+        options = dataclasses.replace(options, limits=self.limits, shard=self.shard)
+        progress = (
+            ExtractionProgress(None, description="Analyzing sampled files...")
+            if self.output is OutputChoice.RICH
+            else None
+        )
+        with progress or contextlib.nullcontext():
+            sampled = aggregate_sample(
+                self.items,
+                self.metrics,
+                self.aggregation.value,
+                options,
+                on_sample=progress.set_total if progress else None,
+                on_file=progress.file_done if progress else None,
+            )
+        _sampled_aggregate_output(self.aggregation, sampled, self.output)
+
+    def indexed(self, index: pathlib.Path, changed: typing.Optional[str]) -> None:
+        """Aggregates the path, reusing and updating the index of unchanged files."""
+        path = typing.cast(pathlib.Path, self.path)
+        rollup_index = RollupIndex.from_file(index)
+        progress = (
+            _index_progress(path, changed) if self.output is OutputChoice.RICH else None
+        )
+        with progress or contextlib.nullcontext():
+            state = rollup_index.aggregate(
+                path,
+                metrics=self.metrics,
+                limits=self.limits,
+                on_file=progress.file_done if progress else None,
+                changed=read_files_from(changed) if changed else None,
+            )
+        rollup_index.write(index)
+        self.output_result(getattr(state, self.aggregation.value))
+
+    def extracted(
+        self, pipeline: bool, write_partial: typing.Optional[pathlib.Path]
+    ) -> None:
+        """Aggregates every method, or writes their state to a partial result."""
+        # use extract directly here rather than `analyze_methods` in case we want
+        # the progressbar
+        progress = (
+            _extraction_progress(self.path, self.shard)
+            if self.output is OutputChoice.RICH and not write_partial
+            else None
+        )
+        methods = _extract_methods(
+            self.items,
+            limits=self.limits,
+            read_ahead=PIPELINE_READ_AHEAD if pipeline else 0,
+            shard=self.shard,
+            on_file=progress.file_done if progress else None,
+        )
+        if progress:
+            methods = progress.track(methods)
+        if write_partial:
+            self.write_partial(methods, write_partial)
+        else:
+            self.output_result(
+                analyze(
+                    methods,
+                    metrics=self.metrics,
+                    aggregation=self.aggregation.as_aggregation(),
+                )
+            )
+
+    def write_partial(
+        self,
+        methods: typing.Iterable[astroid.nodes.FunctionDef],
+        write_partial: pathlib.Path,
+    ) -> None:
+        """Writes the aggregation state of the methods for ``merge``."""
+        state = analyze(
+            methods, metrics=self.metrics, aggregation=AggregationState.from_results
+        )
+        PartialResult.from_aggregation_state(
+            state,
+            command="aggregate",
+            shard=self.shard or Shard(1, 1),
+            options={
+                "method_metric": [m.value for m in self.method_metric],
+                "aggregation": self.aggregation.value,
+            },
+        ).write(write_partial)
+
+    def output_result(self, result) -> None:
+        """Displays the aggregates."""
+        _aggregate_output(self.method_metric, self.aggregation, result, self.output)
+
+
+def _sample_options(
+    sample: typing.Optional[float],
+    sample_files: typing.Optional[int],
+    seed: int,
+    confidence: float,
+    incremental: bool,
+) -> typing.Optional[SampleOptions]:
+    """The options of the sample to aggregate, or None to aggregate every file."""
+    if sample is None and sample_files is None:
+        return None
+    if sample is not None and sample_files is not None:
+        raise typer.BadParameter("Give at most one of `--sample` or `--sample-files`.")
+    if sample == 0.0:
+        raise typer.BadParameter("`--sample` must be greater than 0.")
+    if incremental:
+        raise typer.BadParameter(
+            "Sampling cannot be combined with `--index` or `--write-partial`"
+        )
+    return SampleOptions(
+        fraction=sample, count=sample_files, seed=seed, confidence=confidence
+    )
+
+
+def _check_index_options(
+    path: typing.Optional[pathlib.Path],
+    index: typing.Optional[pathlib.Path],
+    changed: typing.Optional[str],
+    sharded: bool,
+) -> None:
+    if changed and not index:
+        raise typer.BadParameter("`--changed` can only be used with `--index`")
+    if index and (sharded or path is None):
+        raise typer.BadParameter(
+            "`--index` cannot be combined with `--shard`, `--write-partial` "
+            "or `--files-from`"
+        )
+
+
+@app.command(name="batch")
+def cli_batch(
+    manifest_file: pathlib.Path = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+    ),
+    method_metric: typing.List[MethodMetricChoice] = typer.Option(
+        [
+            "length",
+            "cyclomatic_complexity",
+            "cognitive_complexity",
+            "working_memory",
+        ],
+        click_type=METHOD_METRIC_TYPE,
+    ),
+    aggregation: AggregationChoice = typer.Option("average"),
+    output: OutputChoice = typer.Option("rich"),
+):
+    """Aggregates the metrics for each root listed in ``manifest_file``, and overall.
+
+    The manifest is a toml file with a ``[[roots]]`` table for each root, giving its
+    ``path`` and, optionally, a ``name`` and a ``settings_file``. All the roots are
+    analyzed in a single process.
+    """
+    set_up_logging(output)
+    console = rich.console.Console()
+    manifest = read_manifest(manifest_file, console)
+    roots = (
+        rich.progress.track(manifest.roots, description="Analyzing roots...")
+        if output is OutputChoice.RICH
+        else manifest.roots
+    )
+    results = aggregate_roots(
+        roots,
+        metrics=[m.as_method_metric() for m in method_metric],
+        load_settings=functools.partial(read_settings, console=console),
+    )
 
     if output is OutputChoice.RICH:
-        analyze_rich_output(method_metric, methods, metrics, sort)
+        batch_rich_output(aggregation, method_metric, results)
     elif output is OutputChoice.PLAIN:
-        analyze_plain_output(methods, metrics, sort)
+        batch_plain_output(aggregation, method_metric, results)
     elif output is OutputChoice.CSV:
-        analyze_csv_output(method_metric, methods, metrics, sort)
+        batch_csv_output(aggregation, method_metric, results)
 
 
-@app.command(name="aggregate")
-def cli_aggregate(
+@app.command(name="history")
+def cli_history(  # pylint: disable=too-many-arguments
     path: pathlib.Path = typer.Argument(
-        ...,
+        ".",
         exists=True,
-        file_okay=True,
+        file_okay=False,
         dir_okay=True,
     ),
     method_metric: typing.List[MethodMetricChoice] = typer.Option(
@@ -85,36 +520,157 @@ def cli_aggregate(
             "cognitive_complexity",
             "working_memory",
         ],
+        click_type=METHOD_METRIC_TYPE,
     ),
     aggregation: AggregationChoice = typer.Option("average"),
+    commits: int = typer.Option(10, min=1, help="Number of commits to analyze."),
+    every: int = typer.Option(1, min=1, help="Analyze every Kth commit."),
+    revision: str = typer.Option("HEAD", help="The most recent commit to analyze."),
     output: OutputChoice = typer.Option("rich"),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
+    ),
 ):
-    """Produces an aggregate of the metrics for all methods found in ``path``."""
+    """Aggregates the metrics in ``path`` at each of a series of past commits.
+
+    Files are read from the git repository containing ``path``, oldest commit first,
+    without checking out any commits.
+    """
     set_up_logging(output)
-    # use extract directly here rather than `analyze_methods` in case we want
-    # the progressbar
-    methods = extract_methods(path)
-    metrics = [m.as_method_metric() for m in method_metric]
-    aggregation_method = aggregation.as_aggregation()
+    console = rich.console.Console()
+    settings = read_settings(settings_file, console) if settings_file else Settings()
+    with _git_errors(console):
+        history = aggregate_history(
+            path,
+            metrics=[m.as_method_metric() for m in method_metric],
+            count=commits,
+            every=every,
+            revision=revision,
+            limits=settings.limits,
+        )
+    _history_output(method_metric, aggregation, history, output)
 
-    if output is OutputChoice.RICH:
-        aggregate_rich_output(aggregation, aggregation_method, methods, metrics)
 
-    elif output is OutputChoice.PLAIN:
-        aggregate_plain_output(aggregation_method, methods, metrics)
+@app.command(name="hotspots")
+def cli_hotspots(  # pylint: disable=too-many-arguments
+    path: pathlib.Path = typer.Argument(
+        ".",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+    ),
+    method_metric: MethodMetricChoice = typer.Option(
+        "cognitive_complexity",
+        click_type=METHOD_METRIC_TYPE,
+        help="The metric to multiply by churn.",
+    ),
+    since: typing.Optional[str] = typer.Option(
+        "1 year ago", help="Only count commits since this date."
+    ),
+    commits: typing.Optional[int] = typer.Option(
+        None, min=1, help="Only count this many of the most recent commits."
+    ),
+    min_churn: int = typer.Option(
+        2, min=1, help="Only analyze files changed by at least this many commits."
+    ),
+    limit: int = typer.Option(20, min=1, help="Number of methods to show."),
+    output: OutputChoice = typer.Option("rich"),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
+    ),
+):
+    """Ranks the methods in ``path`` by their churn multiplied by a metric.
+
+    A method's churn is the number of recent commits changing any of its lines,
+    read from a single pass over the git log.
+    """
+    set_up_logging(output)
+    console = rich.console.Console()
+    settings = read_settings(settings_file, console) if settings_file else Settings()
+    with _git_errors(console):
+        hotspots = find_hotspots(
+            path,
+            metric=method_metric.as_method_metric(),
+            since=since,
+            max_commits=commits,
+            min_churn=min_churn,
+            limits=settings.limits,
+        )[:limit]
+    _hotspots_output(method_metric, hotspots, output)
+
 
+def _hotspots_output(method_metric, hotspots, output: OutputChoice) -> None:
+    if output is OutputChoice.RICH:
+        hotspots_rich_output(method_metric, hotspots)
+    elif output is OutputChoice.PLAIN:
+        hotspots_plain_output(method_metric, hotspots)
     elif output is OutputChoice.CSV:
-        aggregate_csv_output(aggregation_method, method_metric, methods, metrics)
+        hotspots_csv_output(method_metric, hotspots)
 
 
-@app.command(name="assess")
-def cli_assess(
-    path: pathlib.Path = typer.Argument(
-        ...,
+@app.command(name="serve-http")
+def cli_serve_http(  # pylint: disable=too-many-arguments
+    host: str = typer.Option("127.0.0.1", help="The interface to listen on."),
+    port: int = typer.Option(8765, min=0, max=65535),
+    root: pathlib.Path = typer.Option(
+        ".",
         exists=True,
-        file_okay=True,
+        file_okay=False,
         dir_okay=True,
+        help="Only analyze paths beneath this directory.",
+    ),
+    method_metric: typing.List[MethodMetricChoice] = typer.Option(
+        [
+            "length",
+            "cyclomatic_complexity",
+            "cognitive_complexity",
+            "working_memory",
+        ],
+        click_type=METHOD_METRIC_TYPE,
+    ),
+    jobs: int = typer.Option(1, min=1, help="Number of worker processes."),
+    batch_window: float = typer.Option(
+        5.0,
+        min=0.0,
+        help="Milliseconds to wait for concurrent requests to batch their files.",
+    ),
+    cache_size: int = typer.Option(
+        4096, min=1, help="Number of sources and files whose results are kept."
+    ),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
     ),
+    verbose: bool = typer.Option(False, help="Log each request."),
+):
+    """Serves method metrics over HTTP, keeping workers and results warm.
+
+    POST a JSON object with ``sources``, mapping names to source code, and ``paths``
+    beneath ``--root``, to ``/analyze``. Counts are served at ``/stats``.
+    """
+    console = rich.console.Console()
+    settings = read_settings(settings_file, console) if settings_file else Settings()
+    service = AnalysisService(
+        [metric.value for metric in method_metric],
+        root=root,
+        limits=settings.limits,
+        jobs=jobs,
+        cache_size=cache_size,
+        batch_window=batch_window / 1000,
+    )
+    with service, AnalysisServer((host, port), service, verbose=verbose) as server:
+        console.print(
+            f"Serving on http://{server.server_address[0]}:{server.server_address[1]}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+@app.command(name="assess")
+def cli_assess(  # pylint: disable=too-many-arguments
+    path: typing.Optional[pathlib.Path] = PATH_ARGUMENT,
+    files_from: typing.Optional[str] = FILES_FROM_OPTION,
     method_metric: typing.List[MethodMetricChoice] = typer.Option(
         [
             "length",
@@ -122,10 +678,28 @@ def cli_assess(
             "cognitive_complexity",
             "working_memory",
         ],
+        click_type=METHOD_METRIC_TYPE,
     ),
     settings_file: pathlib.Path = typer.Option(
         "pyproject.toml", file_okay=True, dir_okay=False
     ),
+    shard: typing.Optional[Shard] = typer.Option(
+        None,
+        parser=Shard.parse,
+        metavar="I/N",
+        help="Only analyze shard I of N, selecting files by a hash of their path.",
+    ),
+    write_partial: typing.Optional[pathlib.Path] = typer.Option(
+        None,
+        file_okay=True,
+        dir_okay=False,
+        help="Write a partial result to this file for `merge`, instead of displaying.",
+    ),
+    explain: bool = typer.Option(
+        False,
+        help="Show the contribution of each line of the methods breaching the "
+        "cognitive complexity or working memory thresholds.",
+    ),
 ):
     """Using configurable values, will pass or fail according to calculated metrics.
 
@@ -133,35 +707,286 @@ def cli_assess(
     Exits with code 2 for runtime errors, such as mis-configured settings.
     """
     set_up_logging(OutputChoice.RICH)
-    console = rich.console.Console()
-    metrics = [metric.as_method_metric() for metric in method_metric]
+    if explain and write_partial:
+        raise typer.BadParameter(
+            "`--explain` cannot be combined with `--write-partial`"
+        )
+    items = read_input_paths(path, files_from)
+    settings = read_settings(settings_file, rich.console.Console())
+    methods = _assessed_methods(items, path, settings, shard)
+    if write_partial:
+        _write_assess_partial(write_partial, methods, method_metric, settings, shard)
+    elif explain:
+        # the breaching methods are visited again, in detail, only when explaining
+        explainer = BreachExplainer()
+        assess_rich_output(
+            _breaches(explainer.track(methods), method_metric, settings),
+            settings.thresholds,
+            settings.overrides,
+            explain=explainer.explain,
+        )
+    else:
+        assess_rich_output(
+            _breaches(methods, method_metric, settings),
+            settings.thresholds,
+            settings.overrides,
+        )
+
+
+def _assessed_methods(
+    items: typing.Iterable[pathlib.Path],
+    path: typing.Optional[pathlib.Path],
+    settings: Settings,
+    shard: typing.Optional[Shard],
+) -> typing.Iterator[astroid.nodes.FunctionDef]:
+    """The methods to assess, passing over excluded files, shown on a progress bar."""
+    # excluded files are passed over before they are read
+    exclude = (
+        ThresholdOverrides(settings.thresholds, settings.overrides).excludes
+        if settings.overrides
+        else None
+    )
+    progress = _extraction_progress(path, shard, exclude=exclude)
+    return progress.track(
+        _extract_methods(
+            items,
+            limits=settings.limits,
+            shard=shard,
+            on_file=progress.file_done,
+            exclude=exclude,
+        )
+    )
+
 
-    settings = read_settings(settings_file, console)
-    methods = rich.progress.track(extract_methods(path))
+def _write_assess_partial(
+    write_partial: pathlib.Path,
+    methods: typing.Iterable[astroid.nodes.FunctionDef],
+    method_metric: typing.List[MethodMetricChoice],
+    settings: Settings,
+    shard: typing.Optional[Shard],
+) -> None:
+    PartialResult(
+        command="assess",
+        shard=shard or Shard(1, 1),
+        options={
+            "method_metric": [m.value for m in method_metric],
+            "thresholds": settings.thresholds.dict(),
+            "overrides": [override.dict() for override in settings.overrides],
+        },
+        rows=list(_breaches(methods, method_metric, settings)),
+    ).write(write_partial)
 
-    threshold_breach_results = assess(
-        methods, metrics=metrics, threshold_settings=settings.thresholds
+
+def _breaches(
+    methods: typing.Iterable[astroid.nodes.FunctionDef],
+    method_metric: typing.List[MethodMetricChoice],
+    settings: Settings,
+) -> typing.Iterator[ThresholdBreachDict]:
+    return assess(
+        methods,
+        metrics=[metric.as_method_metric() for metric in method_metric],
+        threshold_settings=settings.thresholds,
+        overrides=settings.overrides,
     )
 
-    count = 0
-    for count, threshold_breach_result in enumerate(threshold_breach_results, 1):
-        threshold_breach = ThresholdBreach.from_dict(
-            threshold_breach_result, threshold_settings=settings.thresholds
+
+@app.command(name="merge")
+def cli_merge(
+    partial_files: typing.List[pathlib.Path] = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+    ),
+    output: OutputChoice = typer.Option("rich"),
+):
+    """Merges the partial results written by each shard of a command.
+
+    The merged output is the same as the output of the command over all the files.
+    Every shard must be given exactly once.
+    """
+    set_up_logging(output)
+    merged = read_partials(partial_files, rich.console.Console())
+    if merged.command == "analyze":
+        _analyze_output(
+            [MethodMetricChoice(m) for m in merged.options["method_metric"]],
+            [MethodRecord.from_dict(row) for row in merged.rows],
+            MethodMetricChoice(merged.options["sort"]),
+            output,
         )
-        console.print(
-            f"{threshold_breach.relative_path}:{threshold_breach.lineno}: "
-            f"[bold red]error:[/] "
-            f"{threshold_breach.metric_name} of "
-            f"[bold]{threshold_breach.method_name}[/] "
-            f"is {threshold_breach.metric_value} "
-            f"exceeding threshold of {threshold_breach.threshold_value}"
+    elif merged.command == "aggregate":
+        _merged_aggregate_output(merged, output)
+    elif merged.command == "assess":
+        _merged_assess_output(merged)
+
+
+def _merged_aggregate_output(merged: PartialResult, output: OutputChoice) -> None:
+    aggregation = AggregationChoice(merged.options["aggregation"])
+    result = getattr(merged.aggregation_state(), aggregation.value)
+    method_metric = [MethodMetricChoice(m) for m in merged.options["method_metric"]]
+    _aggregate_output(method_metric, aggregation, result, output)
+
+
+def _merged_assess_output(merged: PartialResult) -> None:
+    assess_rich_output(
+        [typing.cast(ThresholdBreachDict, row) for row in merged.rows],
+        ThresholdSettings(**merged.options["thresholds"]),
+        [
+            ThresholdOverride(**override)
+            for override in merged.options.get("overrides", [])
+        ],
+    )
+
+
+def _settings(settings_file: typing.Optional[pathlib.Path]) -> Settings:
+    """The settings read from ``settings_file``, or the defaults without one."""
+    if settings_file is None:
+        return Settings()
+    return read_settings(settings_file, rich.console.Console())
+
+
+def _index_progress(
+    path: pathlib.Path, changed: typing.Optional[str]
+) -> ExtractionProgress:
+    if changed:
+        # only the changed paths are visited, so the files can't be counted up front
+        return ExtractionProgress(None, description="Analyzing changed files...")
+    return _extraction_progress(path)
+
+
+def _extract_methods(items: typing.Iterable[pathlib.Path], **kwargs):
+    """Extracts the methods from each of ``items`` in turn."""
+    return itertools.chain.from_iterable(
+        extract_methods(item, **kwargs) for item in items
+    )
+
+
+def _extraction_progress(
+    path: typing.Optional[pathlib.Path],
+    shard: typing.Optional[Shard] = None,
+    description: str = "Analyzing files...",
+    exclude: typing.Optional[typing.Callable[[pathlib.Path], bool]] = None,
+) -> ExtractionProgress:
+    """Progress of analyzing ``path``, with its files counted ahead of time.
+
+    Without a path, such as for files listed by `--files-from`, the total is unknown.
+    """
+    extractor: Extractor[astroid.nodes.NodeNG] = Extractor(shard=shard, exclude=exclude)
+    total_files = extractor.count_files(path) if path else None
+    return ExtractionProgress(total_files, description=description)
+
+
+def _analyze_output(
+    method_metric,
+    analysis,
+    sort,
+    output: OutputChoice,
+    *,
+    pipeline: bool = False,
+    sort_memory: typing.Optional[int] = None,
+) -> None:
+    if output is OutputChoice.RICH:
+        analyze_rich_output(method_metric, analysis, sort)
+    elif output is OutputChoice.PLAIN:
+        analyze_plain_output(analysis, sort)
+    elif output is OutputChoice.CSV:
+        analyze_csv_output(
+            method_metric,
+            analysis,
+            sort,
+            background_writer=pipeline,
+            sort_memory=sort_memory,
         )
 
-    if count:
-        console.print(f"[bold red]Found {count} errors.")
-        raise typer.Exit(1)
 
-    console.print("[bold green]Assessment Complete", "[green]No issues found.")
+def _sampled_aggregate_output(
+    aggregation, result: SampledAggregate, output: OutputChoice
+) -> None:
+    if output is OutputChoice.RICH:
+        sampled_aggregate_rich_output(aggregation, result)
+    elif output is OutputChoice.PLAIN:
+        sampled_aggregate_plain_output(result)
+    elif output is OutputChoice.CSV:
+        sampled_aggregate_csv_output(result)
+
+
+def _aggregate_output(method_metric, aggregation, result, output: OutputChoice) -> None:
+    if output is OutputChoice.RICH:
+        aggregate_rich_output(aggregation, result)
+    elif output is OutputChoice.PLAIN:
+        aggregate_plain_output(result)
+    elif output is OutputChoice.CSV:
+        aggregate_csv_output(method_metric, result)
+
+
+def _history_output(method_metric, aggregation, history, output: OutputChoice) -> None:
+    if output is OutputChoice.RICH:
+        history_rich_output(aggregation, method_metric, history)
+    elif output is OutputChoice.PLAIN:
+        history_plain_output(aggregation, method_metric, history)
+    elif output is OutputChoice.CSV:
+        history_csv_output(aggregation, method_metric, history)
+
+
+@contextlib.contextmanager
+def _git_errors(console: rich.console.Console):
+    """Exits with code 2, printing git's error, if a git command fails."""
+    try:
+        yield
+    except subprocess.CalledProcessError as exc:
+        console.print(f"[bold red]Error:[/] {(exc.stderr or str(exc)).strip()}")
+        raise typer.Exit(2) from exc
+
+
+@app.command(name="duplicates")
+def cli_duplicates(
+    path: pathlib.Path = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=True,
+        dir_okay=True,
+    ),
+    threshold: float = typer.Option(
+        0.8,
+        min=0.0,
+        max=1.0,
+        help="Minimum similarity to group methods; 1.0 finds only exact duplicates.",
+    ),
+    min_length: int = typer.Option(
+        3, min=1, help="Ignore methods with fewer statements than this."
+    ),
+    output: OutputChoice = typer.Option("rich"),
+    settings_file: typing.Optional[pathlib.Path] = typer.Option(
+        None, exists=True, file_okay=True, dir_okay=False
+    ),
+):
+    """Finds groups of structurally identical or similar methods in ``path``.
+
+    Names and constant values are ignored when comparing methods.
+    """
+    set_up_logging(output)
+    console = rich.console.Console()
+    settings = read_settings(settings_file, console) if settings_file else Settings()
+    progress = (
+        _extraction_progress(path, description="Fingerprinting methods...")
+        if output is OutputChoice.RICH
+        else None
+    )
+    methods = extract_methods(
+        path,
+        limits=settings.limits,
+        on_file=progress.file_done if progress else None,
+    )
+    if progress:
+        methods = progress.track(methods)
+    groups = find_duplicates(methods, threshold=threshold, min_length=min_length)
+
+    if output is OutputChoice.RICH:
+        duplicates_rich_output(groups)
+    elif output is OutputChoice.PLAIN:
+        duplicates_plain_output(groups)
+    elif output is OutputChoice.CSV:
+        duplicates_csv_output(groups)
 
 
 @app.callback()
@@ -18,6 +18,11 @@ from sourcery_analytics.metrics.cyclomatic_complexity import (
     method_cyclomatic_complexity,
     cyclomatic_complexity,
 )
+from sourcery_analytics.metrics.halstead import (
+    method_halstead_volume,
+    method_halstead_difficulty,
+    method_maintainability_index,
+)
 from sourcery_analytics.metrics.method_length import method_length, statement_count
 from sourcery_analytics.metrics.utils import (
     method_qualname,
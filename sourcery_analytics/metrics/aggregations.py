@@ -1,9 +1,14 @@
 """Functions to combine the results from multiple nodes into a single result."""
+import dataclasses
 import functools
 import itertools
 import operator
 import typing
 
+from sourcery_analytics.metrics.compounders import (
+    NamedMetricResult,
+    TupleMetricResult,
+)
 from sourcery_analytics.metrics.types import MetricResult
 
 S_co = typing.TypeVar("S_co", covariant=True)
@@ -39,3 +44,92 @@ def peak(results: typing.Iterable[MetricResult]) -> MetricResult:
     # deconstruct each "row", get the max across each "column", and reconstruct
     # from the type of the first result
     return type(first)((max(r) for r in zip(*(first, *remainder))))  # type: ignore
+
+
+@dataclasses.dataclass
+class AggregationState:
+    """Running state of the built-in aggregations, which can be merged with others.
+
+    Merging the states of two collections of results gives the state of both
+    collections together, so results can be aggregated in parts and combined later.
+    The :py:meth:`from_results` constructor can be used as an aggregation.
+
+    Examples:
+        >>> left = AggregationState.from_results([1, 2])
+        >>> right = AggregationState.from_results([6])
+        >>> merged = left.merge(right)
+        >>> merged.count, merged.total, merged.average, merged.peak
+        (3, 9, 3.0, 6)
+        >>> AggregationState().average is None
+        True
+    """
+
+    count: int = 0
+    total: typing.Optional[MetricResult] = None
+    peak: typing.Optional[MetricResult] = None
+
+    @classmethod
+    def from_results(cls, results: typing.Iterable[MetricResult]) -> "AggregationState":
+        """Returns the state after adding each of the results."""
+        state = cls()
+        for result in results:
+            state.add(result)
+        return state
+
+    @classmethod
+    def from_dict(cls, data: typing.Mapping[str, typing.Any]) -> "AggregationState":
+        """Returns the state from its :py:func:`dataclasses.asdict` form, such as JSON.
+
+        Compound results are restored from dictionaries and lists.
+
+        Examples:
+            >>> import dataclasses
+            >>> state = AggregationState.from_results([NamedMetricResult({"x": 1})])
+            >>> AggregationState.from_dict(dataclasses.asdict(state)) == state
+            True
+        """
+        return cls(
+            count=data.get("count", 0),
+            total=_compound(data.get("total")),
+            peak=_compound(data.get("peak")),
+        )
+
+    @property
+    def average(self) -> typing.Optional[MetricResult]:
+        """The arithmetic average of the results, or None if there are none."""
+        if not self.count:
+            return None
+        return self.total / self.count  # type: ignore
+
+    def add(self, result: MetricResult) -> None:
+        """Updates the state with a single result."""
+        self.count += 1
+        self.total = result if self.total is None else self.total + result
+        self.peak = result if self.peak is None else _peak_of(self.peak, result)
+
+    def merge(self, other: "AggregationState") -> "AggregationState":
+        """Returns the state of the results of both ``self`` and ``other``."""
+        # the peak is None exactly when there are no results
+        if other.peak is None:
+            return dataclasses.replace(self)
+        if self.peak is None:
+            return dataclasses.replace(other)
+        return AggregationState(
+            count=self.count + other.count,
+            total=self.total + other.total,  # type: ignore
+            peak=_peak_of(self.peak, other.peak),
+        )
+
+
+def _peak_of(left: MetricResult, right: MetricResult) -> MetricResult:
+    if isinstance(left, (int, float)):
+        return max(left, right)  # type: ignore
+    return peak((left, right))
+
+
+def _compound(value: typing.Any) -> typing.Any:
+    if isinstance(value, dict):
+        return NamedMetricResult(value)
+    if isinstance(value, list):
+        return TupleMetricResult(value)
+    return value
@@ -11,6 +11,15 @@ from sourcery_analytics.conditions import is_elif
 from sourcery_analytics.utils import nodedispatch, validate_node_type
 from sourcery_analytics.visitors import TreeVisitor, Visitor
 
+# the control flow structures which increase the nesting of the nodes within them
+NESTING_NODE_TYPES = (
+    astroid.nodes.If,
+    astroid.nodes.IfExp,
+    astroid.nodes.For,
+    astroid.nodes.While,
+    astroid.nodes.ExceptHandler,
+)
+
 
 @nodedispatch
 @validate_node_type(astroid.nodes.FunctionDef)
@@ -59,16 +68,7 @@ class CognitiveComplexityVisitor(Visitor[int]):
     def enter(self, node: astroid.nodes.NodeNG):
         if is_elif(node):
             yield  # the nesting has already been incremented
-        elif isinstance(
-            node,
-            (
-                astroid.nodes.If,
-                astroid.nodes.IfExp,
-                astroid.nodes.For,
-                astroid.nodes.While,
-                astroid.nodes.ExceptHandler,
-            ),
-        ):
+        elif isinstance(node, NESTING_NODE_TYPES):
             self.nesting += 1
             yield
             self.nesting -= 1
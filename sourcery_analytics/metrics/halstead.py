@@ -0,0 +1,202 @@
+"""Halstead metrics and the maintainability index.
+
+Halstead metrics treat code as a sequence of operators (keywords and punctuation) and
+operands (names and literals). The volume estimates the size of the implementation in
+bits, while the difficulty grows with the number of distinct operators and with operand
+re-use.
+
+Counting operators and operands does not need a syntax tree, so these metrics are
+calculated from the :py:mod:`tokenize` stream of the method's module. Each module is
+tokenized once, then sliced by line number for each of its methods.
+"""
+import bisect
+import dataclasses
+import keyword
+import math
+import tokenize
+import typing
+import weakref
+
+import astroid
+
+from sourcery_analytics.metrics.cyclomatic_complexity import (
+    method_cyclomatic_complexity,
+)
+from sourcery_analytics.utils import nodedispatch, validate_node_type
+
+OPERAND_TOKEN_TYPES = frozenset((tokenize.NAME, tokenize.NUMBER, tokenize.STRING))
+CLOSING_BRACKETS = frozenset((")", "]", "}"))
+LITERAL_KEYWORDS = frozenset(("True", "False", "None"))
+
+ModuleTokens = typing.Tuple[typing.List[int], typing.List[tokenize.TokenInfo]]
+
+# the tokens of each module, kept only as long as the module itself
+_MODULE_TOKENS: "weakref.WeakKeyDictionary[astroid.nodes.Module, ModuleTokens]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@nodedispatch
+@validate_node_type(astroid.nodes.FunctionDef)
+def method_halstead_volume(method: astroid.nodes.FunctionDef) -> float:
+    """Calculates the Halstead volume of the method.
+
+    Args:
+        method: a node for a function definition
+
+    Examples:
+        >>> method_halstead_volume("def add(x, y): return x + y")
+        34.87
+    """
+    return round(halstead_counts(method).volume, 2)
+
+
+@nodedispatch
+@validate_node_type(astroid.nodes.FunctionDef)
+def method_halstead_difficulty(method: astroid.nodes.FunctionDef) -> float:
+    """Calculates the Halstead difficulty of the method.
+
+    Args:
+        method: a node for a function definition
+
+    Examples:
+        >>> method_halstead_difficulty("def add(x, y): return x + y")
+        5.0
+    """
+    return round(halstead_counts(method).difficulty, 2)
+
+
+@nodedispatch
+@validate_node_type(astroid.nodes.FunctionDef)
+def method_maintainability_index(method: astroid.nodes.FunctionDef) -> float:
+    """Calculates the maintainability index of the method, between 0 and 100.
+
+    The index combines the Halstead volume, the cyclomatic complexity, and the number of
+    lines of code, and is scaled so that higher values are more maintainable. Note that
+    :py:func:`.method_cyclomatic_complexity` counts decision points only, so one is
+    added to match the conventional definition.
+
+    Args:
+        method: a node for a function definition
+
+    Examples:
+        >>> method_maintainability_index("def add(x, y): return x + y")
+        89.07
+    """
+    counts = halstead_counts(method)
+    cyclomatic_complexity = method_cyclomatic_complexity(method) + 1
+    index = (
+        171
+        - 5.2 * math.log(max(counts.volume, 1))
+        - 0.23 * cyclomatic_complexity
+        - 16.2 * math.log(max(counts.lines, 1))
+    )
+    return round(max(0.0, index * 100 / 171), 2)
+
+
+@dataclasses.dataclass(frozen=True)
+class HalsteadCounts:
+    """Counts of operators and operands from which Halstead metrics are derived."""
+
+    distinct_operators: int = 0
+    distinct_operands: int = 0
+    total_operators: int = 0
+    total_operands: int = 0
+    lines: int = 0
+
+    @property
+    def vocabulary(self) -> int:
+        """The number of distinct operators and operands."""
+        return self.distinct_operators + self.distinct_operands
+
+    @property
+    def length(self) -> int:
+        """The total number of operators and operands."""
+        return self.total_operators + self.total_operands
+
+    @property
+    def volume(self) -> float:
+        """The program length weighted by the bits needed to encode the vocabulary."""
+        if not self.vocabulary:
+            return 0.0
+        return self.length * math.log2(self.vocabulary)
+
+    @property
+    def difficulty(self) -> float:
+        """The difficulty in writing or understanding the program."""
+        if not self.distinct_operands:
+            return 0.0
+        return (
+            self.distinct_operators / 2 * self.total_operands / self.distinct_operands
+        )
+
+
+def halstead_counts(method: astroid.nodes.FunctionDef) -> HalsteadCounts:
+    """Counts the operators and operands in the lines spanned by the method.
+
+    Keywords and punctuation count as operators, while names and literals, including
+    ``True``, ``False`` and ``None``, count as operands. Closing brackets are not
+    counted separately from their opening brackets.
+
+    Examples:
+        >>> halstead_counts(astroid.extract_node("def add(x, y): return x + y"))
+        HalsteadCounts(distinct_operators=6, distinct_operands=3, total_operators=6, ...
+    """
+    operators: typing.Counter[str] = typing.Counter()
+    operands: typing.Counter[str] = typing.Counter()
+    lines = set()
+    for token in method_tokens(method):
+        if _is_operand(token):
+            operands[token.string] += 1
+        elif token.type in (tokenize.NAME, tokenize.OP):
+            if token.string not in CLOSING_BRACKETS:
+                operators[token.string] += 1
+        else:
+            continue
+        lines.add(token.start[0])
+    return HalsteadCounts(
+        distinct_operators=len(operators),
+        distinct_operands=len(operands),
+        total_operators=sum(operators.values()),
+        total_operands=sum(operands.values()),
+        lines=len(lines),
+    )
+
+
+def _is_operand(token: tokenize.TokenInfo) -> bool:
+    if token.type not in OPERAND_TOKEN_TYPES:
+        return False
+    return token.string in LITERAL_KEYWORDS or not keyword.iskeyword(token.string)
+
+
+def method_tokens(method: astroid.nodes.FunctionDef) -> typing.List[tokenize.TokenInfo]:
+    """Returns the tokens starting within the lines spanned by the method."""
+    rows, tokens = module_tokens(method.root())
+    start = bisect.bisect_left(rows, method.fromlineno)
+    stop = bisect.bisect_right(rows, method.tolineno)
+    return tokens[start:stop]
+
+
+def module_tokens(module: astroid.nodes.Module) -> ModuleTokens:
+    """Tokenizes a module once, returning each token's start row alongside the tokens.
+
+    The result is cached for as long as the module exists, so the methods of a module
+    share a single token stream, without the cache keeping the module alive. Modules
+    without available source, or which fail to tokenize, have no tokens.
+    """
+    tokens = _MODULE_TOKENS.get(module)
+    if tokens is None:
+        tokens = _MODULE_TOKENS[module] = _tokenize(module)
+    return tokens
+
+
+def _tokenize(module: astroid.nodes.Module) -> ModuleTokens:
+    stream = module.stream()
+    if stream is None:
+        return [], []
+    with stream:
+        try:
+            tokens = list(tokenize.tokenize(stream.readline))
+        except (tokenize.TokenError, SyntaxError):
+            return [], []
+    return [token.start[0] for token in tokens], tokens
@@ -0,0 +1,284 @@
+"""Registry of the method metrics available to the CLI, including plugin metrics.
+
+Other packages can provide metrics by registering them under the
+``sourcery_analytics.metrics`` entry point group. The entry point's name is used as the
+metric's choice in the CLI, and the entry point should refer to either a method metric
+function or, preferably, a :py:class:`.VisitorMetric`.
+
+A :py:class:`.VisitorMetric` declares a visitor together with the node types it handles,
+so that :py:func:`.fuse_metrics` can compute any number of these metrics in a single
+walk of each method, rather than one walk per metric.
+"""
+import contextlib
+import functools
+import importlib.metadata
+import typing
+import warnings
+
+import astroid
+
+from sourcery_analytics.metrics.cognitive_complexity import (
+    NESTING_NODE_TYPES,
+    CognitiveComplexityVisitor,
+)
+from sourcery_analytics.metrics.cyclomatic_complexity import cyclomatic_complexity
+from sourcery_analytics.metrics.halstead import (
+    method_halstead_difficulty,
+    method_halstead_volume,
+    method_maintainability_index,
+)
+from sourcery_analytics.metrics.method_length import statement_count
+from sourcery_analytics.metrics.types import Metric, MethodMetric, MetricResult
+from sourcery_analytics.metrics.working_memory import WorkingMemoryVisitor
+from sourcery_analytics.visitors import FunctionVisitor, TreeVisitor, Visitor
+
+ENTRY_POINT_GROUP = "sourcery_analytics.metrics"
+
+NodeTypes = typing.Tuple[typing.Type[astroid.nodes.NodeNG], ...]
+
+
+class VisitorMetric:
+    """A metric calculated by collecting the results of a visitor over a whole tree.
+
+    Attributes:
+        name: the name of the metric, used to label its results
+        visitor_factory: creates a new visitor for each tree walk. Metrics are only
+            picklable, and so usable with several jobs, if this and the collector are
+            module-level functions or classes.
+        collector: combines the visitor's results, and must accept an empty list
+        node_types: the visitor is only entered and touched for nodes of these types
+
+    Examples:
+        >>> from sourcery_analytics.conditions import is_type
+        >>> method_return_count = VisitorMetric(
+        ...     "method_return_count",
+        ...     lambda: FunctionVisitor(is_type(astroid.nodes.Return)),
+        ...     node_types=(astroid.nodes.Return,),
+        ... )
+        >>> method_return_count(
+        ...     astroid.extract_node('''
+        ...         def sign(x):
+        ...             if x < 0:
+        ...                 return -1
+        ...             return 1
+        ...     ''')
+        ... )
+        2
+    """
+
+    def __init__(
+        self,
+        name: str,
+        visitor_factory: typing.Callable[[], Visitor],
+        collector: typing.Callable[[typing.List], MetricResult] = sum,
+        node_types: NodeTypes = (astroid.nodes.NodeNG,),
+    ):
+        self.name = self.__name__ = name
+        self.visitor_factory = visitor_factory
+        self.collector = collector
+        self.node_types = node_types
+
+    def __call__(self, node: astroid.nodes.NodeNG) -> MetricResult:
+        (result,) = _fused_walk((self,), node)
+        return result
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r})"
+
+
+def fuse_metrics(metrics: typing.Iterable[Metric]) -> typing.List[Metric]:
+    """Replaces visitor metrics with equivalents sharing a single tree walk per node.
+
+    Other metrics are returned unchanged and in the same position, so the result can be
+    passed to a compounder in place of the original metrics.
+
+    Examples:
+        >>> registry = method_metric_registry()
+        >>> metrics = fuse_metrics([registry["length"], registry["working_memory"]])
+        >>> method = astroid.extract_node("def add(a, b): return a + b")
+        >>> [metric(method) for metric in metrics]
+        [1, 2]
+    """
+    metrics = list(metrics)
+    visitor_metrics = tuple(m for m in metrics if isinstance(m, VisitorMetric))
+    if len(visitor_metrics) < 2:
+        return metrics
+    fused_walk = _FusedWalk(visitor_metrics)
+    return [
+        fused_walk.metric(visitor_metrics.index(m))
+        if isinstance(m, VisitorMetric)
+        else m
+        for m in metrics
+    ]
+
+
+class _FusedWalk:
+    """Walks each node once for several visitor metrics, remembering the last result."""
+
+    def __init__(self, metrics: typing.Tuple[VisitorMetric, ...]):
+        self.metrics = metrics
+        self._last: typing.Tuple[typing.Any, typing.Tuple] = (None, ())
+
+    def results(self, node: astroid.nodes.NodeNG) -> typing.Tuple:
+        """Returns the results of every metric for the node, walking it at most once."""
+        # read and write the pair in one go, so the cache is safe to share between
+        # threads
+        last_node, results = self._last
+        if last_node is not node:
+            results = _fused_walk(self.metrics, node)
+            self._last = (node, results)
+        return results
+
+    def metric(self, index: int) -> Metric:
+        """Returns a metric giving the result of the metric at the index."""
+
+        def fused_metric(node: astroid.nodes.NodeNG) -> MetricResult:
+            return self.results(node)[index]
+
+        fused_metric.__name__ = self.metrics[index].__name__
+        return fused_metric
+
+
+class _FusedVisitor(Visitor[typing.List[typing.Tuple[int, typing.Any]]]):
+    """Dispatches each node only to the visitors handling its type.
+
+    The visitors handling each node class are computed once per class. Visitors which
+    do not override :py:meth:`.Visitor.enter` are never entered.
+    """
+
+    def __init__(self, visitors: typing.Sequence[Visitor], node_types: typing.Sequence):
+        self.visitors = visitors
+        self.node_types = node_types
+        self._handlers: typing.Dict[type, typing.Tuple[typing.List, typing.List]] = {}
+
+    def _handlers_for(self, node_class: type):
+        if node_class not in self._handlers:
+            indices = [
+                index
+                for index, types in enumerate(self.node_types)
+                if issubclass(node_class, types)
+            ]
+            entering = [
+                self.visitors[index]
+                for index in indices
+                if type(self.visitors[index]).enter is not Visitor.enter
+            ]
+            self._handlers[node_class] = (indices, entering)
+        return self._handlers[node_class]
+
+    @contextlib.contextmanager
+    def enter(self, node: astroid.nodes.NodeNG):
+        _indices, entering = self._handlers_for(type(node))
+        with contextlib.ExitStack() as stack:
+            for visitor in entering:
+                stack.enter_context(visitor.enter(node))
+            yield
+
+    def touch(
+        self, node: astroid.nodes.NodeNG
+    ) -> typing.List[typing.Tuple[int, typing.Any]]:
+        indices, _entering = self._handlers_for(type(node))
+        return [(index, self.visitors[index].touch(node)) for index in indices]
+
+
+def _fused_walk(
+    metrics: typing.Sequence[VisitorMetric], node: astroid.nodes.NodeNG
+) -> typing.Tuple:
+    def collect(rows: typing.Iterator[typing.List[typing.Tuple[int, typing.Any]]]):
+        columns: typing.List[typing.List] = [[] for _ in metrics]
+        for row in rows:
+            for index, value in row:
+                columns[index].append(value)
+        return tuple(
+            metric.collector(column) for metric, column in zip(metrics, columns)
+        )
+
+    visitor = _FusedVisitor(
+        [metric.visitor_factory() for metric in metrics],
+        [metric.node_types for metric in metrics],
+    )
+    return TreeVisitor(visitor, collect).visit(node)
+
+
+# the node types handled by each of the built-in visitor metrics
+_CYCLOMATIC_NODE_TYPES = tuple(
+    node_type for node_type in cyclomatic_complexity.registry if node_type is not object
+)
+_WORKING_MEMORY_NODE_TYPES = (
+    astroid.nodes.If,
+    astroid.nodes.AssignName,
+    astroid.nodes.Statement,
+)
+
+
+# visitor factories and collectors are module-level functions, rather than lambdas, so
+# that metrics can be pickled and sent to worker processes
+def _cyclomatic_complexity_visitor() -> Visitor[int]:
+    return FunctionVisitor(cyclomatic_complexity)
+
+
+def _statement_count_visitor() -> Visitor[int]:
+    return FunctionVisitor(statement_count)
+
+
+def _peak(results: typing.List[int]) -> MetricResult:
+    return max(results, default=0)
+
+
+def builtin_method_metrics() -> typing.Dict[str, MethodMetric]:
+    """Returns the metrics provided by ``sourcery-analytics``, keyed by choice name."""
+    return {
+        "cognitive_complexity": VisitorMetric(
+            "method_cognitive_complexity",
+            CognitiveComplexityVisitor,
+            node_types=NESTING_NODE_TYPES,
+        ),
+        "cyclomatic_complexity": VisitorMetric(
+            "method_cyclomatic_complexity",
+            _cyclomatic_complexity_visitor,
+            node_types=_CYCLOMATIC_NODE_TYPES,
+        ),
+        "length": VisitorMetric(
+            "method_length",
+            _statement_count_visitor,
+            node_types=(astroid.nodes.Statement,),
+        ),
+        "working_memory": VisitorMetric(
+            "method_working_memory",
+            WorkingMemoryVisitor,
+            collector=_peak,
+            node_types=_WORKING_MEMORY_NODE_TYPES,
+        ),
+        "halstead_volume": method_halstead_volume,
+        "halstead_difficulty": method_halstead_difficulty,
+        "maintainability_index": method_maintainability_index,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def method_metric_registry() -> typing.Dict[str, MethodMetric]:
+    """Returns the built-in metrics followed by metrics registered as entry points.
+
+    Plugins which fail to load are skipped with a warning. Plugins cannot replace a
+    built-in metric.
+    """
+    registry = builtin_method_metrics()
+    for entry_point in _entry_points():
+        if entry_point.name in registry:
+            warnings.warn(
+                f"Skipping metric plugin {entry_point.name}: name already registered."
+            )
+            continue
+        try:
+            registry[entry_point.name] = entry_point.load()
+        except Exception as exc:  # pylint: disable=broad-except
+            warnings.warn(f"Unable to load metric plugin {entry_point.name}: {exc}")
+    return registry
+
+
+def _entry_points() -> typing.Iterable[importlib.metadata.EntryPoint]:
+    entry_points = importlib.metadata.entry_points()
+    # `select` was added in python 3.10
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    return entry_points.get(ENTRY_POINT_GROUP, [])
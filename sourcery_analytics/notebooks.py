@@ -0,0 +1,354 @@
+"""Read the code cells of Jupyter notebooks, without loading their outputs.
+
+Notebooks are JSON documents, whose cells hold their outputs and attachments alongside
+their source. Embedded images can make a notebook hundreds of megabytes, of which the
+code is a tiny part, so rather than loading the whole document, it is scanned a chunk at
+a time. Only the type and source of each cell, and the notebook's language, are decoded;
+everything else is passed over by matching brackets and quotes, without decoding it.
+
+Only the current notebook format, version 4, is supported.
+"""
+import json
+import pathlib
+import re
+import typing
+
+NOTEBOOK_SUFFIX = ".ipynb"
+
+# the bytes read from a notebook at a time
+READ_CHUNK = 64 * 1024
+
+_WHITESPACE = b" \t\r\n"
+# the bytes which may change the nesting of a container being skipped
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+# the bytes which end a number, or a literal such as true or null
+_SCALAR_END = re.compile(rb"[\s,}\]]")
+# lines which are IPython magics or shell commands, rather than Python
+_MAGIC = re.compile(r"^([ \t]*)[%!].*$", re.MULTILINE)
+
+
+class NotebookError(ValueError):
+    """Raised when a notebook is not valid JSON, or not a notebook at all."""
+
+
+class CodeCell(typing.NamedTuple):
+    """The source of a code cell, and its position among all the notebook's cells."""
+
+    number: int
+    source: str
+
+
+class Notebook(typing.NamedTuple):
+    """The code cells of a notebook, and the language they are written in, if known."""
+
+    cells: typing.List[CodeCell]
+    language: typing.Optional[str]
+
+    @property
+    def is_python(self) -> bool:
+        """True unless the notebook declares a language other than Python."""
+        return self.language is None or self.language.lower() == "python"
+
+
+def is_notebook(path: pathlib.Path) -> bool:
+    """True if the path names a Jupyter notebook.
+
+    Examples:
+        >>> is_notebook(pathlib.Path("analysis/model.ipynb"))
+        True
+        >>> is_notebook(pathlib.Path("analysis/model.py"))
+        False
+    """
+    return path.suffix == NOTEBOOK_SUFFIX
+
+
+def cell_path(notebook: pathlib.Path, number: int) -> pathlib.Path:
+    """The path reported for the methods of a cell: the notebook's, then the cell's.
+
+    Examples:
+        >>> cell_path(pathlib.Path("analysis/model.ipynb"), 3).as_posix()
+        'analysis/model.ipynb/cell_3'
+    """
+    return notebook / f"cell_{number}"
+
+
+def read_notebook(file: typing.BinaryIO, chunk_size: int = READ_CHUNK) -> Notebook:
+    """Reads the code cells of a notebook from a binary file, a chunk at a time.
+
+    Cells are numbered from 1, counting every cell, so that markdown cells don't change
+    the numbers of the code cells after them.
+
+    Raises:
+        NotebookError: if the file is not a JSON object, or its cells are malformed
+
+    Examples:
+        >>> import io
+        >>> document = {
+        ...     "cells": [
+        ...         {"cell_type": "markdown", "source": "# Title"},
+        ...         {
+        ...             "cell_type": "code",
+        ...             "outputs": [{"data": {"image/png": "iVBORw0KGgo="}}],
+        ...             "source": ["def f(x):\\n", "    return x\\n"],
+        ...         },
+        ...     ],
+        ...     "metadata": {"kernelspec": {"language": "python"}},
+        ... }
+        >>> notebook = read_notebook(io.BytesIO(json.dumps(document).encode()))
+        >>> notebook.cells
+        [CodeCell(number=2, source='def f(x):\\n    return x\\n')]
+        >>> notebook.language
+        'python'
+    """
+    scanner = _Scanner(file, chunk_size)
+    cells: typing.List[CodeCell] = []
+    language = None
+    scanner.expect(b"{")
+    for key in scanner.members():
+        if key == "cells":
+            cells = list(_code_cells(scanner))
+        elif key == "metadata":
+            language = _language(scanner)
+        else:
+            scanner.skip()
+    return Notebook(cells, language)
+
+
+def clean_cell_source(source: str) -> str:
+    """Replaces the IPython magics and shell commands in a cell with ``pass``.
+
+    Each line is kept, with its indentation, so line numbers and blocks are unchanged.
+    Cell magics, such as ``%%bash``, make the whole cell something other than Python,
+    so the whole cell is replaced.
+
+    Examples:
+        >>> print(clean_cell_source("%matplotlib inline\\nfor x in y:\\n    !echo $x"))
+        pass
+        for x in y:
+            pass
+        >>> clean_cell_source("%%bash\\nls -l")
+        ''
+    """
+    if source.lstrip().startswith("%%"):
+        return ""
+    return _MAGIC.sub(r"\1pass", source)
+
+
+def _code_cells(scanner: "_Scanner") -> typing.Iterator[CodeCell]:
+    scanner.expect(b"[")
+    for number in scanner.items(start=1):
+        if cell := _code_cell(scanner, number):
+            yield cell
+
+
+def _code_cell(scanner: "_Scanner", number: int) -> typing.Optional[CodeCell]:
+    """Reads a cell, returning it if it is a code cell."""
+    cell_type = None
+    source: typing.Union[str, typing.List[str]] = ""
+    scanner.expect(b"{")
+    for key in scanner.members():
+        if key == "cell_type":
+            cell_type = scanner.load()
+        elif key == "source":
+            source = scanner.load()
+        else:
+            # outputs and attachments, however big, are never decoded
+            scanner.skip()
+    if cell_type != "code":
+        return None
+    return CodeCell(number, source if isinstance(source, str) else "".join(source))
+
+
+# the metadata fields which may name the notebook's language, in order of preference
+_LANGUAGE_FIELDS = {"language_info": "name", "kernelspec": "language"}
+
+
+def _language(scanner: "_Scanner") -> typing.Optional[str]:
+    languages = {}
+    scanner.expect(b"{")
+    for key in scanner.members():
+        if key not in _LANGUAGE_FIELDS:
+            scanner.skip()
+            continue
+        value = scanner.load()
+        if isinstance(value, dict) and value.get(_LANGUAGE_FIELDS[key]):
+            languages[key] = value[_LANGUAGE_FIELDS[key]]
+    return next((languages[key] for key in _LANGUAGE_FIELDS if key in languages), None)
+
+
+class _Scanner:
+    """Scans JSON values from a binary file, holding only a chunk of it at a time.
+
+    Values can be decoded with :py:meth:`load`, or passed over with :py:meth:`skip`.
+    While skipping, bytes before the current position are discarded as more are read,
+    so skipping a value takes constant memory however big it is.
+    """
+
+    def __init__(self, file: typing.BinaryIO, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = b""
+        self.position = 0
+        # the start of a value being loaded, which must be kept until it is decoded
+        self.mark: typing.Optional[int] = None
+        # the offset in the file of the start of the buffer, for error messages
+        self.offset = 0
+
+    def expect(self, token: bytes) -> None:
+        """Consumes the next byte, which must be the single byte ``token``."""
+        if self.peek() != token[0]:
+            raise self.error(f"expected {token.decode()!r}")
+        self.position += 1
+
+    def members(self) -> typing.Iterator[str]:
+        """Yields the keys of an object whose opening brace has been consumed.
+
+        The caller must consume each key's value before the next key is read.
+        """
+        if self.peek() == ord("}"):
+            self.position += 1
+            return
+        while True:
+            key = self.load()
+            if not isinstance(key, str):
+                raise self.error("expected a string key")
+            self.expect(b":")
+            yield key
+            if self.peek() == ord(","):
+                self.position += 1
+            else:
+                self.expect(b"}")
+                return
+
+    def items(self, start: int = 0) -> typing.Iterator[int]:
+        """Yields the index of each item of an array whose bracket has been consumed.
+
+        The caller must consume each item before the next index is yielded.
+        """
+        if self.peek() == ord("]"):
+            self.position += 1
+            return
+        index = start
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ord(","):
+                self.position += 1
+            else:
+                self.expect(b"]")
+                return
+
+    def load(self) -> typing.Any:
+        """Decodes the next value."""
+        self.peek()
+        self.mark = self.position
+        try:
+            self.skip()
+            raw = self.buffer[self.mark : self.position]
+        finally:
+            self.mark = None
+        try:
+            return json.loads(raw)
+        except ValueError as error:
+            raise self.error(str(error)) from error
+
+    def skip(self) -> None:
+        """Passes over the next value without decoding it."""
+        first = self.peek()
+        if first == ord('"'):
+            self._skip_string()
+        elif first in b"{[":
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def peek(self) -> int:
+        """Skips whitespace, then returns the next byte without consuming it."""
+        while True:
+            while self.position < len(self.buffer):
+                byte = self.buffer[self.position]
+                if byte not in _WHITESPACE:
+                    return byte
+                self.position += 1
+            if not self._fill():
+                raise self.error("unexpected end of file")
+
+    def error(self, message: str) -> NotebookError:
+        """An error at the current position, for the caller to raise."""
+        return NotebookError(
+            f"invalid notebook at byte {self.offset + self.position}: {message}"
+        )
+
+    def _skip_string(self) -> None:
+        # the position is at the opening quote
+        search_from = self.position + 1
+        while True:
+            quote = self.buffer.find(b'"', search_from)
+            if quote == -1:
+                # keep any trailing backslashes, which may escape the next chunk's quote
+                search_from = len(self.buffer) - _backslashes_before(
+                    self.buffer, len(self.buffer)
+                )
+                self.position = search_from
+                if not self._fill():
+                    raise self.error("unterminated string")
+                search_from = self.position
+                continue
+            if _backslashes_before(self.buffer, quote) % 2:
+                search_from = quote + 1
+                continue
+            self.position = quote + 1
+            return
+
+    def _skip_container(self) -> None:
+        # the position is at the opening bracket or brace
+        depth = 0
+        while True:
+            byte = self._next_structure()
+            if byte == ord('"'):
+                self._skip_string()
+                continue
+            self.position += 1
+            depth += 1 if byte in b"{[" else -1
+            if depth == 0:
+                return
+
+    def _next_structure(self) -> int:
+        """Moves to the next byte which may change the nesting, and returns it."""
+        while (match := _STRUCTURE.search(self.buffer, self.position)) is None:
+            self.position = len(self.buffer)
+            if not self._fill():
+                raise self.error("unterminated array or object")
+        self.position = match.start()
+        return self.buffer[self.position]
+
+    def _skip_scalar(self) -> None:
+        while True:
+            match = _SCALAR_END.search(self.buffer, self.position)
+            if match is not None:
+                self.position = match.start()
+                return
+            self.position = len(self.buffer)
+            if not self._fill():
+                # a scalar may end the document, but never ends a notebook
+                return
+
+    def _fill(self) -> bool:
+        """Reads another chunk, discarding the bytes no longer needed."""
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        keep = self.position if self.mark is None else self.mark
+        self.offset += keep
+        self.buffer = self.buffer[keep:] + chunk
+        self.position -= keep
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+
+def _backslashes_before(buffer: bytes, index: int) -> int:
+    count = 0
+    while index > count and buffer[index - count - 1] == ord("\\"):
+        count += 1
+    return count
@@ -0,0 +1,262 @@
+"""Resolve the thresholds of each file from per-path overrides, compiled once.
+
+Overrides map glob patterns to thresholds, so that for instance legacy code can be held
+to looser thresholds than the rest of a repository, or generated code excluded. With
+many patterns, checking each pattern against each file would be slow, so the patterns
+are compiled into a trie of path segments. Matching a path walks the trie one segment
+at a time, so takes time proportional to the depth of the path rather than the number
+of patterns.
+
+Patterns are matched against paths relative to the current directory, segment by
+segment, in the manner of ``.gitignore`` files:
+
+- ``*`` and ``?`` match within a single segment, and ``**`` matches any number of
+  segments, including none
+- patterns without a ``/`` match a file or directory name at any depth
+- patterns matching a directory also match everything beneath it
+"""
+import dataclasses
+import fnmatch
+import pathlib
+import re
+import typing
+
+from sourcery_analytics.settings import ThresholdOverride, ThresholdSettings
+
+V = typing.TypeVar("V")
+
+
+@dataclasses.dataclass
+class _Node(typing.Generic[V]):
+    """A state of the trie, reached by matching a prefix of some patterns."""
+
+    literals: typing.Dict[str, "_Node[V]"] = dataclasses.field(default_factory=dict)
+    # the children reached by wildcard segments, by their translated regexes
+    wildcards: typing.Dict[str, "_Node[V]"] = dataclasses.field(default_factory=dict)
+    # the node reached by a `**` segment, which loops on itself
+    globstar: typing.Optional["_Node[V]"] = None
+    # the patterns ending here, by their position, so matches keep the patterns' order
+    values: typing.List[typing.Tuple[int, V]] = dataclasses.field(default_factory=list)
+    # every wildcard in one regex, compiled when first matched
+    regex: typing.Optional[re.Pattern] = dataclasses.field(default=None, init=False)
+
+    def wildcard(self, segment: str) -> "_Node[V]":
+        """The child reached by a wildcard segment, added if it is new."""
+        self.regex = None
+        return self.wildcards.setdefault(fnmatch.translate(segment), _Node())
+
+    def wildcard_matches(self, segment: str) -> typing.Iterator["_Node[V]"]:
+        """The children of every wildcard matching the segment, found in one match.
+
+        Each wildcard is an optional lookahead with its own named group, so the groups
+        taking part in the match are exactly the wildcards matching the segment.
+        """
+        if not self.wildcards:
+            return
+        if self.regex is None:
+            self.regex = re.compile(
+                "".join(
+                    f"(?:(?=(?P<wildcard_{index}>{regex})))?"
+                    for index, regex in enumerate(self.wildcards)
+                )
+            )
+        match = typing.cast(re.Match, self.regex.match(segment))
+        for index, child in enumerate(self.wildcards.values()):
+            if match.group(f"wildcard_{index}") is not None:
+                yield child
+
+
+class PathMatcher(typing.Generic[V]):
+    """Finds the values of every glob pattern matching a path.
+
+    Args:
+        patterns: pairs of a glob pattern and its value
+
+    Examples:
+        >>> matcher = PathMatcher(
+        ...     [("legacy", "old"), ("*_pb2.py", "pb2"), ("src/**/test_*", "test")]
+        ... )
+        >>> matcher.match("legacy/module.py")
+        ['old']
+        >>> matcher.match("legacy/api/service_pb2.py")
+        ['old', 'pb2']
+        >>> matcher.match("src/a/b/test_c.py")
+        ['test']
+        >>> matcher.match("src/legacy.py")
+        []
+    """
+
+    def __init__(self, patterns: typing.Iterable[typing.Tuple[str, V]]):
+        self._root: _Node[V] = _Node()
+        for index, (pattern, value) in enumerate(patterns):
+            self._add(pattern, index, value)
+
+    def match(self, path: typing.Union[str, pathlib.PurePath]) -> typing.List[V]:
+        """The values of the patterns matching the path or one of its directories.
+
+        The values are in the order their patterns were given.
+        """
+        segments = _segments(path)
+        states = self._closure([self._root])
+        matched: typing.Dict[int, V] = {}
+        for segment in segments:
+            states = self._closure(
+                [
+                    next_state
+                    for state in states
+                    for next_state in self._step(state, segment)
+                ]
+            )
+            if not states:
+                break
+            for state in states:
+                matched.update(state.values)
+        return [matched[index] for index in sorted(matched)]
+
+    def _add(self, pattern: str, index: int, value: V) -> None:
+        segments = _segments(pattern)
+        if len(segments) == 1 and "/" not in pattern.strip("/"):
+            segments = ["**", *segments]
+        node = self._root
+        for segment in segments:
+            node = _child(node, segment)
+        node.values.append((index, value))
+
+    @staticmethod
+    def _step(state: _Node[V], segment: str) -> typing.Iterator[_Node[V]]:
+        if (literal := state.literals.get(segment)) is not None:
+            yield literal
+        yield from state.wildcard_matches(segment)
+        if state.globstar is state:
+            yield state
+
+    @staticmethod
+    def _closure(states: typing.Iterable[_Node[V]]) -> typing.List[_Node[V]]:
+        """The states, with the `**` states they reach without consuming a segment."""
+        closed: typing.Dict[int, _Node[V]] = {}
+        pending = list(states)
+        while pending:
+            state = pending.pop()
+            if id(state) in closed:
+                continue
+            closed[id(state)] = state
+            if state.globstar is not None:
+                pending.append(state.globstar)
+        return list(closed.values())
+
+
+class ThresholdOverrides:
+    """The thresholds of each file, from default thresholds and per-path overrides.
+
+    Where several overrides match a file, later overrides take precedence.
+
+    Args:
+        thresholds: the thresholds of files matching no overrides
+        overrides: the overrides, in order of increasing precedence
+        root: the directory patterns are relative to, by default the current directory
+
+    Examples:
+        >>> overrides = ThresholdOverrides(
+        ...     ThresholdSettings(),
+        ...     [
+        ...         ThresholdOverride(paths=["old"], thresholds={"method_length": 40}),
+        ...         ThresholdOverride(paths=["**/generated/**"], exclude=True),
+        ...     ],
+        ... )
+        >>> overrides.thresholds_for("old/module.py").method_length
+        40
+        >>> overrides.thresholds_for("core/module.py").method_length
+        15
+        >>> overrides.excludes("old/generated/models.py")
+        True
+    """
+
+    def __init__(
+        self,
+        thresholds: ThresholdSettings,
+        overrides: typing.Sequence[ThresholdOverride] = (),
+        root: typing.Optional[pathlib.Path] = None,
+    ):
+        self.thresholds = thresholds
+        self.overrides = list(overrides)
+        self.root = (root or pathlib.Path.cwd()).absolute()
+        self._matcher = PathMatcher(
+            (pattern, index)
+            for index, override in enumerate(self.overrides)
+            for pattern in override.paths
+        )
+        # files matching the same overrides share their thresholds
+        self._resolved: typing.Dict[
+            typing.Tuple[int, ...], typing.Optional[ThresholdSettings]
+        ] = {}
+
+    def thresholds_for(
+        self, file: typing.Union[str, pathlib.Path]
+    ) -> typing.Optional[ThresholdSettings]:
+        """The thresholds of the file, or None if it is excluded."""
+        # an override with several matching patterns applies once
+        indices = tuple(dict.fromkeys(self._matcher.match(self._relative(file))))
+        if indices not in self._resolved:
+            self._resolved[indices] = self._resolve(indices)
+        return self._resolved[indices]
+
+    def excludes(self, file: typing.Union[str, pathlib.Path]) -> bool:
+        """Whether the file is excluded from assessment, so need not be parsed."""
+        return self.thresholds_for(file) is None
+
+    def _resolve(
+        self, indices: typing.Tuple[int, ...]
+    ) -> typing.Optional[ThresholdSettings]:
+        values = self.thresholds.dict()
+        for index in indices:
+            override = self.overrides[index]
+            if override.exclude:
+                return None
+            values.update(override.thresholds)
+        return ThresholdSettings(**values)
+
+    def _relative(self, file: typing.Union[str, pathlib.Path]) -> pathlib.PurePath:
+        return relative_path(file, self.root)
+
+
+def relative_path(
+    file: typing.Union[str, pathlib.Path], root: pathlib.Path
+) -> pathlib.PurePath:
+    """The path to match against patterns: relative to the root, if beneath it.
+
+    Relative paths are assumed to be relative to the root already.
+
+    Examples:
+        >>> relative_path("/repo/src/module.py", pathlib.Path("/repo")).as_posix()
+        'src/module.py'
+        >>> relative_path("/elsewhere/module.py", pathlib.Path("/repo")).as_posix()
+        '/elsewhere/module.py'
+    """
+    path = pathlib.Path(file)
+    if not path.is_absolute():
+        return path
+    try:
+        return path.relative_to(root)
+    except ValueError:
+        return path
+
+
+def _segments(path: typing.Union[str, pathlib.PurePath]) -> typing.List[str]:
+    parts = pathlib.PurePath(path).as_posix().split("/")
+    return [part for part in parts if part not in ("", ".")]
+
+
+def _child(node: _Node[V], segment: str) -> _Node[V]:
+    """The node reached from ``node`` by a pattern segment, added if it is new."""
+    if segment == "**":
+        if node.globstar is None:
+            node.globstar = _Node()
+            node.globstar.globstar = node.globstar
+        return node.globstar
+    if _is_glob(segment):
+        return node.wildcard(segment)
+    return node.literals.setdefault(segment, _Node())
+
+
+def _is_glob(segment: str) -> bool:
+    return any(character in segment for character in "*?[")
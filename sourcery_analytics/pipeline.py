@@ -0,0 +1,108 @@
+"""Run stages of an analysis concurrently, connected by bounded buffers.
+
+Reading files and writing output spend much of their time waiting on I/O, so they can
+run in threads alongside parsing and measuring. Each stage only runs a bounded number
+of items ahead of the next, which caps memory use and applies backpressure to the
+faster stage.
+"""
+import collections
+import concurrent.futures
+import queue
+import threading
+import typing
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+_DONE = object()
+
+
+def prefetch(
+    function: typing.Callable[[T], R],
+    items: typing.Iterable[T],
+    /,
+    buffer: int = 16,
+    workers: int = 4,
+) -> typing.Iterator[R]:
+    """Maps ``function`` over ``items`` in a thread pool, running ahead of the consumer.
+
+    Results are yielded in the order of ``items``. At most ``buffer`` results are
+    computed ahead of the consumer, and ``items`` is consumed lazily.
+
+    Examples:
+        >>> list(prefetch(str.upper, iter("abc"), buffer=2))
+        ['A', 'B', 'C']
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from _run_ahead(executor, function, items, max(buffer, 1))
+
+
+def _run_ahead(
+    executor: concurrent.futures.Executor,
+    function: typing.Callable[[T], R],
+    items: typing.Iterable[T],
+    buffer: int,
+) -> typing.Iterator[R]:
+    pending: typing.Deque[concurrent.futures.Future] = collections.deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= buffer:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def write_in_background(
+    chunks: typing.Iterable[str],
+    /,
+    write: typing.Callable[[str], typing.Any],
+    buffer: int = 64,
+) -> None:
+    """Writes ``chunks`` from a separate thread while they are still being produced.
+
+    Producing blocks when ``buffer`` chunks are waiting to be written. Errors raised
+    while writing are re-raised in the calling thread.
+
+    Examples:
+        >>> written = []
+        >>> write_in_background((f"{n}," for n in range(3)), write=written.append)
+        >>> "".join(written)
+        '0,1,2,'
+    """
+    chunk_queue: queue.Queue = queue.Queue(maxsize=max(buffer, 1))
+    errors: typing.List[BaseException] = []
+    writer = threading.Thread(
+        target=_write_queued,
+        args=(chunk_queue, write, errors),
+        name="sourcery-analytics-writer",
+    )
+    writer.start()
+    try:
+        for chunk in chunks:
+            if errors:
+                break
+            chunk_queue.put(chunk)
+    finally:
+        chunk_queue.put(_DONE)
+        writer.join()
+    if errors:
+        raise errors[0]
+
+
+def _write_queued(
+    chunk_queue: queue.Queue,
+    write: typing.Callable[[str], typing.Any],
+    errors: typing.List[BaseException],
+) -> None:
+    """Writes chunks from the queue until it is done, recording the first error."""
+    while (chunk := chunk_queue.get()) is not _DONE:
+        if errors:
+            continue  # drain, so that the producer is never blocked
+        try:
+            write(chunk)
+        except BaseException as exc:  # pylint: disable=broad-except
+            errors.append(exc)
@@ -0,0 +1,162 @@
+"""Report the progress of an analysis, per file, against a total counted up front.
+
+The total is counted by :py:meth:`.Extractor.count_files`, which only lists files, so
+the progress bar can show how far through the files an analysis is and estimate the
+time remaining. Alongside, the rates of files and methods analyzed per second, and the
+proportion of files whose results were reused from a cache, show whether a long run is
+still making progress.
+
+On an interactive terminal the progress is displayed live. Otherwise, for instance when
+the output is redirected to a log file, a line describing the progress is printed at
+regular intervals instead.
+"""
+import pathlib
+import threading
+import time
+import typing
+
+import rich.console
+import rich.progress
+import rich.text
+
+T = typing.TypeVar("T")
+
+# seconds between progress lines when the console is not interactive
+REPORT_INTERVAL = 60.0
+
+
+class ThroughputColumn(rich.progress.ProgressColumn):
+    """Renders the files and methods per second, and the cache hit rate, of a task."""
+
+    def render(self, task: rich.progress.Task) -> rich.text.Text:
+        elapsed = task.elapsed or 0.0
+        parts = []
+        if elapsed:
+            parts.append(f"{task.completed / elapsed:.1f} files/s")
+            if methods := task.fields.get("methods"):
+                parts.append(f"{methods / elapsed:.1f} methods/s")
+        if task.completed and (cache_hits := task.fields.get("cache_hits")):
+            parts.append(f"{cache_hits / task.completed:.0%} cached")
+        return rich.text.Text(", ".join(parts), style="progress.data.speed")
+
+
+class ExtractionProgress:
+    """Displays the progress of extracting from, and analyzing, a number of files.
+
+    Pass :py:meth:`.file_done` as the ``on_file`` callback of an extraction, and wrap
+    the extracted methods with :py:meth:`.track` to count them. The display runs
+    while the tracked methods are consumed, or while the instance is used as a context
+    manager. Updates are thread-safe, so files may be reported from worker threads.
+
+    If the console is not interactive, a line describing the progress is printed every
+    ``report_interval`` seconds instead of the live display.
+
+    Args:
+        total_files: the number of files to be analyzed, or None if unknown
+        description: shown beside the progress bar
+        console: the console to display on, by default the standard output
+        report_interval: seconds between progress lines on non-interactive consoles
+
+    Examples:
+        >>> progress = ExtractionProgress(2, console=rich.console.Console(quiet=True))
+        >>> with progress:
+        ...     progress.file_done(pathlib.Path("one.py"))
+        ...     progress.file_done(pathlib.Path("two.py"), cached=True)
+        >>> progress.files, progress.cache_hits
+        (2, 1)
+        >>> list(progress.track(["method"]))
+        ['method']
+        >>> progress.methods
+        1
+    """
+
+    def __init__(
+        self,
+        total_files: typing.Optional[int],
+        description: str = "Analyzing files...",
+        console: typing.Optional[rich.console.Console] = None,
+        report_interval: float = REPORT_INTERVAL,
+    ):
+        self.files = 0
+        self.methods = 0
+        self.cache_hits = 0
+        self._reports = _Schedule(report_interval)
+        self._lock = threading.Lock()
+        self._progress = rich.progress.Progress(
+            rich.progress.TextColumn("[progress.description]{task.description}"),
+            rich.progress.BarColumn(),
+            rich.progress.MofNCompleteColumn(),
+            rich.progress.TimeElapsedColumn(),
+            rich.progress.TimeRemainingColumn(),
+            ThroughputColumn(),
+            console=console or rich.get_console(),
+        )
+        self._task = self._progress.add_task(
+            description, total=total_files, methods=0, cache_hits=0
+        )
+
+    @property
+    def console(self) -> rich.console.Console:
+        """The console the progress is displayed on."""
+        return self._progress.console
+
+    def file_done(self, _file: pathlib.Path, cached: bool = False) -> None:
+        """Records that a file has been analyzed, or its results reused if cached."""
+        with self._lock:
+            self.files += 1
+            self.cache_hits += cached
+            self._progress.update(
+                self._task, completed=self.files, cache_hits=self.cache_hits
+            )
+            if not self.console.is_terminal:
+                self._report_periodically()
+
+    def set_total(self, total_files: int) -> None:
+        """Sets the number of files to be analyzed, once it is known."""
+        with self._lock:
+            self._progress.update(self._task, total=total_files)
+
+    def track(self, methods: typing.Iterable[T]) -> typing.Iterator[T]:
+        """Yields the methods, counting them, while displaying the progress."""
+        with self:
+            for method in methods:
+                with self._lock:
+                    self.methods += 1
+                    self._progress.update(self._task, methods=self.methods)
+                yield method
+
+    def status(self) -> str:
+        """Describes the progress so far in a single line."""
+        task = self._progress.tasks[0]
+        total = "?" if task.total is None else f"{task.total:.0f}"
+        throughput = ThroughputColumn().render(task).plain
+        return f"{task.description} {self.files}/{total} files, {throughput}"
+
+    def _report_periodically(self) -> None:
+        if self._reports.due():
+            self.console.print(self.status(), highlight=False, soft_wrap=True)
+
+    def __enter__(self) -> "ExtractionProgress":
+        if self.console.is_terminal:
+            self._progress.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.console.is_terminal:
+            self._progress.stop()
+
+
+class _Schedule:
+    """Decides when something done at regular intervals is next due."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def due(self) -> bool:
+        """True, restarting the interval, if an interval has passed since last due."""
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
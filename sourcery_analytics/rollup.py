@@ -0,0 +1,312 @@
+"""Incrementally aggregate metrics over a directory, reusing unchanged subtrees.
+
+A :py:class:`.RollupIndex` stores, for every directory and Python file beneath a root,
+a hash and the :py:class:`.AggregationState` of its methods. A file's hash covers its
+size and modification time, and a directory's hash combines the names and hashes of its
+children, like a Merkle tree. When aggregating again, any file or directory whose hash
+is unchanged reuses its stored state wholesale, so only the changed files are parsed,
+and only the directories on the path to a changed file are merged again.
+
+Finding the changed files still means checking every file's metadata. When the caller
+already knows which paths changed, for instance from version control or a file watcher,
+it can pass them as ``changed``, and only those paths and the directories above them
+are visited, so the cost of an update depends on the depth of the tree and the size of
+the change, not on the size of the tree.
+"""
+import dataclasses
+import hashlib
+import os
+import pathlib
+import typing
+
+import pydantic
+
+from sourcery_analytics.analysis import analyze
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.notebooks import is_notebook
+from sourcery_analytics.settings import LimitSettings
+
+INDEX_VERSION = 2
+
+OnFile = typing.Callable[[pathlib.Path, bool], None]
+
+
+class RollupEntry(pydantic.BaseModel):
+    """Model describing the hash and aggregation state of a file or directory.
+
+    Directories also list the names of their children which have entries.
+    """
+
+    hash: str
+    state: typing.Dict[str, typing.Any]
+    children: typing.Optional[typing.List[str]] = None
+
+
+@dataclasses.dataclass
+class _Node:
+    """A Python file or notebook, or a directory containing them, and its hash."""
+
+    key: str
+    path: pathlib.Path
+    hash: str
+    children: typing.Optional[typing.List["_Node"]] = None
+
+
+class RollupIndex(pydantic.BaseModel):
+    """Model describing the stored states of every file and directory under a root.
+
+    Entries are keyed by their path relative to the root, in posix form, with ``.``
+    for the root itself. The configuration records what the states were computed
+    with, and the index is only reused with the same configuration.
+
+    Examples:
+        >>> import tempfile
+        >>> from sourcery_analytics.metrics import method_length
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     root = pathlib.Path(directory)
+        ...     _ = (root / "one.py").write_text("def one(): pass")
+        ...     _ = (root / "two.py").write_text("def two(): pass")
+        ...     index = RollupIndex()
+        ...     state = index.aggregate(root, metrics=[method_length])
+        ...     sorted(index.entries)
+        ['.', 'one.py', 'two.py']
+        >>> state.count, state.total
+        (2, {'method_length': 2})
+    """
+
+    version: int = INDEX_VERSION
+    config: typing.Dict[str, typing.Any] = {}
+    entries: typing.Dict[str, RollupEntry] = {}
+
+    @classmethod
+    def from_file(cls, path: pathlib.Path) -> "RollupIndex":
+        """Reads an index, or returns an empty index if there is no usable index."""
+        try:
+            index = cls.parse_file(path)
+        except (OSError, ValueError):
+            return cls()
+        return index if index.version == INDEX_VERSION else cls()
+
+    def write(self, path: pathlib.Path) -> None:
+        """Writes the index to a JSON file."""
+        path.write_text(self.json())
+
+    def aggregate(
+        self,
+        root: pathlib.Path,
+        /,
+        metrics: typing.Iterable[MethodMetric],
+        limits: typing.Optional[LimitSettings] = None,
+        on_file: typing.Optional[OnFile] = None,
+        changed: typing.Optional[typing.Iterable[pathlib.Path]] = None,
+    ) -> AggregationState:
+        """Returns the aggregation state under ``root``, updating the index.
+
+        Args:
+            root: a Python file, or a directory searched for Python files
+            metrics: the method metrics to aggregate
+            limits: per-file limits, beyond which files are skipped with a warning
+            on_file: called with each file visited, and whether its stored state was
+                reused
+            changed: every path under ``root`` which may have been added, modified or
+                removed since the index was last updated, absolute or relative to the
+                current directory. Only these paths are checked for changes, and any
+                other changes are missed. Ignored if the index can't be reused.
+        """
+        updater = _Updater(list(metrics), limits or LimitSettings(), on_file)
+        config = updater.config(root)
+        previous = self.entries if config == self.config else {}
+        if changed is not None and "." in previous:
+            state = updater.update(root, previous, changed)
+        else:
+            state = updater.rebuild(root, previous)
+        self.config = config
+        self.entries = updater.entries
+        return state
+
+
+@dataclasses.dataclass
+class _Updater:
+    """Computes the entries of an index, reusing a previous index's entries."""
+
+    metrics: typing.List[MethodMetric]
+    limits: LimitSettings
+    on_file: typing.Optional[OnFile]
+    entries: typing.Dict[str, RollupEntry] = dataclasses.field(default_factory=dict)
+
+    def config(self, root: pathlib.Path) -> typing.Dict[str, typing.Any]:
+        """What the states are computed with, which must match to reuse them."""
+        return {
+            "root": str(root.absolute()),
+            "metrics": [metric.__name__ for metric in self.metrics],
+            "limits": self.limits.dict(),
+        }
+
+    def rebuild(
+        self, root: pathlib.Path, previous: typing.Dict[str, RollupEntry]
+    ) -> AggregationState:
+        """Scans the whole tree, reusing the previous entries of unchanged subtrees."""
+        tree = _scan(root, ".")
+        return self.state_of(tree, previous) if tree else AggregationState()
+
+    def update(
+        self,
+        root: pathlib.Path,
+        previous: typing.Dict[str, RollupEntry],
+        changed: typing.Iterable[pathlib.Path],
+    ) -> AggregationState:
+        """Updates the previous entries along the changed paths only."""
+        self.entries = dict(previous)
+        # the names which may be new children of each directory above a changed path
+        names: typing.Dict[str, typing.Set[str]] = {}
+        for key in filter(None, (_key(root, path) for path in changed)):
+            self.update_path(root, key)
+            for directory, name in _parents(key):
+                names.setdefault(directory, set()).add(name)
+        # deepest first, so that each directory's children are up to date
+        for directory in sorted(names, key=_depth, reverse=True):
+            self.update_directory(directory, names[directory])
+        entry = self.entries.get(".")
+        return AggregationState.from_dict(entry.state if entry else {})
+
+    def update_path(self, root: pathlib.Path, key: str) -> None:
+        """Replaces the entries of a path and everything beneath it."""
+        previous = self.remove(key)
+        path = root if key == "." else root / key
+        exists = path.is_dir() or (path.is_file() and _is_source(path))
+        node = _scan(path, key) if exists else None
+        if node:
+            self.state_of(node, previous)
+
+    def update_directory(self, key: str, names: typing.Set[str]) -> None:
+        """Merges the states of a directory's children again."""
+        if (entry := self.entries.get(key)) and entry.children:
+            names.update(entry.children)
+        children = {
+            name: self.entries[child_key]
+            for name in sorted(names)
+            if (child_key := _child_key(key, name)) in self.entries
+        }
+        if not children:
+            self.entries.pop(key, None)
+            return
+        state = AggregationState()
+        for child in children.values():
+            state = state.merge(AggregationState.from_dict(child.state))
+        self.entries[key] = RollupEntry(
+            hash=_directory_hash(
+                (name, child.hash) for name, child in children.items()
+            ),
+            state=dataclasses.asdict(state),
+            children=list(children),
+        )
+
+    def remove(self, key: str) -> typing.Dict[str, RollupEntry]:
+        """Removes the entries of a path and everything beneath it, returning them."""
+        removed = {}
+        keys = [key]
+        while keys:
+            current = keys.pop()
+            if entry := self.entries.pop(current, None):
+                removed[current] = entry
+                keys.extend(_child_key(current, name) for name in entry.children or ())
+        return removed
+
+    def state_of(
+        self, node: _Node, previous: typing.Dict[str, RollupEntry]
+    ) -> AggregationState:
+        """The state of a node, reusing its previous entry if its hash is unchanged."""
+        entry = previous.get(node.key)
+        if entry and entry.hash == node.hash:
+            self.reuse(node, previous)
+            return AggregationState.from_dict(entry.state)
+        if node.children is None:
+            state = self.file_state(node.path)
+        else:
+            state = AggregationState()
+            for child in node.children:
+                state = state.merge(self.state_of(child, previous))
+        self.entries[node.key] = RollupEntry(
+            hash=node.hash,
+            state=dataclasses.asdict(state),
+            children=_names(node.children),
+        )
+        return state
+
+    def file_state(self, path: pathlib.Path) -> AggregationState:
+        """Analyzes a file's methods."""
+        state = analyze(
+            extract_methods(path, limits=self.limits),
+            metrics=self.metrics,
+            aggregation=AggregationState.from_results,
+        )
+        if self.on_file:
+            self.on_file(path, False)
+        return state
+
+    def reuse(self, node: _Node, previous: typing.Dict[str, RollupEntry]) -> None:
+        """Copies the stored entries of an unchanged subtree into the new entries."""
+        self.entries[node.key] = previous[node.key]
+        if node.children is None and self.on_file:
+            self.on_file(node.path, True)
+        for child in node.children or ():
+            self.reuse(child, previous)
+
+
+def _scan(path: pathlib.Path, key: str) -> typing.Optional[_Node]:
+    """Hashes the tree under ``path`` from file metadata, without reading any files."""
+    if path.is_file():
+        stat = path.stat()
+        return _Node(key, path, _digest(f"{stat.st_size}:{stat.st_mtime_ns}"))
+    children = [
+        node
+        for child in sorted(path.iterdir())
+        if child.is_dir() or _is_source(child)
+        if (node := _scan(child, _child_key(key, child.name)))
+    ]
+    if not children:
+        return None
+    hash_ = _directory_hash((child.path.name, child.hash) for child in children)
+    return _Node(key, path, hash_, children)
+
+
+def _is_source(path: pathlib.Path) -> bool:
+    return path.suffix == ".py" or is_notebook(path)
+
+
+def _names(nodes: typing.Optional[typing.List[_Node]]) -> typing.Optional[typing.List]:
+    return None if nodes is None else [node.path.name for node in nodes]
+
+
+def _key(root: pathlib.Path, path: pathlib.Path) -> typing.Optional[str]:
+    """The key of a path, or None if it is not beneath the root."""
+    absolute = pathlib.Path(os.path.abspath(path))
+    try:
+        return absolute.relative_to(os.path.abspath(root)).as_posix()
+    except ValueError:
+        return None
+
+
+def _child_key(key: str, name: str) -> str:
+    return name if key == "." else f"{key}/{name}"
+
+
+def _parents(key: str) -> typing.Iterator[typing.Tuple[str, str]]:
+    """Yields each directory above the key, and the name of its child on the way."""
+    parts = [] if key == "." else key.split("/")
+    for depth, name in enumerate(parts):
+        yield "/".join(parts[:depth]) or ".", name
+
+
+def _depth(key: str) -> int:
+    return 0 if key == "." else key.count("/") + 1
+
+
+def _directory_hash(children: typing.Iterable[typing.Tuple[str, str]]) -> str:
+    return _digest("\n".join(f"{name}\0{hash_}" for name, hash_ in children))
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
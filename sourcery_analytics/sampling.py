@@ -0,0 +1,368 @@
+"""Estimate aggregates from a stratified random sample of the files, parsing no others.
+
+Files are only listed, not read, to draw the sample. They are grouped into strata by
+their directory, a given number of levels beneath the analyzed path, and each stratum
+is sampled in proportion to its size, with at least one file from every stratum, so
+that no part of a repository is left out of the estimate. The sample is drawn with a
+fixed seed, so that repeated runs analyze the same files.
+
+Files are the sampling units, so the estimates and their confidence intervals follow
+the usual stratified estimators for cluster samples:
+
+- totals are the sum over strata of each stratum's size times its mean file total
+- averages over methods are ratio estimates, the estimated total over the estimated
+  number of methods, with their variance found by linearization
+- peaks cannot be estimated without bias, so the peak of the sample is reported, which
+  is only a lower bound on the peak of every file
+
+Variances include the finite population correction, so intervals narrow to the exact
+value as the sample approaches every file.
+"""
+import collections
+import dataclasses
+import math
+import pathlib
+import random
+import statistics
+import typing
+
+import astroid
+
+from sourcery_analytics.analysis import analyze
+from sourcery_analytics.extractors import Extractor, extract_methods
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.types import MethodMetric
+from sourcery_analytics.settings import LimitSettings
+from sourcery_analytics.sharding import Shard
+
+# the stratum of files directly beneath the analyzed path
+ROOT_STRATUM = "."
+
+
+class Estimate(typing.NamedTuple):
+    """An estimated aggregate and the bounds of its confidence interval.
+
+    Bounds are None where they cannot be estimated, such as the upper bound of a peak.
+    """
+
+    value: typing.Optional[float]
+    lower: typing.Optional[float]
+    upper: typing.Optional[float]
+
+
+@dataclasses.dataclass
+class Stratum:
+    """The files of a stratum, and the aggregation states of those sampled.
+
+    Attributes:
+        files: every file in the stratum
+        sample: the sampled files, a subset of ``files``
+        states: the aggregation state of the methods of each sampled file, in order
+    """
+
+    files: typing.List[pathlib.Path]
+    sample: typing.List[pathlib.Path] = dataclasses.field(default_factory=list)
+    states: typing.List[AggregationState] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class SampleOptions:
+    """How to draw a sample of files, and estimate aggregates from it.
+
+    Exactly one of ``fraction`` or ``count`` must be given.
+
+    Attributes:
+        fraction: the proportion of files to sample
+        count: the number of files to sample, instead of a fraction
+        seed: the seed of the random sample
+        confidence: the confidence level of the intervals
+        depth: the number of directory levels beneath each item defining the strata
+        limits: per-file limits, beyond which files are skipped with a warning
+        shard: only sample from the files in this shard
+    """
+
+    fraction: typing.Optional[float] = None
+    count: typing.Optional[int] = None
+    seed: int = 0
+    confidence: float = 0.95
+    depth: int = 1
+    limits: typing.Optional[LimitSettings] = None
+    shard: typing.Optional[Shard] = None
+
+
+@dataclasses.dataclass
+class SampledAggregate:
+    """Estimated aggregates of each metric, from a sample of files.
+
+    Attributes:
+        estimates: the estimate of the aggregate of each metric, by metric name
+        sampled_files: the number of files analyzed
+        total_files: the number of files sampled from
+        strata: the number of strata the files were grouped into
+        confidence: the confidence level of the intervals
+    """
+
+    estimates: typing.Dict[str, Estimate]
+    sampled_files: int
+    total_files: int
+    strata: int
+    confidence: float
+
+
+def stratify(
+    items: typing.Iterable[pathlib.Path],
+    depth: int = 1,
+    shard: typing.Optional[Shard] = None,
+) -> typing.Dict[str, Stratum]:
+    """Lists the files beneath each item, grouped by their directory.
+
+    Each file's stratum is its directory relative to the item, truncated to ``depth``
+    levels, with files of an item which is itself a file, or an archive, in the
+    :py:data:`ROOT_STRATUM`. Nothing is read.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     root = pathlib.Path(directory)
+        ...     for name in ["a.py", "core/b.py", "core/sub/c.py", "docs/d.py"]:
+        ...         (root / name).parent.mkdir(parents=True, exist_ok=True)
+        ...         _ = (root / name).write_text("")
+        ...     strata = stratify([root])
+        ...     {key: len(stratum.files) for key, stratum in sorted(strata.items())}
+        {'.': 1, 'core': 2, 'docs': 1}
+    """
+    extractor: Extractor[astroid.nodes.NodeNG] = Extractor(shard=shard)
+    files: typing.DefaultDict[str, typing.List[pathlib.Path]] = collections.defaultdict(
+        list
+    )
+    for item in items:
+        for file in extractor.files(item):
+            files[_stratum_key(item, file, depth)].append(file)
+    # sorted, so that a seeded sample doesn't depend on the order of listing
+    return {key: Stratum(sorted(files[key])) for key in sorted(files)}
+
+
+def draw_sample(
+    strata: typing.Mapping[str, Stratum],
+    fraction: typing.Optional[float] = None,
+    count: typing.Optional[int] = None,
+    seed: int = 0,
+) -> None:
+    """Samples files from each stratum, in proportion to its size.
+
+    Exactly one of ``fraction``, the proportion of files to sample, or ``count``, the
+    number of files to sample, must be given. Every stratum has at least one file
+    sampled, so more than ``count`` files are sampled where there are more strata.
+
+    Examples:
+        >>> strata = {
+        ...     "core": Stratum([pathlib.Path(f"core/{i}.py") for i in range(30)]),
+        ...     "docs": Stratum([pathlib.Path("docs/conf.py")]),
+        ... }
+        >>> draw_sample(strata, fraction=0.1)
+        >>> len(strata["core"].sample), len(strata["docs"].sample)
+        (3, 1)
+    """
+    if (fraction is None) == (count is None):
+        raise ValueError("give exactly one of a fraction or count of files to sample")
+    total_files = sum(len(stratum.files) for stratum in strata.values())
+    if count is not None:
+        fraction = min(count / total_files, 1.0) if total_files else 1.0
+    rng = random.Random(seed)
+    for stratum in strata.values():
+        size = len(stratum.files)
+        sample_size = min(size, max(1, round(size * typing.cast(float, fraction))))
+        stratum.sample = sorted(rng.sample(stratum.files, sample_size))
+        stratum.states = []
+
+
+def estimate(
+    strata: typing.Iterable[Stratum],
+    metric_names: typing.Sequence[str],
+    aggregation: str,
+    confidence: float = 0.95,
+) -> typing.Dict[str, Estimate]:
+    """Estimates the aggregate of each metric over every file, from the sampled files.
+
+    Args:
+        strata: the strata, with the states of their sampled files
+        metric_names: the names of the metrics to estimate the aggregates of
+        aggregation: one of ``"total"``, ``"average"``, or ``"peak"``
+        confidence: the confidence level of the intervals
+
+    Examples:
+        >>> from sourcery_analytics.metrics.compounders import NamedMetricResult
+        >>> def state(*lengths):
+        ...     return AggregationState.from_results(
+        ...         NamedMetricResult({"method_length": n}) for n in lengths
+        ...     )
+        >>> files = [pathlib.Path(f"{i}.py") for i in range(4)]
+        >>> stratum = Stratum(files, files[:2], [state(2, 4), state(6)])
+        >>> estimate([stratum], ["method_length"], "average")["method_length"].value
+        4.0
+        >>> estimate([stratum], ["method_length"], "total")["method_length"].value
+        24.0
+    """
+    strata = [stratum for stratum in strata if stratum.states]
+    critical_value = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    counts = [[float(state.count) for state in stratum.states] for stratum in strata]
+    estimates = {}
+    for name in metric_names:
+        if aggregation == "peak":
+            estimates[name] = _peak(strata, name)
+            continue
+        totals = [
+            [_value(state.total, name) for state in stratum.states]
+            for stratum in strata
+        ]
+        if aggregation == "total":
+            estimates[name] = _interval(
+                *_stratified_total(strata, totals), critical_value
+            )
+        else:
+            estimates[name] = _average(strata, totals, counts, critical_value)
+    return estimates
+
+
+def aggregate_sample(
+    items: typing.Iterable[pathlib.Path],
+    metrics: typing.Sequence[MethodMetric],
+    aggregation: str,
+    options: SampleOptions,
+    *,
+    on_sample: typing.Optional[typing.Callable[[int], None]] = None,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]] = None,
+) -> SampledAggregate:
+    """Estimates the aggregate of the metrics over the items, parsing only a sample.
+
+    Args:
+        items: the files and directories to aggregate over
+        metrics: the metrics to aggregate
+        aggregation: one of ``"total"``, ``"average"``, or ``"peak"``
+        options: how to draw the sample and estimate the aggregates
+        on_sample: called with the number of files sampled, before analyzing them
+        on_file: called with each sampled file once it has been analyzed
+
+    Examples:
+        >>> import tempfile
+        >>> from sourcery_analytics.metrics import method_length
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     root = pathlib.Path(directory)
+        ...     for index in range(10):
+        ...         _ = (root / f"{index}.py").write_text("def f():\\n    pass\\n")
+        ...     options = SampleOptions(count=5)
+        ...     result = aggregate_sample([root], [method_length], "total", options)
+        >>> result.sampled_files, result.total_files
+        (5, 10)
+        >>> result.estimates["method_length"]
+        Estimate(value=10.0, lower=10.0, upper=10.0)
+    """
+    strata = stratify(items, depth=options.depth, shard=options.shard)
+    draw_sample(
+        strata, fraction=options.fraction, count=options.count, seed=options.seed
+    )
+    sampled_files = sum(len(stratum.sample) for stratum in strata.values())
+    if on_sample:
+        on_sample(sampled_files)
+    _analyze_sample(strata.values(), metrics, options, on_file)
+    return SampledAggregate(
+        estimate(
+            strata.values(),
+            [metric.__name__ for metric in metrics],
+            aggregation,
+            confidence=options.confidence,
+        ),
+        sampled_files=sampled_files,
+        total_files=sum(len(stratum.files) for stratum in strata.values()),
+        strata=len(strata),
+        confidence=options.confidence,
+    )
+
+
+def _analyze_sample(
+    strata: typing.Iterable[Stratum],
+    metrics: typing.Sequence[MethodMetric],
+    options: SampleOptions,
+    on_file: typing.Optional[typing.Callable[[pathlib.Path], None]],
+) -> None:
+    """Records the aggregation state of each sampled file in its stratum."""
+    for stratum in strata:
+        for file in stratum.sample:
+            # archives are sampled whole, so must still select their shard
+            methods = extract_methods(
+                file, limits=options.limits, shard=options.shard, on_file=on_file
+            )
+            stratum.states.append(
+                analyze(
+                    methods,
+                    metrics=metrics,
+                    aggregation=AggregationState.from_results,
+                )
+            )
+
+
+def _stratum_key(item: pathlib.Path, file: pathlib.Path, depth: int) -> str:
+    if file == item:
+        return ROOT_STRATUM
+    directories = file.relative_to(item).parent.parts[:depth]
+    return "/".join(directories) or ROOT_STRATUM
+
+
+def _value(result: typing.Any, name: str) -> float:
+    return float(result[name]) if result is not None else 0.0
+
+
+def _stratified_total(
+    strata: typing.Sequence[Stratum], values: typing.Sequence[typing.Sequence[float]]
+) -> typing.Tuple[float, float]:
+    """The estimated total of the values over every file, and its variance.
+
+    Strata with a single sampled file have no variance of their own, so take the
+    variance of the whole sample.
+    """
+    everything = [value for stratum_values in values for value in stratum_values]
+    pooled = statistics.variance(everything) if len(everything) > 1 else 0.0
+    total = variance = 0.0
+    for stratum, stratum_values in zip(strata, values):
+        size, sampled = len(stratum.files), len(stratum_values)
+        spread = statistics.variance(stratum_values) if sampled > 1 else pooled
+        total += size * statistics.fmean(stratum_values)
+        variance += size**2 * (1 - sampled / size) * spread / sampled
+    return total, variance
+
+
+def _peak(strata: typing.Sequence[Stratum], name: str) -> Estimate:
+    """The peak of the sampled files, a lower bound on the peak of every file."""
+    peaks = [
+        _value(state.peak, name)
+        for stratum in strata
+        for state in stratum.states
+        if state.count
+    ]
+    peak = max(peaks) if peaks else None
+    return Estimate(peak, peak, None)
+
+
+def _average(
+    strata: typing.Sequence[Stratum],
+    totals: typing.Sequence[typing.Sequence[float]],
+    counts: typing.Sequence[typing.Sequence[float]],
+    critical_value: float,
+) -> Estimate:
+    """The ratio estimate of the average, with its variance found by linearization."""
+    total, _ = _stratified_total(strata, totals)
+    method_count, _ = _stratified_total(strata, counts)
+    if not method_count:
+        return Estimate(None, None, None)
+    ratio = total / method_count
+    residuals = [
+        [y - ratio * m for y, m in zip(stratum_totals, stratum_counts)]
+        for stratum_totals, stratum_counts in zip(totals, counts)
+    ]
+    _, residual_variance = _stratified_total(strata, residuals)
+    return _interval(ratio, residual_variance / method_count**2, critical_value)
+
+
+def _interval(value: float, variance: float, critical_value: float) -> Estimate:
+    margin = critical_value * math.sqrt(max(variance, 0.0))
+    return Estimate(value, value - margin, value + margin)
@@ -0,0 +1,577 @@
+"""A local HTTP service computing method metrics, built on the standard library.
+
+Rather than starting a process per analysis, a long-running service keeps its worker
+pool, imports and results warm. Clients POST source code or paths to ``/analyze`` as
+JSON, and receive the metrics of each method as JSON::
+
+    {"sources": {"example.py": "def f(): ..."}, "paths": ["src"], "metrics": ["length"]}
+
+Files requested concurrently are batched: the files arriving within a short window,
+across all requests, are deduplicated and split into one submission per worker, rather
+than one submission per file. Records are held in memory, keyed on each source's hash or
+each file's modification time and size, so repeated requests for unchanged code are
+answered without parsing. Counts of requests, batches and cache hits are served at
+``/stats``.
+
+Paths are only analyzed beneath the service's root directory, and by default the
+service only listens on the loopback interface. Request bodies larger than
+:py:data:`.MAX_BODY_SIZE` are refused without being read.
+"""
+import concurrent.futures
+import functools
+import hashlib
+import http.server
+import json
+import pathlib
+import queue
+import threading
+import time
+import typing
+
+import astroid
+import pydantic
+
+from sourcery_analytics.analysis import MethodRecord, MethodRecorder, work_units
+from sourcery_analytics.extractors import Extractable, FileLimitError
+from sourcery_analytics.metrics.registry import method_metric_registry
+from sourcery_analytics.settings import LimitSettings
+from sourcery_analytics.utils import LRUCache, clean_source, time_limit
+
+# seconds to wait for more files before submitting a batch
+BATCH_WINDOW = 0.005
+# most files submitted in a single batch
+MAX_BATCH_SIZE = 256
+# seconds a request waits for its files to be analyzed
+RESULT_TIMEOUT = 600.0
+# largest request body read, in bytes; larger requests are refused unread
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# the records of a unit of work, or a message describing why it failed
+UnitResult = typing.Tuple[
+    typing.Optional[typing.List[MethodRecord]], typing.Optional[str]
+]
+
+
+class AnalysisRequest(pydantic.BaseModel):
+    """Model describing a request to ``/analyze``.
+
+    Sources are keyed by the name to report as their methods' file. Metrics are named as
+    in the CLI, and default to all the metrics the service computes.
+    """
+
+    sources: typing.Dict[str, str] = {}
+    paths: typing.List[str] = []
+    metrics: typing.Optional[typing.List[str]] = None
+
+
+class RequestError(Exception):
+    """Raised for requests which cannot be answered, with the HTTP status to send."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    """Computes the records of sources and files, batching and caching the work.
+
+    Files are analyzed by a pool of ``jobs`` processes, or by a single thread if
+    ``jobs`` is 1. A batching thread collects the files requested within
+    ``batch_window`` seconds of each other, and submits them in up to ``jobs`` chunks.
+    A file already being analyzed for one request is not submitted again for another.
+    If a worker crashes, the files it was analyzing are reported as errors, and the
+    pool is started again. Files still not analyzed ``RESULT_TIMEOUT`` seconds after a
+    request are reported as errors too.
+
+    Sources are held to the same limits as files: their size in bytes, their number of
+    nodes, and the time taken to parse them.
+
+    Args:
+        metric_names: the CLI names of the metrics to compute
+        root: the directory beneath which paths may be analyzed
+        limits: per-file limits, beyond which files are skipped with a warning
+        jobs: the number of worker processes
+        cache_size: the number of sources and files whose records are kept
+        batch_window: seconds to wait for more files before submitting a batch
+        max_batch_size: the most files submitted in a single batch
+
+    Examples:
+        >>> request = AnalysisRequest(sources={"a.py": "def f(): pass"})
+        >>> with AnalysisService(["length"], root=pathlib.Path(".")) as service:
+        ...     response = service.analyze(request)
+        >>> [(row["method_file"], row["method_length"]) for row in response["methods"]]
+        [('a.py', 1)]
+    """
+
+    def __init__(
+        self,
+        metric_names: typing.Sequence[str],
+        root: pathlib.Path,
+        *,
+        limits: typing.Optional[LimitSettings] = None,
+        jobs: int = 1,
+        cache_size: int = 4096,
+        batch_window: float = BATCH_WINDOW,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        registry = method_metric_registry()
+        self.metric_names = list(metric_names)
+        self.recorder = MethodRecorder(
+            [registry[name] for name in self.metric_names], limits or LimitSettings()
+        )
+        self.root = root.resolve()
+        self.cache: LRUCache[typing.Tuple, UnitResult] = LRUCache(cache_size)
+        self.stats = _Counts("requests", "files", "batches", "submissions")
+        self._batcher = _Batcher(
+            _WorkerPool(self.metric_names, self.recorder.limits, jobs),
+            self.cache,
+            self.stats,
+            window=batch_window,
+            max_size=max_batch_size,
+        )
+
+    def analyze(self, request: AnalysisRequest) -> typing.Dict[str, typing.Any]:
+        """Answers a request with the records of its methods, and any errors."""
+        names = self._requested_names(request.metrics)
+        units = self._units(request)
+        self.stats.add(requests=1, files=len(units))
+        futures = [self._submit(unit) for _name, unit in units]
+        deadline = time.monotonic() + RESULT_TIMEOUT
+        methods: typing.List[typing.Dict[str, typing.Any]] = []
+        errors: typing.Dict[str, str] = {}
+        for (name, unit), future in zip(units, futures):
+            records, error = _result(future, deadline)
+            if error is None:
+                methods.extend(_rows(name, unit, records or [], names))
+            else:
+                errors[name] = error
+        return {"methods": methods, "errors": errors}
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        """The service's counts of requests, files, batches and cache hits."""
+        return {
+            **self.stats.dict(),
+            "cache_hits": self.cache.hits,
+            "cached": len(self.cache),
+            "jobs": self._batcher.pool.jobs,
+            "metrics": self.metric_names,
+        }
+
+    def close(self) -> None:
+        """Stops batching, and shuts the worker pool down."""
+        self._batcher.close()
+
+    def __enter__(self) -> "AnalysisService":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _requested_names(
+        self, metrics: typing.Optional[typing.List[str]]
+    ) -> typing.Tuple[str, ...]:
+        names = self.recorder.names
+        if metrics is None:
+            return names
+        unknown = sorted(set(metrics) - set(self.metric_names))
+        if unknown:
+            raise RequestError(
+                400,
+                f"unknown metrics {', '.join(unknown)}; "
+                f"this service computes {', '.join(self.metric_names)}",
+            )
+        return tuple(names[self.metric_names.index(name)] for name in metrics)
+
+    def _units(
+        self, request: AnalysisRequest
+    ) -> typing.List[typing.Tuple[str, Extractable]]:
+        """The requested sources and files, with the names to report their errors by."""
+        units: typing.List[typing.Tuple[str, Extractable]] = list(
+            request.sources.items()
+        )
+        units.extend(
+            (str(file.relative_to(self.root)), file)
+            for file in self._files(request.paths)
+        )
+        return units
+
+    def _files(self, paths: typing.List[str]) -> typing.List[pathlib.Path]:
+        """Resolves requested paths beneath the root, and lists the files in them."""
+        resolved = []
+        for path in paths:
+            full_path = (self.root / path).resolve()
+            if full_path != self.root and self.root not in full_path.parents:
+                raise RequestError(403, f"{path} is outside the service's root")
+            if not full_path.exists():
+                raise RequestError(404, f"{path} does not exist")
+            resolved.append(full_path)
+        return [
+            typing.cast(pathlib.Path, unit)
+            for unit, _shard in work_units(resolved, self.recorder.limits)
+        ]
+
+    def _submit(self, unit: Extractable) -> "concurrent.futures.Future[UnitResult]":
+        """The future records of a unit, from the cache, in flight, or queued."""
+        key = self._key(unit)
+        if key is not None and (result := self.cache.peek(key)) is not None:
+            future: "concurrent.futures.Future[UnitResult]" = (
+                concurrent.futures.Future()
+            )
+            future.set_result(result)
+            return future
+        return self._batcher.submit(key, unit)
+
+    def _key(self, unit: Extractable) -> typing.Optional[typing.Tuple]:
+        if isinstance(unit, str):
+            return ("source", hashlib.blake2b(unit.encode()).digest())
+        return self.recorder.cache_key(unit)
+
+
+def _result(
+    future: "concurrent.futures.Future[UnitResult]", deadline: float
+) -> UnitResult:
+    """The result of a unit of work, or an error if it isn't ready by the deadline."""
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except concurrent.futures.TimeoutError:
+        return None, f"analysis timed out after {RESULT_TIMEOUT}s"
+
+
+_ROW_KEYS = ("method_file", "method_qualname", "method_lineno")
+
+
+def _rows(
+    name: str,
+    unit: Extractable,
+    records: typing.List[MethodRecord],
+    names: typing.Tuple[str, ...],
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """The response rows of a unit's records, with only the requested metrics."""
+    for record in records:
+        row = record.as_dict()
+        if isinstance(unit, str):
+            # sources are parsed without a file, so report their given name
+            row["method_file"] = name
+        yield {key: row[key] for key in _ROW_KEYS + names}
+
+
+class _Counts:
+    """Counts of a service's work, which may be added to from any thread."""
+
+    def __init__(self, *names: str):
+        self._counts = dict.fromkeys(names, 0)
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        """Adds to the counts."""
+        with self._lock:
+            for name, count in counts.items():
+                self._counts[name] += count
+
+    def dict(self) -> typing.Dict[str, int]:
+        """A copy of the counts."""
+        with self._lock:
+            return dict(self._counts)
+
+
+class _WorkerPool:
+    """Runs chunks of units of work in worker processes, starting them again on a crash.
+
+    A crashed worker breaks the whole process pool, failing every pending submission,
+    so a broken pool is replaced by a new one. With one job, chunks run in a thread.
+    """
+
+    def __init__(
+        self, metric_names: typing.List[str], limits: LimitSettings, jobs: int
+    ):
+        self.metric_names = metric_names
+        self.limits = limits
+        self.jobs = max(jobs, 1)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def submit(
+        self, units: typing.List[Extractable]
+    ) -> "concurrent.futures.Future[typing.List[UnitResult]]":
+        """Submits a chunk of units, returning a failed future if the pool is broken."""
+        executor = self._executor
+        try:
+            submission = executor.submit(
+                _chunk_results, units, self.metric_names, self.limits
+            )
+        except concurrent.futures.BrokenExecutor as exc:
+            self._restart(executor)
+            submission = concurrent.futures.Future()
+            submission.set_exception(exc)
+            return submission
+        submission.add_done_callback(functools.partial(self._check, executor))
+        return submission
+
+    def shutdown(self) -> None:
+        """Shuts the pool down, waiting for pending submissions."""
+        self._executor.shutdown()
+
+    def _start(self) -> concurrent.futures.Executor:
+        if self.jobs > 1:
+            return concurrent.futures.ProcessPoolExecutor(self.jobs)
+        return concurrent.futures.ThreadPoolExecutor(1)
+
+    def _check(
+        self,
+        executor: concurrent.futures.Executor,
+        submission: concurrent.futures.Future,
+    ) -> None:
+        if not submission.cancelled() and isinstance(
+            submission.exception(), concurrent.futures.BrokenExecutor
+        ):
+            self._restart(executor)
+
+    def _restart(self, broken: concurrent.futures.Executor) -> None:
+        """Replaces a broken executor, unless it has already been replaced."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._start()
+        broken.shutdown(wait=False)
+
+
+# a queued unit of work: its cache key, the unit, and the future for its result
+_Queued = typing.Tuple[
+    typing.Optional[typing.Tuple],
+    Extractable,
+    "concurrent.futures.Future[UnitResult]",
+]
+
+
+class _Batcher:
+    """Collects the units of work queued within a window into batches for a pool.
+
+    Each batch is split into a chunk per worker. A unit already queued or being
+    analyzed is not queued again, and its future is shared instead.
+    """
+
+    def __init__(
+        self,
+        pool: _WorkerPool,
+        cache: LRUCache[typing.Tuple, UnitResult],
+        stats: _Counts,
+        *,
+        window: float,
+        max_size: int,
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.stats = stats
+        self._in_flight: typing.Dict[
+            typing.Tuple, "concurrent.futures.Future[UnitResult]"
+        ] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[typing.Optional[_Queued]]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._loop, args=(window, max_size), daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, key: typing.Optional[typing.Tuple], unit: Extractable
+    ) -> "concurrent.futures.Future[UnitResult]":
+        """Queues a unit, or returns the future of the same unit already in flight."""
+        future: "concurrent.futures.Future[UnitResult]" = concurrent.futures.Future()
+        with self._lock:
+            shared = future if key is None else self._in_flight.setdefault(key, future)
+        if shared is future:
+            self._queue.put((key, unit, future))
+        return shared
+
+    def close(self) -> None:
+        """Submits the queued units, then shuts the pool down."""
+        self._queue.put(None)
+        self._thread.join()
+        self.pool.shutdown()
+
+    def _loop(self, window: float, max_size: int) -> None:
+        while (first := self._queue.get()) is not None:
+            batch, stopping = self._collect(first, window, max_size)
+            self._submit_batch(batch)
+            if stopping:
+                return
+
+    def _collect(
+        self, first: _Queued, window: float, max_size: int
+    ) -> typing.Tuple[typing.List[_Queued], bool]:
+        """The units queued within the window, and whether the batcher is stopping."""
+        batch = [first]
+        deadline = time.monotonic() + window
+        while len(batch) < max_size:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _submit_batch(self, batch: typing.List[_Queued]) -> None:
+        """Splits a batch into a chunk per worker, and submits each chunk once."""
+        chunk_count = min(self.pool.jobs, len(batch))
+        chunks = [batch[index::chunk_count] for index in range(chunk_count)]
+        self.stats.add(batches=1, submissions=len(chunks))
+        for chunk in chunks:
+            submission = self.pool.submit([unit for _key, unit, _future in chunk])
+            submission.add_done_callback(functools.partial(self._complete, chunk))
+
+    def _complete(
+        self,
+        chunk: typing.List[_Queued],
+        submission: "concurrent.futures.Future[typing.List[UnitResult]]",
+    ) -> None:
+        results, cacheable = _submission_results(submission, len(chunk))
+        for (key, _unit, future), result in zip(chunk, results):
+            if key is not None:
+                self._release(key, result, cacheable)
+            future.set_result(result)
+
+    def _release(self, key: typing.Tuple, result: UnitResult, cacheable: bool) -> None:
+        """Stops sharing a unit's future, first caching its result if it can be."""
+        if cacheable:
+            self.cache.get(key, lambda: result)
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+
+def _submission_results(
+    submission: "concurrent.futures.Future[typing.List[UnitResult]]", count: int
+) -> typing.Tuple[typing.List[UnitResult], bool]:
+    """The results of a chunk, and whether they can be cached."""
+    try:
+        return submission.result(), True
+    except Exception as exc:  # pylint: disable=broad-except
+        # such as a crashed worker, so the files may be analyzed if requested again
+        return [(None, f"analysis failed: {exc}")] * count, False
+
+
+def _chunk_results(
+    units: typing.List[Extractable],
+    metric_names: typing.List[str],
+    limits: LimitSettings,
+) -> typing.List[UnitResult]:
+    """Computes the records of a chunk of units, possibly in another process.
+
+    Metrics are passed by name, as metrics from the registry may not be picklable.
+    """
+    registry = method_metric_registry()
+    recorder = MethodRecorder([registry[name] for name in metric_names], limits)
+    return [_unit_result(recorder, unit) for unit in units]
+
+
+def _unit_result(recorder: MethodRecorder, unit: Extractable) -> UnitResult:
+    try:
+        if isinstance(unit, str):
+            return _source_records(recorder, unit), None
+        return recorder.records(unit), None
+    except Exception as exc:  # pylint: disable=broad-except
+        return None, f"{type(exc).__name__}: {exc}"
+
+
+def _source_records(recorder: MethodRecorder, source: str) -> typing.List[MethodRecord]:
+    """Computes the records of a POSTed source, within the limits on files.
+
+    Raises:
+        FileLimitError: if the source is too big, or has too many nodes
+        TimeoutError: if parsing and analyzing the source takes too long
+    """
+    limits = recorder.limits
+    size = len(source.encode())
+    if limits.max_file_size is not None and size > limits.max_file_size:
+        raise FileLimitError(
+            f"source size of {size} bytes exceeds limit of {limits.max_file_size}"
+        )
+    with time_limit(limits.timeout):
+        module = astroid.parse(clean_source(source))
+        if limits.max_node_count and _node_count(module) > limits.max_node_count:
+            raise FileLimitError(f"node count exceeds limit of {limits.max_node_count}")
+        return recorder.records(module)
+
+
+def _node_count(module: astroid.nodes.Module) -> int:
+    return sum(1 for _node in module.nodes_of_class(astroid.nodes.NodeNG))
+
+
+class AnalysisRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles requests to an :py:class:`.AnalysisServer`."""
+
+    server: "AnalysisServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serves the service's counts at ``/stats``."""
+        if self.path == "/stats":
+            self._send_json(200, self.server.service.status())
+        else:
+            self._send_json(404, {"error": f"no such endpoint {self.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Analyzes the sources and paths POSTed to ``/analyze``."""
+        if self.path != "/analyze":
+            self._send_json(404, {"error": f"no such endpoint {self.path}"})
+        elif (length := self._content_length()) is None:
+            # the body can't be skipped, so the connection can't be reused
+            self._send_json(400, {"error": "invalid Content-Length"}, close=True)
+        elif length > self.server.max_body_size:
+            self._send_json(
+                413,
+                {"error": f"body exceeds limit of {self.server.max_body_size} bytes"},
+                close=True,
+            )
+        else:
+            self._analyze(self.rfile.read(length))
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _content_length(self) -> typing.Optional[int]:
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return None
+        return length if length >= 0 else None
+
+    def _analyze(self, body: bytes) -> None:
+        try:
+            request = AnalysisRequest.parse_raw(body)
+            self._send_json(200, self.server.service.analyze(request))
+        except pydantic.ValidationError as exc:
+            self._send_json(400, {"error": str(exc)})
+        except RequestError as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+
+    def _send_json(self, status: int, body: typing.Any, close: bool = False) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if close:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class AnalysisServer(http.server.ThreadingHTTPServer):
+    """An HTTP server answering each request in a thread, with a shared service."""
+
+    daemon_threads = True
+    # concurrent clients are refused by the default backlog of 5 connections
+    request_queue_size = 128
+    max_body_size = MAX_BODY_SIZE
+
+    def __init__(
+        self,
+        address: typing.Tuple[str, int],
+        service: AnalysisService,
+        verbose: bool = False,
+    ):
+        super().__init__(address, AnalysisRequestHandler)
+        self.service = service
+        self.verbose = verbose
@@ -1,5 +1,6 @@
 """Models describing sourcery-analytics settings."""
 import pathlib
+import typing
 
 import pydantic
 import tomli
@@ -14,10 +15,66 @@ class ThresholdSettings(pydantic.BaseModel):
     method_working_memory: pydantic.PositiveInt = 20
 
 
+class ThresholdOverride(pydantic.BaseModel):
+    """Model describing thresholds overriding the defaults for files matching globs.
+
+    Thresholds not given keep their default values. Excluded files are not assessed,
+    or parsed, at all. See :py:mod:`.overrides` for how patterns are matched.
+    """
+
+    paths: typing.List[str]
+    thresholds: typing.Dict[str, pydantic.PositiveInt] = {}
+    exclude: bool = False
+
+    @pydantic.validator("thresholds")
+    def _known_thresholds(cls, thresholds):  # pylint: disable=no-self-argument
+        unknown = set(thresholds) - set(ThresholdSettings.__fields__)
+        if unknown:
+            raise ValueError(f"unknown thresholds: {', '.join(sorted(unknown))}")
+        return thresholds
+
+
+class TriageSettings(pydantic.BaseModel):
+    """Model describing the checks which pass over files before they are parsed.
+
+    With ``skip_generated``, files matching one of the ``generated_paths`` globs, or
+    containing one of the ``generated_markers`` in their first ``header_size`` bytes,
+    are skipped as generated code. With ``skip_without_methods``, files in which the
+    word ``def`` never occurs are not parsed when extracting methods, since they can
+    contain none. See :py:mod:`.triage`.
+    """
+
+    skip_generated: bool = False
+    generated_paths: typing.List[str] = ["*_pb2.py", "*_pb2_grpc.py", "migrations"]
+    generated_markers: typing.List[str] = [
+        "# Generated by",
+        "@generated",
+        "DO NOT EDIT",
+    ]
+    header_size: pydantic.PositiveInt = 1024
+    skip_without_methods: bool = False
+
+
+class LimitSettings(pydantic.BaseModel):
+    """Model describing the per-file limits beyond which files are skipped.
+
+    By default, files are unlimited. The timeout applies to parsing and extracting
+    from a file, and is only enforced in the main thread on platforms supporting
+    ``SIGALRM``. The ``triage`` settings skip files before they are parsed at all.
+    """
+
+    max_file_size: typing.Optional[pydantic.PositiveInt] = None
+    max_node_count: typing.Optional[pydantic.PositiveInt] = None
+    timeout: typing.Optional[pydantic.PositiveFloat] = None
+    triage: TriageSettings = TriageSettings()
+
+
 class Settings(pydantic.BaseSettings):
     """Model describing general sourcery-analytics settings and their construction."""
 
     thresholds: ThresholdSettings = ThresholdSettings()
+    overrides: typing.List[ThresholdOverride] = []
+    limits: LimitSettings = LimitSettings()
 
     @classmethod
     def from_toml_file(cls, toml_file_path: pathlib.Path):
@@ -0,0 +1,53 @@
+"""Split the files to analyze into shards, to be analyzed separately.
+
+Files are assigned to shards by a stable hash of their path relative to the analyzed
+path, so that every machine selects the same files for a shard regardless of where the
+code is checked out. The results of the shards can be combined using
+:py:meth:`.PartialResult.merge`.
+"""
+import typing
+import zlib
+
+
+class Shard(typing.NamedTuple):
+    """One of ``shard_count`` shards, numbered from 1.
+
+    Examples:
+        >>> shard = Shard.parse("2/3")
+        >>> shard
+        Shard(shard_index=2, shard_count=3)
+        >>> [
+        ...     index
+        ...     for index in range(1, 4)
+        ...     if Shard(index, 3).contains("package/module.py")
+        ... ]
+        [3]
+    """
+
+    shard_index: int
+    shard_count: int
+
+    @classmethod
+    def parse(cls, text: str) -> "Shard":
+        """Parses a shard written as ``index/count``, such as ``1/4``.
+
+        Raises:
+            ValueError: if the text is not of that form, or the index is out of range
+        """
+        try:
+            index, count = (int(part) for part in text.split("/"))
+        except ValueError as exc:
+            raise ValueError(f"shard must be of the form I/N, not {text!r}") from exc
+        if not 1 <= index <= count:
+            raise ValueError(f"shard index must be between 1 and {count}, not {index}")
+        return cls(index, count)
+
+    def contains(self, relative_path: str) -> bool:
+        """Whether the file at the relative path, in posix form, is in this shard."""
+        return (
+            zlib.crc32(relative_path.encode()) % self.shard_count
+            == self.shard_index - 1
+        )
+
+    def __str__(self):
+        return f"{self.shard_index}/{self.shard_count}"
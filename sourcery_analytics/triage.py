@@ -0,0 +1,77 @@
+"""Triage files before parsing them, from their path and a cheap scan of their bytes.
+
+Parsing is by far the most expensive step of analyzing a file, and many files never
+need it. Generated code, such as protobuf modules and database migrations, is rarely
+worth analyzing, and can often be recognized from its path or the comment at its top.
+Modules without any methods, such as ``__init__.py`` files re-exporting names, produce
+no method metrics however they are parsed.
+
+A :py:class:`.Triage` makes these checks according to :py:class:`.TriageSettings`.
+Paths are checked before a file is read, then the start of the file is searched for
+markers of generated code, and finally the whole file is searched for ``def``, which
+every method, including ``async def`` methods, must contain. These are byte searches,
+far cheaper than tokenizing or parsing. A ``def`` in a comment or string still counts,
+so files are only passed over when they certainly contain no methods.
+"""
+import pathlib
+import re
+import typing
+
+from sourcery_analytics.overrides import PathMatcher, relative_path
+from sourcery_analytics.settings import TriageSettings
+
+_DEF = re.compile(rb"\bdef\b")
+
+
+class Triage:
+    """Decides which files to skip, and which need not be parsed, before parsing them.
+
+    Args:
+        settings: the checks to make
+        root: the directory path patterns are relative to, by default the current
+            directory. Patterns are matched as in :py:mod:`.overrides`.
+
+    Examples:
+        >>> settings = TriageSettings(skip_generated=True, skip_without_methods=True)
+        >>> triage = Triage(settings)
+        >>> triage.path_reason(pathlib.Path("api/service_pb2.py"))
+        "generated file matching '*_pb2.py'"
+        >>> triage.header_reason(b"# Generated by Django 4.2\\nimport django\\n")
+        "generated file marked '# Generated by'"
+        >>> triage.may_contain_methods(b"from .core import *\\n")
+        False
+        >>> triage.may_contain_methods(b"async def fetch(): ...\\n")
+        True
+    """
+
+    def __init__(
+        self, settings: TriageSettings, root: typing.Optional[pathlib.Path] = None
+    ):
+        self.settings = settings
+        self.root = (root or pathlib.Path.cwd()).absolute()
+        self._paths = PathMatcher(
+            (pattern, pattern) for pattern in settings.generated_paths
+        )
+        self._markers = [marker.encode() for marker in settings.generated_markers]
+
+    def path_reason(self, file: pathlib.Path) -> typing.Optional[str]:
+        """The reason to skip the file because of its path, or None to read it."""
+        if not self.settings.skip_generated:
+            return None
+        if patterns := self._paths.match(relative_path(file, self.root)):
+            return f"generated file matching {patterns[0]!r}"
+        return None
+
+    def header_reason(self, data: bytes) -> typing.Optional[str]:
+        """The reason to skip a file because of its first bytes, or None to parse it."""
+        if not self.settings.skip_generated:
+            return None
+        header = data[: self.settings.header_size]
+        for marker in self._markers:
+            if marker in header:
+                return f"generated file marked {marker.decode()!r}"
+        return None
+
+    def may_contain_methods(self, data: bytes) -> bool:
+        """False if the file certainly contains no methods, so need not be parsed."""
+        return not self.settings.skip_without_methods or bool(_DEF.search(data))
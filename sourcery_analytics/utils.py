@@ -1,11 +1,18 @@
 """Functions that don't fit anywhere else."""
+import collections
+import contextlib
 import functools
+import hashlib
 import pathlib
+import signal
 import textwrap
+import threading
 import typing
 
 import astroid
+import astroid.builder
 import astroid.manager
+import astroid.modutils
 import astroid.nodes
 
 
@@ -29,11 +36,142 @@ def clean_source(source_str: str) -> str:
     return textwrap.dedent(source_str).strip()
 
 
+K = typing.TypeVar("K", bound=typing.Hashable)
+V = typing.TypeVar("V")
+
+
+class LRUCache(typing.Generic[K, V]):
+    """A thread-safe cache holding up to ``maxsize`` values, evicting the least recent.
+
+    Examples:
+        >>> cache = LRUCache(maxsize=2)
+        >>> cache.get("a", lambda: 1), cache.get("b", lambda: 2)
+        (1, 2)
+        >>> cache.get("a", lambda: 3)
+        1
+        >>> _ = cache.get("c", lambda: 3)
+        >>> cache.get("b", lambda: 4)
+        4
+        >>> cache.hits, cache.misses
+        (1, 4)
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values: typing.OrderedDict[K, V] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K, compute: typing.Callable[[], V]) -> V:
+        """Returns the value for ``key``, computing and storing it if not present.
+
+        The value is computed outside the lock, so may occasionally be computed twice
+        by concurrent callers.
+        """
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._values[key] = value
+            while len(self._values) > self.maxsize:
+                self._discard(self._values.popitem(last=False)[1])
+        return value
+
+    def peek(self, key: K) -> typing.Optional[V]:
+        """Returns the value for ``key`` if present, counting a hit, or None."""
+        with self._lock:
+            if key not in self._values:
+                return None
+            self.hits += 1
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def clear(self) -> None:
+        """Discards every value, and resets the hit and miss counts."""
+        with self._lock:
+            while self._values:
+                self._discard(self._values.popitem(last=False)[1])
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _discard(self, value: V) -> None:
+        """Called with each value as it is discarded."""
+
+
+class ParseCache(LRUCache[typing.Tuple, astroid.nodes.NodeNG]):
+    """A size-bounded cache of nodes parsed from source strings and files.
+
+    Sources are keyed by a hash of their text, and files by their resolved path,
+    modification time, and size, so an edited file is parsed again. When full, the
+    least recently used entry is discarded. Modules parsed from files are also removed
+    from astroid's own module cache when discarded, so that memory stays bounded.
+
+    Examples:
+        >>> cache = ParseCache(maxsize=2)
+        >>> cache.extract_node("x + 1") is cache.extract_node("x + 1")
+        True
+        >>> cache.hits, cache.misses
+        (1, 1)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        manager: typing.Optional[astroid.manager.AstroidManager] = None,
+    ):
+        super().__init__(maxsize)
+        self.manager = manager or astroid.manager.AstroidManager()
+
+    def extract_node(self, source: str) -> astroid.nodes.NodeNG:
+        """Returns the node extracted from source by :py:func:`astroid.extract_node`."""
+        key = ("source", hashlib.blake2b(source.encode()).digest())
+        return self.get(key, lambda: astroid.extract_node(source))
+
+    def parse_file(self, path: pathlib.Path) -> astroid.nodes.Module:
+        """Returns the module parsed from the Python file at ``path``."""
+        filepath = str(path.resolve())
+        stat = path.stat()
+        key = ("file", filepath, stat.st_mtime_ns, stat.st_size)
+        return typing.cast(
+            astroid.nodes.Module, self.get(key, lambda: self._build_module(filepath))
+        )
+
+    def _build_module(self, filepath: str) -> astroid.nodes.Module:
+        # bypass the manager's lookup, which is keyed by module name only and so
+        # would return a stale module for an edited file
+        try:
+            modname = ".".join(astroid.modutils.modpath_from_file(filepath))
+        except ImportError:
+            modname = filepath
+        return astroid.builder.AstroidBuilder(self.manager).file_build(
+            filepath, modname
+        )
+
+    def _discard(self, value: astroid.nodes.NodeNG) -> None:
+        if (
+            isinstance(value, astroid.nodes.Module)
+            and self.manager.astroid_cache.get(value.name) is value
+        ):
+            del self.manager.astroid_cache[value.name]
+
+
+PARSE_CACHE = ParseCache()
+"""The parse cache shared by every function decorated with :py:func:`.nodedispatch`."""
+
+
 def nodedispatch(node_function: typing.Callable[[N], T]) -> typing.Callable[[NT], T]:
     """Extends compatibility of functions over nodes.
 
     Converts a function from working only on nodes to working on strings, nodes, and
-    file paths.
+    file paths. Strings and files are parsed through :py:data:`.PARSE_CACHE`, so
+    calling several such functions on the same file parses it only once.
 
     Examples:
         >>> @nodedispatch
@@ -42,17 +180,16 @@ def nodedispatch(node_function: typing.Callable[[N], T]) -> typing.Callable[[NT]
         >>> node_type("x")
         <class 'astroid.nodes.node_classes.Name'>
     """
-    manager = astroid.manager.AstroidManager()
 
     @functools.wraps(node_function)
     def wrapped(item: NT) -> T:
         if isinstance(item, astroid.nodes.NodeNG):
             return node_function(item)
         if isinstance(item, str):
-            node = astroid.extract_node(item)
+            node = PARSE_CACHE.extract_node(item)
             return node_function(node)
         if isinstance(item, pathlib.Path):
-            node = manager.ast_from_file(item)
+            node = PARSE_CACHE.parse_file(item)
             return node_function(node)
         raise NotImplementedError(
             f"Unable to coerce item of type {type(item)} into a node."
@@ -102,3 +239,39 @@ def validate_node_type(*types: typing.Type[astroid.nodes.NodeNG]):
         return wrapped
 
     return wrap
+
+
+@contextlib.contextmanager
+def time_limit(seconds: typing.Optional[float]):
+    """Raises :py:class:`TimeoutError` if the block takes longer than ``seconds``.
+
+    The limit is enforced using ``SIGALRM``, so it is only applied in the main thread
+    and on platforms which support it. Elsewhere, or if ``seconds`` is None, the block
+    runs without a limit. The signal is only handled between Python bytecodes, so a
+    block stuck inside a single call into C code overruns the limit until it returns.
+
+    Examples:
+        >>> import time
+        >>> with time_limit(0.01):
+        ...     time.sleep(1)
+        Traceback (most recent call last):
+        TimeoutError: exceeded time limit of 0.01s
+    """
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def _raise_timeout(_signum, _frame):
+        raise TimeoutError(f"exceeded time limit of {seconds}s")
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
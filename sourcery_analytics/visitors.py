@@ -199,3 +199,34 @@ class TreeVisitor(Visitor, typing.Generic[P, Q]):
 
     def touch(self, node: astroid.nodes.NodeNG) -> Q:
         return self.collector(self._visit(node))
+
+
+class StatementTreeVisitor(TreeVisitor[P, Q], typing.Generic[P, Q]):
+    """Collects the result of the sub-visitor applied to every statement of a node.
+
+    Statements, such as function and class definitions, only appear in the bodies of
+    modules, classes, functions, and compound statements, never inside expressions.
+    This visitor therefore only descends into statements (and the cases of ``match``
+    statements), skipping every expression subtree, and is much faster than a
+    :py:class:`.TreeVisitor` when only statements are of interest. The node it is
+    called on is always visited.
+
+    Examples:
+        >>> name_visitor = FunctionVisitor(lambda node: node.__class__.__name__)
+        >>> statement_name_visitor = StatementTreeVisitor(name_visitor, list)
+        >>> source = '''
+        ...     def one(x):
+        ...         if x:
+        ...             return f(lambda y: y + 1)
+        ... '''
+        >>> from sourcery_analytics.utils import clean_source
+        >>> statement_name_visitor.visit(astroid.parse(clean_source(source)))
+        ['Module', 'FunctionDef', 'If', 'Return']
+    """
+
+    def _visit(self, node: astroid.nodes.NodeNG):
+        yield self.sub_visitor.touch(node)
+        for child in node.get_children():
+            if child.is_statement or isinstance(child, astroid.nodes.MatchCase):
+                with self.enter(child):
+                    yield from self._visit(child)
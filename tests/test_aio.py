@@ -0,0 +1,171 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics.aio import aanalyze_methods, aiter_method_metrics
+from sourcery_analytics.analysis import (
+    RECORD_CACHE,
+    MethodRecorder,
+    analyze_methods,
+    iter_method_metrics,
+)
+from sourcery_analytics.metrics import method_cognitive_complexity, method_length
+from sourcery_analytics.metrics.aggregations import total
+
+METRICS = [method_length, method_cognitive_complexity]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for index in range(6):
+        (tmp_path / f"module_{index}.py").write_text(
+            f"def f{index}(x):\n    if x:\n        return {index}\n"
+            f"def g{index}():\n    pass\n"
+        )
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    RECORD_CACHE.clear()
+    yield
+    RECORD_CACHE.clear()
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestAiterMethodMetrics:
+    def test_matches_iter_method_metrics_in_order(self, tree):
+        records = asyncio.run(collect(aiter_method_metrics(tree, metrics=METRICS)))
+        assert records == list(iter_method_metrics(tree, metrics=METRICS))
+
+    def test_units_listed_in_chunks(self, tree):
+        with mock.patch("sourcery_analytics.aio.UNIT_CHUNK", 4):
+            records = asyncio.run(collect(aiter_method_metrics(tree, metrics=METRICS)))
+        assert records == list(iter_method_metrics(tree, metrics=METRICS))
+
+    def test_source(self):
+        records = asyncio.run(
+            collect(aiter_method_metrics("def f():\n    pass\n", metrics=METRICS))
+        )
+        assert [record.as_dict() for record in records] == [
+            {
+                "method_file": "<?>",
+                "method_qualname": ".f",
+                "method_lineno": 1,
+                "method_length": 1,
+                "method_cognitive_complexity": 0,
+            }
+        ]
+
+    def test_process_executor(self, tree):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            records = asyncio.run(
+                collect(aiter_method_metrics(tree, metrics=METRICS, executor=executor))
+            )
+        assert records == list(iter_method_metrics(tree, metrics=METRICS))
+
+    def test_cache(self, tree):
+        asyncio.run(collect(aiter_method_metrics(tree, metrics=METRICS, cache=True)))
+        with mock.patch.object(MethodRecorder, "records") as records:
+            cached = asyncio.run(
+                collect(aiter_method_metrics(tree, metrics=METRICS, cache=True))
+            )
+        records.assert_not_called()
+        assert cached == list(iter_method_metrics(tree, metrics=METRICS))
+
+    def test_on_file(self, tree):
+        files = []
+        asyncio.run(
+            collect(aiter_method_metrics(tree, metrics=METRICS, on_file=files.append))
+        )
+        assert sorted(files) == sorted(tree.iterdir())
+
+    def test_semaphore_caps_concurrency(self, tree):
+        running = 0
+        most = 0
+        lock = threading.Lock()
+
+        def slow_records(_recorder, *args):
+            nonlocal running, most
+            with lock:
+                running += 1
+                most = max(most, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return []
+
+        async def scan(semaphore):
+            return await collect(
+                aiter_method_metrics(tree, concurrency=6, semaphore=semaphore)
+            )
+
+        async def scans():
+            semaphore = asyncio.Semaphore(2)
+            await asyncio.gather(scan(semaphore), scan(semaphore))
+
+        with mock.patch.object(MethodRecorder, "records", slow_records):
+            asyncio.run(scans())
+        assert most == 2
+
+    def test_cancellation_stops_scan(self, tree):
+        started = []
+
+        def slow_records(_recorder, unit, *args):
+            started.append(unit)
+            time.sleep(0.05)
+            return []
+
+        async def scan():
+            task = asyncio.ensure_future(
+                collect(aiter_method_metrics(tree, concurrency=1))
+            )
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(MethodRecorder, "records", slow_records):
+            asyncio.run(scan())
+        assert len(started) == 1
+
+    def test_closing_early_cancels_pending(self, tree):
+        async def first():
+            iterator = aiter_method_metrics(tree, metrics=METRICS, concurrency=3)
+            record = await iterator.__anext__()
+            await iterator.aclose()
+            return record, [
+                task
+                for task in asyncio.all_tasks()
+                if task is not asyncio.current_task()
+            ]
+
+        record, tasks = asyncio.run(first())
+        assert record == next(iter_method_metrics(tree, metrics=METRICS))
+        assert all(task.cancelled() or task.done() for task in tasks)
+
+
+class TestAanalyzeMethods:
+    def test_matches_analyze_methods(self, tree):
+        results = asyncio.run(aanalyze_methods(tree, metrics=METRICS))
+        assert results == analyze_methods(tree, metrics=METRICS)
+
+    def test_aggregation(self, tree):
+        result = asyncio.run(
+            aanalyze_methods(tree, metrics=method_length, aggregation=total)
+        )
+        assert result == {"method_length": 18}
+
+    def test_process_executor(self, tree):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            results = asyncio.run(
+                aanalyze_methods(tree, metrics=METRICS, executor=executor)
+            )
+        assert results == analyze_methods(tree, metrics=METRICS)
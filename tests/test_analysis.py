@@ -2,6 +2,16 @@ import astroid
 import pytest
 
 from sourcery_analytics import analyze_methods, analyze
+import pickle
+import warnings
+
+from sourcery_analytics.analysis import (
+    RECORD_CACHE,
+    MethodRecord,
+    assess,
+    iter_method_metrics,
+)
+from sourcery_analytics.sharding import Shard
 from sourcery_analytics.metrics import (
     method_length,
     method_cognitive_complexity,
@@ -138,3 +148,121 @@ class TestAnalyze:
         """Check analyze produces the correct results."""
         analysis = analyze(nodes, metrics, compounder=tuple_metrics)
         assert analysis == expected
+
+
+class TestAssess:
+    def test_assess_no_methods(self):
+        assert list(assess([], metrics=[method_length])) == []
+
+
+class TestIterMethodMetrics:
+    @pytest.fixture
+    def tree(self, tmp_path):
+        for index in range(6):
+            (tmp_path / f"module_{index}.py").write_text(
+                f"def f{index}(x):\n    if x:\n        return {index}\n"
+                f"def g{index}():\n    pass\n"
+            )
+        return tmp_path
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        RECORD_CACHE.clear()
+        yield
+        RECORD_CACHE.clear()
+
+    def records(self, item, **kwargs):
+        return sorted(
+            iter_method_metrics(
+                item, metrics=[method_length, method_cognitive_complexity], **kwargs
+            ),
+            key=lambda record: (record.file, record.lineno),
+        )
+
+    def test_matches_analyze_methods(self, tree):
+        records = self.records(tree)
+        expected = analyze_methods(
+            tree, metrics=[method_length, method_cognitive_complexity]
+        )
+        assert sorted(record.metrics().items() for record in records) == sorted(
+            result.items() for result in expected
+        )
+        assert {record.lineno for record in records} == {1, 4}
+
+    def test_is_lazy(self, tree):
+        records = iter_method_metrics(tree, metrics=method_length)
+        assert isinstance(next(records), MethodRecord)
+
+    def test_iterable_of_items(self, tree):
+        files = sorted(tree.glob("*.py"))
+        assert self.records(files[:2]) == self.records(files[0]) + self.records(
+            files[1]
+        )
+
+    def test_parallel(self, tree):
+        records = list(
+            iter_method_metrics(
+                tree, metrics=[method_length, method_cognitive_complexity], jobs=2
+            )
+        )
+        assert records == list(
+            iter_method_metrics(
+                tree, metrics=[method_length, method_cognitive_complexity]
+            )
+        )
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_cache(self, tree, jobs):
+        first = self.records(tree, cache=True, jobs=jobs)
+        assert RECORD_CACHE.hits == 0
+        assert self.records(tree, cache=True, jobs=jobs) == first
+        assert RECORD_CACHE.hits == 6
+
+    def test_cache_misses_edited_file(self, tree):
+        self.records(tree, cache=True)
+        (tree / "module_0.py").write_text("def changed():\n    return 1\n")
+        records = self.records(tree, cache=True)
+        assert "changed" in {record.qualname.rsplit(".")[-1] for record in records}
+
+    def test_shard(self, tree):
+        shards = [self.records(tree, shard=Shard(index, 2)) for index in (1, 2)]
+        assert sorted(shards[0] + shards[1], key=lambda r: r.file) == sorted(
+            self.records(tree), key=lambda r: r.file
+        )
+        assert self.records(tree, shard=Shard(1, 2), jobs=2, cache=True) == shards[0]
+
+    def test_on_file(self, tree):
+        files = []
+        list(iter_method_metrics(tree, cache=True, on_file=files.append))
+        assert len(files) == 6
+
+    def test_skipped_files_warn(self, tree):
+        (tree / "bad.py").write_text("def bad(:")
+        with pytest.warns(SyntaxWarning):
+            assert len(self.records(tree, cache=True)) == 12
+
+
+class TestMethodRecord:
+    @pytest.fixture
+    def record(self):
+        return MethodRecord(
+            "a.py", "a.f", 3, values=(1, 2), names=("method_length", "other")
+        )
+
+    def test_getitem(self, record):
+        assert record["other"] == 2
+        with pytest.raises(KeyError):
+            record["missing"]
+
+    def test_is_slotted(self, record):
+        assert not hasattr(record, "__dict__")
+
+    def test_round_trips(self, record):
+        assert MethodRecord.from_dict(record.as_dict()) == record
+        assert pickle.loads(pickle.dumps(record)) == record
+
+    def test_repr(self, record):
+        assert repr(record) == (
+            "MethodRecord(file='a.py', qualname='a.f', lineno=3, "
+            "method_length=1, other=2)"
+        )
@@ -0,0 +1,90 @@
+import astroid
+import pytest
+
+from sourcery_analytics.batch import BatchManifest, BatchRoot, aggregate_roots
+from sourcery_analytics.metrics import method_cyclomatic_complexity, method_length
+from sourcery_analytics.settings import Settings
+
+
+@pytest.fixture
+def roots(tmp_path):
+    alpha = tmp_path / "alpha"
+    alpha.mkdir()
+    (alpha / "a.py").write_text("def a():\n    x = 1\n    return x\n")
+    beta = tmp_path / "beta"
+    beta.mkdir()
+    (beta / "b.py").write_text("def b(x):\n    if x:\n        return 1\n")
+    (beta / "pyproject.toml").write_text(
+        "[tool.sourcery-analytics.limits]\nmax_file_size = 60\n"
+    )
+    (beta / "big.py").write_text("def big():\n    pass\n" * 10)
+    return tmp_path
+
+
+def test_manifest_paths_relative_to_manifest(roots):
+    manifest_path = roots / "manifest.toml"
+    manifest_path.write_text(
+        '[[roots]]\npath = "alpha"\n'
+        '[[roots]]\npath = "beta"\nname = "b"\nsettings_file = "beta/pyproject.toml"\n'
+    )
+    manifest = BatchManifest.from_toml_file(manifest_path)
+    assert manifest.roots == [
+        BatchRoot(path=roots / "alpha"),
+        BatchRoot(
+            path=roots / "beta", name="b", settings_file=roots / "beta/pyproject.toml"
+        ),
+    ]
+    assert [root.label for root in manifest.roots] == [str(roots / "alpha"), "b"]
+
+
+def test_aggregate_roots(roots):
+    batch = [
+        BatchRoot(path=roots / "alpha"),
+        BatchRoot(path=roots / "beta", settings_file=roots / "beta/pyproject.toml"),
+    ]
+    with pytest.warns(UserWarning, match="exceeds limit"):
+        results = list(
+            aggregate_roots(
+                batch, metrics=[method_length, method_cyclomatic_complexity]
+            )
+        )
+    assert [(root, state.count) for root, state in results] == [
+        (batch[0], 1),
+        (batch[1], 1),
+    ]
+    assert results[0][1].total == {
+        "method_length": 2,
+        "method_cyclomatic_complexity": 0,
+    }
+    assert results[1][1].total == {
+        "method_length": 2,
+        "method_cyclomatic_complexity": 1,
+    }
+
+
+def test_aggregate_roots_settings_loader(roots):
+    loaded = []
+
+    def load_settings(path):
+        loaded.append(path)
+        return Settings()
+
+    batch = [BatchRoot(path=roots / "beta", settings_file=roots / "beta/x.toml")]
+    ((_root, state),) = aggregate_roots(
+        batch, metrics=[method_length], load_settings=load_settings
+    )
+    assert loaded == [roots / "beta/x.toml"]
+    assert state.count == 11
+
+
+def test_aggregate_roots_missing_root(roots):
+    batch = [BatchRoot(path=roots / "missing"), BatchRoot(path=roots / "alpha")]
+    with pytest.warns(UserWarning, match="missing"):
+        results = list(aggregate_roots(batch, metrics=[method_length]))
+    assert [root for root, _state in results] == batch[1:]
+
+
+def test_aggregate_roots_evicts_parsed_modules(roots):
+    cached = set(astroid.MANAGER.astroid_cache)
+    list(aggregate_roots([BatchRoot(path=roots / "alpha")], metrics=[method_length]))
+    assert set(astroid.MANAGER.astroid_cache) <= cached
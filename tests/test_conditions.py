@@ -8,6 +8,7 @@ from sourcery_analytics.conditions import (
     is_method,
     is_const,
     is_name,
+    matches_statements_only,
 )
 
 
@@ -111,3 +112,19 @@ class TestIsName:
 
     def test_neg(self, nodes):
         assert not is_name(nodes[1])
+
+
+class TestMatchesStatementsOnly:
+    @pytest.mark.parametrize(
+        "condition, expected",
+        [
+            (is_method, True),
+            (is_type(astroid.nodes.ClassDef, astroid.nodes.ExceptHandler), True),
+            (is_type(astroid.nodes.FunctionDef, astroid.nodes.Lambda), False),
+            (is_const, False),
+            (is_elif, False),
+            (always, False),
+        ],
+    )
+    def test_matches_statements_only(self, condition, expected):
+        assert matches_statements_only(condition) is expected
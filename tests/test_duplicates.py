@@ -0,0 +1,122 @@
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics.duplicates import (
+    DuplicateIndex,
+    find_duplicates,
+    method_fingerprint,
+)
+from sourcery_analytics.extractors import extract_methods
+
+
+@pytest.fixture
+def source():
+    return """
+        def load(path):
+            with open(path) as file:
+                data = file.read()
+            rows = [line.split(",") for line in data.splitlines()]
+            header, *body = rows
+            return [dict(zip(header, row)) for row in body]
+
+        def read_table(filename):
+            with open(filename) as f:
+                text = f.read()
+            rows = [line.split(";") for line in text.splitlines()]
+            keys, *values = rows
+            return [dict(zip(keys, value)) for value in values]
+
+        def load_logged(path):
+            print(path)
+            with open(path) as file:
+                data = file.read()
+            rows = [line.split(",") for line in data.splitlines()]
+            header, *body = rows
+            return [dict(zip(header, row)) for row in body]
+
+        def unrelated(x):
+            if x > 0:
+                return x
+            while x < 0:
+                x += 1
+            return -x
+    """
+
+
+def qualnames(groups):
+    return [[method.method_qualname for method in group.methods] for group in groups]
+
+
+class TestMethodFingerprint:
+    def test_names_and_constants_ignored(self):
+        left, _ = method_fingerprint(next(extract_methods("def f(x): return x + 1")))
+        right, _ = method_fingerprint(next(extract_methods("def g(y): return y + 2")))
+        assert left == right
+
+    def test_operators_kept(self):
+        left, _ = method_fingerprint(next(extract_methods("def f(x): return x + 1")))
+        right, _ = method_fingerprint(next(extract_methods("def f(x): return x - 1")))
+        assert left != right
+
+    def test_length(self):
+        _, length = method_fingerprint(
+            next(extract_methods("def f(x):\n    y = x\n    return y"))
+        )
+        assert length == 2
+
+
+class TestFindDuplicates:
+    def test_exact(self, cleaned_source):
+        groups = list(find_duplicates(extract_methods(cleaned_source), threshold=1.0))
+        assert qualnames(groups) == [[".load", ".read_table"]]
+        assert groups[0].similarity == 1.0
+
+    def test_near(self, cleaned_source):
+        groups = list(find_duplicates(extract_methods(cleaned_source)))
+        assert qualnames(groups) == [[".load", ".read_table", ".load_logged"]]
+        assert 0.8 <= groups[0].similarity < 1.0
+
+    def test_min_length(self, cleaned_source):
+        groups = find_duplicates(extract_methods(cleaned_source), min_length=10)
+        assert list(groups) == []
+
+    def test_exact_only_skips_signatures(self, cleaned_source):
+        index = DuplicateIndex(threshold=1.0)
+        index.update(extract_methods(cleaned_source))
+        assert not index._signatures
+
+    def test_path(self, file_path, file, cleaned_source):
+        groups = list(find_duplicates(extract_methods(file_path), threshold=1.0))
+        assert groups[0].methods[0].method_file == str(file_path)
+        assert groups[0].methods[0].method_lineno == 1
+
+
+class TestDuplicateIndex:
+    def test_signature_estimates_jaccard_similarity(self):
+        index = DuplicateIndex(shingle_size=1, bands=128, rows=4)
+        labels = [f"label{n}" for n in range(200)]
+        errors = []
+        for overlap in (20, 60, 100, 140, 180):
+            left, right = labels[: overlap + 10], labels[200 - overlap - 10 :]
+            exact = len(set(left) & set(right)) / len(set(left) | set(right))
+            index._signatures = {
+                b"left": index._signature(left),
+                b"right": index._signature(right),
+            }
+            errors.append(index._similarity(b"left", b"right") - exact)
+        assert max(abs(error) for error in errors) < 0.1
+        assert abs(sum(errors) / len(errors)) < 0.05
+
+    def test_candidates_are_capped(self):
+        source = "\n".join(
+            f"def f{n}(x):\n    y = x + {n}\n    z = y * 2\n    return z{' + 1' * n}"
+            for n in range(60)
+        )
+        index = DuplicateIndex(threshold=0.99, min_length=1, max_candidates=4)
+        index.update(extract_methods(source))
+        with mock.patch.object(
+            DuplicateIndex, "_similarity", autospec=True, return_value=0.0
+        ) as similarity:
+            list(index.groups())
+        assert 0 < similarity.call_count <= 4 * 60 * index.bands
@@ -0,0 +1,111 @@
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics.analysis import assess
+from sourcery_analytics.explain import (
+    BreachExplainer,
+    explain_method,
+    line_contributions,
+)
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics import (
+    method_cognitive_complexity,
+    method_length,
+    method_working_memory,
+)
+from sourcery_analytics.settings import ThresholdSettings
+
+SOURCE = """
+    def process(items, flag):
+        total = 0
+        for item in items:
+            if item.valid:
+                if flag:
+                    total += item.value
+                else:
+                    total -= 1
+            elif item.skip:
+                continue
+        return total
+
+    def simple(x):
+        return x
+"""
+
+
+@pytest.fixture
+def methods():
+    return list(extract_methods(SOURCE))
+
+
+class TestLineContributions:
+    def test_cognitive_complexity_sums_to_metric(self, methods):
+        for method in methods:
+            contributions = line_contributions(method, "method_cognitive_complexity")
+            assert sum(contributions.values()) == method_cognitive_complexity(method)
+
+    def test_cognitive_complexity(self, methods):
+        assert line_contributions(methods[0], "method_cognitive_complexity") == {
+            3: 1,
+            4: 2,
+            5: 4,
+            9: 2,
+        }
+
+    def test_working_memory_peaks_at_metric(self, methods):
+        for method in methods:
+            contributions = line_contributions(method, "method_working_memory")
+            assert max(contributions.values()) == method_working_memory(method)
+
+    def test_unknown_metric(self, methods):
+        with pytest.raises(KeyError):
+            line_contributions(methods[0], "method_length")
+
+
+class TestExplainMethod:
+    def test_every_line_of_the_method(self, methods):
+        explanation = explain_method(methods[0], "method_cognitive_complexity")
+        assert explanation.metric_name == "method_cognitive_complexity"
+        assert [line.lineno for line in explanation.lines] == list(range(1, 12))
+        assert explanation.lines[0].source == "def process(items, flag):"
+        assert explanation.lines[4].source == "            if flag:"
+        assert explanation.lines[4].value == 4
+
+
+class TestBreachExplainer:
+    def assess(self, explainer, methods, **thresholds):
+        return assess(
+            explainer.track(methods),
+            metrics=[method_length, method_cognitive_complexity],
+            threshold_settings=ThresholdSettings(**thresholds),
+        )
+
+    def test_explains_breaching_method(self, methods):
+        explainer = BreachExplainer()
+        explained = [
+            (breach["method_name"], explainer.explain(breach))
+            for breach in self.assess(explainer, methods, method_cognitive_complexity=1)
+        ]
+        assert [name for name, _ in explained] == ["process"]
+        assert explained[0][1] == explain_method(
+            methods[0], "method_cognitive_complexity"
+        )
+
+    def test_unexplainable_metric(self, methods):
+        explainer = BreachExplainer()
+        breaches = self.assess(explainer, methods, method_length=1)
+        assert [explainer.explain(breach) for breach in breaches] == [None]
+
+    def test_only_breaching_methods_are_explained(self, methods):
+        explainer = BreachExplainer()
+        with mock.patch(
+            "sourcery_analytics.explain.explain_method", wraps=explain_method
+        ) as explain:
+            for breach in self.assess(
+                explainer, methods, method_cognitive_complexity=1, method_length=1
+            ):
+                explainer.explain(breach)
+                explainer.explain(breach)
+        assert explain.call_count == 1
+        assert explain.call_args.args == (methods[0], "method_cognitive_complexity")
@@ -0,0 +1,91 @@
+import operator
+import random
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics import external_sort
+from sourcery_analytics.analysis import MethodRecord
+from sourcery_analytics.external_sort import sort_records
+
+NAMES = ("method_length", "method_cognitive_complexity", "method_halstead_volume")
+
+
+@pytest.fixture
+def records():
+    rng = random.Random(0)
+    return [
+        MethodRecord(
+            f"package/module_{index % 7}.py",
+            f"module_{index % 7}.f{index}",
+            index,
+            values=(rng.randint(0, 20), rng.randint(0, 5), rng.random() * 100),
+            names=NAMES,
+        )
+        for index in range(500)
+    ]
+
+
+def expected(records, key, reverse):
+    by_location = sorted(records, key=operator.attrgetter("file", "lineno"))
+    return sorted(by_location, key=operator.itemgetter(key), reverse=reverse)
+
+
+class TestSortRecords:
+    @pytest.mark.parametrize("reverse", [False, True])
+    @pytest.mark.parametrize("key", NAMES)
+    def test_in_memory(self, records, key, reverse):
+        with mock.patch.object(external_sort, "_write_run") as write_run:
+            result = list(sort_records(records, key=key, reverse=reverse))
+        write_run.assert_not_called()
+        assert result == expected(records, key, reverse)
+
+    @pytest.mark.parametrize("reverse", [False, True])
+    def test_spilled_runs_are_merged(self, records, reverse):
+        with mock.patch.object(
+            external_sort, "_write_run", wraps=external_sort._write_run
+        ) as write_run:
+            result = list(
+                sort_records(
+                    records, key="method_length", reverse=reverse, memory_limit=4096
+                )
+            )
+        assert write_run.call_count > 1
+        assert result == expected(records, "method_length", reverse)
+        assert [record.lineno for record in result] == [
+            record.lineno for record in expected(records, "method_length", reverse)
+        ]
+
+    def test_ties_are_ordered_by_location(self, records):
+        shuffled = random.Random(1).sample(records, len(records))
+        for memory_limit in (4096, external_sort.MEMORY_LIMIT):
+            result = sort_records(
+                shuffled, key="method_length", reverse=True, memory_limit=memory_limit
+            )
+            assert list(result) == expected(records, "method_length", True)
+
+    def test_runs_beyond_fan_in_are_merged_in_passes(self, records):
+        with mock.patch.object(external_sort, "MERGE_FAN_IN", 3):
+            result = list(sort_records(records, key="method_length", memory_limit=1024))
+        assert result == expected(records, "method_length", False)
+
+    def test_temporary_files_are_removed(self, records, tmp_path):
+        sorted_records = sort_records(
+            records, key="method_length", memory_limit=4096, directory=tmp_path
+        )
+        next(sorted_records)
+        assert list(tmp_path.iterdir())
+        sorted_records.close()
+        assert not list(tmp_path.iterdir())
+
+    def test_empty(self):
+        assert list(sort_records([], key="method_length")) == []
+
+    def test_mismatched_names(self, records):
+        other = MethodRecord("a.py", "a.f", 1, values=(1,), names=("method_length",))
+        with pytest.raises(ValueError, match="cannot sort records"):
+            list(sort_records([records[0], other], key="method_length"))
+
+    def test_unknown_key(self, records):
+        with pytest.raises(ValueError):
+            list(sort_records(records, key="method_working_memory"))
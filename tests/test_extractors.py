@@ -1,9 +1,27 @@
+import io
+import json
+import pathlib
+import sys
+import tarfile
+import time
+import zipfile
+from unittest import mock
+
 import astroid.nodes
 import pytest
 
 from sourcery_analytics import extract_methods, extract
-from sourcery_analytics.conditions import is_const
-from sourcery_analytics.extractors import Extractor
+from sourcery_analytics.conditions import is_const, is_method, is_type
+from sourcery_analytics.extractors import Extractor, SkippedFileWarning
+from sourcery_analytics.metrics.utils import method_file
+from sourcery_analytics.settings import LimitSettings, TriageSettings
+from sourcery_analytics.sharding import Shard
+from sourcery_analytics.utils import clean_source
+from sourcery_analytics.visitors import (
+    ConditionalVisitor,
+    FunctionVisitor,
+    TreeVisitor,
+)
 
 
 @pytest.fixture
@@ -103,3 +121,490 @@ class TestExtractor:
     def test_extract_with_syntax_error(self, extractor, file_path, file, caplog):
         with pytest.warns(SyntaxWarning):
             list(extractor.extract(file_path))
+
+
+class TestExtractorLimits:
+    @pytest.fixture
+    def source(self):
+        return """
+            def one():
+                return 1
+        """
+
+    @pytest.mark.parametrize(
+        "limits",
+        [
+            LimitSettings(max_file_size=10),
+            LimitSettings(max_node_count=3),
+        ],
+    )
+    def test_exceeds_limits(self, file_path, file, limits):
+        with pytest.warns(SkippedFileWarning) as record:
+            result = list(extract_methods(file_path, limits=limits))
+        assert result == []
+        assert record[0].message.path == file_path
+        assert "exceeds limit" in record[0].message.reason
+
+    @pytest.mark.parametrize(
+        "limits",
+        [
+            LimitSettings(),
+            LimitSettings(max_file_size=1000, max_node_count=100, timeout=10),
+        ],
+    )
+    def test_within_limits(self, file_path, file, limits):
+        result = list(extract_methods(file_path, limits=limits))
+        assert [n.name for n in result] == ["one"]
+
+    def test_timeout(self, file_path, file):
+        def slow(node):
+            time.sleep(0.1)
+
+        extractor = Extractor(FunctionVisitor(slow), limits=LimitSettings(timeout=0.01))
+        with pytest.warns(SkippedFileWarning, match="time limit"):
+            assert list(extractor.extract(file_path)) == []
+
+    def test_too_deeply_nested(self, tmp_path, file):
+        (tmp_path / "deep.py").write_text("x = " + "-" * 5000 + "1")
+        with pytest.warns(SkippedFileWarning, match="too deeply nested"):
+            result = list(extract_methods(tmp_path))
+        assert [n.name for n in result] == ["one"]
+
+
+class TestExtractorReadAhead:
+    def test_read_ahead(self, tmp_path, file):
+        for index in range(10):
+            (tmp_path / f"file{index}.py").write_text(f"def f{index}(): pass")
+        expected = [n.qname() for n in extract_methods(tmp_path)]
+        result = [n.qname() for n in extract_methods(tmp_path, read_ahead=3)]
+        assert result == expected
+        assert len(result) == 12
+
+    def test_read_ahead_limits(self, tmp_path, file):
+        (tmp_path / "big.py").write_text("def big():\n    pass\n" * 100)
+        with pytest.warns(SkippedFileWarning, match="exceeds limit"):
+            result = list(
+                extract_methods(
+                    tmp_path, limits=LimitSettings(max_file_size=100), read_ahead=2
+                )
+            )
+        assert [n.name for n in result] == ["one", "two"]
+
+    def test_read_ahead_encoding(self, tmp_path):
+        (tmp_path / "latin.py").write_bytes(
+            b"# -*- coding: latin-1 -*-\ndef caf\xe9(): pass\n"
+        )
+        (tmp_path / "nonsense.py").write_bytes(b"# -*- coding: nonsense -*-\n")
+        with pytest.warns(SyntaxWarning):
+            result = list(extract_methods(tmp_path, read_ahead=2))
+        assert [n.name for n in result] == ["café"]
+
+
+class TestExtractFromArchive:
+    @pytest.fixture
+    def members(self):
+        return {
+            "package/__init__.py": "",
+            "package/module.py": "def one():\n    return 1\n",
+            "package/sub/other.py": "def two():\n    return 2\n",
+            "package/data.txt": "def not_python(): pass\n",
+        }
+
+    @pytest.fixture
+    def zip_path(self, tmp_path, members):
+        path = tmp_path / "package-1.0-py3-none-any.whl"
+        with zipfile.ZipFile(path, "w") as zip_file:
+            for name, content in members.items():
+                zip_file.writestr(name, content)
+        return path
+
+    @pytest.fixture
+    def tar_path(self, tmp_path, members):
+        path = tmp_path / "package-1.0.tar.gz"
+        with tarfile.open(path, "w:gz") as tar_file:
+            for name, content in members.items():
+                data = content.encode()
+                info = tarfile.TarInfo(f"package-1.0/{name}")
+                info.size = len(data)
+                tar_file.addfile(info, io.BytesIO(data))
+        return path
+
+    def test_zip(self, zip_path):
+        result = list(extract_methods(zip_path))
+        assert [n.name for n in result] == ["one", "two"]
+        assert [method_file(n) for n in result] == [
+            str(zip_path / "package/module.py"),
+            str(zip_path / "package/sub/other.py"),
+        ]
+
+    def test_tar(self, tar_path):
+        result = list(extract_methods(tar_path))
+        assert [n.name for n in result] == ["one", "two"]
+        assert method_file(result[0]) == str(tar_path / "package-1.0/package/module.py")
+
+    def test_nothing_written(self, tmp_path, zip_path, tar_path):
+        before = sorted(tmp_path.rglob("*"))
+        list(extract_methods(zip_path))
+        list(extract_methods(tar_path))
+        assert sorted(tmp_path.rglob("*")) == before
+
+    def test_limits(self, zip_path):
+        with pytest.warns(SkippedFileWarning, match="exceeds limit") as record:
+            result = list(
+                extract_methods(zip_path, limits=LimitSettings(max_file_size=20))
+            )
+        assert result == []
+        assert {warning.message.path.name for warning in record} == {
+            "module.py",
+            "other.py",
+        }
+
+    def test_syntax_error(self, tmp_path):
+        path = tmp_path / "broken.zip"
+        with zipfile.ZipFile(path, "w") as zip_file:
+            zip_file.writestr("broken.py", "def broken(:\n")
+            zip_file.writestr("fine.py", "def fine(): pass\n")
+        with pytest.warns(SyntaxWarning, match="broken.py"):
+            result = list(extract_methods(path))
+        assert [n.name for n in result] == ["fine"]
+
+
+def write_notebook(path, *sources, language="python"):
+    cells = [{"cell_type": "markdown", "source": "# Notebook"}] + [
+        {
+            "cell_type": "code",
+            "outputs": [{"data": {"image/png": "iVBORw0KGgo" * 100}}],
+            "source": source.splitlines(keepends=True),
+        }
+        for source in sources
+    ]
+    metadata = {"language_info": {"name": language}}
+    path.write_text(json.dumps({"cells": cells, "metadata": metadata, "nbformat": 4}))
+    return path
+
+
+class TestExtractFromNotebook:
+    @pytest.fixture
+    def notebook(self, tmp_path):
+        return write_notebook(
+            tmp_path / "analysis.ipynb",
+            "import os\n%matplotlib inline\n\ndef one():\n    return 1\n",
+            "def two(x):\n    !echo $x\n    return 2\n",
+        )
+
+    def test_cells(self, notebook):
+        result = list(extract_methods(notebook))
+        assert [n.name for n in result] == ["one", "two"]
+        assert [method_file(n) for n in result] == [
+            str(notebook / "cell_2"),
+            str(notebook / "cell_3"),
+        ]
+        assert [n.lineno for n in result] == [4, 1]
+
+    @pytest.mark.parametrize("read_ahead", [0, 2])
+    def test_directory(self, tmp_path, notebook, read_ahead):
+        (tmp_path / "module.py").write_text("def three(): pass")
+        result = list(extract_methods(tmp_path, read_ahead=read_ahead))
+        assert sorted(n.name for n in result) == ["one", "three", "two"]
+
+    def test_syntax_error_in_cell(self, tmp_path):
+        notebook = write_notebook(
+            tmp_path / "broken.ipynb", "def broken(:\n", "def fine(): pass\n"
+        )
+        with pytest.warns(SyntaxWarning, match="cell_2"):
+            result = list(extract_methods(notebook))
+        assert [n.name for n in result] == ["fine"]
+
+    def test_limits_apply_to_cells(self, notebook):
+        result = list(extract_methods(notebook, limits=LimitSettings(max_file_size=60)))
+        assert [n.name for n in result] == ["one", "two"]
+
+    def test_other_language(self, tmp_path):
+        notebook = write_notebook(
+            tmp_path / "r.ipynb", "f <- function(x) x", language="R"
+        )
+        with pytest.warns(SkippedFileWarning, match="not Python"):
+            assert list(extract_methods(notebook)) == []
+
+    def test_invalid(self, tmp_path):
+        notebook = tmp_path / "invalid.ipynb"
+        notebook.write_text('{"cells": [')
+        files = []
+        with pytest.warns(SkippedFileWarning, match="invalid notebook"):
+            assert list(extract_methods(notebook, on_file=files.append)) == []
+        assert files == [notebook]
+
+    @pytest.mark.parametrize("read_ahead", [0, 2])
+    def test_invalid_in_directory(self, tmp_path, notebook, read_ahead):
+        (tmp_path / "invalid.ipynb").write_text("def not_python(): pass")
+        with pytest.warns(SkippedFileWarning, match="invalid notebook"):
+            result = list(extract_methods(tmp_path, read_ahead=read_ahead))
+        assert sorted(n.name for n in result) == ["one", "two"]
+
+    def test_on_file_called_once(self, notebook):
+        files = []
+        list(extract_methods(notebook, on_file=files.append))
+        assert files == [notebook]
+        assert Extractor().count_files(notebook.parent) == 1
+
+
+class TestExtractTriage:
+    @pytest.fixture
+    def tree(self, tmp_path):
+        files = {
+            "module.py": "def one():\n    return 1\n",
+            "__init__.py": "from .module import one\n",
+            "api/service_pb2.py": "def two(): pass\n",
+            "app/migrations/0001_initial.py": "def three(): pass\n",
+            "models.py": "# Generated by Django 4.2\ndef four(): pass\n",
+            "broken.py": "x = (\n",
+        }
+        for name, content in files.items():
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text(content)
+        return tmp_path
+
+    @pytest.fixture
+    def limits(self):
+        return LimitSettings(
+            triage=TriageSettings(skip_generated=True, skip_without_methods=True)
+        )
+
+    @pytest.mark.parametrize("read_ahead", [0, 2])
+    def test_skips_generated_files(self, tree, limits, read_ahead):
+        files = []
+        with pytest.warns(SkippedFileWarning) as record:
+            result = list(
+                extract_methods(
+                    tree, limits=limits, read_ahead=read_ahead, on_file=files.append
+                )
+            )
+        assert [n.name for n in result] == ["one"]
+        assert {
+            (warning.message.path.name, warning.message.reason) for warning in record
+        } == {
+            ("service_pb2.py", "generated file matching '*_pb2.py'"),
+            ("0001_initial.py", "generated file matching 'migrations'"),
+            ("models.py", "generated file marked '# Generated by'"),
+        }
+        assert len(files) == 6
+
+    def test_files_without_methods_are_not_parsed(self, tree, limits):
+        with mock.patch.object(
+            Extractor, "_parse_bytes", autospec=True, side_effect=Extractor._parse_bytes
+        ) as parse_bytes:
+            with pytest.warns(SkippedFileWarning):
+                list(extract_methods(tree, limits=limits))
+        assert [call.args[2].name for call in parse_bytes.call_args_list] == [
+            "module.py"
+        ]
+
+    def test_other_extractions_parse_every_file(self, tree, limits):
+        with pytest.warns(SyntaxWarning, match="broken.py"):
+            with pytest.warns(SkippedFileWarning):
+                result = list(extract(tree, condition=is_const, limits=limits))
+        assert [node.value for node in result] == [1]
+
+    def test_disabled_by_default(self, tree):
+        with pytest.warns(SyntaxWarning, match="broken.py"):
+            result = list(extract_methods(tree))
+        assert sorted(n.name for n in result) == ["four", "one", "three", "two"]
+
+
+class TestExtractShard:
+    def test_shards_partition_directory(self, tmp_path):
+        for index in range(20):
+            (tmp_path / f"file{index}.py").write_text(f"def f{index}(): pass")
+        expected = sorted(n.name for n in extract_methods(tmp_path))
+        result = [
+            n.name
+            for index in range(1, 4)
+            for n in extract_methods(tmp_path, shard=Shard(index, 3))
+        ]
+        assert sorted(result) == expected
+
+    def test_shard_uses_relative_path(self, tmp_path):
+        for root in ("one", "two"):
+            (tmp_path / root / "package").mkdir(parents=True)
+            (tmp_path / root / "package" / "module.py").write_text("def f(): pass")
+        for index in range(1, 3):
+            shard = Shard(index, 2)
+            assert len(list(extract_methods(tmp_path / "one", shard=shard))) == len(
+                list(extract_methods(tmp_path / "two", shard=shard))
+            )
+
+    def test_shard_single_file_by_relative_path(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for directory in ("one", "two", "three", "four"):
+            (tmp_path / directory).mkdir()
+            (tmp_path / directory / "module.py").write_text("def f(): pass")
+            for path in (pathlib.Path(directory), tmp_path / directory):
+                shard = Shard(1, 2)
+                methods = list(extract_methods(path / "module.py", shard=shard))
+                assert len(methods) == shard.contains(f"{directory}/module.py")
+
+    def test_shard_single_file(self, file_path, file):
+        counts = [
+            len(list(extract_methods(file_path, shard=Shard(index, 2))))
+            for index in range(1, 3)
+        ]
+        assert sorted(counts) == [0, 2]
+
+
+class TestExtractStatements:
+    SOURCE = """
+        import contextlib
+
+        @decorate(lambda f: f)
+        class One:
+            def method(self, x=lambda: 1):
+                def inner():
+                    pass
+                return [y for y in x]
+
+        def two(value):
+            try:
+                with contextlib.suppress(KeyError):
+                    def in_with(): pass
+            except ValueError:
+                def in_handler(): pass
+            else:
+                def in_else(): pass
+            finally:
+                def in_finally(): pass
+            while True:
+                async def in_while(): pass
+    """
+    if sys.version_info >= (3, 10):
+        SOURCE += """
+            match value:
+                case [first, *_]:
+                    def in_case(): pass
+        """
+
+    @pytest.mark.parametrize(
+        "condition",
+        [
+            is_method,
+            is_type(astroid.nodes.ClassDef, astroid.nodes.ExceptHandler),
+            is_type(astroid.nodes.FunctionDef, astroid.nodes.Lambda),
+        ],
+    )
+    def test_same_results_as_full_walk(self, condition):
+        module = astroid.parse(clean_source(self.SOURCE))
+        expected = [
+            node
+            for node in TreeVisitor(ConditionalVisitor(condition=condition)).visit(
+                module
+            )
+            if node
+        ]
+        assert list(extract(module, condition=condition)) == expected
+
+    def test_expressions_are_not_visited(self):
+        module = astroid.parse("def one(): return f(a + b)")
+        visited = []
+        extractor = Extractor(
+            ConditionalVisitor(
+                condition=lambda node: visited.append(node) or is_method(node)
+            )
+        )
+        extractor.visitor.condition.types = is_method.types
+        assert [method.name for method in extractor.extract(module)] == ["one"]
+        assert [type(node).__name__ for node in visited] == [
+            "Module",
+            "FunctionDef",
+            "Return",
+        ]
+
+
+class TestExtractOnFile:
+    def test_called_for_each_file(self, tmp_path):
+        (tmp_path / "one.py").write_text("def one(): pass")
+        (tmp_path / "bad.py").write_text("def bad(:")
+        (tmp_path / "big.py").write_text("def big(): pass\n" * 10)
+        files = []
+        with pytest.warns(Warning):
+            methods = list(
+                extract_methods(
+                    tmp_path,
+                    limits=LimitSettings(max_file_size=50),
+                    on_file=files.append,
+                )
+            )
+        assert [method.name for method in methods] == ["one"]
+        assert sorted(file.name for file in files) == ["bad.py", "big.py", "one.py"]
+
+    def test_called_for_archive_members(self, tmp_path):
+        archive = tmp_path / "package.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("package/one.py", "def one(): pass")
+            zip_file.writestr("package/data.txt", "text")
+        files = []
+        list(extract_methods(archive, on_file=files.append))
+        assert files == [archive / "package" / "one.py"]
+
+
+class TestCountFiles:
+    def test_directory(self, tmp_path):
+        for name in ("a.py", "b.py", "sub/c.py", "sub/d.txt"):
+            (tmp_path / name).parent.mkdir(exist_ok=True)
+            (tmp_path / name).write_text("")
+        assert Extractor().count_files(tmp_path) == 3
+        shards = [Extractor(shard=Shard(i, 2)).count_files(tmp_path) for i in (1, 2)]
+        assert sum(shards) == 3
+
+    def test_file(self, tmp_path):
+        file = tmp_path / "a.py"
+        file.write_text("")
+        assert Extractor().count_files(file) == 1
+
+    def test_archives(self, tmp_path):
+        archive = tmp_path / "package.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("package/one.py", "")
+            zip_file.writestr("package/two.py", "")
+            zip_file.writestr("package/data.txt", "")
+        assert Extractor().count_files(archive) == 2
+        with tarfile.open(tmp_path / "package.tar.gz", "w:gz"):
+            pass
+        assert Extractor().count_files(tmp_path / "package.tar.gz") is None
+
+
+class TestExtractExclude:
+    @pytest.fixture
+    def tree(self, tmp_path):
+        (tmp_path / "generated").mkdir()
+        (tmp_path / "generated" / "models.py").write_text("def (")
+        (tmp_path / "app.py").write_text("def app(): pass\n")
+        return tmp_path
+
+    @staticmethod
+    def exclude(path):
+        return "generated" in path.parts
+
+    def test_excluded_files_are_not_read(self, tree):
+        with mock.patch.object(
+            pathlib.Path,
+            "read_bytes",
+            autospec=True,
+            side_effect=pathlib.Path.read_bytes,
+        ) as read_bytes:
+            methods = list(extract_methods(tree, exclude=self.exclude))
+        assert [method.name for method in methods] == ["app"]
+        assert [call.args[0] for call in read_bytes.call_args_list] == [tree / "app.py"]
+
+    def test_excluded_file(self, tree):
+        file = tree / "generated" / "models.py"
+        assert list(extract_methods(file, exclude=self.exclude)) == []
+
+    def test_excluded_archive_members(self, tmp_path):
+        archive = tmp_path / "package.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("package/generated/one.py", "def one(): pass")
+            zip_file.writestr("package/two.py", "def two(): pass")
+        methods = extract_methods(archive, exclude=self.exclude)
+        assert [method.name for method in methods] == ["two"]
+
+    def test_count_files(self, tree):
+        assert Extractor(exclude=self.exclude).count_files(tree) == 1
@@ -0,0 +1,85 @@
+import io
+import pathlib
+
+import pytest
+
+from sourcery_analytics.extractors import SkippedFileWarning
+from sourcery_analytics.file_lists import listed_files, read_file_list
+
+
+class ChunkedStream:
+    """A stream returning one chunk per read, recording how many have been read."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    def read1(self, _size):
+        self.reads += 1
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+class TestReadFileList:
+    @pytest.mark.parametrize(
+        "data",
+        [
+            b"a.py\0dir/b.py\0",
+            b"a.py\0dir/b.py",
+            b"a.py\ndir/b.py\n",
+            b"a.py\r\ndir/b.py\r\n",
+            b"\na.py\n\ndir/b.py",
+        ],
+    )
+    def test_separators(self, data):
+        assert list(read_file_list(io.BytesIO(data))) == [
+            pathlib.Path("a.py"),
+            pathlib.Path("dir/b.py"),
+        ]
+
+    def test_nul_separated_paths_may_contain_newlines(self):
+        assert list(read_file_list(io.BytesIO(b"a\nb.py\0c.py\0"))) == [
+            pathlib.Path("a\nb.py"),
+            pathlib.Path("c.py"),
+        ]
+
+    def test_entries_split_across_chunks(self):
+        stream = ChunkedStream([b"a.", b"py\0dir/", b"b.py\0"])
+        assert list(read_file_list(stream)) == [
+            pathlib.Path("a.py"),
+            pathlib.Path("dir/b.py"),
+        ]
+
+    def test_lazy(self):
+        stream = ChunkedStream([b"a.py\n", b"b.py\n", b"c.py\n"])
+        paths = read_file_list(stream)
+        assert next(paths) == pathlib.Path("a.py")
+        assert stream.reads == 1
+
+    def test_empty(self):
+        assert list(read_file_list(io.BytesIO(b""))) == []
+
+
+class TestListedFiles:
+    def test_deduplicates(self, tmp_path):
+        file = tmp_path / "a.py"
+        file.write_text("")
+        assert list(listed_files([file, tmp_path / "." / "a.py", file])) == [file]
+
+    def test_skips_non_python_files(self, tmp_path):
+        (tmp_path / "a.py").write_text("")
+        (tmp_path / "README.md").write_text("")
+        (tmp_path / "dist.whl").write_bytes(b"")
+        (tmp_path / "b.ipynb").write_text("")
+        names = ["README.md", "a.py", "dist.whl", "b.ipynb"]
+        assert list(listed_files([tmp_path / name for name in names])) == [
+            tmp_path / "a.py",
+            tmp_path / "dist.whl",
+            tmp_path / "b.ipynb",
+        ]
+
+    def test_directories(self, tmp_path):
+        assert list(listed_files([tmp_path])) == [tmp_path]
+
+    def test_missing_files_are_skipped_with_warning(self, tmp_path):
+        with pytest.warns(SkippedFileWarning, match="no such file"):
+            assert list(listed_files([tmp_path / "missing.py"])) == []
@@ -0,0 +1,149 @@
+import marshal
+import pathlib
+import pickle
+
+import astroid
+import pytest
+
+import sourcery_analytics
+from sourcery_analytics.analysis import iter_method_metrics
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.flat import (
+    FLAT_METRICS,
+    FLAT_VERSION,
+    FlatTree,
+    flat_method_records,
+    flatten,
+)
+from sourcery_analytics.metrics import (
+    method_cognitive_complexity,
+    method_cyclomatic_complexity,
+    method_length,
+    method_working_memory,
+)
+from sourcery_analytics.utils import clean_source
+
+METRICS = [
+    method_length,
+    method_cyclomatic_complexity,
+    method_cognitive_complexity,
+    method_working_memory,
+]
+
+SOURCES = [
+    """
+    def grade(score, bonus):
+        if score > 90 and bonus:
+            return "A"
+        elif score > 80 or bonus > 2:
+            return "B"
+        elif score > 70:
+            if bonus:
+                return "B"
+            else:
+                return "C"
+        else:
+            return "F"
+    """,
+    """
+    def read(paths):
+        results = []
+        for path in paths:
+            try:
+                with open(path) as file:
+                    results.append(file.read())
+            except OSError:
+                continue
+            except ValueError as exc:
+                raise RuntimeError(path) from exc
+            else:
+                pass
+        else:
+            results.sort()
+        while results and results[-1] is None:
+            results.pop()
+        else:
+            return [line for result in results for line in result if line if line[0]]
+    """,
+    """
+    class Outer:
+        def method(self, items):
+            def inner(x):
+                return x.value if x else None
+
+            total = sum(inner(item) for item in items)
+            return lambda: total
+
+        async def fetch(self, client):
+            async for chunk in client.stream():
+                if chunk:
+                    yield chunk
+    """,
+]
+
+
+def flat_tree(source):
+    return flatten(astroid.parse(clean_source(source)))
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_metrics_match_astroid(source):
+    methods = list(extract_methods(source))
+    records = flat_method_records(flat_tree(source))
+    assert [record.qualname for record in records] == [
+        method.qname() for method in methods
+    ]
+    assert [record.values for record in records] == [
+        tuple(metric(method) for metric in METRICS) for method in methods
+    ]
+
+
+def test_metrics_match_astroid_on_package():
+    package = pathlib.Path(sourcery_analytics.__file__).parent
+    for name in ["conditions.py", "overrides.py", "sampling.py"]:
+        file = package / name
+        module = astroid.MANAGER.ast_from_file(str(file))
+        assert flat_method_records(flatten(module)) == list(
+            iter_method_metrics(file, metrics=METRICS)
+        )
+
+
+class TestFlatTree:
+    def test_subtrees_are_contiguous(self):
+        tree = flat_tree(SOURCES[0])
+        for index in range(len(tree)):
+            for child in tree.children(index):
+                assert tree.columns.parents[child] == index
+                assert (
+                    index < child < tree.columns.ends[child] <= tree.columns.ends[index]
+                )
+
+    def test_lines(self):
+        tree = flat_tree(SOURCES[0])
+        [method] = tree.methods()
+        assert (tree.columns.linenos[method], tree.columns.end_linenos[method]) == (
+            1,
+            12,
+        )
+
+    def test_pickle(self):
+        tree = flat_tree(SOURCES[1])
+        assert pickle.loads(pickle.dumps(tree)) == tree
+
+    def test_bytes(self):
+        tree = flat_tree(SOURCES[2])
+        assert FlatTree.from_bytes(tree.to_bytes()) == tree
+
+    def test_bytes_version(self):
+        _version, *fields = marshal.loads(flat_tree(SOURCES[0]).to_bytes())
+        with pytest.raises(ValueError, match="version"):
+            FlatTree.from_bytes(marshal.dumps((FLAT_VERSION + 1, *fields)))
+
+    def test_selected_metrics(self):
+        records = flat_method_records(flat_tree(SOURCES[0]), ["method_length"])
+        assert records[0].metrics() == {"method_length": 9}
+
+    def test_unknown_metric(self):
+        assert "method_halstead_volume" not in FLAT_METRICS
+        with pytest.raises(KeyError):
+            flat_method_records(flat_tree(SOURCES[0]), ["method_halstead_volume"])
@@ -0,0 +1,127 @@
+import subprocess
+
+import pytest
+
+from sourcery_analytics import analyze_methods
+from sourcery_analytics.extractors import Extractor, SkippedFileWarning
+from sourcery_analytics.history import GitObjectReader, aggregate_history
+from sourcery_analytics.metrics import method_cognitive_complexity, method_length
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.settings import LimitSettings, TriageSettings
+
+METRICS = [method_length, method_cognitive_complexity]
+
+
+def git(repository, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repository,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def commit(repository, files, message):
+    """Writes the files, commits them, and returns the state of the whole tree."""
+    for name, source in files.items():
+        path = repository / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    git(repository, "add", "-A")
+    git(repository, "commit", "-q", "-m", message)
+    return analyze_methods(
+        repository / "src", metrics=METRICS, aggregation=AggregationState.from_results
+    )
+
+
+@pytest.fixture(params=["sha1", "sha256"])
+def repository(tmp_path, request):
+    git(tmp_path, "init", "-q", f"--object-format={request.param}")
+    return tmp_path
+
+
+@pytest.fixture
+def expected(repository):
+    return [
+        commit(repository, {"src/a.py": "def a():\n    pass\n"}, "first"),
+        commit(
+            repository,
+            {"src/b.py": "def b(x):\n    if x:\n        return x\n"},
+            "second",
+        ),
+        commit(
+            repository,
+            {"src/sub/c.py": "def c():\n    for i in range(3):\n        print(i)\n"},
+            "third",
+        ),
+        commit(repository, {"src/a.py": "def a():\n    return 1\n"}, "fourth"),
+    ]
+
+
+def test_aggregate_history(repository, expected):
+    history = list(aggregate_history(repository / "src", metrics=METRICS))
+    assert [point.state for point in history] == expected
+    assert history[-1].commit == git(repository, "rev-parse", "HEAD").strip()
+
+
+def test_every(repository, expected):
+    history = aggregate_history(repository / "src", metrics=METRICS, count=2, every=2)
+    assert [point.state for point in history] == [expected[1], expected[3]]
+
+
+def test_each_blob_parsed_once(repository, expected, monkeypatch):
+    parsed = []
+    original = Extractor.extract_from_bytes
+
+    def extract_from_bytes(self, data, file):
+        parsed.append(file.as_posix())
+        return original(self, data, file)
+
+    monkeypatch.setattr(Extractor, "extract_from_bytes", extract_from_bytes)
+    list(aggregate_history(repository / "src", metrics=METRICS))
+    assert sorted(parsed) == ["src/a.py", "src/a.py", "src/b.py", "src/sub/c.py"]
+
+
+def test_same_blob_parsed_once(repository, monkeypatch):
+    source = "def f():\n    pass\n"
+    commit(repository, {"src/f.py": source, "src/sub/g.py": source}, "first")
+    commit(repository, {"src/__init__.py": "", "src/sub/__init__.py": ""}, "second")
+    parsed = []
+    original = Extractor.extract_from_bytes
+
+    def extract_from_bytes(self, data, file):
+        parsed.append(file.as_posix())
+        return original(self, data, file)
+
+    monkeypatch.setattr(Extractor, "extract_from_bytes", extract_from_bytes)
+    history = list(aggregate_history(repository / "src", metrics=METRICS))
+    assert [point.state.count for point in history] == [2, 2]
+    assert len(parsed) == 2
+
+
+def test_same_blob_in_different_paths(repository):
+    source = "def f():\n    pass\n"
+    commit(repository, {"src/f.py": source, "src/f_pb2.py": source}, "first")
+    limits = LimitSettings(triage=TriageSettings(skip_generated=True))
+    with pytest.warns(SkippedFileWarning, match="generated"):
+        (point,) = aggregate_history(repository / "src", metrics=METRICS, limits=limits)
+    assert point.state.count == 1
+
+
+def test_directory_missing_from_early_commits(repository, expected):
+    history = list(aggregate_history(repository / "src" / "sub", metrics=METRICS))
+    assert [point.state.count for point in history] == [0, 0, 1, 1]
+
+
+def test_not_a_repository(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        aggregate_history(tmp_path, metrics=METRICS)
+
+
+def test_object_reader(repository, expected):
+    with GitObjectReader(repository) as reader:
+        _sha, object_type, data = reader.read("HEAD:src/a.py")
+        assert (object_type, data) == ("blob", b"def a():\n    return 1\n")
+        with pytest.raises(KeyError):
+            reader.read("HEAD:src/missing.py")
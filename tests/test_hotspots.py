@@ -0,0 +1,175 @@
+import subprocess
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics.hotspots import (
+    FileChurn,
+    LineMap,
+    _parse_log,
+    find_hotspots,
+    read_churn,
+)
+from sourcery_analytics.metrics import method_cognitive_complexity, method_length
+
+ONE = """\
+def stable():
+    return 1
+
+
+def busy(x):
+    if x:
+        return x
+    return 0
+"""
+
+
+def git(repository, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repository,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def commit(repository, files, message):
+    for name, source in files.items():
+        path = repository / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if source is None:
+            path.unlink()
+        else:
+            path.write_text(source)
+    git(repository, "add", "-A")
+    git(repository, "commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def repository(tmp_path):
+    git(tmp_path, "init", "-q")
+    commit(tmp_path, {"src/one.py": ONE, "src/two.py": "def two():\n    pass\n"}, "1")
+    # changes busy, then inserts lines above it, then changes busy again
+    commit(tmp_path, {"src/one.py": ONE.replace("return 0", "return -1")}, "2")
+    commit(
+        tmp_path,
+        {"src/one.py": "import os\n\n\n" + ONE.replace("return 0", "return -1")},
+        "3",
+    )
+    commit(
+        tmp_path,
+        {"src/one.py": "import os\n\n\n" + ONE.replace("return 0", "return -2")},
+        "4",
+    )
+    return tmp_path
+
+
+class TestLineMap:
+    def test_insertion_shifts_later_lines(self):
+        line_map = LineMap([(2, 0, 3, 2)])
+        assert [line_map[line] for line in (1, 2, 3)] == [1, 2, 5]
+
+    def test_deletion_shifts_later_lines(self):
+        line_map = LineMap([(2, 2, 1, 0)])
+        assert [line_map[line] for line in (1, 2, 3, 4)] == [
+            1,
+            1,
+            1,
+            2,
+        ]
+
+    def test_many_hunks(self):
+        # every odd line replaced by two lines
+        hunks = [(line, 1, line + line // 2, 2) for line in range(1, 200, 2)]
+        line_map = LineMap(hunks)
+        assert line_map[2] == 3
+        assert line_map[5] == 7
+        assert line_map[200] == 300
+
+
+class TestFileChurn:
+    def test_changes_are_mapped_through_newer_commits(self):
+        churn = FileChurn()
+        # newest commit inserts 5 lines at the top
+        churn.add_commit(0, [(0, 0, 1, 5)])
+        # older commit changed line 10
+        churn.add_commit(1, [(10, 1, 10, 1)])
+        assert churn.changes == [(0, 1, 5), (1, 15, 15)]
+        assert churn.churn(15, 20) == 1
+        assert churn.churn(1, 20) == 2
+        assert churn.churn(6, 14) == 0
+
+    def test_changes_before_removal_are_ignored(self):
+        churn = FileChurn()
+        churn.add_commit(0, [(0, 0, 1, 2)])
+        churn.remove()
+        churn.add_commit(1, [(0, 0, 1, 2)])
+        assert churn.commits == {0}
+
+
+class TestParseLog:
+    def test_ignores_patch_lines_resembling_headers(self):
+        log = [
+            b"\0commit\n",
+            b"\n",
+            b"diff --git a/x.py b/x.py\n",
+            b"--- a/x.py\n",
+            b"+++ b/x.py\n",
+            b"@@ -1 +1 @@\n",
+            b"--- a/y.py\n",
+            b"+++ b/y.py\n",
+        ]
+        assert list(_parse_log(log)) == [(0, "x.py", [(1, 1, 1, 1)], False)]
+
+    def test_removed_file(self):
+        log = [
+            b"\0commit\n",
+            b"diff --git a/x.py b/x.py\n",
+            b"deleted file mode 100644\n",
+            b"--- a/x.py\n",
+            b"+++ /dev/null\n",
+            b"@@ -1,2 +0,0 @@\n",
+        ]
+        assert list(_parse_log(log)) == [(0, "x.py", [(1, 2, 0, 0)], True)]
+
+
+class TestReadChurn:
+    def test_counts_commits_per_file(self, repository):
+        churn = read_churn(repository / "src")
+        assert len(churn[repository / "src" / "one.py"].commits) == 4
+        assert len(churn[repository / "src" / "two.py"].commits) == 1
+
+    def test_max_commits(self, repository):
+        churn = read_churn(repository, max_commits=2)
+        assert len(churn[repository / "src" / "one.py"].commits) == 2
+        assert repository / "src" / "two.py" not in churn
+
+    def test_not_a_repository(self, tmp_path):
+        with pytest.raises(subprocess.CalledProcessError):
+            read_churn(tmp_path)
+
+
+class TestFindHotspots:
+    def test_ranks_by_churn_times_metric(self, repository):
+        hotspots = find_hotspots(repository, metric=method_cognitive_complexity)
+        assert [
+            (hotspot.method_qualname.rsplit(".", 1)[-1], hotspot.churn, hotspot.score)
+            for hotspot in hotspots
+        ] == [("busy", 3, 3), ("stable", 1, 0), ("two", 1, 0)]
+
+    def test_only_parses_files_above_min_churn(self, repository):
+        with mock.patch(
+            "sourcery_analytics.hotspots.extract_methods", return_value=[]
+        ) as extract_methods:
+            find_hotspots(repository, metric=method_length, min_churn=2)
+        extract_methods.assert_called_once_with(
+            repository / "src" / "one.py", limits=None
+        )
+
+    def test_removed_files_are_skipped(self, repository):
+        commit(repository, {"src/two.py": None}, "5")
+        hotspots = find_hotspots(repository, metric=method_length)
+        assert {hotspot.method_file for hotspot in hotspots} == {
+            str(repository / "src" / "one.py")
+        }
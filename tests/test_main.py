@@ -1,4 +1,8 @@
 import logging
+import re
+import subprocess
+import warnings
+from unittest import mock
 
 import pytest
 from typer.testing import CliRunner
@@ -234,3 +238,493 @@ def test_assess_bad_toml(cli_runner, file, file_path, toml_file):
     )
     assert result.exit_code == 2
     assert "Error" in result.stdout
+
+
+@pytest.mark.parametrize(
+    "options, exit_code",
+    [
+        ([], 0),
+        (["--threshold", "1.0"], 0),
+        (["--threshold", "2.0"], 2),
+        (["--min-length", "1"], 0),
+        (["--min-length", "0"], 2),
+    ],
+)
+@pytest.mark.parametrize("output", ["rich", "plain", "csv"])
+def test_duplicates_options(
+    cli_runner, tmp_path, directory, options, output, exit_code
+):
+    """Check duplicate detection works for relevant combinations of options."""
+    result = cli_runner.invoke(
+        app, ["duplicates", str(tmp_path), *options, "--output", output]
+    )
+    assert result.exit_code == exit_code
+
+
+def test_duplicates_csv(cli_runner, tmp_path, directory):
+    """Check duplicate detection finds a copied method."""
+    (tmp_path / "file3.py").write_text((tmp_path / "file.py").read_text())
+    result = cli_runner.invoke(
+        app, ["duplicates", str(tmp_path), "--min-length", "1", "--output", "csv"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout.startswith("group,similarity,file,lineno,qualname\n")
+    assert f"1,1.0,{tmp_path / 'file.py'},1," in result.stdout
+    assert f"1,1.0,{tmp_path / 'file3.py'},1," in result.stdout
+
+
+@pytest.mark.parametrize(
+    "toml_file_source",
+    [
+        """
+            [tool.sourcery-analytics.limits]
+            max_node_count = 12
+        """
+    ],
+)
+def test_analyze_limits(cli_runner, tmp_path, directory, toml_file):
+    """Check files exceeding the limits are skipped."""
+    result = cli_runner.invoke(
+        app,
+        [
+            "analyze",
+            str(tmp_path),
+            "--output",
+            "csv",
+            "--settings-file",
+            str(toml_file),
+            "--method-metric",
+            "length",
+        ],
+    )
+    assert result.exit_code == 0
+    assert "bar,2" in result.stdout
+    assert "foo" not in result.stdout
+
+
+@pytest.mark.parametrize("command", ["analyze", "aggregate"])
+@pytest.mark.parametrize("output", ["rich", "plain", "csv"])
+def test_pipeline(cli_runner, tmp_path, directory, command, output):
+    """Check pipeline mode produces the same output."""
+    expected = cli_runner.invoke(app, [command, str(tmp_path), "--output", output])
+    result = cli_runner.invoke(
+        app, [command, str(tmp_path), "--output", output, "--pipeline"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout == expected.stdout
+
+
+@pytest.fixture
+def manifest(tmp_path, directory):
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "other.py").write_text("def baz():\n    return 1\n")
+    manifest_path = tmp_path / "manifest.toml"
+    manifest_path.write_text(
+        '[[roots]]\npath = "."\nname = "first"\n'
+        '[[roots]]\npath = "other"\nname = "second"\n'
+    )
+    return manifest_path
+
+
+@pytest.mark.parametrize("output", ["rich", "plain", "csv"])
+def test_batch_options(cli_runner, manifest, output):
+    """Check batch mode works for each output."""
+    result = cli_runner.invoke(app, ["batch", str(manifest), "--output", output])
+    assert result.exit_code == 0
+    assert "second" in result.stdout
+
+
+def test_batch_csv(cli_runner, manifest):
+    """Check batch mode gives per-root aggregates followed by the overall aggregate."""
+    result = cli_runner.invoke(
+        app,
+        [
+            "batch",
+            str(manifest),
+            "--method-metric",
+            "length",
+            "--aggregation",
+            "total",
+            "--output",
+            "csv",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.stdout == (
+        "root,method_count,length\nfirst,3,7\nsecond,1,1\n(overall),4,8\n"
+    )
+
+
+def test_batch_invalid_manifest(cli_runner, tmp_path):
+    """Check an invalid manifest exits with code 2."""
+    manifest_path = tmp_path / "manifest.toml"
+    manifest_path.write_text("[[roots]]\nname = 'no path'\n")
+    result = cli_runner.invoke(app, ["batch", str(manifest_path)])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["analyze", "--sort", "working_memory", "--output", "csv"],
+        ["aggregate", "--aggregation", "peak", "--output", "plain"],
+        ["aggregate", "--aggregation", "average", "--output", "csv"],
+        ["assess", "--settings-file", "thresholds.toml"],
+    ],
+)
+def test_merge_shards(cli_runner, tmp_path, directory, command):
+    """Check merging every shard gives the same output as a full run."""
+    name, *options = command
+    source_path = tmp_path / "source"
+    source_path.mkdir()
+    for file in tmp_path.glob("*.py"):
+        file.rename(source_path / file.name)
+    (tmp_path / "thresholds.toml").write_text(
+        "[tool.sourcery-analytics.thresholds]\nmethod_cognitive_complexity = 1\n"
+    )
+    options = [str(tmp_path / o) if o.endswith(".toml") else o for o in options]
+    full = cli_runner.invoke(app, [name, str(source_path), *options])
+    partials = [str(tmp_path / f"partial{index}.json") for index in (1, 2)]
+    for index, partial in enumerate(partials, 1):
+        result = cli_runner.invoke(
+            app,
+            [
+                name,
+                str(source_path),
+                *options,
+                "--shard",
+                f"{index}/2",
+                "--write-partial",
+                partial,
+            ],
+        )
+        assert result.exit_code == 0
+    output_options = options[-2:] if "--output" in options else []
+    merged = cli_runner.invoke(app, ["merge", *partials, *output_options])
+    assert merged.exit_code == full.exit_code
+    assert _without_progress(merged.stdout) == _without_progress(full.stdout)
+
+
+def _without_progress(stdout):
+    """Joins the lines of the output, without progress bars, ignoring wrapping."""
+    return "".join(line for line in stdout.splitlines() if "━" not in line)
+
+
+def test_merge_shards_orders_ties_by_location(cli_runner, tmp_path):
+    """Check methods with equal values are listed by file, whichever shard they are in."""
+    for index in range(8):
+        (tmp_path / f"module_{index}.py").write_text("def f():\n    pass\n")
+    partials = [str(tmp_path / f"partial{index}.json") for index in (1, 2)]
+    for index, partial in enumerate(partials, 1):
+        shard = ["--shard", f"{index}/2", "--write-partial", partial]
+        cli_runner.invoke(app, ["analyze", str(tmp_path), *shard])
+    merged = cli_runner.invoke(app, ["merge", *partials, "--output", "csv"])
+    rows = merged.stdout.splitlines()[1:9]
+    assert [re.search(r"module_\d", row).group() for row in rows] == [
+        f"module_{index}" for index in range(8)
+    ]
+
+
+def test_merge_missing_shard(cli_runner, tmp_path, directory):
+    """Check merging fails with code 2 if a shard is missing."""
+    partial = str(tmp_path / "partial.json")
+    cli_runner.invoke(
+        app, ["analyze", str(tmp_path), "--shard", "1/2", "--write-partial", partial]
+    )
+    result = cli_runner.invoke(app, ["merge", partial])
+    assert result.exit_code == 2
+    assert "2 shards" in result.stdout
+
+
+def test_invalid_shard(cli_runner, tmp_path, directory):
+    """Check an invalid shard is a usage error."""
+    result = cli_runner.invoke(app, ["analyze", str(tmp_path), "--shard", "3/2"])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("aggregation", ["total", "average", "peak"])
+def test_aggregate_index(cli_runner, tmp_path, directory, aggregation):
+    """Check aggregating with an index gives the same output, before and after reuse."""
+    source_path = tmp_path / "source"
+    source_path.mkdir()
+    for file in tmp_path.glob("*.py"):
+        file.rename(source_path / file.name)
+    options = ["--aggregation", aggregation, "--output", "plain"]
+    expected = cli_runner.invoke(app, ["aggregate", str(source_path), *options])
+    index_path = tmp_path / "index.json"
+    for _run in range(2):
+        result = cli_runner.invoke(
+            app,
+            ["aggregate", str(source_path), *options, "--index", str(index_path)],
+        )
+        assert result.exit_code == 0
+        assert result.stdout == expected.stdout
+    assert index_path.exists()
+
+
+def test_aggregate_index_changed(cli_runner, tmp_path, directory):
+    """Check updating an index from a list of changed paths gives the full output."""
+    source_path = tmp_path / "source"
+    source_path.mkdir()
+    for file in tmp_path.glob("*.py"):
+        file.rename(source_path / file.name)
+    options = ["--aggregation", "total", "--output", "plain"]
+    index = ["--index", str(tmp_path / "index.json")]
+    cli_runner.invoke(app, ["aggregate", str(source_path), *options, *index])
+    (source_path / "added.py").write_text("def added(x):\n    return x\n")
+    expected = cli_runner.invoke(app, ["aggregate", str(source_path), *options])
+    result = cli_runner.invoke(
+        app,
+        ["aggregate", str(source_path), *options, *index, "--changed", "-"],
+        input=f"{source_path / 'added.py'}\n",
+    )
+    assert result.exit_code == 0
+    assert result.stdout == expected.stdout
+
+
+def test_changed_without_index(cli_runner, tmp_path, directory):
+    """Check `--changed` is a usage error without `--index`."""
+    result = cli_runner.invoke(app, ["aggregate", str(tmp_path), "--changed", "-"])
+    assert result.exit_code == 2
+
+
+def test_history_csv(cli_runner, tmp_path, file):
+    """Check history reports an aggregate for each commit."""
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    subprocess.run([*git, "init", "-q"], cwd=tmp_path, check=True)
+    for message in ("first", "second"):
+        (tmp_path / f"{message}.py").write_text("def f():\n    pass\n")
+        subprocess.run([*git, "add", "-A"], cwd=tmp_path, check=True)
+        subprocess.run([*git, "commit", "-q", "-m", message], cwd=tmp_path, check=True)
+    result = cli_runner.invoke(
+        app,
+        [
+            "history",
+            str(tmp_path),
+            "--method-metric",
+            "length",
+            "--aggregation",
+            "total",
+            "--output",
+            "csv",
+        ],
+    )
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert lines[0] == "commit,date,method_count,length"
+    assert [line.split(",")[2:] for line in lines[1:]] == [["2", "5"], ["3", "6"]]
+
+
+def test_history_not_a_repository(cli_runner, tmp_path):
+    """Check history outside a git repository exits with code 2."""
+    result = cli_runner.invoke(app, ["history", str(tmp_path)])
+    assert result.exit_code == 2
+
+
+def test_hotspots_csv(cli_runner, tmp_path):
+    """Check hotspots ranks changed methods by churn times the metric."""
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    subprocess.run([*git, "init", "-q"], cwd=tmp_path, check=True)
+    for body in ("pass", "return 1"):
+        (tmp_path / "a.py").write_text(f"def f():\n    {body}\n")
+        subprocess.run([*git, "add", "-A"], cwd=tmp_path, check=True)
+        subprocess.run([*git, "commit", "-q", "-m", body], cwd=tmp_path, check=True)
+    result = cli_runner.invoke(
+        app,
+        ["hotspots", str(tmp_path), "--method-metric", "length", "--output", "csv"],
+    )
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert lines[0] == "method_qualname,method_file,method_lineno,churn,length,score"
+    assert lines[1].split(",")[2:] == ["1", "2", "1", "2"]
+
+
+def test_hotspots_not_a_repository(cli_runner, tmp_path):
+    """Check hotspots outside a git repository exits with code 2."""
+    result = cli_runner.invoke(app, ["hotspots", str(tmp_path)])
+    assert result.exit_code == 2
+
+
+def test_serve_http(cli_runner, tmp_path):
+    """Check serve-http serves on the given port until interrupted."""
+    with mock.patch(
+        "sourcery_analytics.main.AnalysisServer.serve_forever",
+        side_effect=KeyboardInterrupt,
+    ):
+        result = cli_runner.invoke(
+            app, ["serve-http", "--port", "0", "--root", str(tmp_path)]
+        )
+    assert result.exit_code == 0
+    assert result.stdout.startswith("Serving on http://127.0.0.1:")
+
+
+@pytest.mark.parametrize("command", ["analyze", "aggregate"])
+def test_files_from_stdin(cli_runner, tmp_path, directory, command):
+    """Check files listed on stdin give the same output as their directory."""
+    listed = f"{tmp_path / 'file2.py'}\0{tmp_path / 'file.py'}\0{tmp_path / 'file.py'}"
+    result = cli_runner.invoke(
+        app, [command, "--files-from", "-", "--output", "plain"], input=listed
+    )
+    expected = cli_runner.invoke(app, [command, str(tmp_path), "--output", "plain"])
+    assert result.exit_code == 0
+    assert result.stdout == expected.stdout
+
+
+def test_files_from_file(cli_runner, tmp_path, directory, toml_file_path):
+    """Check assess reads newline-separated files listed in a file."""
+    toml_file_path.write_text(
+        """
+        [tool.sourcery-analytics.thresholds]
+        method_length = 1
+        """
+    )
+    files_list = tmp_path / "files.txt"
+    files_list.write_text(f"{tmp_path / 'file2.py'}\n{tmp_path / 'README.md'}\n")
+    (tmp_path / "README.md").write_text("")
+    result = cli_runner.invoke(
+        app,
+        [
+            "assess",
+            "--files-from",
+            str(files_list),
+            "--settings-file",
+            str(toml_file_path),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "file2.py:1" in result.stdout
+    assert "Found 1 errors." in result.stdout
+
+
+@pytest.mark.parametrize(
+    "arguments", [[], ["{tmp_path}", "--files-from", "-"], ["--files-from", "missing"]]
+)
+def test_files_from_invalid(cli_runner, tmp_path, arguments):
+    """Check giving neither or both of a path and `--files-from` fails."""
+    arguments = [argument.format(tmp_path=tmp_path) for argument in arguments]
+    result = cli_runner.invoke(app, ["analyze", *arguments])
+    assert result.exit_code == 2
+
+
+def test_assess_overrides(cli_runner, tmp_path, directory, toml_file_path, monkeypatch):
+    """Check assess applies the thresholds of matching overrides, and excludes files."""
+    (tmp_path / "generated").mkdir()
+    (tmp_path / "generated" / "broken.py").write_text("def (")
+    toml_file_path.write_text(
+        """
+        [tool.sourcery-analytics.thresholds]
+        method_length = 1
+
+        [[tool.sourcery-analytics.overrides]]
+        paths = ["file.py"]
+        thresholds = { method_length = 10 }
+
+        [[tool.sourcery-analytics.overrides]]
+        paths = ["generated"]
+        exclude = true
+        """
+    )
+    monkeypatch.chdir(tmp_path)
+    with warnings.catch_warnings():
+        # the broken file would warn, if it were parsed
+        warnings.simplefilter("error")
+        result = cli_runner.invoke(
+            app, ["assess", ".", "--settings-file", str(toml_file_path)]
+        )
+    assert result.exit_code == 1
+    output = " ".join(result.stdout.split())
+    assert "file2.py:1: error: length of bar is 2 exceeding threshold of 1" in output
+    assert "Found 1 errors." in output
+
+
+def test_assess_explain(cli_runner, file, file_path, toml_file_path):
+    """Check assess explains breaches with the contribution of each line."""
+    toml_file_path.write_text(
+        """
+        [tool.sourcery-analytics.thresholds]
+        method_cognitive_complexity = 1
+        method_length = 1
+        """
+    )
+    result = cli_runner.invoke(
+        app,
+        ["assess", str(file_path), "--settings-file", str(toml_file_path), "--explain"],
+    )
+    assert result.exit_code == 1
+    lines = [" ".join(line.split()) for line in result.stdout.splitlines()]
+    assert "2 1 | if x:" in lines
+    assert "3 2 | if y:" in lines
+    assert "4 | return x + y" in lines
+    # method length cannot be explained
+    assert lines.count("1 | def foo(x, y):") == 1
+    assert "Found 2 errors." in lines
+
+
+def test_assess_explain_partial(cli_runner, file, file_path, tmp_path):
+    result = cli_runner.invoke(
+        app,
+        [
+            "assess",
+            str(file_path),
+            "--explain",
+            "--write-partial",
+            str(tmp_path / "partial.json"),
+        ],
+    )
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("output", ["rich", "plain", "csv"])
+def test_aggregate_sample(cli_runner, tmp_path, directory, output):
+    """Check sampling every file estimates the exact aggregates."""
+    result = cli_runner.invoke(
+        app,
+        [
+            "aggregate",
+            str(tmp_path),
+            "--sample",
+            "1",
+            "--method-metric",
+            "length",
+            "--output",
+            output,
+        ],
+    )
+    assert result.exit_code == 0
+    if output == "plain":
+        assert result.stdout == (
+            "{'method_length': {'value': 3.0, 'lower': 3.0, 'upper': 3.0}}\n"
+        )
+    elif output == "csv":
+        assert result.stdout.splitlines()[1] == "method_length,3.0,3.0,3.0"
+    else:
+        assert "Estimated from 2 of 2 files" in result.stdout
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--sample", "0.5", "--sample-files", "1"],
+        ["--sample", "0"],
+        ["--sample-files", "1", "--index", "index.json"],
+    ],
+)
+def test_aggregate_sample_bad_options(cli_runner, tmp_path, directory, options):
+    result = cli_runner.invoke(app, ["aggregate", str(tmp_path), *options])
+    assert result.exit_code == 2
+
+
+def test_analyze_sort_memory(cli_runner, tmp_path, directory):
+    """Check sorting with a memory limit gives the same CSV output."""
+    options = ["analyze", str(tmp_path), "--output", "csv", "--sort", "length"]
+    expected = cli_runner.invoke(app, options)
+    with mock.patch("sourcery_analytics.external_sort._RECORD_OVERHEAD", 2**20):
+        result = cli_runner.invoke(app, [*options, "--sort-memory", "1"])
+    assert result.exit_code == 0
+    assert result.stdout == expected.stdout
+
+
+def test_analyze_sort_memory_rich(cli_runner, tmp_path, directory):
+    result = cli_runner.invoke(app, ["analyze", str(tmp_path), "--sort-memory", "1"])
+    assert result.exit_code == 2
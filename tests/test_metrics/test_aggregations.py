@@ -1,6 +1,11 @@
 import pytest
 
-from sourcery_analytics.metrics.aggregations import average, total, peak
+from sourcery_analytics.metrics.aggregations import (
+    AggregationState,
+    average,
+    total,
+    peak,
+)
 from sourcery_analytics.metrics.compounders import TupleMetricResult, NamedMetricResult
 
 
@@ -51,3 +56,34 @@ def test_total(inputs, expected):
 def test_peak(inputs, expected):
     result = peak(inputs)
     assert result == expected
+
+
+@pytest.mark.parametrize(
+    "inputs",
+    [
+        (1, 5, 2, 4),
+        [NamedMetricResult({"x": 1, "y": 4}), NamedMetricResult({"x": 3, "y": 2})],
+    ],
+)
+def test_aggregation_state_matches_aggregations(inputs):
+    state = AggregationState.from_results(inputs)
+    assert state.count == len(inputs)
+    assert state.total == total(inputs)
+    assert state.average == average(inputs)
+    if isinstance(inputs[0], NamedMetricResult):
+        assert state.peak == peak(inputs)
+
+
+def test_aggregation_state_merge():
+    results = [NamedMetricResult({"x": x}) for x in (4, 1, 7, 2, 3)]
+    merged = AggregationState.from_results(results[:2]).merge(
+        AggregationState.from_results(results[2:])
+    )
+    assert merged == AggregationState.from_results(results)
+
+
+def test_aggregation_state_merge_empty():
+    state = AggregationState.from_results([1, 2])
+    assert state.merge(AggregationState()) == state
+    assert AggregationState().merge(state) == state
+    assert AggregationState().merge(AggregationState()).average is None
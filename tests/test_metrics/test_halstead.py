@@ -0,0 +1,91 @@
+import gc
+import weakref
+from unittest import mock
+
+import astroid
+import pytest
+
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics import (
+    method_halstead_difficulty,
+    method_halstead_volume,
+    method_maintainability_index,
+)
+from sourcery_analytics.metrics import halstead
+from sourcery_analytics.metrics.halstead import halstead_counts, module_tokens
+from sourcery_analytics.utils import InvalidNodeTypeError
+
+
+@pytest.fixture
+def source():
+    return """
+        import math #@
+
+        def hypotenuse(a, b): #@
+            # a comment should not count
+            return math.sqrt(a ** 2 + b ** 2)
+
+        def nothing(): #@
+            pass
+    """
+
+
+def test_counts(nodes):
+    result = halstead_counts(nodes[1])
+    assert result.distinct_operators == 8
+    assert result.distinct_operands == 6
+    assert result.total_operators == 10
+    assert result.total_operands == 9
+    assert result.lines == 2
+
+
+def test_counts_exclude_other_methods(nodes):
+    result = halstead_counts(nodes[2])
+    assert result.total_operands == 1
+    assert result.lines == 2
+
+
+def test_literal_keywords_are_operands():
+    method = astroid.extract_node("def f(x): return x is None or x == True")
+    result = halstead_counts(method)
+    # def ( : return is or == ) and f x None True
+    assert result.distinct_operators == 7
+    assert result.distinct_operands == 4
+    assert result.total_operators == 7
+    assert result.total_operands == 6
+
+
+def test_volume(nodes):
+    assert method_halstead_volume(nodes[1]) == 72.34
+
+
+def test_difficulty(nodes):
+    assert method_halstead_difficulty(nodes[1]) == 6.0
+
+
+def test_maintainability_index(nodes):
+    result = method_maintainability_index(nodes[1])
+    assert 0 < result < 100
+    assert result < method_maintainability_index(nodes[2])
+
+
+def test_neg_import(nodes):
+    with pytest.raises(InvalidNodeTypeError):
+        method_halstead_volume(nodes[0])
+
+
+def test_file_tokenized_once(file_path, file):
+    with mock.patch.object(halstead, "_tokenize", wraps=halstead._tokenize) as tokenize:
+        for method in extract_methods(file_path):
+            method_halstead_volume(method)
+            method_maintainability_index(method)
+    assert tokenize.call_count == 1
+
+
+def test_tokens_do_not_keep_module_alive():
+    module = astroid.parse("def f(x):\n    return x\n")
+    assert module_tokens(module)[1]
+    reference = weakref.ref(module)
+    del module
+    gc.collect()
+    assert reference() is None
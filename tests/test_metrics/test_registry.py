@@ -0,0 +1,162 @@
+import importlib.metadata
+import pickle
+
+import astroid
+import pytest
+
+from sourcery_analytics.analysis import iter_method_metrics
+from sourcery_analytics.conditions import is_type
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics import (
+    method_cognitive_complexity,
+    method_cyclomatic_complexity,
+    method_length,
+    method_working_memory,
+)
+from sourcery_analytics.metrics import registry
+from sourcery_analytics.metrics.registry import (
+    VisitorMetric,
+    fuse_metrics,
+    method_metric_registry,
+)
+from sourcery_analytics.visitors import FunctionVisitor
+
+method_return_count = VisitorMetric(
+    "method_return_count",
+    lambda: FunctionVisitor(is_type(astroid.nodes.Return)),
+    node_types=(astroid.nodes.Return,),
+)
+
+
+@pytest.fixture
+def source():
+    return """
+        def bin(xs):
+            for x in xs:
+                if x < 8 and x > 0:
+                    yield "small"
+                elif x < 10:
+                    yield "medium"
+                else:
+                    try:
+                        yield x.size()
+                    except ValueError:
+                        return
+
+        def maturity(cheese):
+            years = [c.years for c in cheese if c]
+            if years > 5:
+                return "seriously mature"
+            else:
+                return "quite mild" if years > 2 else "mild"
+    """
+
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    entry_points = []
+    monkeypatch.setattr(registry, "_entry_points", lambda: entry_points)
+    method_metric_registry.cache_clear()
+    yield entry_points
+    method_metric_registry.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "name, method_metric",
+    [
+        ("length", method_length),
+        ("cyclomatic_complexity", method_cyclomatic_complexity),
+        ("cognitive_complexity", method_cognitive_complexity),
+        ("working_memory", method_working_memory),
+    ],
+)
+def test_builtin_matches_method_metric(cleaned_source, name, method_metric):
+    visitor_metric = method_metric_registry()[name]
+    for method in extract_methods(cleaned_source):
+        assert visitor_metric(method) == method_metric(method)
+
+
+def test_fused_matches_method_metrics(cleaned_source):
+    names = ["length", "cyclomatic_complexity", "cognitive_complexity"]
+    metrics = [method_metric_registry()[name] for name in names]
+    fused = fuse_metrics([*metrics, method_return_count])
+    for method in extract_methods(cleaned_source):
+        assert [metric(method) for metric in fused] == [
+            *(metric(method) for metric in metrics),
+            method_return_count(method),
+        ]
+
+
+def test_fused_single_walk(cleaned_source, monkeypatch):
+    walks = []
+    fused_walk = registry._fused_walk
+
+    def counting_fused_walk(metrics, node):
+        walks.append(node)
+        return fused_walk(metrics, node)
+
+    monkeypatch.setattr(registry, "_fused_walk", counting_fused_walk)
+    metrics = fuse_metrics([method_return_count, method_metric_registry()["length"]])
+    for method in extract_methods(cleaned_source):
+        assert [metric(method) for metric in metrics] == [
+            method_return_count(method),
+            method_length(method),
+        ]
+    # one fused walk and one standalone walk per method
+    assert len(walks) == 4
+
+
+def test_fuse_keeps_names_and_order():
+    metrics = [method_metric_registry()["length"], len, method_return_count]
+    fused = fuse_metrics(metrics)
+    assert [m.__name__ for m in fused] == [
+        "method_length",
+        "len",
+        "method_return_count",
+    ]
+    assert fused[1] is len
+
+
+def test_builtin_metrics_run_in_workers(tmp_path, cleaned_source):
+    metrics = list(registry.builtin_method_metrics().values())
+    assert all(pickle.loads(pickle.dumps(metric)) for metric in metrics)
+
+    (tmp_path / "source.py").write_text(cleaned_source)
+    serial = [r.as_dict() for r in iter_method_metrics(tmp_path, metrics=metrics)]
+    parallel = iter_method_metrics(tmp_path, metrics=metrics, jobs=2)
+    assert [r.as_dict() for r in parallel] == serial
+
+
+def test_plugin(entry_points):
+    entry_points.append(
+        importlib.metadata.EntryPoint(
+            "return_count",
+            "tests.test_metrics.test_registry:method_return_count",
+            registry.ENTRY_POINT_GROUP,
+        )
+    )
+    assert method_metric_registry()["return_count"] is method_return_count
+
+
+def test_plugin_clash(entry_points):
+    entry_points.append(
+        importlib.metadata.EntryPoint(
+            "length",
+            "tests.test_metrics.test_registry:method_return_count",
+            registry.ENTRY_POINT_GROUP,
+        )
+    )
+    with pytest.warns(UserWarning, match="already registered"):
+        result = method_metric_registry()
+    assert result["length"] is not method_return_count
+
+
+def test_plugin_broken(entry_points):
+    entry_points.append(
+        importlib.metadata.EntryPoint(
+            "nonsense", "not_a_module:nonsense", registry.ENTRY_POINT_GROUP
+        )
+    )
+    with pytest.warns(UserWarning, match="Unable to load"):
+        result = method_metric_registry()
+    assert "nonsense" not in result
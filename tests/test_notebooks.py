@@ -0,0 +1,124 @@
+import io
+import json
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics import notebooks
+from sourcery_analytics.notebooks import (
+    CodeCell,
+    NotebookError,
+    clean_cell_source,
+    read_notebook,
+)
+
+IMAGE = "iVBORw0KGgo" * 10_000
+
+
+@pytest.fixture
+def document():
+    return {
+        "cells": [
+            {"cell_type": "markdown", "metadata": {}, "source": ['# "Title" {\n']},
+            {
+                "attachments": {"image.png": {"image/png": IMAGE}},
+                "cell_type": "code",
+                "execution_count": 1,
+                "id": "a1",
+                "metadata": {"tags": ["[", "{"]},
+                "outputs": [
+                    {"data": {"image/png": IMAGE, "text/plain": ['"\\\\"']}},
+                    {"name": "stdout", "text": ['\\\\\\"}]\n']},
+                ],
+                "source": ["def f(x):\n", '    return "\\\\" + x\n'],
+            },
+            {"cell_type": "raw", "source": "def not_code(): pass"},
+            {"cell_type": "code", "outputs": [], "source": "g = lambda: 1"},
+        ],
+        "metadata": {
+            "kernelspec": {"display_name": "Python 3", "name": "python3"},
+            "language_info": {"name": "python", "version": "3.11.0"},
+            "widgets": {"state": {"x": [1, 2.5e3, True, None]}},
+        },
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def read(document, chunk_size=64 * 1024, **dumps):
+    return read_notebook(io.BytesIO(json.dumps(document, **dumps).encode()), chunk_size)
+
+
+class TestReadNotebook:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 64 * 1024])
+    @pytest.mark.parametrize("indent", [None, 1])
+    def test_code_cells(self, document, chunk_size, indent):
+        notebook = read(document, chunk_size, indent=indent)
+        assert notebook.cells == [
+            CodeCell(2, 'def f(x):\n    return "\\\\" + x\n'),
+            CodeCell(4, "g = lambda: 1"),
+        ]
+        assert notebook.language == "python"
+        assert notebook.is_python
+
+    def test_outputs_are_not_held(self, document):
+        fill = notebooks._Scanner._fill
+        buffer_sizes = []
+
+        def record_fill(scanner):
+            buffer_sizes.append(len(scanner.buffer))
+            return fill(scanner)
+
+        with mock.patch.object(notebooks._Scanner, "_fill", record_fill):
+            notebook = read(document, chunk_size=1024)
+        assert len(notebook.cells) == 2
+        assert len(IMAGE) > 100_000 > max(buffer_sizes) * 50
+
+    def test_non_ascii(self, document):
+        document["cells"][3]["source"] = "café = '☕'"
+        assert read(document, chunk_size=3, ensure_ascii=False).cells[1].source == (
+            "café = '☕'"
+        )
+
+    def test_language(self, document):
+        del document["metadata"]["language_info"]
+        document["metadata"]["kernelspec"]["language"] = "R"
+        notebook = read(document)
+        assert notebook.language == "R"
+        assert not notebook.is_python
+
+    def test_no_metadata(self):
+        notebook = read({"cells": [{"cell_type": "code", "source": ""}]})
+        assert notebook.cells == [CodeCell(1, "")]
+        assert notebook.language is None
+        assert notebook.is_python
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            b"",
+            b"[]",
+            b'{"cells": [{"cell_type": "code", "source": "x"',
+            b'{"cells": [{"cell_type": "code" "source": "x"}]}',
+            b'{"cells": [{"outputs": "unterminated}]}',
+            b'{"cells": {"cell_type": "code"}}',
+        ],
+    )
+    def test_invalid(self, data):
+        with pytest.raises(NotebookError, match="invalid notebook"):
+            read_notebook(io.BytesIO(data), chunk_size=4)
+
+
+class TestCleanCellSource:
+    def test_lines_are_kept(self):
+        source = "import os\n%time os.listdir()\ndef f():\n    !ls\n    return 1\n"
+        assert clean_cell_source(source) == (
+            "import os\npass\ndef f():\n    pass\n    return 1\n"
+        )
+
+    def test_python_is_unchanged(self):
+        source = "x = 10 % 3\ny = x != 1\n"
+        assert clean_cell_source(source) == source
+
+    def test_cell_magic(self):
+        assert clean_cell_source("\n%%timeit\nf()") == ""
@@ -0,0 +1,111 @@
+import pathlib
+
+import pytest
+
+from sourcery_analytics.overrides import PathMatcher, ThresholdOverrides
+from sourcery_analytics.settings import ThresholdOverride, ThresholdSettings
+
+
+class TestPathMatcher:
+    @pytest.mark.parametrize(
+        "pattern, path, matches",
+        [
+            ("legacy", "legacy/module.py", True),
+            ("legacy", "src/legacy/module.py", True),
+            ("legacy", "legacy_module.py", False),
+            ("src/legacy", "src/legacy/module.py", True),
+            ("src/legacy", "lib/src/legacy/module.py", False),
+            ("*.py", "a/b/c.py", True),
+            ("*_pb2.py", "api/service_pb2.py", True),
+            ("*_pb2.py", "api/service.py", False),
+            ("src/*/models.py", "src/app/models.py", True),
+            ("src/*/models.py", "src/app/sub/models.py", False),
+            ("src/**/models.py", "src/models.py", True),
+            ("src/**/models.py", "src/app/sub/models.py", True),
+            ("**/generated/**", "a/generated/b/c.py", True),
+            ("**/generated/**", "generated/c.py", True),
+            ("**/generated/**", "a/generated_c.py", False),
+            ("test_?.py", "tests/test_a.py", True),
+            ("test_?.py", "tests/test_ab.py", False),
+            ("./src/", "src/a.py", True),
+        ],
+    )
+    def test_match(self, pattern, path, matches):
+        assert bool(PathMatcher([(pattern, True)]).match(path)) is matches
+
+    def test_values_in_pattern_order(self):
+        matcher = PathMatcher([("*.py", 1), ("src", 2), ("src/a.py", 3), ("**", 4)])
+        assert matcher.match("src/a.py") == [1, 2, 3, 4]
+
+    def test_several_wildcards_match_a_segment(self):
+        matcher = PathMatcher(
+            [("src/*.py", 1), ("src/test_*", 2), ("src/*_[ab].py", 3), ("src/*.pyi", 4)]
+        )
+        assert matcher.match("src/test_a.py") == [1, 2, 3]
+        assert matcher.match("src/b.pyi") == [4]
+
+    def test_shared_prefixes(self):
+        matcher = PathMatcher([("src/a", "a"), ("src/b", "b"), ("src/*", "any")])
+        assert matcher.match("src/b/c.py") == ["b", "any"]
+
+    def test_many_patterns(self):
+        matcher = PathMatcher(
+            (f"packages/package_{index}/**/*.py", index) for index in range(1000)
+        )
+        assert matcher.match("packages/package_500/a/b.py") == [500]
+        # the trie only follows the matching package's branch
+        assert len(matcher._root.literals["packages"].literals) == 1000
+
+    def test_absolute_path(self):
+        assert PathMatcher([("generated", 1)]).match("/repo/generated/a.py") == [1]
+
+
+class TestThresholdOverrides:
+    @pytest.fixture
+    def overrides(self, tmp_path):
+        return ThresholdOverrides(
+            ThresholdSettings(method_length=10),
+            [
+                ThresholdOverride(
+                    paths=["legacy", "old"],
+                    thresholds={"method_length": 30, "method_working_memory": 40},
+                ),
+                ThresholdOverride(
+                    paths=["legacy/core"], thresholds={"method_length": 20}
+                ),
+                ThresholdOverride(paths=["*_pb2.py"], exclude=True),
+            ],
+            root=tmp_path,
+        )
+
+    def test_defaults(self, overrides):
+        assert overrides.thresholds_for("core/a.py") == ThresholdSettings(
+            method_length=10
+        )
+
+    def test_later_overrides_take_precedence(self, overrides):
+        thresholds = overrides.thresholds_for("legacy/core/a.py")
+        assert thresholds.method_length == 20
+        assert thresholds.method_working_memory == 40
+
+    def test_several_matching_patterns(self, overrides):
+        assert overrides.thresholds_for("legacy/old/a.py").method_length == 30
+
+    def test_exclude(self, overrides):
+        assert overrides.excludes("legacy/service_pb2.py")
+        assert overrides.thresholds_for("legacy/service_pb2.py") is None
+        assert not overrides.excludes("legacy/service.py")
+
+    def test_relative_to_root(self, overrides, tmp_path):
+        assert (
+            overrides.thresholds_for(tmp_path / "legacy" / "a.py").method_length == 30
+        )
+        assert (
+            overrides.thresholds_for(pathlib.Path("/elsewhere/a.py")).method_length
+            == 10
+        )
+
+    def test_resolved_thresholds_are_shared(self, overrides):
+        assert overrides.thresholds_for("legacy/a.py") is overrides.thresholds_for(
+            "old/b.py"
+        )
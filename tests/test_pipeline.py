@@ -0,0 +1,55 @@
+import itertools
+import threading
+
+import pytest
+
+from sourcery_analytics.pipeline import prefetch, write_in_background
+
+
+class TestPrefetch:
+    def test_order(self):
+        result = list(prefetch(lambda x: x * 2, range(100), buffer=4, workers=8))
+        assert result == [x * 2 for x in range(100)]
+
+    def test_bounded(self):
+        consumed = []
+
+        def items():
+            for item in itertools.count():
+                consumed.append(item)
+                yield item
+
+        results = prefetch(lambda x: x, items(), buffer=4)
+        assert next(results) == 0
+        assert len(consumed) == 4
+        results.close()
+
+    def test_error(self):
+        def fail(x):
+            if x == 3:
+                raise ValueError(x)
+            return x
+
+        with pytest.raises(ValueError):
+            list(prefetch(fail, range(10)))
+
+
+class TestWriteInBackground:
+    def test_order(self):
+        written = []
+        write_in_background((str(x) for x in range(1000)), write=written.append)
+        assert written == [str(x) for x in range(1000)]
+
+    def test_separate_thread(self):
+        threads = set()
+        write_in_background(
+            ["a", "b"], write=lambda chunk: threads.add(threading.current_thread())
+        )
+        assert threading.current_thread() not in threads
+
+    def test_error(self):
+        def write(chunk):
+            raise OSError("disk full")
+
+        with pytest.raises(OSError, match="disk full"):
+            write_in_background((str(x) for x in range(1000)), write=write, buffer=2)
@@ -0,0 +1,55 @@
+import io
+import pathlib
+
+import rich.console
+
+from sourcery_analytics.progress import ExtractionProgress
+
+
+def console(file, is_terminal):
+    return rich.console.Console(file=file, force_terminal=is_terminal, width=200)
+
+
+class TestExtractionProgress:
+    def test_counts_files_methods_and_cache_hits(self):
+        progress = ExtractionProgress(3, console=console(io.StringIO(), False))
+        with progress:
+            progress.file_done(pathlib.Path("one.py"))
+            progress.file_done(pathlib.Path("two.py"), cached=True)
+        assert list(progress.track("ab")) == ["a", "b"]
+        assert (progress.files, progress.methods, progress.cache_hits) == (2, 2, 1)
+        assert progress.status().startswith("Analyzing files... 2/3 files, ")
+        assert progress.status().endswith("methods/s, 50% cached")
+
+    def test_unknown_total(self):
+        progress = ExtractionProgress(None, console=console(io.StringIO(), False))
+        assert progress.status().startswith("Analyzing files... 0/? files")
+
+    def test_set_total(self):
+        progress = ExtractionProgress(None, console=console(io.StringIO(), False))
+        progress.set_total(4)
+        assert progress.status().startswith("Analyzing files... 0/4 files")
+
+    def test_reports_periodically_when_not_interactive(self):
+        output = io.StringIO()
+        progress = ExtractionProgress(
+            2, console=console(output, False), report_interval=0
+        )
+        with progress:
+            progress.file_done(pathlib.Path("one.py"))
+            progress.file_done(pathlib.Path("two.py"))
+        lines = output.getvalue().splitlines()
+        assert [line.split(" files,")[0] for line in lines] == [
+            "Analyzing files... 1/2",
+            "Analyzing files... 2/2",
+        ]
+
+    def test_displays_live_when_interactive(self):
+        output = io.StringIO()
+        progress = ExtractionProgress(
+            1, console=console(output, True), report_interval=0
+        )
+        with progress:
+            progress.file_done(pathlib.Path("one.py"))
+        assert "1/1" in output.getvalue()
+        assert "Analyzing files... 1/1 files" not in output.getvalue()
@@ -0,0 +1,172 @@
+import os
+import pathlib
+
+import pytest
+
+from sourcery_analytics import analyze_methods
+from sourcery_analytics.metrics import method_cognitive_complexity, method_length
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.rollup import RollupIndex
+from sourcery_analytics import rollup
+
+METRICS = [method_length, method_cognitive_complexity]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for directory in ("a/b", "a/c", "d"):
+        (tmp_path / directory).mkdir(parents=True)
+    for index, file in enumerate(["a/b/one.py", "a/c/two.py", "d/three.py", "top.py"]):
+        (tmp_path / file).write_text(
+            f"def f{index}(x):\n    if x:\n        return {index}\n"
+        )
+    (tmp_path / "a/notes.txt").write_text("not python")
+    return tmp_path
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    files = []
+
+    def extract_methods(path, **kwargs):
+        files.append(path.name)
+        return original(path, **kwargs)
+
+    original = rollup.extract_methods
+    monkeypatch.setattr(rollup, "extract_methods", extract_methods)
+    return files
+
+
+def expected_state(path):
+    return analyze_methods(
+        path, metrics=METRICS, aggregation=AggregationState.from_results
+    )
+
+
+def modify(file, source):
+    stat = file.stat()
+    file.write_text(source)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_aggregate(tree, parsed):
+    index = RollupIndex()
+    assert index.aggregate(tree, metrics=METRICS) == expected_state(tree)
+    assert sorted(parsed) == ["one.py", "three.py", "top.py", "two.py"]
+    assert sorted(index.entries) == [
+        ".",
+        "a",
+        "a/b",
+        "a/b/one.py",
+        "a/c",
+        "a/c/two.py",
+        "d",
+        "d/three.py",
+        "top.py",
+    ]
+
+
+def test_unchanged_reuses_everything(tree, parsed):
+    index = RollupIndex()
+    state = index.aggregate(tree, metrics=METRICS)
+    parsed.clear()
+    assert index.aggregate(tree, metrics=METRICS) == state
+    assert parsed == []
+
+
+def test_only_changed_file_parsed(tree, parsed, tmp_path):
+    index_path = tmp_path / "index.json"
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    index.write(index_path)
+    modify(tree / "a/c/two.py", "def g():\n    for x in y:\n        pass\n")
+    parsed.clear()
+    index = RollupIndex.from_file(index_path)
+    assert index.aggregate(tree, metrics=METRICS) == expected_state(tree)
+    assert parsed == ["two.py"]
+
+
+def test_on_file_reports_reused_files(tree):
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    modify(tree / "a/c/two.py", "def g():\n    pass\n")
+    reported = []
+    index.aggregate(
+        tree,
+        metrics=METRICS,
+        on_file=lambda path, cached: reported.append((path.name, cached)),
+    )
+    assert sorted(reported) == [
+        ("one.py", True),
+        ("three.py", True),
+        ("top.py", True),
+        ("two.py", False),
+    ]
+
+
+def test_added_and_removed_files(tree, parsed):
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    (tree / "d/three.py").unlink()
+    (tree / "a/b/four.py").write_text("def four(): pass\n")
+    parsed.clear()
+    assert index.aggregate(tree, metrics=METRICS) == expected_state(tree)
+    assert parsed == ["four.py"]
+    assert "d/three.py" not in index.entries
+
+
+def test_different_metrics_not_reused(tree, parsed):
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    parsed.clear()
+    index.aggregate(tree, metrics=[method_length])
+    assert len(parsed) == 4
+
+
+def test_changed_paths_only_are_scanned(tree, parsed, monkeypatch):
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    modify(tree / "a/c/two.py", "def g():\n    for x in y:\n        pass\n")
+    scanned = []
+    scan = rollup._scan
+    monkeypatch.setattr(
+        rollup, "_scan", lambda path, key: scanned.append(key) or scan(path, key)
+    )
+    parsed.clear()
+    state = index.aggregate(tree, metrics=METRICS, changed=[tree / "a/c/two.py"])
+    assert state == expected_state(tree)
+    assert parsed == ["two.py"]
+    assert scanned == ["a/c/two.py"]
+
+
+def test_changed_paths_give_same_index_as_full_scan(tree, monkeypatch):
+    index = RollupIndex()
+    index.aggregate(tree, metrics=METRICS)
+    (tree / "d/three.py").unlink()
+    (tree / "d").rmdir()
+    (tree / "a/b/one.py").unlink()
+    (tree / "e/f").mkdir(parents=True)
+    (tree / "e/f/five.py").write_text("def five():\n    pass\n")
+    (tree / "a/c/six.py").write_text("def six():\n    pass\n")
+    monkeypatch.chdir(tree)
+    changed = [tree / "d", pathlib.Path("a/b/one.py"), tree / "e/f/five.py"]
+    changed += [tree / "a/c/six.py", tree / "a/notes.txt", tree.parent / "other.py"]
+    state = index.aggregate(tree, metrics=METRICS, changed=changed)
+    assert state == expected_state(tree)
+    rebuilt = RollupIndex()
+    rebuilt.aggregate(tree, metrics=METRICS)
+    assert index.entries == rebuilt.entries
+
+
+def test_changed_paths_without_index(tree, parsed):
+    index = RollupIndex()
+    assert index.aggregate(tree, metrics=METRICS, changed=[]) == expected_state(tree)
+    assert len(parsed) == 4
+
+
+@pytest.mark.parametrize("content", [None, "not json", '{"version": 0}'])
+def test_unusable_index_file(tmp_path, content):
+    index_path = tmp_path / "index.json"
+    if content is not None:
+        index_path.write_text(content)
+    assert RollupIndex.from_file(index_path) == RollupIndex()
@@ -0,0 +1,123 @@
+import pathlib
+
+import pytest
+
+from sourcery_analytics.analysis import analyze
+from sourcery_analytics.extractors import extract_methods
+from sourcery_analytics.metrics import method_cognitive_complexity, method_length
+from sourcery_analytics.metrics.aggregations import average, total
+from sourcery_analytics.sampling import (
+    SampleOptions,
+    Stratum,
+    aggregate_sample,
+    draw_sample,
+    stratify,
+)
+
+METRICS = [method_length, method_cognitive_complexity]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for index in range(60):
+        directory = tmp_path / ["core", "api", "tools/scripts"][index % 3]
+        directory.mkdir(parents=True, exist_ok=True)
+        body = "".join(
+            f"    {'    ' * depth}if x > {depth}:\n" for depth in range(index % 5)
+        )
+        methods = "".join(
+            f"def f{method}(x):\n{body}{'    ' * (index % 5 + 1)}return {method}\n"
+            for method in range(index % 3 + 1)
+        )
+        (directory / f"module_{index}.py").write_text(methods)
+    return tmp_path
+
+
+def exact(tree, aggregation):
+    return analyze(extract_methods(tree), metrics=METRICS, aggregation=aggregation)
+
+
+class TestStratify:
+    def test_depth(self, tree):
+        assert list(stratify([tree])) == ["api", "core", "tools"]
+        assert list(stratify([tree], depth=2)) == ["api", "core", "tools/scripts"]
+
+    def test_file(self, tree):
+        file = tree / "core" / "module_0.py"
+        assert stratify([file]) == {".": Stratum([file])}
+
+
+class TestDrawSample:
+    def test_every_stratum_is_sampled(self):
+        strata = {
+            "big": Stratum([pathlib.Path(f"{index}.py") for index in range(100)]),
+            "small": Stratum([pathlib.Path("small.py")]),
+        }
+        draw_sample(strata, count=10)
+        assert [len(stratum.sample) for stratum in strata.values()] == [10, 1]
+
+    def test_seed(self, tree):
+        def sample(seed):
+            strata = stratify([tree])
+            draw_sample(strata, fraction=0.2, seed=seed)
+            return [stratum.sample for stratum in strata.values()]
+
+        assert sample(1) == sample(1)
+        assert sample(1) != sample(2)
+
+    def test_fraction_or_count(self):
+        with pytest.raises(ValueError):
+            draw_sample({}, fraction=0.5, count=1)
+
+
+class TestAggregateSample:
+    def test_only_sampled_files_are_parsed(self, tree):
+        files = []
+        result = aggregate_sample(
+            [tree],
+            METRICS,
+            "average",
+            SampleOptions(fraction=0.25),
+            on_file=files.append,
+        )
+        assert len(files) == result.sampled_files == 15
+        assert result.total_files == 60
+        assert result.strata == 3
+
+    @pytest.mark.parametrize(
+        "aggregation, function", [("average", average), ("total", total)]
+    )
+    def test_whole_population_is_exact(self, tree, aggregation, function):
+        result = aggregate_sample(
+            [tree], METRICS, aggregation, SampleOptions(fraction=1.0)
+        )
+        for name, value in exact(tree, function):
+            assert result.estimates[name].value == pytest.approx(value)
+            assert result.estimates[name].lower == pytest.approx(value)
+            assert result.estimates[name].upper == pytest.approx(value)
+
+    @pytest.mark.parametrize(
+        "aggregation, function", [("average", average), ("total", total)]
+    )
+    def test_interval_contains_exact_value(self, tree, aggregation, function):
+        result = aggregate_sample(
+            [tree], METRICS, aggregation, SampleOptions(count=20, seed=3)
+        )
+        for name, value in exact(tree, function):
+            estimate = result.estimates[name]
+            assert estimate.lower < estimate.value < estimate.upper
+            assert estimate.lower <= value <= estimate.upper
+
+    def test_peak_is_a_lower_bound(self, tree):
+        result = aggregate_sample([tree], METRICS, "peak", SampleOptions(count=6))
+        peak = exact(tree, lambda results: max(r["method_length"] for r in results))
+        estimate = result.estimates["method_length"]
+        assert estimate.value == estimate.lower <= peak
+        assert estimate.upper is None
+
+    def test_no_methods(self, tmp_path):
+        (tmp_path / "empty.py").write_text("")
+        result = aggregate_sample(
+            [tmp_path], METRICS, "average", SampleOptions(fraction=0.5)
+        )
+        assert result.estimates["method_length"] == (None, None, None)
@@ -0,0 +1,257 @@
+import concurrent.futures
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import pytest
+
+from sourcery_analytics.load_testing import LoadTestResult, load_test
+from sourcery_analytics.server import (
+    AnalysisRequest,
+    AnalysisServer,
+    AnalysisService,
+    RequestError,
+)
+from sourcery_analytics.settings import LimitSettings
+
+SOURCE = "def f(x):\n    if x:\n        return 1\n"
+
+
+@pytest.fixture
+def service(tmp_path):
+    (tmp_path / "package").mkdir()
+    (tmp_path / "package" / "one.py").write_text(SOURCE)
+    (tmp_path / "package" / "two.py").write_text("def g():\n    pass\n")
+    with AnalysisService(
+        ["length", "cognitive_complexity"], root=tmp_path, batch_window=0.05
+    ) as service:
+        yield service
+
+
+@pytest.fixture
+def server(service):
+    with AnalysisServer(("127.0.0.1", 0), service) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        thread.join()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def post(server, body):
+    request = urllib.request.Request(url(server, "/analyze"), data=body.encode())
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.load(exc)
+
+
+class TestAnalysisService:
+    def test_sources_are_named(self, service):
+        response = service.analyze(AnalysisRequest(sources={"a.py": SOURCE}))
+        assert response == {
+            "methods": [
+                {
+                    "method_file": "a.py",
+                    "method_qualname": ".f",
+                    "method_lineno": 1,
+                    "method_length": 2,
+                    "method_cognitive_complexity": 1,
+                }
+            ],
+            "errors": {},
+        }
+
+    def test_paths(self, service, tmp_path):
+        response = service.analyze(AnalysisRequest(paths=["package"]))
+        assert sorted(row["method_file"] for row in response["methods"]) == [
+            str(tmp_path / "package" / "one.py"),
+            str(tmp_path / "package" / "two.py"),
+        ]
+
+    def test_selected_metrics(self, service):
+        response = service.analyze(
+            AnalysisRequest(sources={"a.py": SOURCE}, metrics=["length"])
+        )
+        assert list(response["methods"][0]) == [
+            "method_file",
+            "method_qualname",
+            "method_lineno",
+            "method_length",
+        ]
+
+    def test_unknown_metric(self, service):
+        with pytest.raises(RequestError, match="unknown metrics working_memory"):
+            service.analyze(
+                AnalysisRequest(sources={"a.py": SOURCE}, metrics=["working_memory"])
+            )
+
+    def test_paths_outside_root(self, service):
+        with pytest.raises(RequestError) as error:
+            service.analyze(AnalysisRequest(paths=[".."]))
+        assert error.value.status == 403
+
+    def test_missing_path(self, service):
+        with pytest.raises(RequestError) as error:
+            service.analyze(AnalysisRequest(paths=["missing.py"]))
+        assert error.value.status == 404
+
+    def test_syntax_errors_are_reported(self, service):
+        response = service.analyze(
+            AnalysisRequest(sources={"bad.py": "def (", "a.py": SOURCE})
+        )
+        assert len(response["methods"]) == 1
+        assert list(response["errors"]) == ["bad.py"]
+        assert "AstroidSyntaxError" in response["errors"]["bad.py"]
+
+    def test_results_stay_warm(self, service):
+        request = AnalysisRequest(sources={"a.py": SOURCE}, paths=["package"])
+        first = service.analyze(request)
+        second = service.analyze(request)
+        assert first == second
+        status = service.status()
+        assert status["cache_hits"] == 3
+        assert status["batches"] == 1
+
+    def test_edited_files_are_analyzed_again(self, service, tmp_path):
+        request = AnalysisRequest(paths=["package/two.py"])
+        service.analyze(request)
+        (tmp_path / "package" / "two.py").write_text("def h():\n    x = 1\n    y = 2\n")
+        response = service.analyze(request)
+        assert response["methods"][0]["method_length"] == 2
+
+    def test_concurrent_requests_are_batched(self, service):
+        requests = [
+            AnalysisRequest(sources={f"{index}.py": SOURCE + f"# {index}\n"})
+            for index in range(8)
+        ]
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(service.analyze, requests))
+        assert all(len(response["methods"]) == 1 for response in responses)
+        assert service.status()["batches"] < 8
+
+    def test_identical_sources_are_analyzed_once(self, service):
+        requests = [
+            AnalysisRequest(sources={f"{index}.py": SOURCE}) for index in range(4)
+        ]
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            responses = list(executor.map(service.analyze, requests))
+        assert [response["methods"][0]["method_file"] for response in responses] == [
+            "0.py",
+            "1.py",
+            "2.py",
+            "3.py",
+        ]
+        assert service.status()["cached"] == 1
+
+    @pytest.mark.parametrize(
+        "limits", [LimitSettings(max_file_size=20), LimitSettings(max_node_count=6)]
+    )
+    def test_sources_obey_limits(self, tmp_path, limits):
+        with AnalysisService(["length"], root=tmp_path, limits=limits) as service:
+            response = service.analyze(
+                AnalysisRequest(sources={"a.py": SOURCE, "b.py": "def g(): pass"})
+            )
+        assert "exceeds limit" in response["errors"]["a.py"]
+        assert [row["method_file"] for row in response["methods"]] == ["b.py"]
+
+    def test_broken_pool_is_restarted(self, service):
+        executor = service._batcher.pool._executor
+        broken = concurrent.futures.BrokenExecutor("pool is broken")
+        with mock.patch.object(executor, "submit", side_effect=broken):
+            response = service.analyze(AnalysisRequest(sources={"a.py": SOURCE}))
+        assert "pool is broken" in response["errors"]["a.py"]
+        response = service.analyze(AnalysisRequest(sources={"a.py": SOURCE}))
+        assert response["errors"] == {}
+        assert len(response["methods"]) == 1
+
+    def test_slow_analysis_times_out(self, service):
+        def slow_results(units, *args):
+            time.sleep(0.5)
+            return [([], None)] * len(units)
+
+        with mock.patch(
+            "sourcery_analytics.server._chunk_results", slow_results
+        ), mock.patch("sourcery_analytics.server.RESULT_TIMEOUT", 0.05):
+            response = service.analyze(AnalysisRequest(sources={"a.py": SOURCE}))
+        assert "timed out" in response["errors"]["a.py"]
+
+
+class TestAnalysisServer:
+    def test_analyze(self, server):
+        status, body = post(server, json.dumps({"sources": {"a.py": SOURCE}}))
+        assert status == 200
+        assert body["methods"][0]["method_cognitive_complexity"] == 1
+
+    def test_invalid_json(self, server):
+        status, body = post(server, "not json")
+        assert status == 400
+        assert "error" in body
+
+    @pytest.mark.parametrize("length", ["ten", "-1"])
+    def test_invalid_content_length(self, server, length):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.putrequest("POST", "/analyze")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert json.load(response) == {"error": "invalid Content-Length"}
+        connection.close()
+
+    def test_body_too_large(self, server):
+        server.max_body_size = 10
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.putrequest("POST", "/analyze")
+        connection.putheader("Content-Length", str(10 * 1024**3))
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 413
+        assert response.getheader("Connection") == "close"
+        assert json.load(response) == {"error": "body exceeds limit of 10 bytes"}
+        connection.close()
+
+    def test_request_error(self, server):
+        status, body = post(server, json.dumps({"paths": ["/"]}))
+        assert status == 403
+        assert "outside" in body["error"]
+
+    def test_stats(self, server):
+        post(server, json.dumps({"sources": {"a.py": SOURCE}}))
+        with urllib.request.urlopen(url(server, "/stats")) as response:
+            stats = json.load(response)
+        assert stats["requests"] == 1
+        assert stats["metrics"] == ["length", "cognitive_complexity"]
+
+    def test_unknown_endpoint(self, server):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url(server, "/nope"))
+        assert error.value.code == 404
+
+
+class TestLoadTest:
+    def test_load_test(self, server):
+        result = load_test(
+            url(server, "/analyze"),
+            [{"sources": {"a.py": SOURCE}}, {"paths": ["package"]}],
+            requests=20,
+            concurrency=4,
+        )
+        assert result.requests == 20
+        assert result.failures == 0
+        assert len(result.latencies) == 20
+        assert result.throughput > 0
+
+    def test_percentile(self):
+        result = LoadTestResult(4, 0, 1.0, [0.4, 0.1, 0.3, 0.2])
+        assert result.percentile(50) == 0.3
+        assert result.percentile(99) == 0.4
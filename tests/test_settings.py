@@ -1,3 +1,6 @@
+import pydantic
+import pytest
+
 from sourcery_analytics.settings import Settings
 
 
@@ -9,3 +12,78 @@ class TestSettings:
     def test_from_toml_file(self, toml_file, toml_file_path):
         settings = Settings.from_toml_file(toml_file_path)
         assert settings.thresholds.method_cyclomatic_complexity == 5
+
+    def test_limits_default(self):
+        settings = Settings()
+        assert settings.limits.max_file_size is None
+
+    @pytest.mark.parametrize(
+        "toml_file_source",
+        [
+            """
+                [tool.sourcery-analytics.limits]
+                max_file_size = 1000
+                timeout = 2.5
+            """
+        ],
+    )
+    def test_limits_from_toml_file(self, toml_file, toml_file_path):
+        settings = Settings.from_toml_file(toml_file_path)
+        assert settings.limits.max_file_size == 1000
+        assert settings.limits.max_node_count is None
+        assert settings.limits.timeout == 2.5
+
+    @pytest.mark.parametrize(
+        "toml_file_source",
+        [
+            """
+                [tool.sourcery-analytics.limits.triage]
+                skip_generated = true
+                generated_paths = ["*_pb2.py"]
+                skip_without_methods = true
+            """
+        ],
+    )
+    def test_triage_from_toml_file(self, toml_file, toml_file_path):
+        triage = Settings.from_toml_file(toml_file_path).limits.triage
+        assert triage.skip_generated
+        assert triage.generated_paths == ["*_pb2.py"]
+        assert triage.generated_markers == Settings().limits.triage.generated_markers
+        assert triage.skip_without_methods
+
+    @pytest.mark.parametrize(
+        "toml_file_source",
+        [
+            """
+                [[tool.sourcery-analytics.overrides]]
+                paths = ["legacy/**"]
+                thresholds = { method_length = 40 }
+
+                [[tool.sourcery-analytics.overrides]]
+                paths = ["*_pb2.py"]
+                exclude = true
+            """
+        ],
+    )
+    def test_overrides_from_toml_file(self, toml_file, toml_file_path):
+        settings = Settings.from_toml_file(toml_file_path)
+        assert [override.paths for override in settings.overrides] == [
+            ["legacy/**"],
+            ["*_pb2.py"],
+        ]
+        assert settings.overrides[0].thresholds == {"method_length": 40}
+        assert settings.overrides[1].exclude
+
+    @pytest.mark.parametrize(
+        "toml_file_source",
+        [
+            """
+                [[tool.sourcery-analytics.overrides]]
+                paths = ["legacy/**"]
+                thresholds = { method_lenght = 40 }
+            """
+        ],
+    )
+    def test_overrides_unknown_threshold(self, toml_file, toml_file_path):
+        with pytest.raises(pydantic.ValidationError, match="unknown thresholds"):
+            Settings.from_toml_file(toml_file_path)
@@ -0,0 +1,78 @@
+import pytest
+
+from sourcery_analytics.cli.data import PartialResult
+from sourcery_analytics.metrics.aggregations import AggregationState
+from sourcery_analytics.metrics.compounders import NamedMetricResult
+from sourcery_analytics.sharding import Shard
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("1/1", Shard(1, 1)), ("3/4", Shard(3, 4))],
+)
+def test_parse(text, expected):
+    assert Shard.parse(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "1", "0/2", "3/2", "a/b", "1/2/3"])
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        Shard.parse(text)
+
+
+def test_each_path_in_exactly_one_shard():
+    paths = [f"package/module_{index}.py" for index in range(100)]
+    shards = [Shard(index, 4) for index in range(1, 5)]
+    for path in paths:
+        assert sum(shard.contains(path) for shard in shards) == 1
+    assert all(any(shard.contains(path) for path in paths) for shard in shards)
+
+
+def test_str():
+    assert str(Shard(2, 5)) == "2/5"
+
+
+def partial(index, count=2, command="analyze", **fields):
+    return PartialResult(
+        command=command, shard=Shard(index, count), rows=[{"x": index}], **fields
+    )
+
+
+def test_merge_rows_in_shard_order():
+    merged = PartialResult.merge([partial(2), partial(1)])
+    assert merged.rows == [{"x": 1}, {"x": 2}]
+    assert merged.shard == Shard(1, 1)
+    assert merged.state is None
+
+
+def test_merge_aggregation_states():
+    results = [NamedMetricResult({"x": value}) for value in (1, 5, 3)]
+    partials = [
+        PartialResult.from_aggregation_state(
+            AggregationState.from_results(part),
+            command="aggregate",
+            shard=Shard(index, 2),
+        )
+        for index, part in ((1, results[:1]), (2, results[1:]))
+    ]
+    merged = PartialResult.merge(
+        PartialResult.parse_raw(partial.json()) for partial in partials
+    )
+    assert merged.aggregation_state() == AggregationState.from_results(results)
+
+
+@pytest.mark.parametrize(
+    "partials",
+    [
+        [],
+        [partial(1)],
+        [partial(1), partial(1)],
+        [partial(1), partial(2), partial(3)],
+        [partial(1), partial(2, count=3), partial(3, count=3)],
+        [partial(1), partial(2, command="assess")],
+        [partial(1), partial(2, options={"sort": "length"})],
+    ],
+)
+def test_merge_invalid(partials):
+    with pytest.raises(ValueError):
+        PartialResult.merge(partials)
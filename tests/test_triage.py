@@ -0,0 +1,76 @@
+import pathlib
+
+import pytest
+
+from sourcery_analytics.settings import TriageSettings
+from sourcery_analytics.triage import Triage
+
+
+@pytest.fixture
+def triage():
+    return Triage(
+        TriageSettings(skip_generated=True, skip_without_methods=True),
+        root=pathlib.Path("/repo"),
+    )
+
+
+class TestPathReason:
+    @pytest.mark.parametrize(
+        "path, pattern",
+        [
+            ("api/service_pb2.py", "*_pb2.py"),
+            ("/repo/api/service_pb2_grpc.py", "*_pb2_grpc.py"),
+            ("app/migrations/0001_initial.py", "migrations"),
+            ("app/service.py", None),
+        ],
+    )
+    def test_generated_paths(self, triage, path, pattern):
+        reason = triage.path_reason(pathlib.Path(path))
+        if pattern is None:
+            assert reason is None
+        else:
+            assert reason == f"generated file matching {pattern!r}"
+
+    def test_patterns_are_relative_to_root(self):
+        triage = Triage(
+            TriageSettings(skip_generated=True, generated_paths=["src/gen"]),
+            root=pathlib.Path("/repo"),
+        )
+        assert triage.path_reason(pathlib.Path("/repo/src/gen/a.py"))
+        assert not triage.path_reason(pathlib.Path("/repo/lib/src/gen/a.py"))
+
+    def test_disabled(self):
+        triage = Triage(TriageSettings())
+        assert triage.path_reason(pathlib.Path("api/service_pb2.py")) is None
+
+
+class TestHeaderReason:
+    def test_marker_in_header(self, triage):
+        data = b'"""Module docstring."""\n# Code generated by protoc. DO NOT EDIT.\n'
+        assert triage.header_reason(data) == "generated file marked 'DO NOT EDIT'"
+
+    def test_marker_beyond_header(self):
+        triage = Triage(TriageSettings(skip_generated=True, header_size=16))
+        assert triage.header_reason(b"x = 1\n" * 10 + b"# @generated\n") is None
+
+    def test_disabled(self):
+        assert Triage(TriageSettings()).header_reason(b"# Generated by hand") is None
+
+
+class TestMayContainMethods:
+    @pytest.mark.parametrize(
+        "data, expected",
+        [
+            (b"from .core import *\n__all__ = ['undefined']\n", False),
+            (b"", False),
+            (b"def f(): pass\n", True),
+            (b"class A:\n    async def f(self): ...\n", True),
+            # a def in a comment is enough to need parsing
+            (b"# def f(): pass\n", True),
+        ],
+    )
+    def test_scan(self, triage, data, expected):
+        assert triage.may_contain_methods(data) is expected
+
+    def test_disabled(self):
+        assert Triage(TriageSettings()).may_contain_methods(b"x = 1\n")
@@ -1,7 +1,10 @@
+import os
+
+import astroid.manager
 import astroid.nodes
 import pytest
 
-from sourcery_analytics.utils import nodedispatch, clean_source
+from sourcery_analytics.utils import ParseCache, nodedispatch, clean_source
 
 
 class TestCleanSource:
@@ -45,3 +48,46 @@ class TestNodeDispatch:
         dispatch_node_check = nodedispatch(node_checker)
         with pytest.raises(NotImplementedError):
             dispatch_node_check(42)
+
+
+class TestParseCache:
+    @pytest.fixture
+    def cache(self):
+        return ParseCache(maxsize=2)
+
+    def test_parse_file_is_cached(self, cache, tmp_path):
+        file_path = tmp_path / "cached.py"
+        file_path.write_text("def one(): pass\n")
+        assert cache.parse_file(file_path) is cache.parse_file(file_path)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_edited_file_is_parsed_again(self, cache, tmp_path):
+        path = tmp_path / "edited.py"
+        path.write_text("def one(): pass\n")
+        first = cache.parse_file(path)
+        path.write_text("def one(): pass\ndef two(): pass\n")
+        os.utime(path, ns=(0, path.stat().st_mtime_ns + 1))
+        second = cache.parse_file(path)
+        assert second is not first
+        assert len(second.body) == 2
+
+    def test_least_recently_used_is_evicted(self, cache):
+        first = cache.extract_node("1")
+        cache.extract_node("2")
+        cache.extract_node("1")
+        cache.extract_node("3")
+        assert len(cache) == 2
+        assert cache.extract_node("1") is first
+        assert cache.misses == 3
+
+    def test_evicted_modules_leave_the_manager_cache(self, cache, tmp_path):
+        paths = [tmp_path / f"module_{index}.py" for index in range(3)]
+        for path in paths:
+            path.write_text("x = 1\n")
+        modules = [cache.parse_file(path) for path in paths]
+        astroid_cache = astroid.manager.AstroidManager().astroid_cache
+        assert modules[0].name not in astroid_cache
+        assert astroid_cache[modules[2].name] is modules[2]
+        cache.clear()
+        assert modules[2].name not in astroid_cache
+        assert len(cache) == 0